@@ -0,0 +1,181 @@
+"""
+Controle de admissão do POST /validacao/: dois compartimentos (utils.bulkhead)
+por worker, para que a lentidão da consulta externa de CNPJ não tome o lugar
+da validação local.
+
+- local: toda requisição ocupa uma vaga dele do começo (antes de ler o corpo)
+  até a etapa externa;
+- externa: o documento que precisa da rede (CNPJ fora do índice local e do
+  cache em memória) troca a vaga local por uma deste na etapa externa.
+  Documentos resolvidos sem rede nunca passam por ele.
+
+Quem não cabe na fila de um compartimento (ou espera nela mais que o limite)
+recebe 503 com Retry-After na hora, em vez de ficar na fila do servidor.
+A resposta recusada não é guardada no cache de respostas.
+
+Configuração (por worker):
+- ADMISSAO_LOCAL_CONCORRENCIA, ADMISSAO_LOCAL_FILA, ADMISSAO_LOCAL_ESPERA
+  (padrão 256, 512 e 0,5 s);
+- ADMISSAO_EXTERNA_CONCORRENCIA, ADMISSAO_EXTERNA_FILA,
+  ADMISSAO_EXTERNA_ESPERA (padrão 64, 128 e 1 s);
+- ADMISSAO_RETRY_AFTER: segundos sugeridos no Retry-After (padrão 1);
+- ADMISSAO_ENABLED=0 desliga o controle.
+
+Métricas (sonda "admission"): vagas ocupadas e fila de cada compartimento,
+limites, admitidos, recusados por motivo e a espera na fila.
+"""
+import os
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from utils.bulkhead import QUEUE_FULL, QUEUE_TIMEOUT, Bulkhead, BulkheadFull
+from utils.metrics import registry
+from utils.tracing import span
+
+LOCAL = "local"
+EXTERNA = "externa"
+
+SONDA_ADMISSAO = registry.probe("admission")
+ESPERA_NA_FILA = registry.histogram(
+    "bulkhead_queue_wait_seconds", "Espera na fila do compartimento até a admissão", ("bulkhead",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+
+_admissao_atual: ContextVar[Optional["Admissao"]] = ContextVar("admissao_atual", default=None)
+
+
+class Sobrecarga(Exception):
+    """Requisição recusada pelo compartimento (fila cheia ou espera esgotada): vira 503."""
+
+    def __init__(self, compartimento: str, motivo: str, retry_after: int):
+        super().__init__(f"Servidor sobrecarregado ({compartimento}: {motivo}). Tente novamente em instantes.")
+        self.compartimento = compartimento
+        self.motivo = motivo
+        self.retry_after = retry_after
+
+
+class Admissao:
+    """Vaga de uma requisição no compartimento local, trocável pela externa."""
+    __slots__ = ("controle", "local")
+
+    def __init__(self, controle: "ControleDeAdmissao"):
+        self.controle = controle
+        self.local = True
+
+    def liberar_local(self):
+        """Devolve a vaga local (uma vez só)."""
+        if self.local:
+            self.local = False
+            self.controle.local.release()
+
+
+class ControleDeAdmissao:
+    def __init__(self, local: Bulkhead, externa: Bulkhead, retry_after: int = 1):
+        self.local = local
+        self.externa = externa
+        self.retry_after = retry_after
+
+    async def _ocupar(self, compartimento: Bulkhead):
+        try:
+            espera = await compartimento.acquire()
+        except BulkheadFull as e:
+            raise Sobrecarga(compartimento.name, e.reason, self.retry_after) from None
+        if SONDA_ADMISSAO.enabled:
+            ESPERA_NA_FILA.labels(compartimento.name).observe(espera)
+
+    async def admitir(self) -> Admissao:
+        """Vaga local para a requisição, que passa a ser a atual (contextvar). Levanta Sobrecarga."""
+        await self._ocupar(self.local)
+        admissao = Admissao(self)
+        _admissao_atual.set(admissao)
+        return admissao
+
+    def stats(self) -> Dict[str, Any]:
+        return {b.name: b.stats() for b in (self.local, self.externa)}
+
+
+class etapa_externa:
+    """
+    Envolve a etapa externa de um documento que precisa da rede: troca a
+    vaga local da requisição atual por uma externa. Sem requisição admitida
+    (lote, tarefas, testes), não faz nada.
+
+        async with etapa_externa():
+            ...
+    """
+    __slots__ = ("_controle",)
+
+    async def __aenter__(self):
+        admissao = _admissao_atual.get()
+        self._controle = None
+        if admissao is None:
+            return
+        admissao.liberar_local()
+        with span("admissao.externa"):
+            await admissao.controle._ocupar(admissao.controle.externa)
+        self._controle = admissao.controle
+
+    async def __aexit__(self, *exc):
+        if self._controle is not None:
+            self._controle.externa.release()
+        return False
+
+
+_UNSET = object()
+_controle_padrao = _UNSET
+
+
+def _controle_do_ambiente() -> Optional[ControleDeAdmissao]:
+    if os.environ.get("ADMISSAO_ENABLED", "1") == "0":
+        return None
+    return ControleDeAdmissao(
+        Bulkhead(LOCAL,
+                 int(os.environ.get("ADMISSAO_LOCAL_CONCORRENCIA", 256)),
+                 int(os.environ.get("ADMISSAO_LOCAL_FILA", 512)),
+                 float(os.environ.get("ADMISSAO_LOCAL_ESPERA", 0.5))),
+        Bulkhead(EXTERNA,
+                 int(os.environ.get("ADMISSAO_EXTERNA_CONCORRENCIA", 64)),
+                 int(os.environ.get("ADMISSAO_EXTERNA_FILA", 128)),
+                 float(os.environ.get("ADMISSAO_EXTERNA_ESPERA", 1.0))),
+        retry_after=int(os.environ.get("ADMISSAO_RETRY_AFTER", 1)),
+    )
+
+
+def get_controle_admissao() -> Optional[ControleDeAdmissao]:
+    """Controle de admissão padrão, criado na primeira requisição. None se ADMISSAO_ENABLED=0."""
+    global _controle_padrao
+    if _controle_padrao is _UNSET:
+        _controle_padrao = _controle_do_ambiente()
+    return _controle_padrao
+
+
+def set_controle_admissao(controle: Optional[ControleDeAdmissao]):
+    """Substitui o controle padrão (None desliga a admissão; ex.: nos testes)."""
+    global _controle_padrao
+    _controle_padrao = controle
+
+
+def _coletar_admissao() -> List[tuple]:
+    if not isinstance(_controle_padrao, ControleDeAdmissao) or not SONDA_ADMISSAO.enabled:
+        return []
+    s = _controle_padrao.stats()
+    return [
+        ("bulkhead_in_flight", "gauge", "Execuções em andamento no compartimento",
+         [({"bulkhead": nome}, b["active"]) for nome, b in s.items()]),
+        ("bulkhead_queued", "gauge", "Requisições na fila do compartimento",
+         [({"bulkhead": nome}, b["waiting"]) for nome, b in s.items()]),
+        ("bulkhead_max_concurrent", "gauge", "Limite de execuções simultâneas do compartimento",
+         [({"bulkhead": nome}, b["max_concurrent"]) for nome, b in s.items()]),
+        ("bulkhead_max_queue", "gauge", "Tamanho máximo da fila do compartimento",
+         [({"bulkhead": nome}, b["max_queue"]) for nome, b in s.items()]),
+        ("bulkhead_max_wait_seconds", "gauge", "Espera máxima na fila do compartimento",
+         [({"bulkhead": nome}, b["max_wait"]) for nome, b in s.items()]),
+        ("bulkhead_admitted_total", "counter", "Requisições admitidas pelo compartimento",
+         [({"bulkhead": nome}, b["admitted"]) for nome, b in s.items()]),
+        ("bulkhead_rejected_total", "counter", "Requisições recusadas (503) pelo compartimento, por motivo", [
+            ({"bulkhead": nome, "reason": motivo}, b[motivo])
+            for nome, b in s.items() for motivo in (QUEUE_FULL, QUEUE_TIMEOUT)
+        ]),
+    ]
+
+
+registry.add_collector(_coletar_admissao)
@@ -0,0 +1,397 @@
+"""
+Validação ao vivo de um formulário: o cliente envia os campos à medida que
+o usuário os preenche e recebe de volta os erros de cada trecho do
+documento (sub-schema: EnderecoSchema, SupervisorSchema,
+DadosEstagioSchema...), sem mandar o documento inteiro a cada tecla.
+
+Uma SessaoAoVivo guarda o rascunho do documento e memoriza o resultado de
+cada trecho pelo conteúdo dele (e pelos resultados dos trechos internos):
+um campo alterado revalida só o trecho dele e os que o contêm, e voltar a
+um valor já visto não revalida nada. Trechos incompletos são validados
+assim mesmo; a falta dos campos ainda não preenchidos não é erro.
+
+Os verificadores da etapa externa (api/verificadores.py; hoje, a consulta
+do CNPJ) rodam quando o trecho do campo verificado fica válido e também são
+memorizados, pelo valor: a consulta de um CNPJ acontece uma vez por sessão.
+
+Protocolo do WebSocket /validacao/ao-vivo (mensagens JSON):
+
+    cliente -> {"campos": {"estagiario.endereco.cep": "07190-100", ...}}
+               {"documento": {...}}   (o documento, parcial ou completo)
+    servidor -> {"tipo": "trecho", "trecho": "estagiario.endereco",
+                 "completo": true, "valido": false, "erros": [...]}
+                {"tipo": "verificacao", "nome": "cnpj_concedente",
+                 "campo": "unidade_concedente.cnpj", "resultado": "ok", "erro": null}
+                {"tipo": "erro", "mensagem": "..."}
+
+Os erros de uma sessão não contam em validation_rejections_total: são
+valores ainda sendo digitados, não documentos recusados.
+
+Só são enviados os trechos cujo resultado mudou. Os erros seguem o formato
+dos do Pydantic, com "loc" a partir da raiz do documento. As verificações
+chegam depois, quando terminam, pela mesma conexão.
+"""
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, ValidationError
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from utils.metrics import registry
+from .idempotencia import chave_do_documento
+from .metricas import sem_contar_rejeicoes
+from .regras import CONJUNTO_DE_REGRAS, ConjuntoDeRegras, regras_vigentes
+from .schemas import ValidacaoDocumentoSchema
+from .verificadores import Verificacao, get_registro_verificadores
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+DOCUMENTO = "documento"
+MAX_MEMORIZADOS = 256
+
+
+class Trecho(NamedTuple):
+    schema: type
+    escalares: frozenset                 # campos próprios (não são sub-schemas)
+    internos: Dict[str, str]             # campo -> caminho do trecho interno
+    loc: Tuple[str, ...]                 # posição no documento
+
+
+def _mapear_trechos(schema: type, caminho: str, loc: Tuple[str, ...], trechos: Dict[str, Trecho]):
+    internos = {}
+    for campo, info in schema.model_fields.items():
+        if isinstance(info.annotation, type) and issubclass(info.annotation, BaseModel):
+            interno = f"{caminho}.{campo}" if loc else campo
+            internos[campo] = interno
+            _mapear_trechos(info.annotation, interno, loc + (campo,), trechos)
+    trechos[caminho] = Trecho(schema, frozenset(schema.model_fields) - set(internos), internos, loc)
+
+
+# caminho ("documento", "estagiario", "estagiario.endereco"...) -> Trecho
+TRECHOS: Dict[str, Trecho] = {}
+_mapear_trechos(ValidacaoDocumentoSchema, DOCUMENTO, (), TRECHOS)
+
+
+class ResultadoTrecho(NamedTuple):
+    chave: str                           # hash do conteúdo validado (chave da memorização)
+    modelo: Optional[BaseModel]          # None se incompleto ou com erro
+    completo: bool
+    erros: List[Dict[str, Any]]
+
+    @property
+    def valido(self) -> bool:
+        return self.modelo is not None
+
+
+class CampoDesconhecido(ValueError):
+    """Caminho que não é um campo do documento."""
+
+
+def localizar(campo: str) -> Tuple[str, str]:
+    """"estagiario.endereco.cep" -> ("estagiario.endereco", "cep"). Levanta CampoDesconhecido."""
+    caminho, _, nome = campo.rpartition(".")
+    trecho = TRECHOS.get(caminho or DOCUMENTO)
+    if trecho is None or nome not in trecho.escalares:
+        raise CampoDesconhecido(f"Campo desconhecido: {campo}")
+    return caminho or DOCUMENTO, nome
+
+
+def achatar(documento: Dict[str, Any], caminho: str = DOCUMENTO) -> Dict[str, Any]:
+    """Documento (parcial) aninhado -> {"trecho.campo": valor}. Levanta CampoDesconhecido."""
+    trecho = TRECHOS[caminho]
+    campos = {}
+    for nome, valor in documento.items():
+        if nome in trecho.internos and isinstance(valor, dict):
+            campos.update(achatar(valor, trecho.internos[nome]))
+        elif nome in trecho.escalares:
+            campos[".".join(trecho.loc + (nome,))] = valor
+        else:
+            raise CampoDesconhecido(f"Campo desconhecido: {'.'.join(trecho.loc + (nome,))}")
+    return campos
+
+
+def _acima(caminho: str) -> Iterable[str]:
+    """O trecho e os que o contêm, do mais interno para a raiz."""
+    while caminho != DOCUMENTO:
+        yield caminho
+        caminho = caminho.rpartition(".")[0] or DOCUMENTO
+    yield DOCUMENTO
+
+
+_stats = {"sessoes": 0, "trechos_validados": 0, "trechos_memorizados": 0,
+          "verificacoes": 0, "verificacoes_memorizadas": 0}
+
+
+class SessaoAoVivo:
+    """Rascunho de um documento e os resultados memorizados de seus trechos e verificações."""
+
+    def __init__(self, regras: Optional[ConjuntoDeRegras] = None, max_memorizados: int = MAX_MEMORIZADOS):
+        self.regras = regras
+        self.max_memorizados = max_memorizados
+        self.valores: Dict[str, Dict[str, Any]] = {caminho: {} for caminho in TRECHOS}
+        self.resultados: Dict[str, ResultadoTrecho] = {}
+        self._memoria: "OrderedDict[str, ResultadoTrecho]" = OrderedDict()
+        self._enviados: Dict[str, Tuple[bool, bool, List[Dict[str, Any]]]] = {}
+        self._verificacoes: "OrderedDict[Tuple[str, Any], Verificacao]" = OrderedDict()
+        self._verificados: Dict[str, Any] = {}
+
+    def atualizar(self, campos: Dict[str, Any]) -> List[Tuple[str, ResultadoTrecho]]:
+        """
+        Aplica os campos ao rascunho e revalida os trechos afetados. Retorna
+        os trechos cujo resultado mudou (caminho, resultado). Levanta
+        CampoDesconhecido sem alterar nada.
+        """
+        destinos = [(localizar(campo), valor) for campo, valor in campos.items()]
+        afetados = set()
+        for (caminho, nome), valor in destinos:
+            self.valores[caminho][nome] = valor
+            afetados.update(_acima(caminho))
+        regras = self.regras or regras_vigentes()
+        # Dos mais internos para a raiz: cada trecho usa o resultado dos internos
+        afetados = sorted(afetados, key=lambda c: (-len(TRECHOS[c].loc), c))
+        with sem_contar_rejeicoes():
+            for caminho in afetados:
+                self.resultados[caminho] = self._validar(caminho, regras)
+        return [(caminho, self.resultados[caminho]) for caminho in afetados if self._mudou(caminho)]
+
+    def _mudou(self, caminho: str) -> bool:
+        resultado = self.resultados[caminho]
+        enviado = (resultado.completo, resultado.valido, resultado.erros)
+        if self._enviados.get(caminho) == enviado:
+            return False
+        self._enviados[caminho] = enviado
+        return True
+
+    def _validar(self, caminho: str, regras: ConjuntoDeRegras) -> ResultadoTrecho:
+        trecho = TRECHOS[caminho]
+        entrada = dict(self.valores[caminho])
+        internos = {campo: self.resultados.get(interno) for campo, interno in trecho.internos.items()}
+        chave = chave_do_documento(
+            [caminho, entrada, {campo: r.chave if r else None for campo, r in internos.items()}],
+            regras.assinatura)
+        memorizado = self._memoria.get(chave)
+        if memorizado is not None:
+            self._memoria.move_to_end(chave)
+            _stats["trechos_memorizados"] += 1
+            return memorizado
+
+        _stats["trechos_validados"] += 1
+        completo = all(r is not None and r.completo for r in internos.values())
+        for campo, r in internos.items():
+            if r is not None and r.valido:
+                # Já validado: o Pydantic aceita a instância sem validar de novo
+                entrada[campo] = r.modelo
+        modelo, erros = None, []
+        try:
+            modelo = trecho.schema.model_validate(entrada, context={CONJUNTO_DE_REGRAS: regras})
+        except ValidationError as e:
+            for erro in e.errors(include_url=False):
+                if erro["type"] == "missing":
+                    # Campo ainda não preenchido, ou trecho interno com erro
+                    # (que aparece no resultado dele)
+                    completo = completo and erro["loc"][0] in trecho.internos
+                    continue
+                erros.append({**erro, "loc": trecho.loc + tuple(erro["loc"])})
+        resultado = ResultadoTrecho(chave, modelo, completo, jsonable_encoder(erros))
+
+        self._memoria[chave] = resultado
+        if len(self._memoria) > self.max_memorizados:
+            self._memoria.popitem(last=False)
+        return resultado
+
+    # --- Verificações da etapa externa ---
+
+    def verificacoes_pendentes(self) -> List[Tuple[str, Any]]:
+        """
+        (nome, valor) dos verificadores cujo campo mudou desde a última vez;
+        valor None se o campo ficou vazio ou o trecho dele, inválido (não há
+        o que verificar). Os já memorizados são devolvidos por
+        verificacao_memorizada, sem rodar de novo.
+        """
+        registro = get_registro_verificadores()
+        pendentes = []
+        for verificador in registro or ():
+            caminho = ".".join(verificador.campo[:-1]) or DOCUMENTO
+            resultado = self.resultados.get(caminho)
+            valor = self.valores[caminho].get(verificador.campo[-1])
+            if resultado is None or not resultado.valido or not valor:
+                valor = None
+            if self._verificados.get(verificador.nome) != valor:
+                self._verificados[verificador.nome] = valor
+                pendentes.append((verificador.nome, valor))
+        return pendentes
+
+    def verificacao_memorizada(self, nome: str, valor: Any) -> Optional[Verificacao]:
+        verificacao = self._verificacoes.get((nome, valor))
+        if verificacao is not None:
+            _stats["verificacoes_memorizadas"] += 1
+        return verificacao
+
+    async def verificar(self, nome: str, valor: Any, client: Optional["httpx.AsyncClient"] = None) -> Optional[Verificacao]:
+        """
+        Executa (ou devolve da memória) o verificador `nome` sobre `valor`.
+        Retorna None se o campo mudou enquanto isso (resultado obsoleto).
+        """
+        verificacao = self.verificacao_memorizada(nome, valor)
+        if verificacao is None:
+            registro = get_registro_verificadores()
+            if registro is None:
+                return None
+            _stats["verificacoes"] += 1
+            with sem_contar_rejeicoes():
+                verificacao = await registro.verificar_valor(nome, valor, client)
+            if verificacao.definitivo:
+                # Falhas transitórias (prazo, provedor fora do ar) são tentadas de novo
+                self._verificacoes[(nome, valor)] = verificacao
+                if len(self._verificacoes) > self.max_memorizados:
+                    self._verificacoes.popitem(last=False)
+        if self._verificados.get(nome) != valor:
+            return None
+        return verificacao
+
+
+def _ordem(caminho: str) -> Tuple[int, str]:
+    return len(TRECHOS[caminho].loc), caminho
+
+
+def mensagem_trecho(caminho: str, resultado: ResultadoTrecho) -> Dict[str, Any]:
+    return {"tipo": "trecho", "trecho": caminho, "completo": resultado.completo,
+            "valido": resultado.valido, "erros": resultado.erros}
+
+
+def mensagem_verificacao(verificacao: Verificacao) -> Dict[str, Any]:
+    verificador = next(v for v in get_registro_verificadores() if v.nome == verificacao.nome)
+    return {"tipo": "verificacao", "nome": verificacao.nome, "campo": ".".join(verificador.campo),
+            "resultado": verificacao.resultado, "erro": verificacao.erro}
+
+
+def campos_da_mensagem(mensagem: Any) -> Dict[str, Any]:
+    """Campos de uma mensagem do cliente ({"campos": {...}} e/ou {"documento": {...}})."""
+    if not isinstance(mensagem, dict):
+        raise CampoDesconhecido("A mensagem deve ser um objeto JSON com \"campos\" ou \"documento\".")
+    campos = {}
+    documento = mensagem.get("documento")
+    if documento is not None:
+        if not isinstance(documento, dict):
+            raise CampoDesconhecido("\"documento\" deve ser um objeto.")
+        campos.update(achatar(documento))
+    avulsos = mensagem.get("campos")
+    if avulsos is not None:
+        if not isinstance(avulsos, dict):
+            raise CampoDesconhecido("\"campos\" deve ser um objeto.")
+        campos.update(avulsos)
+    return campos
+
+
+async def conduzir_sessao(websocket: WebSocket, client: Optional["httpx.AsyncClient"] = None):
+    """
+    Atende uma conexão de validação ao vivo até o cliente desconectar: cada
+    mensagem recebida é respondida na hora com os trechos que mudaram; as
+    verificações externas são enviadas quando terminam. Uma verificação
+    ainda em andamento para um campo que mudou é cancelada.
+    """
+    await websocket.accept()
+    sessao = SessaoAoVivo()
+    _stats["sessoes"] += 1
+    em_andamento: Dict[str, asyncio.Task] = {}
+
+    async def verificar(nome: str, valor: Any):
+        # Tarefa avulsa: ninguém espera por ela, então o erro (ex.: envio
+        # com a conexão já fechada) fica aqui, e não no log do event loop
+        try:
+            verificacao = await sessao.verificar(nome, valor, client)
+            if verificacao is not None:
+                await websocket.send_json(mensagem_verificacao(verificacao))
+        except Exception as e:
+            logger.debug("Verificação %s da sessão ao vivo interrompida: %r", nome, e)
+
+    try:
+        while True:
+            mensagem = await websocket.receive()
+            if mensagem["type"] == "websocket.disconnect":
+                break
+            texto = mensagem.get("text")
+            if texto is None:
+                await websocket.send_json({"tipo": "erro", "mensagem": "As mensagens devem ser texto (JSON)."})
+                continue
+            try:
+                campos = campos_da_mensagem(json.loads(texto))
+                alterados = sessao.atualizar(campos)
+            except json.JSONDecodeError:
+                await websocket.send_json({"tipo": "erro", "mensagem": "JSON inválido."})
+                continue
+            except CampoDesconhecido as e:
+                await websocket.send_json({"tipo": "erro", "mensagem": str(e)})
+                continue
+            for caminho, resultado in alterados:
+                await websocket.send_json(mensagem_trecho(caminho, resultado))
+            for nome, valor in sessao.verificacoes_pendentes():
+                anterior = em_andamento.pop(nome, None)
+                if anterior is not None:
+                    anterior.cancel()
+                if valor is None:
+                    continue
+                memorizada = sessao.verificacao_memorizada(nome, valor)
+                if memorizada is not None:
+                    await websocket.send_json(mensagem_verificacao(memorizada))
+                else:
+                    em_andamento[nome] = asyncio.ensure_future(verificar(nome, valor))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        _stats["sessoes"] -= 1
+        for tarefa in em_andamento.values():
+            tarefa.cancel()
+
+
+async def validar_trecho(caminho: str, dados: Any, client: Optional["httpx.AsyncClient"] = None) -> Dict[str, Any]:
+    """
+    Validação avulsa (sem sessão) de um trecho: o corpo é o trecho (parcial)
+    como aparece no documento. Retorna o resultado dele, o dos trechos
+    internos e o dos verificadores do trecho, já executados.
+    """
+    if caminho not in TRECHOS:
+        raise CampoDesconhecido(f"Trecho desconhecido: {caminho}")
+    if not isinstance(dados, dict):
+        raise CampoDesconhecido("O corpo deve ser um objeto JSON com os campos do trecho.")
+    sessao = SessaoAoVivo()
+    sessao.atualizar(achatar(dados, caminho))
+    prefixo = "" if caminho == DOCUMENTO else caminho + "."
+    verificacoes = []
+    for nome, valor in sessao.verificacoes_pendentes():
+        verificacao = await sessao.verificar(nome, valor, client) if valor is not None else None
+        if verificacao is not None:
+            verificacoes.append(mensagem_verificacao(verificacao))
+    trechos = {c: r for c, r in sessao.resultados.items() if c == caminho or c.startswith(prefixo)}
+    resultado = trechos[caminho]
+    return {
+        "trecho": caminho,
+        "completo": resultado.completo,
+        "valido": resultado.valido,
+        "erros": [erro for c, r in sorted(trechos.items(), key=lambda i: _ordem(i[0])) for erro in r.erros],
+        "verificacoes": [v for v in verificacoes if v["campo"].startswith(prefixo)],
+    }
+
+
+def _coletar_ao_vivo() -> List[tuple]:
+    return [
+        ("live_validation_sessions", "gauge", "Conexões de validação ao vivo abertas", [({}, _stats["sessoes"])]),
+        ("live_validation_sections_total", "counter", "Trechos revalidados ou reaproveitados da memória da sessão", [
+            ({"result": "validated"}, _stats["trechos_validados"]),
+            ({"result": "memoized"}, _stats["trechos_memorizados"]),
+        ]),
+        ("live_validation_verifications_total", "counter", "Verificações externas executadas ou reaproveitadas", [
+            ({"result": "executed"}, _stats["verificacoes"]),
+            ({"result": "memoized"}, _stats["verificacoes_memorizadas"]),
+        ]),
+    ]
+
+
+registry.add_collector(_coletar_ao_vivo)
@@ -0,0 +1,183 @@
+"""
+Cache de respostas do POST /validacao/ para reenvios do mesmo documento
+(duplo clique, nova tentativa depois de um timeout...).
+
+- A chave é o hash (SHA-256) da forma canônica do documento (JSON com as
+  chaves ordenadas e sem espaços), junto com a assinatura das regras de
+  negócio em vigor e o modo de validação: a mesma resposta só é reaproveitada
+  enquanto as regras não mudarem.
+- O cabeçalho Idempotency-Key guarda a resposta também pela chave informada
+  pelo cliente, por mais tempo; reusar a chave com outro documento é um erro.
+- Só entram respostas definitivas: 200 e 422 por erro de validação ou por
+  CNPJ inexistente/inativo. Falhas transitórias da consulta de CNPJ
+  (conexão, indisponibilidade, 5xx) nunca são guardadas.
+- Os dois níveis são LRU limitados, com TTL.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = 1_000
+DEFAULT_TTL = 300                    # mesmo documento: 5 minutos
+DEFAULT_IDEMPOTENCY_TTL = 24 * 3600  # mesma Idempotency-Key: 1 dia
+
+
+class ChaveDeIdempotenciaReutilizada(Exception):
+    """A Idempotency-Key já foi usada com outro documento."""
+
+
+class RespostaGuardada(NamedTuple):
+    status_code: int
+    corpo: bytes
+    etag: str
+    media_type: str = "application/json"
+
+
+def forma_canonica(dados: Any) -> bytes:
+    """JSON canônico: chaves ordenadas, sem espaços, UTF-8."""
+    return json.dumps(dados, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def chave_do_documento(dados: Any, *variantes: str) -> str:
+    """Hash da forma canônica do documento e das variantes (regras em vigor, modo de validação...)."""
+    return chave_da_forma_canonica(forma_canonica(dados), *variantes)
+
+
+def chave_da_forma_canonica(canonica: bytes, *variantes: str) -> str:
+    """Como chave_do_documento, com a forma canônica já calculada (ex.: pelo caminho rápido)."""
+    h = hashlib.sha256(canonica)
+    for variante in variantes:
+        h.update(b"\0" + variante.encode("utf-8"))
+    return h.hexdigest()
+
+
+def etag_de(corpo: bytes) -> str:
+    return '"' + hashlib.sha256(corpo).hexdigest()[:32] + '"'
+
+
+def etag_confere(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match (lista de ETags, fracas ou fortes, ou "*") contém a ETag?"""
+    if not if_none_match:
+        return False
+    for candidata in if_none_match.split(","):
+        candidata = candidata.strip()
+        if candidata == "*" or candidata.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class CacheDeRespostas:
+    """
+    LRU em memória das respostas por documento (TTL `ttl`) e por
+    Idempotency-Key (TTL `idempotency_ttl`), cada um limitado a `max_entries`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: float = DEFAULT_TTL,
+        idempotency_ttl: float = DEFAULT_IDEMPOTENCY_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.idempotency_ttl = idempotency_ttl
+        self._clock = clock
+        self._documentos: "OrderedDict[str, Tuple[RespostaGuardada, float]]" = OrderedDict()
+        self._chaves: "OrderedDict[str, Tuple[str, RespostaGuardada, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "idempotent_replays": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def get(self, chave: str, chave_idempotencia: Optional[str] = None) -> Tuple[Optional[RespostaGuardada], bool]:
+        """
+        Resposta guardada para o documento (ou para a Idempotency-Key).
+        Retorna (resposta ou None, True se veio da Idempotency-Key).
+        Levanta ChaveDeIdempotenciaReutilizada se a chave foi usada com outro documento.
+        """
+        agora = self._clock()
+        with self._lock:
+            if chave_idempotencia is not None:
+                item = self._chaves.get(chave_idempotencia)
+                if item is not None:
+                    documento, resposta, expira_em = item
+                    if expira_em > agora:
+                        if documento != chave:
+                            raise ChaveDeIdempotenciaReutilizada(chave_idempotencia)
+                        self._chaves.move_to_end(chave_idempotencia)
+                        self._stats["idempotent_replays"] += 1
+                        return resposta, True
+                    del self._chaves[chave_idempotencia]
+
+            item = self._documentos.get(chave)
+            if item is not None:
+                resposta, expira_em = item
+                if expira_em > agora:
+                    self._documentos.move_to_end(chave)
+                    self._stats["hits"] += 1
+                    return resposta, False
+                del self._documentos[chave]
+            self._stats["misses"] += 1
+            return None, False
+
+    def set(self, chave: str, resposta: RespostaGuardada, chave_idempotencia: Optional[str] = None):
+        agora = self._clock()
+        with self._lock:
+            self._guardar(self._documentos, chave, (resposta, agora + self.ttl))
+            if chave_idempotencia is not None:
+                self._guardar(self._chaves, chave_idempotencia, (chave, resposta, agora + self.idempotency_ttl))
+            self._stats["stores"] += 1
+
+    def _guardar(self, lru: OrderedDict, chave: str, item: tuple):
+        lru[chave] = item
+        lru.move_to_end(chave)
+        while len(lru) > self.max_entries:
+            lru.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._documentos.clear()
+            self._chaves.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._documentos)
+            stats["idempotency_keys"] = len(self._chaves)
+        hits = stats["hits"] + stats["idempotent_replays"]
+        total = hits + stats["misses"]
+        stats["hit_rate"] = hits / total if total else 0.0
+        return stats
+
+
+_UNSET = object()
+_cache_padrao = _UNSET
+
+
+def get_cache_respostas() -> Optional[CacheDeRespostas]:
+    """
+    Cache padrão, criado na primeira chamada. Variáveis de ambiente:
+    RESPOSTAS_CACHE_ENABLED=0 desliga; RESPOSTAS_CACHE_MAX_ENTRIES,
+    RESPOSTAS_CACHE_TTL e IDEMPOTENCY_KEY_TTL (segundos).
+    """
+    global _cache_padrao
+    if _cache_padrao is _UNSET:
+        if os.environ.get("RESPOSTAS_CACHE_ENABLED", "1") == "0":
+            _cache_padrao = None
+        else:
+            _cache_padrao = CacheDeRespostas(
+                max_entries=int(os.environ.get("RESPOSTAS_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+                ttl=float(os.environ.get("RESPOSTAS_CACHE_TTL", DEFAULT_TTL)),
+                idempotency_ttl=float(os.environ.get("IDEMPOTENCY_KEY_TTL", DEFAULT_IDEMPOTENCY_TTL)),
+            )
+    return _cache_padrao
+
+
+def set_cache_respostas(cache: Optional[CacheDeRespostas]):
+    """Substitui o cache padrão (None desliga o cache de respostas)."""
+    global _cache_padrao
+    _cache_padrao = cache
@@ -0,0 +1,187 @@
+import asyncio
+import codecs
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Tuple
+
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+
+# Tamanho máximo de um único registro ainda incompleto no buffer. Evita que um
+# registro malformado faça o servidor acumular o upload inteiro em memória.
+TAMANHO_MAXIMO_REGISTRO = 1024 * 1024
+
+CONCORRENCIA_PADRAO = 16
+CONCORRENCIA_MAXIMA = 64
+
+_ESPACOS = " \t\r\n"
+
+
+class ErroLote(ValueError):
+    """Entrada do lote que não pode mais ser lida (ex.: array JSON quebrado)."""
+
+
+class RegistroInvalido:
+    """Registro cujo JSON não pôde ser decodificado (NDJSON segue em frente)."""
+    __slots__ = ("mensagem",)
+
+    def __init__(self, mensagem: str):
+        self.mensagem = mensagem
+
+
+async def ler_registros(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Decodifica incrementalmente um lote de documentos, à medida que os bytes
+    chegam. Aceita NDJSON (um documento por linha) ou um array JSON.
+    Produz (índice, documento); linhas NDJSON inválidas viram RegistroInvalido.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    modo = None  # "ndjson" ou "array"
+    fim = False
+    json_decoder = json.JSONDecoder()
+    indice = 0
+    pos = 0
+    chunks = chunks.__aiter__()
+
+    while True:
+        if not fim:
+            try:
+                chunk = await chunks.__anext__()
+                buffer = buffer[pos:] + decoder.decode(chunk)
+            except StopAsyncIteration:
+                fim = True
+                buffer = buffer[pos:] + decoder.decode(b"", final=True)
+            pos = 0
+
+        if modo is None:
+            inicio = buffer.lstrip(_ESPACOS)
+            if not inicio:
+                if fim:
+                    return
+                continue
+            if inicio[0] == "\ufeff":  # BOM
+                inicio = inicio[1:]
+            modo = "array" if inicio.startswith("[") else "ndjson"
+            buffer = inicio[1:] if modo == "array" else inicio
+
+        if modo == "ndjson":
+            while True:
+                quebra = buffer.find("\n", pos)
+                if quebra == -1:
+                    if not fim:
+                        break
+                    quebra = len(buffer)
+                linha = buffer[pos:quebra].strip(_ESPACOS)
+                pos = quebra + 1
+                if linha:
+                    try:
+                        yield indice, json.loads(linha)
+                    except ValueError as e:
+                        yield indice, RegistroInvalido(f"JSON inválido: {e}")
+                    indice += 1
+                if pos > len(buffer):
+                    return
+        else:
+            while True:
+                while pos < len(buffer) and (buffer[pos] in _ESPACOS or buffer[pos] == ","):
+                    pos += 1
+                if pos < len(buffer) and buffer[pos] == "]":
+                    return
+                if pos >= len(buffer):
+                    if fim:
+                        raise ErroLote("Array JSON incompleto: faltou o ']' final.")
+                    break
+                try:
+                    documento, final = json_decoder.raw_decode(buffer, pos)
+                except ValueError as e:
+                    if fim:
+                        raise ErroLote(f"JSON inválido no registro {indice}: {e}")
+                    break
+                # Um número no fim do buffer pode estar cortado; espera mais dados.
+                if final >= len(buffer) and not fim:
+                    break
+                pos = final
+                yield indice, documento
+                indice += 1
+
+        if len(buffer) - pos > TAMANHO_MAXIMO_REGISTRO:
+            raise ErroLote(f"Registro {indice} excede o tamanho máximo de {TAMANHO_MAXIMO_REGISTRO} bytes.")
+        if fim:
+            return
+
+
+async def validar_em_lote(
+    registros: AsyncIterator[Tuple[int, Any]],
+    validar: Callable[[Any], Awaitable[Dict[str, Any]]],
+    concorrencia: int = CONCORRENCIA_PADRAO,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Valida os registros com no máximo `concorrencia` documentos em andamento
+    e produz cada resultado assim que fica pronto (fora de ordem, com "indice").
+
+    Um novo registro só é lido depois que o resultado de outro foi entregue,
+    então a memória fica limitada independentemente do tamanho do lote.
+    """
+    vagas = asyncio.Semaphore(concorrencia)
+    prontos: "asyncio.Queue" = asyncio.Queue()
+    tarefas = set()
+    estado = {"pendentes": 0, "leitura_terminou": False}
+
+    async def validar_registro(indice, dados):
+        if isinstance(dados, RegistroInvalido):
+            resultado = {"status": "erro", "erros": [{"type": "json_invalid", "loc": [], "msg": dados.mensagem}]}
+        else:
+            try:
+                resultado = await validar(dados)
+            except Exception as e:
+                resultado = {"status": "erro", "erros": [{"type": "erro_interno", "loc": [], "msg": str(e)}]}
+        await prontos.put({"indice": indice, **resultado})
+
+    async def produzir():
+        try:
+            async for indice, dados in registros:
+                await vagas.acquire()
+                estado["pendentes"] += 1
+                tarefa = asyncio.ensure_future(validar_registro(indice, dados))
+                tarefas.add(tarefa)
+                tarefa.add_done_callback(tarefas.discard)
+        except ErroLote as e:
+            estado["pendentes"] += 1
+            await prontos.put({"indice": None, "status": "erro", "erros": [{"type": "lote_invalido", "loc": [], "msg": str(e)}]})
+        finally:
+            estado["leitura_terminou"] = True
+            await prontos.put(None)
+
+    produtor = asyncio.ensure_future(produzir())
+    try:
+        while not (estado["leitura_terminou"] and estado["pendentes"] == 0):
+            item = await prontos.get()
+            if item is None:
+                continue
+            estado["pendentes"] -= 1
+            yield item
+            vagas.release()
+        # Propaga falhas inesperadas na leitura (ex.: ClientDisconnect)
+        await produtor
+    finally:
+        produtor.cancel()
+        for tarefa in list(tarefas):
+            tarefa.cancel()
+
+
+class RespostaNDJSON(StreamingResponse):
+    """
+    StreamingResponse que não disputa o `receive` com a leitura do corpo:
+    a resposta começa a ser enviada enquanto o upload ainda está chegando.
+    A desconexão do cliente é percebida pela própria leitura (ClientDisconnect)
+    ou pela falha no envio.
+    """
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        except (OSError, ClientDisconnect):
+            return
+        if self.background is not None:
+            await self.background()
@@ -1,40 +1,526 @@
-from fastapi import FastAPI, HTTPException
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Optional
+
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, WebSocket
+from fastapi.exceptions import RequestValidationError
+from fastapi.openapi.utils import get_openapi
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+from utils import format_cnpj
+from utils.cnpj_cache import get_cnpj_cache
+from utils.cnpj_registry import get_cnpj_registry
+from utils.cnpj_resolver import get_cnpj_resolver
+from utils.document_validator import cnpj_singleflight
+from utils.http_client import close_async_client, get_async_client
+from utils.metrics import registry, CONTENT_TYPE as CONTENT_TYPE_METRICAS
+from utils.singleflight import SingleFlight
+from .admissao import Sobrecarga, get_controle_admissao
+from .ao_vivo import TRECHOS, CampoDesconhecido, conduzir_sessao, validar_trecho
+from .idempotencia import (
+    ChaveDeIdempotenciaReutilizada,
+    RespostaGuardada,
+    chave_da_forma_canonica,
+    forma_canonica,
+    etag_confere,
+    etag_de,
+    get_cache_respostas,
+)
 from .schemas import ValidacaoDocumentoSchema
+from .lote import (
+    ler_registros,
+    validar_em_lote,
+    ErroLote,
+    RespostaNDJSON,
+    CONCORRENCIA_PADRAO,
+    CONCORRENCIA_MAXIMA,
+)
+from .metricas import MetricasHTTP, etapa, contar_rejeicoes
+from .rastreamento import RastreamentoHTTP, parar_rastreamento
+from .rapido import CONTEUDO_MSGPACK, JSON, MSGPACK, formato_aceito, formato_do_conteudo, get_caminho_rapido
+from .regras import get_regras, regras_vigentes
+from .services import validar_documento, validar_documento_rapido, resumo_documento
+from .tarefas import (
+    FilaCheia,
+    FilaIndisponivel,
+    get_fila_tarefas,
+    get_processador_tarefas,
+    na_fila,
+    parar_tarefas,
+    retomar_tarefas,
+)
+
+if TYPE_CHECKING:
+    import httpx
+
+# OpenAPI gerado no build (tools/gerar_openapi.py) e servido sem gerar de novo
+CAMINHO_OPENAPI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "openapi.json")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compila as regras de negócio na subida: um arquivo inválido impede o
+    # worker de iniciar, em vez de falhar na primeira requisição.
+    get_regras()
+    # Tarefas de validação deixadas na fila por uma execução anterior
+    retomar_tarefas()
+    try:
+        yield
+    finally:
+        await parar_tarefas()
+        await close_async_client()
+        parar_rastreamento()
+
+
 app = FastAPI(
     title="API de Validação de Estágio",
     description="Valida documentos de estágio conforme regras da Coordenadoria de Extensão.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
+app.add_middleware(MetricasHTTP)
+app.add_middleware(RastreamentoHTTP)
+
+
+def gerar_openapi():
+    """
+    OpenAPI padrão do FastAPI, mais o ValidacaoDocumentoSchema: o
+    POST /validacao/ lê o corpo cru (para medir parse e schema
+    separadamente), então o modelo não aparece sozinho nos componentes.
+    """
+    schema = get_openapi(title=app.title, version=app.version, description=app.description, routes=app.routes)
+    componentes = schema.setdefault("components", {}).setdefault("schemas", {})
+    modelo = ValidacaoDocumentoSchema.model_json_schema(ref_template="#/components/schemas/{model}")
+    componentes.update(modelo.pop("$defs", {}))
+    componentes[ValidacaoDocumentoSchema.__name__] = modelo
+    return schema
+
+
+def openapi_da_aplicacao():
+    """
+    OpenAPI pré-gerado (CAMINHO_OPENAPI), se existir; senão, gerado na
+    primeira chamada. Em ambos os casos, guardado para as seguintes.
+    """
+    if app.openapi_schema is None:
+        try:
+            with open(CAMINHO_OPENAPI, encoding="utf-8") as f:
+                app.openapi_schema = json.load(f)
+        except FileNotFoundError:
+            app.openapi_schema = gerar_openapi()
+    return app.openapi_schema
+
+
+app.openapi = openapi_da_aplicacao
+
+
+@app.exception_handler(Sobrecarga)
+async def responder_sobrecarga(request: Request, e: Sobrecarga):
+    """Recusa do controle de admissão (api/admissao.py): 503 com Retry-After."""
+    return JSONResponse({"detail": str(e)}, status_code=503, headers={"Retry-After": str(e.retry_after)})
+
+
+@app.exception_handler(FilaIndisponivel)
+async def responder_fila_indisponivel(request: Request, e: FilaIndisponivel):
+    """Arquivo da fila de tarefas travado (api/tarefas.py): 503 com Retry-After."""
+    return JSONResponse({"detail": str(e)}, status_code=503, headers={"Retry-After": "5"})
+
+
+async def get_http_client() -> Optional["httpx.AsyncClient"]:
+    # Um único cliente (pool de conexões HTTP/2) por worker, criado pela
+    # primeira consulta de CNPJ (utils.http_client) e reaproveitado pelas
+    # seguintes (em serverless, pelas invocações seguintes da mesma
+    # instância); fechado no desligamento. None até lá.
+    return get_async_client()
+
+
+def decodificar_corpo(corpo: bytes, formato: str = JSON):
+    """Corpo da requisição decodificado, com os mesmos erros que o FastAPI geraria."""
+    if not corpo:
+        erro = {"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}
+    elif formato == MSGPACK:
+        caminho = get_caminho_rapido()
+        if caminho is None:
+            raise HTTPException(status_code=415, detail="MessagePack não suportado: instale o pacote msgspec.")
+        try:
+            with etapa("parse"):
+                return caminho.decodificar_msgpack(corpo)
+        except ValueError as e:
+            erro = {"type": "msgpack_invalid", "loc": ("body",), "msg": "MessagePack decode error",
+                    "input": {}, "ctx": {"error": str(e)}}
+    else:
+        try:
+            with etapa("parse"):
+                return json.loads(corpo)
+        except json.JSONDecodeError as e:
+            erro = {"type": "json_invalid", "loc": ("body", e.pos), "msg": "JSON decode error",
+                    "input": {}, "ctx": {"error": e.msg}}
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="There was an error parsing the body")
+    contar_rejeicoes([erro])
+    raise RequestValidationError([erro])
+
+
+# Reenvios simultâneos do mesmo documento (ex.: duplo clique) esperam a
+# primeira validação em vez de repeti-la
+validacoes_em_andamento = SingleFlight("validacao")
+
+
+async def _responder_validacao(corpo, entrada, saida, doc, dados, client, todos_os_erros, regras):
+    """
+    Valida o documento (pelo caminho rápido, se `doc` já veio decodificado
+    por ele, e pelo Pydantic se ele não aprovar) e monta o corpo da resposta
+    em `saida` (o 422 em JSON é o mesmo que o handler padrão do FastAPI
+    geraria). Retorna (resposta, definitivo).
+    """
+    caminho = get_caminho_rapido()
+    resultado = None
+    if doc is not None:
+        resultado = await validar_documento_rapido(doc, client, regras, caminho)
+    if resultado is None:
+        if dados is None:
+            dados = decodificar_corpo(corpo, entrada)
+        resultado = await validar_documento(dados, client, todos_os_erros, regras, rapido=False)
+    doc, erros, definitivo = resultado
+
+    with etapa("resposta"):
+        if erros:
+            detalhe = [{**erro, "loc": ["body", *erro["loc"]]} for erro in erros]
+            conteudo, status_code = {"detail": jsonable_encoder(detalhe)}, 422
+        else:
+            conteudo, status_code = resumo_documento(doc), 200
+        if saida == MSGPACK:
+            resposta = caminho.codificar(conteudo, MSGPACK)
+        elif caminho is not None and status_code == 200:
+            resposta = caminho.codificar(conteudo)
+        else:
+            resposta = JSONResponse(conteudo).body
+        media_type = CONTEUDO_MSGPACK if saida == MSGPACK else "application/json"
+        return RespostaGuardada(status_code, resposta, etag_de(resposta), media_type), definitivo
+
 
 @app.get("/")
 async def read_root():
     return {"Coordenadoria": "Extensão"}
 
-@app.post("/validacao/", status_code=200)
-async def validar_documento_estagio(doc: ValidacaoDocumentoSchema):
+@app.post(
+    "/validacao/",
+    status_code=200,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"$ref": "#/components/schemas/ValidacaoDocumentoSchema"}},
+                "application/msgpack": {"schema": {"$ref": "#/components/schemas/ValidacaoDocumentoSchema"}},
+            },
+        },
+        "responses": {
+            "422": {
+                "description": "Validation Error",
+                "content": {
+                    "application/json": {"schema": {"$ref": "#/components/schemas/HTTPValidationError"}},
+                    "application/msgpack": {"schema": {"$ref": "#/components/schemas/HTTPValidationError"}},
+                },
+            },
+            "503": {"description": "Servidor sobrecarregado; tente de novo depois de Retry-After segundos"},
+        },
+    },
+)
+async def validar_documento_estagio(
+    request: Request,
+    todos_os_erros: bool = Query(False, description="Devolve todas as violações de uma vez, cada uma com o código da regra"),
+    client: Optional["httpx.AsyncClient"] = Depends(get_http_client)
+):
     """
     Recebe o JSON completo do documento de estágio.
     
     - Realiza validação de tipos (String, Int, Date).
     - Valida máscaras e formatos (CPF, CNPJ, CEP, Email, Telefone).
     - Aplica regras de negócio (Datas, Horas, PCD, Duração).
+    - Confere a existência do CNPJ na Receita Federal (BrasilAPI).
     
-    Se houver erro, retorna 422 com a lista de erros.
+    Se houver erro, retorna 422 com a lista de erros. Por padrão, cada regra
+    de negócio para na primeira violação; com `todos_os_erros=true`, todas
+    são avaliadas e cada erro traz o campo "codigo" da regra (a consulta à
+    Receita só é feita se não houver erro local).
     Se sucesso, retorna 200 com status de sucesso.
+
+    O reenvio do mesmo documento (mesmo conteúdo, em qualquer ordem de
+    chaves) devolve a resposta guardada (cabeçalho `X-Cache: HIT`) enquanto
+    as regras de negócio não mudarem. Com o cabeçalho `Idempotency-Key`, a
+    resposta fica guardada também pela chave (`Idempotent-Replayed: true` no
+    reenvio); reusar a chave com outro documento retorna 422. A resposta traz
+    `ETag`: com `If-None-Match` igual, um 200 vira 304 sem corpo.
+
+    Com o servidor sobrecarregado (fila do controle de admissão cheia ou
+    espera esgotada), retorna 503 com `Retry-After`: a validação que não
+    consulta a Receita não espera pela que consulta.
+
+    Com o msgspec instalado, o corpo também pode ser MessagePack
+    (`Content-Type: application/msgpack`) e a resposta vem em MessagePack
+    com `Accept: application/msgpack`.
+    """
+    controle = get_controle_admissao()
+    if controle is None:
+        return await _validar_documento_estagio(request, todos_os_erros, client)
+    admissao = await controle.admitir()
+    try:
+        return await _validar_documento_estagio(request, todos_os_erros, client)
+    finally:
+        admissao.liberar_local()
+
+
+async def _validar_documento_estagio(request: Request, todos_os_erros: bool, client) -> Response:
+    corpo = await request.body()
+    entrada = formato_do_conteudo(request.headers.get("content-type"))
+    caminho = get_caminho_rapido()
+    saida = formato_aceito(request.headers.get("accept")) if caminho is not None else JSON
+    regras = regras_vigentes()
+    cache = get_cache_respostas()
+    chave_idempotencia = request.headers.get("idempotency-key")
+
+    # Caminho rápido (api/rapido.py): decodificação e tipos em um passo só.
+    # Se não der, o corpo é decodificado para o Pydantic, como sempre.
+    doc = dados = None
+    if caminho is not None and corpo and not todos_os_erros:
+        with etapa("parse") as medicao:
+            doc = caminho.decodificar(corpo, entrada)
+            if doc is None:
+                medicao.descartar()
+    if doc is None:
+        dados = decodificar_corpo(corpo, entrada)
+
+    async def validar():
+        # Tipos, formatos e regras de negócio (schemas.py) e, se passarem,
+        # a etapa externa (assíncrona)
+        return await _responder_validacao(corpo, entrada, saida, doc, dados, client, todos_os_erros, regras)
+
+    if cache is None:
+        resposta, _ = await validar()
+        return _resposta_validacao(request, resposta)
+
+    canonica = caminho.forma_canonica(doc) if doc is not None else forma_canonica(dados)
+    chave = chave_da_forma_canonica(canonica, regras.assinatura, str(todos_os_erros), saida)
+    try:
+        resposta, repetida = cache.get(chave, chave_idempotencia)
+    except ChaveDeIdempotenciaReutilizada:
+        return JSONResponse(
+            {"detail": "A Idempotency-Key informada já foi usada com outro documento."}, status_code=422)
+    if resposta is not None:
+        return _resposta_validacao(request, resposta, "HIT", repetida)
+
+    (resposta, definitivo), _ = await validacoes_em_andamento.do(chave, validar)
+    # Falhas transitórias da etapa externa (consulta de CNPJ fora do ar,
+    # prazo esgotado) não são guardadas: o próximo envio tenta de novo
+    if definitivo:
+        cache.set(chave, resposta, chave_idempotencia)
+    return _resposta_validacao(request, resposta, "MISS")
+
+
+def _resposta_validacao(request: Request, resposta: RespostaGuardada, x_cache=None, repetida=False) -> Response:
+    headers = {"ETag": resposta.etag}
+    if x_cache is not None:
+        headers["X-Cache"] = x_cache
+    if repetida:
+        headers["Idempotent-Replayed"] = "true"
+    if resposta.status_code == 200 and etag_confere(request.headers.get("if-none-match"), resposta.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(resposta.corpo, status_code=resposta.status_code, headers=headers, media_type=resposta.media_type)
+
+# Corpo de POST /validacao/lote e POST /validacao/tarefas
+CORPO_LOTE = {
+    "required": True,
+    "content": {
+        "application/x-ndjson": {"schema": {"type": "string"}},
+        "application/json": {"schema": {"type": "array", "items": {"type": "object"}}},
+    },
+}
+
+@app.post("/validacao/lote", response_class=RespostaNDJSON, openapi_extra={"requestBody": CORPO_LOTE})
+async def validar_lote_documentos(
+    request: Request,
+    concorrencia: int = Query(CONCORRENCIA_PADRAO, ge=1, le=CONCORRENCIA_MAXIMA),
+    todos_os_erros: bool = Query(False),
+    client: Optional["httpx.AsyncClient"] = Depends(get_http_client)
+):
+    """
+    Valida vários documentos de estágio em uma única requisição.
+
+    - Corpo em NDJSON (um documento por linha) ou um array JSON de documentos.
+    - Os registros são lidos à medida que o upload chega e validados com no
+      máximo `concorrencia` documentos em paralelo.
+    - A resposta é NDJSON: uma linha por documento, na ordem em que ficam
+      prontos, identificada pelo campo "indice" (posição no lote, a partir de 0).
+    - `todos_os_erros` tem o mesmo efeito que em POST /validacao/.
+    """
+
+    async def validar(dados):
+        doc, erros, _ = await validar_documento(dados, client, todos_os_erros)
+        if erros:
+            return {"status": "erro", "erros": erros}
+        return resumo_documento(doc)
+
+    async def linhas():
+        registros = ler_registros(request.stream())
+        async for resultado in validar_em_lote(registros, validar, concorrencia):
+            yield json.dumps(resultado, ensure_ascii=False) + "\n"
+
+    return RespostaNDJSON(linhas())
+
+@app.post("/validacao/tarefas", status_code=202, openapi_extra={"requestBody": CORPO_LOTE})
+async def criar_tarefa_de_validacao(
+    request: Request,
+    todos_os_erros: bool = Query(False),
+):
+    """
+    Enfileira um lote de documentos para validação em segundo plano e
+    responde na hora (202) com a tarefa criada; o cabeçalho `Location`
+    aponta para GET /validacao/tarefas/{id}.
+
+    - Corpo em NDJSON ou array JSON, como em POST /validacao/lote.
+    - Os documentos são validados por workers com concorrência limitada,
+      incluindo a consulta à Receita Federal; a fila é persistente e
+      sobrevive a reinícios da API.
+    - 413 se o lote passar do máximo de documentos por tarefa; 503 (com
+      `Retry-After`) se a fila estiver cheia ou o arquivo dela, travado.
+    """
+    fila = get_fila_tarefas()
+    if fila is None:
+        raise HTTPException(status_code=503, detail="Tarefas de validação desligadas (TAREFAS_ENABLED=0).")
+    documentos = []
+    try:
+        async for _, dados in ler_registros(request.stream()):
+            if len(documentos) == fila.max_documentos:
+                raise HTTPException(
+                    status_code=413, detail=f"Uma tarefa aceita no máximo {fila.max_documentos} documentos.")
+            documentos.append(dados)
+    except ErroLote as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if not documentos:
+        raise HTTPException(status_code=422, detail="O lote não tem nenhum documento.")
+
+    try:
+        tarefa = await na_fila(fila.criar, documentos, todos_os_erros)
+    except FilaCheia as e:
+        return JSONResponse({"detail": str(e)}, status_code=503, headers={"Retry-After": "60"})
+    get_processador_tarefas().iniciar()
+    return JSONResponse(
+        await na_fila(fila.situacao, tarefa, limite=0), status_code=202,
+        headers={"Location": f"/validacao/tarefas/{tarefa}"})
+
+@app.get("/validacao/tarefas/{tarefa}")
+async def situacao_da_tarefa(
+    tarefa: str,
+    desde: int = Query(0, ge=0, description="Primeiro índice dos resultados"),
+    limite: int = Query(100, ge=0, le=1000, description="Máximo de resultados nesta resposta"),
+):
+    """
+    Progresso da tarefa (total, concluídos, aprovados, recusados) e os
+    resultados já prontos, em ordem de índice, no mesmo formato das linhas
+    de POST /validacao/lote. Resultados paginados: o campo "desde" traz o
+    índice da próxima página (null se esta não veio cheia).
+
+    404 se a tarefa não existe ou já expirou; 503 (com `Retry-After`) se o
+    arquivo da fila estiver travado.
     """
+    fila = get_fila_tarefas()
+    situacao = await na_fila(fila.situacao, tarefa, desde, limite) if fila is not None else None
+    if situacao is None:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada (ou expirada).")
+    return situacao
+
+@app.delete("/validacao/tarefas/{tarefa}")
+async def cancelar_tarefa(tarefa: str):
+    """Cancela a tarefa: os documentos ainda não validados saem da fila; os resultados prontos ficam."""
+    fila = get_fila_tarefas()
+    if fila is None or not await na_fila(fila.cancelar, tarefa):
+        if fila is None or await na_fila(fila.situacao, tarefa, limite=0) is None:
+            raise HTTPException(status_code=404, detail="Tarefa não encontrada (ou expirada).")
+        raise HTTPException(status_code=409, detail="A tarefa já terminou.")
+    return await na_fila(fila.situacao, tarefa, limite=0)
+
+@app.websocket("/validacao/ao-vivo")
+async def validacao_ao_vivo(websocket: WebSocket, client: Optional["httpx.AsyncClient"] = Depends(get_http_client)):
+    """
+    Validação campo a campo enquanto o formulário é preenchido, por uma
+    conexão só (protocolo em api/ao_vivo.py). Cada trecho do documento é
+    revalidado só quando muda, e a consulta do CNPJ acontece uma vez por
+    valor na sessão.
+    """
+    await conduzir_sessao(websocket, client)
+
+@app.post("/validacao/trecho/{trecho}")
+async def validar_trecho_do_documento(
+    trecho: str,
+    request: Request,
+    client: Optional["httpx.AsyncClient"] = Depends(get_http_client)
+):
+    """
+    Valida um trecho (parcial) do documento, sem sessão: alternativa ao
+    WebSocket /validacao/ao-vivo para clientes e servidores sem ele (ex.: a
+    ponte WSGI). O corpo é o trecho como aparece no documento; campos ainda
+    não preenchidos não são erro.
+
+    - `trecho`: `documento`, `unidade_concedente`, `unidade_concedente.endereco`,
+      `supervisor`, `estagiario.endereco`, `dados_estagio`...
+    - A resposta traz "completo", "valido", os erros do trecho e dos trechos
+      internos (com "loc" a partir da raiz do documento) e o resultado dos
+      verificadores externos do trecho (ex.: CNPJ na Receita), se ele estiver válido.
 
-    # Já validado pelo schemas.py
-    return {
-        "status": "sucesso",
-        "mensagem": "Documento de estágio validado com sucesso.",
-        "dados_processados": {
-            "estagiario": doc.estagiario.nome,
-            "empresa": doc.unidade_concedente.razao_social,
-            "periodo": f"{doc.dados_estagio.data_inicio} a {doc.dados_estagio.data_termino}"
-        }
+    404 se o trecho não existe; 422 se o corpo tem campos que o trecho não tem.
+    """
+    if trecho not in TRECHOS:
+        raise HTTPException(status_code=404, detail=f"Trecho desconhecido: {trecho}")
+    try:
+        dados = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="There was an error parsing the body")
+    try:
+        return await validar_trecho(trecho, dados, client)
+    except CampoDesconhecido as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.get("/cache/cnpj")
+async def estatisticas_cache_cnpj():
+    """
+    Contadores de acerto/erro do cache de consultas de CNPJ, das consultas
+    simultâneas agrupadas em uma só requisição externa, da camada de
+    resiliência (disjuntores, retentativas e hedge por provedor) e do
+    índice local da Receita Federal, se configurado.
+    """
+    cache = get_cnpj_cache()
+    registro = get_cnpj_registry()
+    extras = {
+        "agrupamento": cnpj_singleflight.stats(),
+        "resiliencia": get_cnpj_resolver().stats(),
+        "registro": registro.stats() if registro is not None else None,
     }
+    if cache is None:
+        return {"habilitado": False, **extras}
+    return {"habilitado": True, **cache.stats(), **extras}
+
+@app.get("/regras")
+async def regras_de_negocio():
+    """
+    Regras de negócio em vigor (arquivo, parâmetros e dependências), número
+    de recargas do arquivo e o erro da última tentativa, se o arquivo atual
+    foi recusado.
+    """
+    return get_regras().stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def metricas():
+    """Métricas no formato texto do Prometheus (ver api/metricas.py)."""
+    return Response(registry.render(), media_type=CONTENT_TYPE_METRICAS)
+
+@app.delete("/cache/cnpj/{cnpj:path}")
+async def invalidar_cache_cnpj(cnpj: str):
+    """Remove um CNPJ do cache, forçando uma nova consulta na próxima validação."""
+    cache = get_cnpj_cache()
+    removido = cache.invalidate(format_cnpj(cnpj)) if cache is not None else False
+    return {"cnpj": cnpj, "removido": removido}
 
 # if __name__ == "__main__":
 #     import uvicorn
 #     uvicorn.run(app, host="0.0.0.0", port=8000)
-
@@ -0,0 +1,237 @@
+"""
+Instrumentação da API exportada em GET /metrics (formato texto do Prometheus).
+
+Sondas (METRICS_DISABLED_PROBES desliga as listadas; METRICS_ENABLED=0, todas):
+- http: requisições em andamento e duração por rota/status;
+- stages: duração de cada etapa da validação (parse, schema, externa, resposta);
+- validators: duração de cada validador de campo e de cada model validator;
+- rejections: documentos recusados, contados por regra;
+- verifiers: duração e resultado de cada verificador da etapa externa
+  (api/verificadores.py);
+- outbound: duração e status das consultas aos provedores de CNPJ
+  (definida em utils.cnpj_providers).
+- admission: vagas, fila, recusas e espera na fila dos compartimentos do
+  controle de admissão (definida em api/admissao.py).
+Caches (de CNPJ e de respostas), agrupamento de consultas e disjuntores são
+lidos só na coleta.
+"""
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List
+
+from utils.cnpj_cache import get_cnpj_cache
+from utils.cnpj_resolver import get_cnpj_resolver
+from utils.document_validator import cnpj_singleflight
+from utils.metrics import registry
+from utils.tracing import span
+from .idempotencia import get_cache_respostas
+
+SONDA_HTTP = registry.probe("http")
+SONDA_ETAPAS = registry.probe("stages")
+SONDA_VALIDADORES = registry.probe("validators")
+SONDA_REJEICOES = registry.probe("rejections")
+SONDA_VERIFICADORES = registry.probe("verifiers")
+
+REQUISICOES_EM_ANDAMENTO = registry.gauge(
+    "http_requests_in_flight", "Requisições HTTP em andamento")
+DURACAO_HTTP = registry.histogram(
+    "http_request_duration_seconds", "Duração das requisições HTTP", ("method", "route", "status"))
+DURACAO_ETAPA = registry.histogram(
+    "validation_stage_duration_seconds", "Duração de cada etapa da validação de um documento", ("stage",))
+DURACAO_VALIDADOR = registry.histogram(
+    "validator_duration_seconds", "Duração de cada validador do schema", ("validator",))
+DURACAO_VERIFICADOR = registry.histogram(
+    "document_verifier_duration_seconds", "Duração de cada verificador da etapa externa, por resultado",
+    ("verifier", "outcome"))
+REJEICOES = registry.counter(
+    "validation_rejections", "Erros de validação, por regra", ("rule",))
+
+
+class etapa:
+    """
+    Mede a duração de um bloco como uma etapa da validação: `with etapa("schema"): ...`.
+    A etapa também é um span do rastro da requisição (api/rastreamento.py).
+    """
+    __slots__ = ("_serie", "_inicio", "_span")
+
+    def __init__(self, nome: str):
+        self._serie = DURACAO_ETAPA.labels(nome) if SONDA_ETAPAS.enabled else None
+        self._span = span(nome)
+
+    def __enter__(self):
+        self._span.__enter__()
+        if self._serie is not None:
+            self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self._serie is not None:
+            self._serie.observe(time.perf_counter() - self._inicio)
+        self._span.__exit__(*exc)
+        return False
+
+    def descartar(self):
+        """Não registra esta medição (ex.: tentativa refeita por outro caminho, que será medido)."""
+        self._serie = None
+
+
+# False enquanto valida algo que não é um documento enviado (ex.: a
+# validação ao vivo de um formulário, api/ao_vivo.py): nada conta como recusa
+_contar_rejeicoes: ContextVar[bool] = ContextVar("contar_rejeicoes", default=True)
+
+
+@contextmanager
+def sem_contar_rejeicoes():
+    """Bloco cujas recusas não vão para validation_rejections_total."""
+    token = _contar_rejeicoes.set(False)
+    try:
+        yield
+    finally:
+        _contar_rejeicoes.reset(token)
+
+
+def rejeitar(regra: str):
+    if SONDA_REJEICOES.enabled and _contar_rejeicoes.get():
+        REJEICOES.labels(regra).inc()
+
+
+def contar_rejeicoes(erros: Iterable[Dict[str, Any]]):
+    """
+    Conta os erros gerados pelo próprio Pydantic (campo ausente, tipo ou
+    tamanho inválido...). Os value_error já foram contados pelas regras que
+    os levantaram, com o código da regra.
+    """
+    if SONDA_REJEICOES.enabled and _contar_rejeicoes.get():
+        for erro in erros:
+            if erro.get("type") != "value_error":
+                REJEICOES.labels(erro.get("type", "desconhecido")).inc()
+
+
+def medir_validador(func):
+    """
+    Decorador para model validators (mode='after'): mede a duração com o nome
+    da função como validador (também um span do rastro da requisição). As
+    recusas são contadas pelas próprias regras.
+    """
+    serie = DURACAO_VALIDADOR.labels(func.__name__)
+    nome_do_span = f"validador.{func.__name__}"
+
+    @functools.wraps(func)
+    def medido(self, *args):
+        with span(nome_do_span):
+            if not SONDA_VALIDADORES.enabled:
+                return func(self, *args)
+            inicio = time.perf_counter()
+            try:
+                return func(self, *args)
+            finally:
+                serie.observe(time.perf_counter() - inicio)
+
+    return medido
+
+
+class MetricasHTTP:
+    """Middleware ASGI: requisições em andamento e duração por rota (modelo do caminho) e status."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not SONDA_HTTP.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        REQUISICOES_EM_ANDAMENTO.inc()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            REQUISICOES_EM_ANDAMENTO.dec()
+            rota = getattr(scope.get("route"), "path", "<sem_rota>")
+            DURACAO_HTTP.labels(scope["method"], rota, status).observe(time.perf_counter() - inicio)
+
+
+def _coletar_consulta_cnpj() -> List[tuple]:
+    familias = []
+    cache = get_cnpj_cache()
+    if cache is not None:
+        s = cache.stats()
+        familias += [
+            ("cnpj_cache_lookups_total", "counter", "Consultas ao cache de CNPJ, por resultado", [
+                ({"result": "memory_hit"}, s["memory_hits"]),
+                ({"result": "shared_hit"}, s["shared_hits"]),
+                ({"result": "disk_hit"}, s["disk_hits"]),
+                ({"result": "miss"}, s["misses"]),
+            ]),
+            ("cnpj_cache_hit_ratio", "gauge", "Fração de consultas respondidas pelo cache de CNPJ",
+             [({}, s["hit_rate"])]),
+            ("cnpj_cache_memory_entries", "gauge", "Itens no nível em memória do cache de CNPJ",
+             [({}, s["memory_entries"])]),
+            ("cnpj_cache_disk_errors_total", "counter",
+             "Leituras e gravações do cache de CNPJ em disco puladas por erro do SQLite (arquivo travado)",
+             [({}, s["disk_errors"])]),
+        ]
+        if s["shared"] is not None:
+            familias.append(("cnpj_cache_shared_evictions_total", "counter",
+                             "Entradas da tabela compartilhada do cache de CNPJ substituídas por falta de espaço",
+                             [({}, s["shared"]["evictions"])]))
+
+    sf = cnpj_singleflight.stats()
+    familias += [
+        ("cnpj_lookups_coalesced_total", "counter", "Consultas de CNPJ agrupadas em uma requisição já em andamento",
+         [({}, sf["coalesced"])]),
+        ("cnpj_lookups_in_flight", "gauge", "Consultas externas de CNPJ em andamento", [({}, sf["in_flight"])]),
+    ]
+
+    resolver = get_cnpj_resolver().stats()
+    familias += [
+        ("cnpj_resolver_events_total", "counter", "Eventos da camada de resiliência da consulta de CNPJ", [
+            ({"event": evento}, resolver[evento])
+            for evento in ("lookups", "retries", "hedges", "hedge_wins", "fallbacks", "fast_failures")
+        ]),
+        ("cnpj_provider_circuit_open", "gauge", "1 se o disjuntor do provedor está aberto (0,5 meio aberto)", [
+            ({"provider": nome}, {"open": 1, "half_open": 0.5}.get(p["state"], 0))
+            for nome, p in resolver["providers"].items()
+        ]),
+    ]
+    limites = {nome: p["rate_limit"] for nome, p in resolver["providers"].items() if p["rate_limit"]}
+    if limites:
+        familias += [
+            ("cnpj_rate_limit_effective_rate", "gauge",
+             "Consultas/s permitidas ao provedor (menor que a configurada depois de um 429)",
+             [({"provider": nome}, l["effective_rate"]) for nome, l in limites.items()]),
+            ("cnpj_rate_limit_throttled_total", "counter", "Respostas 429 recebidas do provedor",
+             [({"provider": nome}, l["throttled"]) for nome, l in limites.items()]),
+        ]
+    return familias
+
+
+def _coletar_cache_respostas() -> List[tuple]:
+    cache = get_cache_respostas()
+    if cache is None:
+        return []
+    s = cache.stats()
+    return [
+        ("response_cache_lookups_total", "counter", "Consultas ao cache de respostas do POST /validacao/, por resultado", [
+            ({"result": "hit"}, s["hits"]),
+            ({"result": "idempotent_replay"}, s["idempotent_replays"]),
+            ({"result": "miss"}, s["misses"]),
+        ]),
+        ("response_cache_hit_ratio", "gauge", "Fração de documentos respondidos pelo cache de respostas",
+         [({}, s["hit_rate"])]),
+        ("response_cache_entries", "gauge", "Respostas guardadas, por documento", [({}, s["entries"])]),
+    ]
+
+
+registry.add_collector(_coletar_consulta_cnpj)
+registry.add_collector(_coletar_cache_respostas)
@@ -0,0 +1,258 @@
+"""
+Caminho rápido da validação, com msgspec (opcional).
+
+O ValidacaoDocumentoSchema é espelhado em Structs do msgspec, geradas a
+partir dos próprios modelos do Pydantic (campos, obrigatoriedade, tamanho
+máximo). O corpo da requisição (JSON ou MessagePack) é decodificado direto
+nessas Structs, em um passo só, e elas passam pelas mesmas verificações da
+lib utils e pelas mesmas regras de negócio (api/regras.py).
+
+O caminho rápido só decide sozinho quando o documento é aprovado. Se a
+decodificação ou qualquer verificação falhar, o documento é validado de
+novo pelo Pydantic, que continua sendo a referência e gera os erros: o
+veredito e o corpo do 422 são sempre os do caminho de referência. Por isso
+o msgspec é mais estrito que o Pydantic (não converte "30" em 30, por
+exemplo): na dúvida, recusa, e o Pydantic decide.
+
+Desligado sem o msgspec instalado ou com VALIDACAO_RAPIDA=0.
+"""
+import os
+from datetime import date, time
+from operator import attrgetter
+from time import perf_counter
+from typing import Annotated, Any, Callable, List, Optional, Tuple, Union, get_args, get_origin
+
+from pydantic import BaseModel
+
+from utils import check_cep_uf
+
+from .metricas import DURACAO_VALIDADOR, SONDA_VALIDADORES
+from .regras import GRUPOS, ConjuntoDeRegras
+from .schemas import (
+    VALIDADORES,
+    EnderecoSchema,
+    EstagiarioSchema,
+    SupervisorSchema,
+    UnidadeConcedenteSchema,
+    ValidacaoDocumentoSchema,
+)
+
+JSON = "json"
+MSGPACK = "msgpack"
+TIPOS_DE_CONTEUDO = {
+    "application/json": JSON,
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+}
+CONTEUDO_MSGPACK = "application/msgpack"
+
+# Campos verificados pela lib utils em cada modelo (os field_validators de
+# api/schemas.py) e o tipo de verificação
+VERIFICACOES = {
+    EnderecoSchema: {"cep": "cep", "estado": "uf"},
+    UnidadeConcedenteSchema: {"cnpj": "cnpj", "cpf": "cpf", "telefone": "telefone"},
+    SupervisorSchema: {"cpf": "cpf", "email": "email"},
+    EstagiarioSchema: {"cpf": "cpf", "email": "email", "telefone": "telefone", "celular": "telefone"},
+}
+
+# Verificações entre campos de um mesmo modelo, feitas em api/schemas.py
+# dentro do field_validator do último campo: (campos, check da lib utils,
+# nome da série da métrica)
+VERIFICACOES_CRUZADAS = {
+    EnderecoSchema: [(("cep", "estado"), check_cep_uf, "cep_uf")],
+}
+
+# Model validator de api/schemas.py que aplica cada grupo de regras (nome
+# usado na métrica validator_duration_seconds)
+VALIDADORES_DOS_GRUPOS = {
+    "unidade_concedente": "verificar_documento_obrigatorio",
+    "dados_estagio": "validar_regras_negocio",
+    "documento": "validar_regras_documento",
+}
+
+# Formatos de horário que o Pydantic aceita e que datetime.time.fromisoformat
+# converte para o mesmo valor (HH:MM, HH:MM:SS e frações de segundo)
+_HORARIO = r"^\d\d:\d\d(:\d\d(\.\d{1,6})?)?$"
+
+
+def formato_do_conteudo(content_type: Optional[str]) -> Optional[str]:
+    """MSGPACK se o Content-Type é MessagePack; senão (inclusive ausente), JSON."""
+    if not content_type:
+        return JSON
+    # O endpoint sempre tratou qualquer outro Content-Type como JSON
+    return TIPOS_DE_CONTEUDO.get(content_type.split(";", 1)[0].strip().lower(), JSON)
+
+
+def formato_aceito(accept: Optional[str]) -> str:
+    """MSGPACK se o Accept pede MessagePack; senão, JSON."""
+    if accept:
+        for item in accept.split(","):
+            if TIPOS_DE_CONTEUDO.get(item.split(";", 1)[0].strip().lower()) == MSGPACK:
+                return MSGPACK
+    return JSON
+
+
+class CaminhoRapido:
+    """Structs, decodificadores e verificações gerados a partir dos schemas."""
+
+    def __init__(self):
+        import msgspec
+
+        self._msgspec = msgspec
+        # (leitor do campo, check_* da lib utils, série da métrica)
+        self._verificacoes: List[Tuple[Callable[[Any], Any], Callable, Any]] = []
+        self.Documento = self._struct_do_modelo(ValidacaoDocumentoSchema, ())
+        self._decodificadores = {
+            JSON: msgspec.json.Decoder(self.Documento),
+            MSGPACK: msgspec.msgpack.Decoder(self.Documento),
+        }
+        self._json = msgspec.json.Encoder()
+        self._msgpack = msgspec.msgpack.Encoder()
+        self._erros = (msgspec.DecodeError, msgspec.ValidationError)
+        self._secoes = [
+            (grupo, attrgetter(secao) if secao else None, DURACAO_VALIDADOR.labels(VALIDADORES_DOS_GRUPOS[grupo]))
+            for grupo, secao in GRUPOS.items()
+        ]
+
+    def _struct_do_modelo(self, modelo, caminho: Tuple[str, ...]):
+        msgspec = self._msgspec
+        campos, horarios = [], []
+        for nome, info in modelo.model_fields.items():
+            tipo = info.annotation
+            opcional = get_origin(tipo) is Union and type(None) in get_args(tipo)
+            if opcional:
+                (tipo,) = [arg for arg in get_args(tipo) if arg is not type(None)]
+            restricoes = {
+                "max_length": m.max_length for m in info.metadata if getattr(m, "max_length", None) is not None
+            }
+            if isinstance(tipo, type) and issubclass(tipo, BaseModel):
+                tipo = self._struct_do_modelo(tipo, caminho + (nome,))
+            elif tipo is time:
+                # O msgspec exige os segundos; o Pydantic, não
+                tipo = str
+                restricoes["pattern"] = _HORARIO
+                horarios.append(nome)
+            elif tipo not in (str, int, float, bool, date):
+                raise TypeError(f"{modelo.__name__}.{nome}: tipo sem equivalente no caminho rápido ({tipo})")
+            if restricoes:
+                tipo = Annotated[tipo, msgspec.Meta(**restricoes)]
+            if opcional:
+                tipo = Optional[tipo]
+            campos.append((nome, tipo) if info.is_required() else (nome, tipo, info.default))
+
+        for nome, verificacao in VERIFICACOES.get(modelo, {}).items():
+            self._verificacoes.append((
+                attrgetter(".".join(caminho + (nome,))), VALIDADORES[verificacao][0], DURACAO_VALIDADOR.labels(verificacao),
+            ))
+
+        for nomes, check, serie in VERIFICACOES_CRUZADAS.get(modelo, ()):
+            self._verificacoes.append((
+                attrgetter(*(".".join(caminho + (nome,)) for nome in nomes)),
+                lambda valores, check=check: check(*valores), DURACAO_VALIDADOR.labels(serie),
+            ))
+
+        namespace = {}
+        if horarios:
+            def __post_init__(self):
+                for nome in horarios:
+                    setattr(self, nome, time.fromisoformat(getattr(self, nome)))
+            namespace["__post_init__"] = __post_init__
+        return msgspec.defstruct(
+            modelo.__name__.removesuffix("Schema"), campos, kw_only=True, namespace=namespace, gc=False)
+
+    def decodificar(self, corpo: bytes, formato: str = JSON):
+        """Documento decodificado e com os tipos conferidos, ou None (o Pydantic decide)."""
+        try:
+            return self._decodificadores[formato].decode(corpo)
+        except self._erros:
+            return None
+
+    def converter(self, dados: Any):
+        """Como decodificar, a partir do JSON já decodificado (ex.: um registro do lote)."""
+        try:
+            return self._msgspec.convert(dados, self.Documento)
+        except self._erros:
+            return None
+
+    def aprovado(self, doc, regras: ConjuntoDeRegras) -> bool:
+        """Passa nas verificações da lib utils e nas regras de negócio?"""
+        if SONDA_VALIDADORES.enabled:
+            return self._aprovado_medindo(doc, regras)
+        for ler, check, _ in self._verificacoes:
+            valor = ler(doc)
+            # Como em validar_com_utils: campos vazios não são verificados
+            if valor and not check(valor)[0]:
+                return False
+        try:
+            for grupo, secao, _ in self._secoes:
+                if not regras.conferencias[grupo](secao(doc) if secao else doc):
+                    return False
+        except (ValueError, AssertionError):
+            return False
+        return True
+
+    def _aprovado_medindo(self, doc, regras: ConjuntoDeRegras) -> bool:
+        # Mesmas séries dos validadores do Pydantic. Só registradas se o
+        # documento for aprovado: se não, o Pydantic valida de novo e mede.
+        medidas = []
+        for ler, check, serie in self._verificacoes:
+            valor = ler(doc)
+            if valor:
+                inicio = perf_counter()
+                valido = check(valor)[0]
+                medidas.append((serie, perf_counter() - inicio))
+                if not valido:
+                    return False
+        try:
+            for grupo, secao, serie in self._secoes:
+                inicio = perf_counter()
+                aprovado = regras.conferencias[grupo](secao(doc) if secao else doc)
+                medidas.append((serie, perf_counter() - inicio))
+                if not aprovado:
+                    return False
+        except (ValueError, AssertionError):
+            return False
+        for serie, duracao in medidas:
+            serie.observe(duracao)
+        return True
+
+    def forma_canonica(self, doc) -> bytes:
+        """JSON do documento já convertido: independe da ordem das chaves e dos espaços do corpo."""
+        return self._json.encode(doc)
+
+    def codificar(self, conteudo: Any, formato: str = JSON) -> bytes:
+        return (self._msgpack if formato == MSGPACK else self._json).encode(conteudo)
+
+    def decodificar_msgpack(self, corpo: bytes) -> Any:
+        """MessagePack sem tipo (para o caminho de referência). Levanta ValueError se inválido."""
+        try:
+            return self._msgspec.msgpack.decode(corpo)
+        except self._msgspec.DecodeError as e:
+            raise ValueError(str(e)) from None
+
+
+_UNSET = object()
+_caminho_padrao = _UNSET
+
+
+def get_caminho_rapido() -> Optional[CaminhoRapido]:
+    """
+    Caminho rápido padrão, montado na primeira chamada (e não na importação,
+    para não pesar na subida). None sem o msgspec ou com VALIDACAO_RAPIDA=0.
+    """
+    global _caminho_padrao
+    if _caminho_padrao is _UNSET:
+        if os.environ.get("VALIDACAO_RAPIDA", "1") == "0":
+            _caminho_padrao = None
+        else:
+            try:
+                _caminho_padrao = CaminhoRapido()
+            except ImportError:
+                _caminho_padrao = None
+    return _caminho_padrao
+
+
+def set_caminho_rapido(caminho: Optional[CaminhoRapido]):
+    """Substitui o caminho rápido padrão (None desliga; ex.: nos testes)."""
+    global _caminho_padrao
+    _caminho_padrao = caminho
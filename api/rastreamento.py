@@ -0,0 +1,213 @@
+"""
+Rastreamento de cada requisição (utils/tracing.py): um span raiz por
+requisição e, dentro dele, as etapas da validação (parse, schema, externa,
+resposta), cada validador de campo e model validator, cada verificador da
+etapa externa e cada consulta aos provedores de CNPJ.
+
+- Server-Timing: toda resposta traz a duração das etapas e o total
+  (`parse;dur=0.05, schema;dur=0.31, externa;dur=82.10, total;dur=83.02`),
+  visível no DevTools do navegador, e o cabeçalho X-Trace-Id.
+- Exportação (OTLP/JSON, em uma thread): TRACING_EXPORT_PATH (arquivo
+  JSONL) e/ou TRACING_OTLP_ENDPOINT (coletor OTLP/HTTP, ex.:
+  http://localhost:4318/v1/traces). TRACING_SAMPLE é a fração das
+  requisições exportadas (padrão 1); as lentas são sempre exportadas.
+- Requisições lentas: acima de TRACING_SLOW_THRESHOLD segundos (padrão 2;
+  0 desliga), uma amostra (TRACING_SLOW_SAMPLE, padrão 1) vai para o log
+  `api.rastreamento` com a árvore completa de spans.
+
+CPF, CNPJ e e-mail nos atributos exportados ou registrados no log são
+mascarados (mask_cpf, mask_cnpj, mask_email da lib utils).
+TRACING_ENABLED=0 desliga tudo.
+"""
+import json
+import logging
+import os
+import random
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from utils import mask_cnpj, mask_cpf, mask_email
+from utils.metrics import registry
+from utils.tracing import (
+    BackgroundExporter,
+    FileExporter,
+    OTLPHTTPExporter,
+    Span,
+    end_trace,
+    server_timing,
+    start_trace,
+    to_dict,
+    to_otlp_spans,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIAR_LENTO = 2.0
+NOME_DO_SERVICO = "api-validacao-estagio"
+# Spans de chamadas de saída (SpanKind CLIENT no OTLP)
+PREFIXOS_DE_SAIDA = ("cnpj.",)
+
+_CNPJ = re.compile(r"\b\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2}\b")
+_CPF = re.compile(r"\b\d{3}\.?\d{3}\.?\d{3}-?\d{2}\b")
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_MASCARAS = {"cnpj": mask_cnpj, "cpf": mask_cpf, "email": mask_email}
+
+
+def mascarar_texto(texto: str) -> str:
+    """Mascara os CNPJs, CPFs e e-mails que aparecem no texto."""
+    texto = _CNPJ.sub(lambda m: mask_cnpj(m.group()), texto)
+    texto = _CPF.sub(lambda m: mask_cpf(m.group()), texto)
+    return _EMAIL.sub(lambda m: mask_email(m.group()), texto)
+
+
+def mascarar_atributo(chave: str, valor: Any) -> Any:
+    """Valor do atributo sem dados pessoais: pela chave (cpf, cnpj, email) ou procurando no texto."""
+    if not isinstance(valor, str):
+        return valor
+    mascara = _MASCARAS.get(chave.rsplit(".", 1)[-1])
+    if mascara is not None:
+        return mascara(valor)
+    return mascarar_texto(valor)
+
+
+class Rastreador:
+    """Decide, no fim de cada requisição, o que exportar e o que registrar como lento."""
+
+    def __init__(
+        self,
+        exportador: Optional[BackgroundExporter] = None,
+        amostra: float = 1.0,
+        limiar_lento: Optional[float] = DEFAULT_LIMIAR_LENTO,
+        amostra_lenta: float = 1.0,
+        aleatorio: Callable[[], float] = random.random,
+    ):
+        self.exportador = exportador
+        self.amostra = amostra
+        self.limiar_lento = limiar_lento or None
+        self.amostra_lenta = amostra_lenta
+        self._aleatorio = aleatorio
+        self._stats = {"rastros": 0, "lentos": 0, "lentos_registrados": 0, "exportados": 0}
+
+    def concluir(self, raiz: Span):
+        """Requisição terminada: exporta e registra no log, conforme as amostras."""
+        self._stats["rastros"] += 1
+        lento = self.limiar_lento is not None and raiz.duration >= self.limiar_lento
+        if lento:
+            self._stats["lentos"] += 1
+            if self._aleatorio() < self.amostra_lenta:
+                self._stats["lentos_registrados"] += 1
+                logger.warning("requisição lenta: %s",
+                               json.dumps(to_dict(raiz, mascarar_atributo), ensure_ascii=False))
+        if self.exportador is not None and (lento or self._aleatorio() < self.amostra):
+            self._stats["exportados"] += 1
+            self.exportador.submit(to_otlp_spans(raiz, mascarar_atributo, PREFIXOS_DE_SAIDA))
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["exportacao"] = self.exportador.stats() if self.exportador is not None else None
+        return stats
+
+    def fechar(self):
+        if self.exportador is not None:
+            self.exportador.close()
+
+
+class RastreamentoHTTP:
+    """Middleware ASGI: abre o rastro da requisição e acrescenta Server-Timing e X-Trace-Id à resposta."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        rastreador = get_rastreador()
+        if scope["type"] != "http" or rastreador is None:
+            await self.app(scope, receive, send)
+            return
+
+        raiz, token = start_trace(scope["method"], {"http.method": scope["method"]})
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                raiz.set_attribute("http.status_code", mensagem["status"])
+                cabecalhos = list(mensagem.get("headers", ()))
+                cabecalhos.append((b"server-timing", server_timing(raiz).encode("latin-1")))
+                cabecalhos.append((b"x-trace-id", raiz.trace.trace_id.encode("latin-1")))
+                mensagem = {**mensagem, "headers": cabecalhos}
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        except BaseException as e:
+            raiz.error = type(e).__name__
+            raise
+        finally:
+            end_trace(raiz, token)
+            rota = getattr(scope.get("route"), "path", None)
+            raiz.name = f"{scope['method']} {rota or '<sem_rota>'}"
+            raiz.set_attribute("http.route", rota or mascarar_texto(scope["path"]))
+            rastreador.concluir(raiz)
+
+
+_UNSET = object()
+_rastreador_padrao = _UNSET
+
+
+def _rastreador_do_ambiente() -> Optional[Rastreador]:
+    if os.environ.get("TRACING_ENABLED", "1") == "0":
+        return None
+    exportadores = []
+    if os.environ.get("TRACING_EXPORT_PATH"):
+        exportadores.append(FileExporter(os.environ["TRACING_EXPORT_PATH"]))
+    if os.environ.get("TRACING_OTLP_ENDPOINT"):
+        exportadores.append(OTLPHTTPExporter(os.environ["TRACING_OTLP_ENDPOINT"]))
+    return Rastreador(
+        exportador=BackgroundExporter(exportadores, NOME_DO_SERVICO, scope=__name__) if exportadores else None,
+        amostra=float(os.environ.get("TRACING_SAMPLE", 1.0)),
+        limiar_lento=float(os.environ.get("TRACING_SLOW_THRESHOLD", DEFAULT_LIMIAR_LENTO)),
+        amostra_lenta=float(os.environ.get("TRACING_SLOW_SAMPLE", 1.0)),
+    )
+
+
+def get_rastreador() -> Optional[Rastreador]:
+    """Rastreador padrão, criado na primeira requisição. None se TRACING_ENABLED=0."""
+    global _rastreador_padrao
+    if _rastreador_padrao is _UNSET:
+        _rastreador_padrao = _rastreador_do_ambiente()
+    return _rastreador_padrao
+
+
+def set_rastreador(rastreador: Optional[Rastreador]):
+    """Substitui o rastreador padrão (None desliga o rastreamento; ex.: nos testes)."""
+    global _rastreador_padrao
+    _rastreador_padrao = rastreador
+
+
+def parar_rastreamento():
+    """No desligamento: exporta os rastros que ainda estão na fila."""
+    if isinstance(_rastreador_padrao, Rastreador):
+        _rastreador_padrao.fechar()
+
+
+def _coletar_rastreamento() -> List[tuple]:
+    if not isinstance(_rastreador_padrao, Rastreador):
+        return []
+    s = _rastreador_padrao.stats()
+    familias = [
+        ("slow_requests_total", "counter", "Requisições acima de TRACING_SLOW_THRESHOLD, por destino", [
+            ({"logged": "true"}, s["lentos_registrados"]),
+            ({"logged": "false"}, s["lentos"] - s["lentos_registrados"]),
+        ]),
+    ]
+    if s["exportacao"] is not None:
+        familias += [
+            ("traces_exported_total", "counter", "Rastros exportados ou descartados com a fila de exportação cheia", [
+                ({"result": "exported"}, s["exportacao"]["exported"]),
+                ({"result": "dropped"}, s["exportacao"]["dropped"]),
+            ]),
+            ("trace_export_errors_total", "counter", "Falhas ao gravar ou enviar um lote de rastros",
+             [({}, s["exportacao"]["errors"])]),
+        ]
+    return familias
+
+
+registry.add_collector(_coletar_rastreamento)
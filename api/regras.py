@@ -0,0 +1,590 @@
+"""
+Regras de negócio do documento de estágio.
+
+As regras são declaradas em um arquivo JSON (api/regras.json, ou o indicado
+em REGRAS_NEGOCIO_PATH) e compiladas uma única vez em um plano de avaliação:
+cada regra vira uma closure com os limites e os leitores de campo já
+resolvidos, agrupada pelo model validator que a executa e ordenada de acordo
+com as dependências entre regras.
+
+Cada item do arquivo tem um "tipo" (que define os campos lidos, onde o erro
+é apontado e a verificação), os parâmetros do tipo (limites) e, opcionalmente:
+- "codigo": código da regra (padrão: o do tipo);
+- "ativa": false desliga a regra;
+- "depende_de": códigos das regras que precisam passar para que esta seja
+  avaliada (padrão: as do tipo; ex.: o limite diário depende da ordem dos
+  horários).
+
+Dois modos de validação usam o mesmo plano:
+- padrão: os model validators de schemas.py param na primeira regra violada
+  de cada grupo (comportamento original);
+- completo (validar_todas): todas as regras são avaliadas em uma passada,
+  inclusive quando outros campos do documento têm erro; só deixam de ser
+  avaliadas as regras que dependem de um campo inválido ou de uma regra que
+  não passou.
+
+O arquivo é relido quando muda (verificação a cada
+REGRAS_NEGOCIO_CHECK_INTERVAL s). O novo conjunto só substitui o atual depois
+de compilado sem erros, pela troca de uma única referência; cada documento é
+validado do início ao fim com o conjunto vigente quando a validação começou.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time as _time
+from datetime import date, datetime, time
+from operator import attrgetter
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from pydantic import TypeAdapter
+
+from .metricas import rejeitar
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "regras.json")
+
+# Chaves do contexto de validação do Pydantic: COLETAR_REGRAS desliga os
+# model validators (as regras são avaliadas à parte, por validar_todas) e
+# CONJUNTO_DE_REGRAS fixa o conjunto usado em todo o documento.
+COLETAR_REGRAS = "coletar_regras"
+CONJUNTO_DE_REGRAS = "conjunto_de_regras"
+
+
+class RegraViolada(ValueError):
+    """ValueError com o código da regra, preservado em ctx["error"] nos erros do Pydantic."""
+
+    def __init__(self, mensagem: str, codigo: str):
+        super().__init__(mensagem)
+        self.codigo = codigo
+
+
+class ErroNasRegras(ValueError):
+    """Arquivo de regras inválido (tipo desconhecido, parâmetro errado, dependência circular...)."""
+
+
+# --- Tipos de regra ---
+# Cada compilador recebe o leitor dos campos do tipo (attrgetter, que devolve
+# o valor, ou a tupla de valores, na ordem de Tipo.campos), a função chamada
+# com a mensagem quando a regra é violada (que levanta RegraViolada no modo
+# padrão e devolve a mensagem no modo completo) e os parâmetros do arquivo, e
+# devolve a avaliação: uma função que recebe o modelo.
+
+def _microssegundos(horario: time) -> int:
+    return ((horario.hour * 60 + horario.minute) * 60 + horario.second) * 1_000_000 + horario.microsecond
+
+
+def _horas_diarias(horario_inicio, horario_termino) -> float:
+    if horario_inicio.tzinfo is None and horario_termino.tzinfo is None:
+        return (_microssegundos(horario_termino) - _microssegundos(horario_inicio)) / 3_600_000_000
+    dummy_date = date(2000, 1, 1)
+    diferenca = datetime.combine(dummy_date, horario_termino) - datetime.combine(dummy_date, horario_inicio)
+    return diferenca.total_seconds() / 3600
+
+
+def _documento_obrigatorio(ler, violada):
+    def avaliar(modelo):
+        cnpj, cpf = ler(modelo)
+        if not cnpj and not cpf:
+            return violada('É obrigatório informar o CNPJ ou o CPF da Unidade Concedente.')
+    return avaliar
+
+
+def _termino_apos_inicio(ler, violada):
+    def avaliar(modelo):
+        data_inicio, data_termino = ler(modelo)
+        if data_termino <= data_inicio:
+            return violada('A data de término deve ser posterior à data de início.')
+    return avaliar
+
+
+def _horario_termino_apos_inicio(ler, violada):
+    def avaliar(modelo):
+        horario_inicio, horario_termino = ler(modelo)
+        if horario_termino <= horario_inicio:
+            return violada('O horário de término deve ser posterior ao horário de início.')
+    return avaliar
+
+
+def _limite_horas_diarias(ler, violada, *, limite: float):
+    def avaliar(modelo):
+        horas_diarias = _horas_diarias(*ler(modelo))
+        if horas_diarias > limite:
+            return violada(f'A carga horária diária ({horas_diarias:.1f}h) excede o limite permitido de {limite:g} horas.')
+    return avaliar
+
+
+def _limite_horas_semanais(ler, violada, *, limite: float):
+    def avaliar(modelo):
+        horas_semanais = ler(modelo)
+        if horas_semanais > limite:
+            return violada(f'A carga horária semanal ({horas_semanais}h) excede o limite permitido de {limite:g} horas.')
+    return avaliar
+
+
+def _prazo(dias: int) -> str:
+    if dias % 365:
+        return f'{dias} dias'
+    anos = dias // 365
+    return '1 ano' if anos == 1 else f'{anos} anos'
+
+
+def _duracao_maxima(ler, violada, *, dias: int, exceto_pcd: bool = True):
+    excecao = ', exceto para estagiários PCD' if exceto_pcd else ''
+    mensagem = f'A duração do estágio não pode exceder {_prazo(dias)}{excecao}.'
+
+    def avaliar(modelo):
+        data_inicio, data_termino, portador_de_deficiencia = ler(modelo)
+        if (data_termino - data_inicio).days > dias and not (exceto_pcd and portador_de_deficiencia):
+            return violada(mensagem)
+    return avaliar
+
+
+def _idade_minima(ler, violada, *, anos: int):
+    def avaliar(modelo):
+        data_nascimento, data_inicio = ler(modelo)
+        idade = data_inicio.year - data_nascimento.year - (
+            (data_inicio.month, data_inicio.day) < (data_nascimento.month, data_nascimento.day))
+        if idade < anos:
+            return violada(f'O estagiário deve ter no mínimo {anos} anos na data de início do estágio. Idade calculada: {idade} anos.')
+    return avaliar
+
+
+class Tipo(NamedTuple):
+    grupo: str                     # model validator que executa as regras do tipo (ver GRUPOS)
+    codigo: str                    # código padrão
+    campos: Tuple[str, ...]        # campos lidos, como caminhos "secao.campo"
+    loc: Tuple[str, ...]           # onde o erro é apontado no modo completo
+    compilar: Callable[..., Callable[[Any], Optional[str]]]
+    depende_de: Tuple[str, ...] = ()
+
+
+TIPOS: Dict[str, Tipo] = {
+    "documento_obrigatorio": Tipo(
+        "unidade_concedente", "concedente.documento_obrigatorio",
+        ("unidade_concedente.cnpj", "unidade_concedente.cpf"), ("unidade_concedente",),
+        _documento_obrigatorio),
+    "termino_apos_inicio": Tipo(
+        "dados_estagio", "datas.termino_antes_do_inicio",
+        ("dados_estagio.data_inicio", "dados_estagio.data_termino"), ("dados_estagio", "data_termino"),
+        _termino_apos_inicio),
+    "horario_termino_apos_inicio": Tipo(
+        "dados_estagio", "horario.termino_antes_do_inicio",
+        ("dados_estagio.horario_inicio", "dados_estagio.horario_termino"), ("dados_estagio", "horario_termino"),
+        _horario_termino_apos_inicio),
+    "limite_horas_diarias": Tipo(
+        "dados_estagio", "horario.limite_diario",
+        ("dados_estagio.horario_inicio", "dados_estagio.horario_termino"), ("dados_estagio", "horario_termino"),
+        _limite_horas_diarias, ("horario.termino_antes_do_inicio",)),
+    "limite_horas_semanais": Tipo(
+        "dados_estagio", "horario.limite_semanal",
+        ("dados_estagio.horas_semanais",), ("dados_estagio", "horas_semanais"),
+        _limite_horas_semanais),
+    "duracao_maxima": Tipo(
+        "documento", "duracao.limite",
+        ("dados_estagio.data_inicio", "dados_estagio.data_termino", "estagiario.portador_de_deficiencia"),
+        ("dados_estagio", "data_termino"),
+        _duracao_maxima, ("datas.termino_antes_do_inicio",)),
+    "idade_minima": Tipo(
+        "documento", "idade.minima",
+        ("estagiario.data_nascimento", "dados_estagio.data_inicio"), ("estagiario", "data_nascimento"),
+        _idade_minima),
+}
+
+# Grupos, um por model validator, na ordem em que o Pydantic os executa, e o
+# modelo que cada um recebe (a seção, ou None para o documento inteiro)
+GRUPOS: Dict[str, Optional[str]] = {
+    "unidade_concedente": "unidade_concedente",
+    "dados_estagio": "dados_estagio",
+    "documento": None,
+}
+_ORDEM_GRUPOS = {grupo: i for i, grupo in enumerate(GRUPOS)}
+
+_CHAVES_RESERVADAS = {"tipo", "codigo", "ativa", "depende_de"}
+
+# Tipos dos campos usados pelas regras, para lê-los do JSON quando o
+# documento como um todo não pôde ser montado
+TIPOS_DOS_CAMPOS = {
+    "unidade_concedente.cnpj": Optional[str],
+    "unidade_concedente.cpf": Optional[str],
+    "dados_estagio.data_inicio": date,
+    "dados_estagio.data_termino": date,
+    "dados_estagio.horario_inicio": time,
+    "dados_estagio.horario_termino": time,
+    "dados_estagio.horas_semanais": int,
+    "estagiario.portador_de_deficiencia": bool,
+    "estagiario.data_nascimento": date,
+}
+_ADAPTADORES = {campo: TypeAdapter(tipo) for campo, tipo in TIPOS_DOS_CAMPOS.items()}
+_OPCIONAIS = {"unidade_concedente.cnpj", "unidade_concedente.cpf"}
+
+
+def erro_pydantic(loc, mensagem: str, valor) -> Dict[str, Any]:
+    """Monta um erro no mesmo formato dos erros de validação do Pydantic."""
+    return {
+        "type": "value_error",
+        "loc": tuple(loc),
+        "msg": f"Value error, {mensagem}",
+        "input": valor,
+        "ctx": {"error": mensagem},
+    }
+
+
+# --- Compilação ---
+
+class Regra(NamedTuple):
+    codigo: str
+    tipo: str
+    grupo: str
+    campos: Tuple[str, ...]
+    loc: Tuple[str, ...]
+    depende_de: Tuple[str, ...]
+    parametros: Dict[str, Any]
+    avaliar: Callable[[Any], None]                      # modelo do grupo; levanta RegraViolada
+    avaliar_documento: Callable[[Any], Optional[str]]   # documento inteiro -> mensagem ou None
+    conferir: Callable[[Any], Optional[str]]            # modelo do grupo -> mensagem ou None (não conta recusa)
+
+
+def _leitor(campos: Sequence[str], secao: Optional[str] = None) -> Callable[[Any], Any]:
+    """Lê os campos do modelo recebido pelo grupo (a seção ou o documento inteiro)."""
+    return attrgetter(*(campo.split(".", 1)[1] if campo.split(".", 1)[0] == secao else campo for campo in campos))
+
+
+def _mensagem(mensagem: str) -> str:
+    return mensagem
+
+
+def _compilar_regra(item: Dict[str, Any]) -> Regra:
+    if not isinstance(item, dict) or "tipo" not in item:
+        raise ErroNasRegras(f"Regra sem tipo: {item!r}")
+    tipo = TIPOS.get(item["tipo"])
+    if tipo is None:
+        raise ErroNasRegras(f"Tipo de regra desconhecido: {item['tipo']!r} (tipos: {', '.join(TIPOS)})")
+    codigo = item.get("codigo", tipo.codigo)
+    parametros = {k: v for k, v in item.items() if k not in _CHAVES_RESERVADAS}
+    for nome, valor in parametros.items():
+        esperado = tipo.compilar.__annotations__.get(nome)
+        numero = isinstance(valor, (int, float)) and not isinstance(valor, bool)
+        if (esperado in (int, float) and not numero) or (esperado is bool and not isinstance(valor, bool)):
+            raise ErroNasRegras(f"Parâmetro {nome} da regra {codigo}: esperado {esperado.__name__}, recebido {valor!r}")
+
+    def violada(mensagem):
+        rejeitar(codigo)
+        raise RegraViolada(mensagem, codigo)
+
+    try:
+        avaliar = tipo.compilar(_leitor(tipo.campos, GRUPOS[tipo.grupo]), violada, **parametros)
+        avaliar_documento = tipo.compilar(_leitor(tipo.campos), _mensagem, **parametros)
+        conferir = tipo.compilar(_leitor(tipo.campos, GRUPOS[tipo.grupo]), _mensagem, **parametros)
+    except TypeError as e:
+        raise ErroNasRegras(f"Parâmetros inválidos na regra {codigo}: {e}") from None
+
+    return Regra(
+        codigo, item["tipo"], tipo.grupo, tipo.campos, tipo.loc,
+        tuple(item.get("depende_de", tipo.depende_de)), parametros, avaliar, avaliar_documento, conferir,
+    )
+
+
+def _ordenar(regras: List[Regra]) -> List[Regra]:
+    """Ordena por grupo e, dentro do grupo, coloca cada regra depois das que ela depende."""
+    por_codigo = {regra.codigo: regra for regra in regras}
+    ordenadas, visitadas, em_andamento = [], set(), set()
+
+    def visitar(regra: Regra):
+        if regra.codigo in visitadas:
+            return
+        if regra.codigo in em_andamento:
+            raise ErroNasRegras(f"Dependência circular envolvendo a regra {regra.codigo}")
+        em_andamento.add(regra.codigo)
+        for codigo in regra.depende_de:
+            visitar(por_codigo[codigo])
+        em_andamento.discard(regra.codigo)
+        visitadas.add(regra.codigo)
+        ordenadas.append(regra)
+
+    for regra in regras:
+        visitar(regra)
+    return sorted(ordenadas, key=lambda regra: _ORDEM_GRUPOS[regra.grupo])
+
+
+def _executor(regras: Sequence[Regra]) -> Callable[[Any], None]:
+    """Avaliação de um grupo: a própria closure da regra, se o grupo tem uma só."""
+    if len(regras) == 1:
+        return regras[0].avaliar
+    avaliacoes = tuple(regra.avaliar for regra in regras)
+
+    def executar(modelo):
+        for avaliar in avaliacoes:
+            avaliar(modelo)
+
+    return executar
+
+
+def _conferencia(regras: Sequence[Regra]) -> Callable[[Any], bool]:
+    """Como _executor, sem levantar nem contar recusas: True se o modelo passa em todas."""
+    conferencias = tuple(regra.conferir for regra in regras)
+
+    def conferir(modelo) -> bool:
+        return all(conferir(modelo) is None for conferir in conferencias)
+
+    return conferir
+
+
+class ConjuntoDeRegras:
+    """Plano de avaliação imutável, compilado a partir da configuração das regras."""
+
+    def __init__(self, config: Dict[str, Any], origem: str = "<memória>"):
+        if not isinstance(config, dict) or not isinstance(config.get("regras"), list):
+            raise ErroNasRegras('A configuração deve ser um objeto com a lista "regras".')
+        regras, inativas = [], set()
+        for item in config["regras"]:
+            regra = _compilar_regra(item)
+            if item.get("ativa", True):
+                regras.append(regra)
+            else:
+                inativas.add(regra.codigo)
+
+        codigos = [regra.codigo for regra in regras]
+        repetidos = {codigo for codigo in codigos if codigos.count(codigo) > 1}
+        if repetidos:
+            raise ErroNasRegras(f"Códigos de regra repetidos: {', '.join(sorted(repetidos))}")
+        por_codigo = {regra.codigo: regra for regra in regras}
+        for i, regra in enumerate(regras):
+            # Dependência de uma regra desligada é sempre satisfeita
+            depende_de = tuple(codigo for codigo in regra.depende_de if codigo not in inativas)
+            for codigo in depende_de:
+                dependencia = por_codigo.get(codigo)
+                if dependencia is None:
+                    raise ErroNasRegras(f"A regra {regra.codigo} depende de uma regra inexistente: {codigo}")
+                if not self._pode_depender(regra.grupo, dependencia.grupo):
+                    raise ErroNasRegras(
+                        f"A regra {regra.codigo} ({regra.grupo}) não pode depender de {codigo} ({dependencia.grupo}).")
+            regras[i] = por_codigo[regra.codigo] = regra._replace(depende_de=depende_de)
+
+        self.regras: Tuple[Regra, ...] = tuple(_ordenar(regras))
+        self.grupos: Dict[str, Tuple[Regra, ...]] = {
+            grupo: tuple(regra for regra in self.regras if regra.grupo == grupo) for grupo in GRUPOS
+        }
+        self.executores: Dict[str, Callable[[Any], Any]] = {
+            grupo: _executor(regras_do_grupo) for grupo, regras_do_grupo in self.grupos.items()
+        }
+        # Para quem só precisa saber se passa (caminho rápido, api/rapido.py):
+        # quem recusa é o Pydantic, que valida de novo e conta a recusa
+        self.conferencias: Dict[str, Callable[[Any], bool]] = {
+            grupo: _conferencia(regras_do_grupo) for grupo, regras_do_grupo in self.grupos.items()
+        }
+        self.origem = origem
+        self.versao = config.get("versao")
+        # Identifica o conteúdo das regras (não a origem): respostas guardadas
+        # só valem enquanto a assinatura for a mesma
+        self.assinatura = hashlib.sha256(
+            json.dumps(config, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _pode_depender(grupo: str, grupo_dependencia: str) -> bool:
+        # No modo padrão, uma regra só vê o resultado das regras do mesmo
+        # grupo ou, no grupo do documento inteiro, das regras das seções
+        # (que já passaram, senão o documento não teria sido montado).
+        if grupo == grupo_dependencia:
+            return True
+        return GRUPOS[grupo] is None and _ORDEM_GRUPOS[grupo_dependencia] < _ORDEM_GRUPOS[grupo]
+
+    @classmethod
+    def do_arquivo(cls, caminho: str) -> "ConjuntoDeRegras":
+        try:
+            with open(caminho, encoding="utf-8") as f:
+                config = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ErroNasRegras(f"{caminho}: JSON inválido ({e})") from None
+        return cls(config, caminho)
+
+    def aplicar(self, modelo, grupo: str):
+        """Avalia as regras do grupo e levanta RegraViolada na primeira violada."""
+        self.executores[grupo](modelo)
+        return modelo
+
+    def validar_todas(self, dados: Any, doc=None, erros_de_campo: Sequence[Dict[str, Any]] = ()) -> List[Dict[str, Any]]:
+        """
+        Avalia todas as regras e devolve todas as violações, no formato dos
+        erros do Pydantic acrescido de "codigo".
+
+        Com o documento montado (`doc`), os valores vêm dele; senão, do JSON
+        (`dados`), pulando as regras que dependem de campos com erro.
+        """
+        locs_com_erro = [tuple(erro["loc"]) for erro in erros_de_campo]
+        nao_passaram = set()
+        violacoes = []
+        for regra in self.regras:
+            if nao_passaram.intersection(regra.depende_de):
+                nao_passaram.add(regra.codigo)
+                continue
+            if doc is not None:
+                valores = doc
+            else:
+                try:
+                    if any(_bloqueado(tuple(campo.split(".")), locs_com_erro) for campo in regra.campos):
+                        raise LookupError(regra.codigo)
+                    valores = _do_json(dados, regra.campos)
+                except (LookupError, ValueError):
+                    nao_passaram.add(regra.codigo)
+                    continue
+            mensagem = regra.avaliar_documento(valores)
+            if mensagem:
+                nao_passaram.add(regra.codigo)
+                rejeitar(regra.codigo)
+                valor = attrgetter(".".join(regra.loc))(valores) if len(regra.loc) > 1 else None
+                violacoes.append({**erro_pydantic(regra.loc, mensagem, valor), "codigo": regra.codigo})
+        return violacoes
+
+    def descricao(self) -> List[Dict[str, Any]]:
+        return [
+            {"codigo": r.codigo, "tipo": r.tipo, "depende_de": list(r.depende_de), **r.parametros}
+            for r in self.regras
+        ]
+
+
+def _bloqueado(caminho: Tuple[str, ...], locs_com_erro: Iterable[Tuple]) -> bool:
+    """O campo tem erro próprio, ou está dentro de uma seção com erro (ex.: seção ausente)?"""
+    for loc in locs_com_erro:
+        n = min(len(loc), len(caminho))
+        if tuple(loc[:n]) == caminho[:n]:
+            return True
+    return False
+
+
+def _do_json(dados: Any, campos: Sequence[str]) -> SimpleNamespace:
+    """Lê e converte os campos do JSON, em um objeto com a mesma estrutura do documento."""
+    valores = SimpleNamespace()
+    for campo in campos:
+        secao, nome = campo.split(".")
+        no = dados.get(secao) if isinstance(dados, dict) else None
+        if isinstance(no, dict) and nome in no:
+            valor = _ADAPTADORES[campo].validate_python(no[nome])
+        elif campo in _OPCIONAIS:
+            valor = None
+        else:
+            raise LookupError(campo)
+        if not hasattr(valores, secao):
+            setattr(valores, secao, SimpleNamespace())
+        setattr(getattr(valores, secao), nome, valor)
+    return valores
+
+
+# --- Arquivo de regras e recarga ---
+
+class FonteDeRegras:
+    """
+    Conjunto de regras lido de um arquivo, recarregado quando o arquivo muda.
+    Um arquivo novo com erro é ignorado (e registrado no log e em stats());
+    o conjunto anterior continua valendo.
+    """
+
+    def __init__(self, caminho: str, check_interval: float = 5.0):
+        self.caminho = caminho
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._identidade = self._identidade_do_arquivo()
+        self._conjunto = ConjuntoDeRegras.do_arquivo(caminho)
+        self._checked_at = _time.monotonic()
+        self.recargas = 0
+        self.erro: Optional[str] = None
+
+    def _identidade_do_arquivo(self):
+        st = os.stat(self.caminho)
+        return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def recarregar_se_mudou(self, force: bool = False) -> bool:
+        """Recompila as regras se o arquivo mudou. Retorna True se o conjunto foi trocado."""
+        with self._lock:
+            self._checked_at = _time.monotonic()
+            try:
+                identidade = self._identidade_do_arquivo()
+            except OSError:
+                return False
+            if not force and identidade == self._identidade:
+                return False
+            self._identidade = identidade
+            try:
+                conjunto = ConjuntoDeRegras.do_arquivo(self.caminho)
+            except (OSError, ErroNasRegras) as e:
+                self.erro = str(e)
+                logger.warning("Regras de negócio mantidas; arquivo novo inválido: %s", e)
+                return False
+            self._conjunto = conjunto
+            self.erro = None
+            self.recargas += 1
+            return True
+
+    def vigente(self) -> ConjuntoDeRegras:
+        if _time.monotonic() - self._checked_at >= self.check_interval:
+            self.recarregar_se_mudou()
+        return self._conjunto
+
+    def stats(self) -> Dict[str, Any]:
+        conjunto = self._conjunto
+        return {
+            "arquivo": self.caminho,
+            "versao": conjunto.versao,
+            "assinatura": conjunto.assinatura,
+            "recargas": self.recargas,
+            "erro": self.erro,
+            "regras": conjunto.descricao(),
+        }
+
+
+_fonte_padrao: Optional[FonteDeRegras] = None
+
+
+def get_regras() -> FonteDeRegras:
+    """
+    Fonte padrão das regras: REGRAS_NEGOCIO_PATH (ou api/regras.json),
+    verificada a cada REGRAS_NEGOCIO_CHECK_INTERVAL s.
+    """
+    global _fonte_padrao
+    if _fonte_padrao is None:
+        _fonte_padrao = FonteDeRegras(
+            os.environ.get("REGRAS_NEGOCIO_PATH", CAMINHO_PADRAO),
+            float(os.environ.get("REGRAS_NEGOCIO_CHECK_INTERVAL", 5.0)),
+        )
+    return _fonte_padrao
+
+
+def set_regras(fonte: Optional[FonteDeRegras]):
+    """Substitui a fonte padrão (None volta à configurada no ambiente)."""
+    global _fonte_padrao
+    _fonte_padrao = fonte
+
+
+def regras_vigentes() -> ConjuntoDeRegras:
+    return get_regras().vigente()
+
+
+# --- Pontos de uso ---
+
+def aplicar(modelo, grupo: str, info=None):
+    """
+    Model validators: avalia as regras do grupo com o conjunto fixado no
+    contexto da validação (ou o vigente). Não faz nada no modo completo.
+    """
+    contexto = info.context if info is not None else None
+    conjunto = contexto.get(CONJUNTO_DE_REGRAS) if contexto else None
+    if conjunto is None:
+        if contexto and contexto.get(COLETAR_REGRAS):
+            return modelo
+        conjunto = regras_vigentes()
+    conjunto.executores[grupo](modelo)
+    return modelo
+
+
+def validar_todas(dados: Any, doc=None, erros_de_campo: Sequence[Dict[str, Any]] = (),
+                  conjunto: Optional[ConjuntoDeRegras] = None) -> List[Dict[str, Any]]:
+    return (conjunto or regras_vigentes()).validar_todas(dados, doc, erros_de_campo)
+
+
+def codigo_do_erro(erro: Dict[str, Any]) -> str:
+    """Código da regra de um erro do Pydantic: o da RegraViolada, ou o tipo do erro."""
+    excecao = (erro.get("ctx") or {}).get("error")
+    return getattr(excecao, "codigo", None) or erro["type"]
@@ -1,32 +1,69 @@
-from pydantic import BaseModel, Field, field_validator, model_validator, ConfigDict
+from pydantic import BaseModel, Field, field_validator, model_validator, ConfigDict, ValidationInfo
 from typing import Optional
-from datetime import date, time, datetime, timedelta
-import httpx
+from datetime import date, time
+from time import perf_counter
 
 from utils import (
-    validate_cep,
-    validate_cpf,
-    validate_cnpj,
-    validate_email,
-    validate_phone_number,
-    validate_uf,
-    ValidationError
+    check_cep, cep_error_message,
+    check_cep_uf, cep_uf_error_message,
+    check_cpf, cpf_error_message,
+    check_cnpj, cnpj_error_message,
+    check_email, email_error_message,
+    check_phone_number, phone_number_error_message,
+    check_uf, uf_error_message,
 )
+from utils.tracing import span
+from .metricas import SONDA_VALIDADORES, DURACAO_VALIDADOR, rejeitar, medir_validador
+from .regras import RegraViolada, aplicar
+
+# Validação rápida (sem exceções) da lib utils e a mensagem de cada tipo de campo
+VALIDADORES = {
+    'cep': (check_cep, cep_error_message),
+    'cpf': (check_cpf, cpf_error_message),
+    'cnpj': (check_cnpj, cnpj_error_message),
+    'email': (check_email, email_error_message),
+    'telefone': (check_phone_number, phone_number_error_message),
+    'uf': (check_uf, uf_error_message),
+}
+_DURACAO_POR_TIPO = {tipo: DURACAO_VALIDADOR.labels(tipo) for tipo in VALIDADORES}
+_SPAN_POR_TIPO = {tipo: f"validador.{tipo}" for tipo in VALIDADORES}
+_DURACAO_CEP_UF = DURACAO_VALIDADOR.labels('cep_uf')
 
 # --- Helper para conectar Utils ao Pydantic ---
-def validar_com_utils(func_validacao, valor, nome_campo):
+def validar_com_utils(tipo, valor, nome_campo):
     """
-    Executa uma função de validação da lib utils.
-    Se a lib levantar ValidationError, converte para ValueError do Pydantic.
+    Executa a validação `tipo` da lib utils (check_*, que não levanta exceções).
+    Se o valor for inválido, levanta um único ValueError (RegraViolada, com o
+    código "tipo.motivo") para o Pydantic.
     """
     if not valor:
         return valor
-    try:
-        func_validacao(valor)
-    except ValidationError as e:
-        raise ValueError(str(e))
+    check, mensagem = VALIDADORES[tipo]
+    with span(_SPAN_POR_TIPO[tipo], {"campo": nome_campo}):
+        if SONDA_VALIDADORES.enabled:
+            inicio = perf_counter()
+            valido, codigo = check(valor)
+            _DURACAO_POR_TIPO[tipo].observe(perf_counter() - inicio)
+        else:
+            valido, codigo = check(valor)
+    if not valido:
+        rejeitar(f"{tipo}.{codigo}")
+        raise RegraViolada(mensagem(valor, codigo), f"{tipo}.{codigo}")
     return valor
 
+def validar_cep_uf(cep, uf):
+    """CEP e UF já válidos: o CEP pertence à UF (faixas dos Correios, sem I/O)?"""
+    with span("validador.cep_uf"):
+        if SONDA_VALIDADORES.enabled:
+            inicio = perf_counter()
+            valido, codigo = check_cep_uf(cep, uf)
+            _DURACAO_CEP_UF.observe(perf_counter() - inicio)
+        else:
+            valido, codigo = check_cep_uf(cep, uf)
+    if not valido:
+        rejeitar(f"cep.{codigo}")
+        raise RegraViolada(cep_uf_error_message(cep, uf, codigo), f"cep.{codigo}")
+
 # Esses Schemas se referem aos aninhamentos internos dos nós
 
 class EnderecoSchema(BaseModel):
@@ -38,11 +75,16 @@ class EnderecoSchema(BaseModel):
 
     @field_validator('cep')
     def validar_cep(cls, v):
-        return validar_com_utils(validate_cep, v, 'cep')
+        return validar_com_utils('cep', v, 'cep')
 
     @field_validator('estado')
-    def validar_estado(cls, v):
-        return validar_com_utils(validate_uf, v, 'estado')
+    def validar_estado(cls, v, info: ValidationInfo):
+        validar_com_utils('uf', v, 'estado')
+        # O CEP é validado antes (ordem dos campos); só chega aqui se válido
+        cep = info.data.get('cep')
+        if cep and v:
+            validar_cep_uf(cep, v)
+        return v
 
 class RepresentanteSchema(BaseModel):
     nome: str = Field(..., max_length=100)
@@ -66,60 +108,25 @@ class UnidadeConcedenteSchema(BaseModel):
     @field_validator('cnpj')
     def validar_cnpj_campo(cls, v):
         """
-        Valida o formato/dígito (Matemática) e a existência na Receita (API).
+        Valida o formato/dígito (Matemática).
+        A existência na Receita (API) é verificada depois, de forma assíncrona,
+        pelos verificadores de api/verificadores.py.
         """
-        if not v:
-            return v
-
-        # 1. Validação Matemática (Utils - Rápida)
-        try:
-            validate_cnpj(v)
-        except ValidationError as e:
-            raise ValueError(str(e))
-
-        # 2. Validação Externa (BrasilAPI - Lenta)
-        cnpj_limpo = v.replace('.', '').replace('/', '').replace('-', '')
-        
-        try:
-            # Cliente síncrono pois validadores do Pydantic são síncronos
-            with httpx.Client(timeout=10.0) as client:
-                url = f"https://brasilapi.com.br/api/cnpj/v1/{cnpj_limpo}"
-                response = client.get(url)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if 'type' in data and data['type'] == 'service_error':
-                        raise ValueError(f"CNPJ não encontrado na base da Receita Federal: {v}")
-                    
-                elif response.status_code == 404:
-                    raise ValueError(f"CNPJ não existe na Receita Federal: {v}")
-                
-                elif response.status_code == 400:
-                    raise ValueError("CNPJ inválido ou mal formatado na consulta externa.")
-                
-                else:
-                    # Em caso de erro 500 da API externa, barramos por segurança
-                    raise ValueError(f"Erro ao consultar BrasilAPI (Status {response.status_code}). Tente novamente.")
-
-        except httpx.RequestError:
-             raise ValueError("Erro de conexão: Não foi possível validar o CNPJ na Receita Federal.")
-
-        return v
+        return validar_com_utils('cnpj', v, 'cnpj')
 
     @field_validator('cpf')
     def validar_cpf_campo(cls, v):
-        return validar_com_utils(validate_cpf, v, 'cpf')
+        return validar_com_utils('cpf', v, 'cpf')
 
     @field_validator('telefone')
     def validar_telefone_campo(cls, v):
-        return validar_com_utils(validate_phone_number, v, 'telefone')
+        return validar_com_utils('telefone', v, 'telefone')
 
     @model_validator(mode='after')
-    def verificar_documento_obrigatorio(self):
-        """Regra: Obrigatório CNPJ se CPF não preenchido e vice-versa."""
-        if not self.cnpj and not self.cpf:
-            raise ValueError('É obrigatório informar o CNPJ ou o CPF da Unidade Concedente.')
-        return self
+    @medir_validador
+    def verificar_documento_obrigatorio(self, info: ValidationInfo):
+        """Regras do grupo "unidade_concedente" (api/regras.json): CNPJ ou CPF obrigatório."""
+        return aplicar(self, "unidade_concedente", info)
 
 class SupervisorSchema(BaseModel):
     nome: str = Field(..., max_length=100)
@@ -131,11 +138,11 @@ class SupervisorSchema(BaseModel):
 
     @field_validator('cpf')
     def validar_cpf_campo(cls, v):
-        return validar_com_utils(validate_cpf, v, 'cpf')
+        return validar_com_utils('cpf', v, 'cpf')
 
     @field_validator('email')
     def validar_email_campo(cls, v):
-        return validar_com_utils(validate_email, v, 'email')
+        return validar_com_utils('email', v, 'email')
 
 class EstagiarioSchema(BaseModel):
     nome: str = Field(..., max_length=100)
@@ -154,19 +161,19 @@ class EstagiarioSchema(BaseModel):
 
     @field_validator('cpf')
     def validar_cpf_campo(cls, v):
-        return validar_com_utils(validate_cpf, v, 'cpf')
+        return validar_com_utils('cpf', v, 'cpf')
 
     @field_validator('email')
     def validar_email_campo(cls, v):
-        return validar_com_utils(validate_email, v, 'email')
+        return validar_com_utils('email', v, 'email')
 
     @field_validator('telefone')
     def validar_telefone_campo(cls, v):
-        return validar_com_utils(validate_phone_number, v, 'telefone')
+        return validar_com_utils('telefone', v, 'telefone')
 
     @field_validator('celular')
     def validar_celular_campo(cls, v):
-        return validar_com_utils(validate_phone_number, v, 'celular')
+        return validar_com_utils('telefone', v, 'celular')
 
 class DadosEstagioSchema(BaseModel):
     data_inicio: date
@@ -180,34 +187,13 @@ class DadosEstagioSchema(BaseModel):
     valor_bolsa_auxilio: float
 
     @model_validator(mode='after')
-    def validar_regras_negocio_datas(self):
-        # Data Término deve ser posterior à Data Início
-        if self.data_termino <= self.data_inicio:
-            raise ValueError('A data de término deve ser posterior à data de início.')
-        return self
-
-    @model_validator(mode='after')
-    def validar_regras_negocio_horarios(self):
-        # Cálculo da carga horária diária
-        dummy_date = date(2000, 1, 1)
-        dt_inicio = datetime.combine(dummy_date, self.horario_inicio)
-        dt_termino = datetime.combine(dummy_date, self.horario_termino)
-
-        if dt_termino <= dt_inicio:
-            raise ValueError('O horário de término deve ser posterior ao horário de início.')
-
-        diferenca = dt_termino - dt_inicio
-        horas_diarias = diferenca.total_seconds() / 3600
-
-        # Não ultrapassar 6 horas diárias (padrão)
-        if horas_diarias > 6:
-            raise ValueError(f'A carga horária diária ({horas_diarias:.1f}h) excede o limite permitido de 6 horas.')
-
-        # Não deve ultrapassar 30 horas semanais
-        if self.horas_semanais > 30:
-             raise ValueError(f'A carga horária semanal ({self.horas_semanais}h) excede o limite permitido de 30 horas.')
-             
-        return self
+    @medir_validador
+    def validar_regras_negocio(self, info: ValidationInfo):
+        """
+        Regras do grupo "dados_estagio" (api/regras.json): término após o
+        início (datas e horários) e limites de carga horária diária e semanal.
+        """
+        return aplicar(self, "dados_estagio", info)
 
 # Schema principal para o JSON que será recebido:
 
@@ -288,33 +274,10 @@ class ValidacaoDocumentoSchema(BaseModel):
     )
 
     @model_validator(mode='after')
-    def validar_duracao_estagio(self):
-        """
-        Regra: Período máximo 2 anos (730 dias) exceto para PCD (Portador de Deficiência).
-        """
-        inicio = self.dados_estagio.data_inicio
-        termino = self.dados_estagio.data_termino
-        e_pcd = self.estagiario.portador_de_deficiencia
-        
-        diferenca_dias = abs((termino - inicio).days)
-        
-        # 2 anos = 730 dias
-        if diferenca_dias > 730 and not e_pcd:
-            raise ValueError('A duração do estágio não pode exceder 2 anos, exceto para estagiários PCD.')
-            
-        return self
-
-    @model_validator(mode='after')
-    def validar_idade_minima(self):
+    @medir_validador
+    def validar_regras_documento(self, info: ValidationInfo):
         """
-        Regra: O estagiário deve ter no mínimo 18 anos na data de início do estágio.
+        Regras do grupo "documento" (api/regras.json), que cruzam seções:
+        duração máxima do estágio (exceto PCD) e idade mínima do estagiário.
         """
-        nascimento = self.estagiario.data_nascimento
-        inicio = self.dados_estagio.data_inicio
-        
-        idade = inicio.year - nascimento.year - ((inicio.month, inicio.day) < (nascimento.month, nascimento.day))
-        
-        if idade < 18:
-            raise ValueError(f'O estagiário deve ter no mínimo 18 anos na data de início do estágio. Idade calculada: {idade} anos.')
-            
-        return self
\ No newline at end of file
+        return aplicar(self, "documento", info)
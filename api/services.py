@@ -1,58 +1,180 @@
-from .schemas import ValidacaoDocumentoSchema, UnidadeConcedenteSchema, SupervisorSchema, EstagiarioSchema
-from utils.document_validator import validate_cnpj_api, validate_cpf_business
-from typing import Dict, Any
-
-async def validate_document_service(doc: ValidacaoDocumentoSchema) -> Dict[str, Any]:
-    """
-    Orquestra a validação de todos os documentos (CNPJ e CPFs) presentes no schema.
-    """
-    observacoes = []
-    todas_validas = True
-
-    # 1. Validação do CNPJ da Unidade Concedente
-    unidade_concedente: UnidadeConcedenteSchema = doc.unidade_concedente
-    cnpj = unidade_concedente.cnpj
-    
-    if cnpj:
-        cnpj_result = await validate_cnpj_api(cnpj)
-        if not cnpj_result["validacao"]:
-            todas_validas = False
-            observacoes.append(f"CNPJ Unidade Concedente: {cnpj_result['obs']}")
-        else:
-            observacoes.append(f"CNPJ Unidade Concedente: {cnpj_result['obs']}")
-
-    # 2. Validação do CPF do Supervisor
-    supervisor: SupervisorSchema = doc.supervisor
-    cpf_supervisor = supervisor.cpf
-    
-    if cpf_supervisor:
-        cpf_supervisor_result = await validate_cpf_business(cpf_supervisor)
-        if not cpf_supervisor_result["validacao"]:
-            todas_validas = False
-            observacoes.append(f"CPF Supervisor: {cpf_supervisor_result['obs']}")
-        else:
-            observacoes.append(f"CPF Supervisor: {cpf_supervisor_result['obs']}")
-
-    # 3. Validação do CPF do Estagiário (Aluno)
-    estagiario: EstagiarioSchema = doc.estagiario
-    cpf_estagiario = estagiario.cpf
-    
-    if cpf_estagiario:
-        cpf_estagiario_result = await validate_cpf_business(cpf_estagiario)
-        if not cpf_estagiario_result["validacao"]:
-            todas_validas = False
-            observacoes.append(f"CPF Estagiário: {cpf_estagiario_result['obs']}")
-        else:
-            observacoes.append(f"CPF Estagiário: {cpf_estagiario_result['obs']}")
-
-    # Lógica de retorno final
-    if todas_validas:
-        return {
-            "validacao": True,
-            "obs": "Todas as validações de documentos foram bem-sucedidas. " + " | ".join(observacoes)
+from .admissao import etapa_externa
+from .schemas import ValidacaoDocumentoSchema
+from .metricas import etapa, contar_rejeicoes
+from .rapido import CaminhoRapido, get_caminho_rapido
+from .regras import COLETAR_REGRAS, CONJUNTO_DE_REGRAS, ConjuntoDeRegras, regras_vigentes, codigo_do_erro
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+from .verificadores import (
+    VERIFICADORES_CPF,
+    RegistroDeVerificadores,
+    get_registro_verificadores,
+    verificar_cnpj_concedente,  # reexportado: usado por tools/validar_arquivo.py
+)
+from typing import TYPE_CHECKING, Dict, Any, List, NamedTuple, Optional, Tuple
+
+if TYPE_CHECKING:
+    import httpx
+
+
+class ResultadoValidacao(NamedTuple):
+    doc: Optional[ValidacaoDocumentoSchema]   # None se o schema falhou
+    erros: List[Dict[str, Any]]               # prontos para serialização em JSON
+    definitivo: bool = True                   # False se dependeu de uma falha transitória da etapa externa
+
+
+def resumo_documento(doc: ValidacaoDocumentoSchema) -> Dict[str, Any]:
+    """Resposta de sucesso da validação de um documento."""
+    return {
+        "status": "sucesso",
+        "mensagem": "Documento de estágio validado com sucesso.",
+        "dados_processados": {
+            "estagiario": doc.estagiario.nome,
+            "empresa": doc.unidade_concedente.razao_social,
+            "periodo": f"{doc.dados_estagio.data_inicio} a {doc.dados_estagio.data_termino}"
         }
+    }
+
+
+async def validar_documento(
+    dados: Any,
+    client: Optional["httpx.AsyncClient"] = None,
+    todos_os_erros: bool = False,
+    regras: Optional[ConjuntoDeRegras] = None,
+    rapido: bool = True
+) -> ResultadoValidacao:
+    """
+    Valida um documento ainda não convertido (dict vindo do JSON):
+    schema + regras de negócio e, se tudo estiver certo, a etapa externa.
+    Retorna (documento, erros, definitivo); o documento é None se o schema
+    falhou e `definitivo` é False se o resultado dependeu de uma falha
+    transitória da etapa externa (e não deve ser reaproveitado).
+
+    Com `todos_os_erros`, devolve todas as violações de uma vez (erros de
+    campo e todas as regras de negócio avaliáveis), cada uma com o campo
+    "codigo" da regra. A etapa externa só roda se não houver nenhum erro local.
+
+    No modo padrão, tenta antes o caminho rápido (api/rapido.py), se
+    disponível e se `rapido`; o Pydantic só roda se ele não aprovar.
+    """
+    # O documento inteiro é validado com o mesmo conjunto de regras, mesmo
+    # que o arquivo de regras seja recarregado no meio do caminho
+    regras = regras or regras_vigentes()
+    if todos_os_erros:
+        return await _validar_documento_completo(dados, client, regras)
+
+    caminho = get_caminho_rapido() if rapido else None
+    if caminho is not None:
+        with etapa("schema") as medicao:
+            doc = caminho.converter(dados)
+            aprovado = doc is not None and caminho.aprovado(doc, regras)
+            if not aprovado:
+                # Quem mede (e gera os erros) é o Pydantic, logo abaixo
+                medicao.descartar()
+        if aprovado:
+            return await _concluir(doc, client)
+
+    with etapa("schema"):
+        try:
+            doc = ValidacaoDocumentoSchema.model_validate(
+                dados, from_attributes=True, context={CONJUNTO_DE_REGRAS: regras})
+        except ValidationError as e:
+            doc, erros = None, jsonable_encoder(e.errors(include_url=False))
+    if doc is None:
+        contar_rejeicoes(erros)
+        return ResultadoValidacao(None, erros)
+    return await _concluir(doc, client)
+
+
+async def _concluir(doc: Any, client: Optional["httpx.AsyncClient"]) -> ResultadoValidacao:
+    """Documento aprovado localmente: falta a etapa externa."""
+    erros, definitivo = await _etapa_externa(doc, client)
+    return ResultadoValidacao(doc, erros, definitivo)
+
+
+async def validar_documento_rapido(
+    doc: Any,
+    client: Optional["httpx.AsyncClient"] = None,
+    regras: Optional[ConjuntoDeRegras] = None,
+    caminho: Optional[CaminhoRapido] = None
+) -> Optional[ResultadoValidacao]:
+    """
+    Valida um documento já decodificado pelo caminho rápido (Struct do
+    msgspec): verificações da lib utils e regras de negócio e, se passarem,
+    a etapa externa. Retorna None se o documento não passou localmente:
+    quem chamou valida de novo pelo Pydantic, que gera os erros.
+    """
+    regras = regras or regras_vigentes()
+    caminho = caminho or get_caminho_rapido()
+    with etapa("schema") as medicao:
+        aprovado = caminho.aprovado(doc, regras)
+        if not aprovado:
+            medicao.descartar()
+    if not aprovado:
+        return None
+    return await _concluir(doc, client)
+
+
+async def _validar_documento_completo(dados: Any, client: Optional["httpx.AsyncClient"], regras: ConjuntoDeRegras) -> ResultadoValidacao:
+    with etapa("schema"):
+        doc, erros_de_campo = None, []
+        try:
+            doc = ValidacaoDocumentoSchema.model_validate(
+                dados, from_attributes=True, context={COLETAR_REGRAS: True})
+        except ValidationError as e:
+            erros_de_campo = [{**erro, "codigo": codigo_do_erro(erro)} for erro in e.errors(include_url=False)]
+        erros = erros_de_campo + regras.validar_todas(dados, doc, erros_de_campo)
+    if erros:
+        contar_rejeicoes(erros_de_campo)
+        return ResultadoValidacao(doc if not erros_de_campo else None, jsonable_encoder(erros))
+
+    erros, definitivo = await _etapa_externa(doc, client, com_codigo=True)
+    return ResultadoValidacao(doc, erros, definitivo)
+
+
+async def _etapa_externa(doc: Any, client: Optional["httpx.AsyncClient"], com_codigo: bool = False) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Verificadores do registro padrão (api/verificadores.py), em paralelo:
+    (erros, definitivo). Se algum deles precisa da rede, a etapa passa pelo
+    compartimento externo do controle de admissão (api/admissao.py).
+    """
+    registro = get_registro_verificadores()
+    if registro is None:
+        return [], True
+    if registro.precisa_de_rede(doc):
+        async with etapa_externa():
+            with etapa("externa"):
+                resultado = await registro.verificar(doc, client)
     else:
+        with etapa("externa"):
+            resultado = await registro.verificar(doc, client)
+    if com_codigo:
+        return [{**v.erro, "codigo": v.codigo} for v in resultado.verificacoes if v.erro is not None], resultado.definitivo
+    return resultado.erros, resultado.definitivo
+
+
+async def validate_document_service(doc: ValidacaoDocumentoSchema, client: Optional["httpx.AsyncClient"] = None) -> Dict[str, Any]:
+    """
+    Verifica os documentos (CNPJ e CPFs) de um documento já validado pelo
+    schema, com os verificadores do registro padrão e os de CPF, em
+    paralelo. Retorna um dicionário com 'validacao' (bool) e 'obs' (str).
+    """
+    padrao = get_registro_verificadores()
+    registro = RegistroDeVerificadores(
+        [*(padrao or ()), *VERIFICADORES_CPF], prazo=padrao.prazo if padrao is not None else None)
+    resultado = await registro.verificar(doc, client)
+    rotulos = {v.nome: v.rotulo for v in registro}
+    observacoes = [
+        f"{rotulos[v.nome]}: {v.erro['ctx']['error'] if v.erro else 'válido.'}"
+        for v in resultado.verificacoes
+    ]
+
+    if not resultado.erros:
         return {
-            "validacao": False,
-            "obs": "Falha nas validações de documentos: " + " | ".join(observacoes)
+            "validacao": True,
+            "obs": "Todas as validações de documentos foram bem-sucedidas. " + " | ".join(observacoes)
         }
+    return {
+        "validacao": False,
+        "obs": "Falha nas validações de documentos: " + " | ".join(observacoes)
+    }
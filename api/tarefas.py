@@ -0,0 +1,592 @@
+"""
+Validação assíncrona de lotes grandes (ex.: a turma inteira no início do
+semestre): POST /validacao/tarefas guarda os documentos em uma fila e
+responde na hora com o id da tarefa; workers em segundo plano validam os
+documentos (schema, regras de negócio e etapa externa, como no POST
+/validacao/) e GET /validacao/tarefas/{id} mostra o progresso e os
+resultados já prontos.
+
+- A fila é um arquivo SQLite local (TAREFAS_PATH): sobrevive a reinícios e
+  é compartilhada pelos workers da API. Um documento em validação fica
+  reservado por um tempo (`reserva`); se o processo morrer no meio, a
+  reserva vence e outro worker valida o documento de novo.
+- Cada processo valida no máximo TAREFAS_WORKERS documentos ao mesmo tempo.
+- Falhas transitórias da etapa externa (consulta de CNPJ fora do ar, prazo
+  esgotado) voltam para a fila, com espera crescente, até `max_tentativas`.
+- O armazenamento é limitado: uma tarefa concluída expira TAREFAS_TTL
+  segundos depois, e a fila inteira guarda no máximo TAREFAS_MAX_ITENS
+  documentos (as tarefas concluídas mais antigas saem primeiro; sem espaço,
+  a criação é recusada).
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from utils.http_client import get_async_client
+from utils.metrics import registry
+from utils.state_dir import state_path
+from .lote import RegistroInvalido
+from .services import resumo_documento, validar_documento
+
+if TYPE_CHECKING:
+    import sqlite3
+
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 24 * 3600             # resultados de uma tarefa concluída: 1 dia
+DEFAULT_MAX_ITENS = 200_000         # documentos guardados, somando todas as tarefas
+DEFAULT_MAX_DOCUMENTOS = 10_000     # documentos por tarefa
+DEFAULT_WORKERS = 4
+DEFAULT_RESERVA = 120.0             # segundos que um documento fica reservado para um worker
+DEFAULT_MAX_TENTATIVAS = 3
+DEFAULT_ESPERA = 5.0                # espera antes da 1ª retentativa (dobra a cada uma)
+
+# Situação de uma tarefa
+PENDENTE = "pendente"
+EM_ANDAMENTO = "em_andamento"
+CONCLUIDA = "concluida"
+CANCELADA = "cancelada"
+
+# Situação de um documento da fila
+_AGUARDANDO = "pendente"
+_CONCLUIDO = "concluido"
+
+
+class FilaCheia(Exception):
+    """Não há espaço na fila para os documentos da nova tarefa."""
+
+
+class FilaIndisponivel(Exception):
+    """O arquivo da fila não respondeu (travado por outro processo, erro de disco): vira 503."""
+
+
+class ItemDaFila(NamedTuple):
+    tarefa: str
+    indice: int
+    documento: Any
+    tentativas: int             # incluindo a atual
+    todos_os_erros: bool
+
+
+def _horario(instante: Optional[float]) -> Optional[str]:
+    if instante is None:
+        return None
+    return datetime.fromtimestamp(instante, timezone.utc).isoformat(timespec="seconds")
+
+
+def _resultado_de_registro_invalido(registro: RegistroInvalido) -> Dict[str, Any]:
+    return {"status": "erro", "erros": [{"type": "json_invalid", "loc": [], "msg": registro.mensagem}]}
+
+
+class FilaDeTarefas:
+    """
+    Fila persistente (SQLite) das tarefas de validação e dos seus documentos.
+
+    As operações que mudam a fila são transações curtas com trava de escrita
+    (BEGIN IMMEDIATE), seguras com vários processos no mesmo arquivo.
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        ttl: float = DEFAULT_TTL,
+        max_itens: int = DEFAULT_MAX_ITENS,
+        max_documentos: int = DEFAULT_MAX_DOCUMENTOS,
+        reserva: float = DEFAULT_RESERVA,
+        max_tentativas: int = DEFAULT_MAX_TENTATIVAS,
+        espera: float = DEFAULT_ESPERA,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self.max_documentos = max_documentos
+        self.reserva = reserva
+        self.max_tentativas = max_tentativas
+        self.espera = espera
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._db = self._open_db(path)
+        self._stats = {"criadas": 0, "despejadas": 0, "expiradas": 0, "canceladas": 0}
+
+    @staticmethod
+    def _open_db(path: str) -> "sqlite3.Connection":
+        import sqlite3  # só quem usa as tarefas precisa dele
+
+        db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS tarefas ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " todos_os_erros INTEGER NOT NULL,"
+            " total INTEGER NOT NULL,"
+            " concluidos INTEGER NOT NULL,"
+            " recusados INTEGER NOT NULL,"
+            " criada_em REAL NOT NULL,"
+            " concluida_em REAL,"
+            " expira_em REAL)"
+        )
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS itens ("
+            " tarefa TEXT NOT NULL,"
+            " indice INTEGER NOT NULL,"
+            " status TEXT NOT NULL,"
+            " documento TEXT,"
+            " resultado TEXT,"
+            " tentativas INTEGER NOT NULL DEFAULT 0,"
+            " disponivel_em REAL NOT NULL,"
+            " PRIMARY KEY (tarefa, indice)) WITHOUT ROWID"
+        )
+        # Próximo documento a validar: o que está disponível há mais tempo
+        db.execute(f"CREATE INDEX IF NOT EXISTS itens_fila ON itens (disponivel_em) WHERE status = '{_AGUARDANDO}'")
+        db.execute("CREATE INDEX IF NOT EXISTS tarefas_expiracao ON tarefas (expira_em) WHERE expira_em IS NOT NULL")
+        return db
+
+    @contextmanager
+    def _transacao(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    # --- Criação e consulta ---
+
+    def criar(self, documentos: Sequence[Any], todos_os_erros: bool = False) -> str:
+        """
+        Enfileira os documentos (dicts vindos do JSON; RegistroInvalido já
+        entra concluído, com o erro) e retorna o id da tarefa.
+        Levanta FilaCheia se não couberem na fila.
+        """
+        if len(documentos) > self.max_documentos:
+            raise ValueError(f"Uma tarefa aceita no máximo {self.max_documentos} documentos.")
+        agora = self._clock()
+        tarefa = uuid.uuid4().hex
+        itens, invalidos = [], 0
+        for indice, dados in enumerate(documentos):
+            if isinstance(dados, RegistroInvalido):
+                invalidos += 1
+                resultado = json.dumps(_resultado_de_registro_invalido(dados), ensure_ascii=False)
+                itens.append((tarefa, indice, _CONCLUIDO, None, resultado, agora))
+            else:
+                itens.append((tarefa, indice, _AGUARDANDO, json.dumps(dados, ensure_ascii=False), None, agora))
+        concluida = invalidos == len(itens)
+
+        with self._transacao() as db:
+            self._abrir_espaco(db, len(itens), agora)
+            db.execute(
+                "INSERT INTO tarefas (id, status, todos_os_erros, total, concluidos, recusados,"
+                " criada_em, concluida_em, expira_em) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (tarefa, CONCLUIDA if concluida else PENDENTE, int(todos_os_erros), len(itens), invalidos,
+                 invalidos, agora, agora if concluida else None, agora + self.ttl if concluida else None),
+            )
+            db.executemany(
+                "INSERT INTO itens (tarefa, indice, status, documento, resultado, disponivel_em)"
+                " VALUES (?, ?, ?, ?, ?, ?)", itens)
+            self._stats["criadas"] += 1
+        return tarefa
+
+    def _abrir_espaco(self, db: "sqlite3.Connection", necessario: int, agora: float):
+        """Apaga as tarefas vencidas e, se preciso, as concluídas mais antigas."""
+        self._stats["expiradas"] += self._apagar(db, "expira_em <= ?", (agora,))
+        (guardados,) = db.execute("SELECT COUNT(*) FROM itens").fetchone()
+        excesso = guardados + necessario - self.max_itens
+        if excesso <= 0:
+            return
+        despejadas = []
+        for tarefa, total in db.execute(
+                f"SELECT id, total FROM tarefas WHERE status IN ('{CONCLUIDA}', '{CANCELADA}') ORDER BY concluida_em"):
+            if excesso <= 0:
+                break
+            despejadas.append(tarefa)
+            excesso -= total
+        if excesso > 0:
+            raise FilaCheia(f"Fila de tarefas cheia: não há espaço para mais {necessario} documentos. "
+                            "Tente novamente depois que as tarefas em andamento terminarem.")
+        for tarefa in despejadas:
+            self._apagar(db, "id = ?", (tarefa,))
+        self._stats["despejadas"] += len(despejadas)
+
+    @staticmethod
+    def _apagar(db: "sqlite3.Connection", condicao: str, parametros: tuple) -> int:
+        ids = [linha[0] for linha in db.execute(f"SELECT id FROM tarefas WHERE {condicao}", parametros)]
+        for tarefa in ids:
+            db.execute("DELETE FROM itens WHERE tarefa = ?", (tarefa,))
+            db.execute("DELETE FROM tarefas WHERE id = ?", (tarefa,))
+        return len(ids)
+
+    def situacao(self, tarefa: str, desde: int = 0, limite: int = 100) -> Optional[Dict[str, Any]]:
+        """
+        Progresso da tarefa e até `limite` resultados já prontos, em ordem de
+        índice, a partir do índice `desde`. None se a tarefa não existe (ou expirou).
+        """
+        agora = self._clock()
+        with self._lock:
+            linha = self._db.execute(
+                "SELECT status, todos_os_erros, total, concluidos, recusados, criada_em, concluida_em, expira_em"
+                " FROM tarefas WHERE id = ?", (tarefa,)).fetchone()
+            if linha is None or (linha[7] is not None and linha[7] <= agora):
+                return None
+            resultados = self._db.execute(
+                f"SELECT indice, resultado FROM itens WHERE tarefa = ? AND status = '{_CONCLUIDO}' AND indice >= ?"
+                " ORDER BY indice LIMIT ?", (tarefa, desde, limite)).fetchall()
+        status, todos_os_erros, total, concluidos, recusados, criada_em, concluida_em, expira_em = linha
+        return {
+            "id": tarefa,
+            "status": status,
+            "todos_os_erros": bool(todos_os_erros),
+            "total": total,
+            "concluidos": concluidos,
+            "aprovados": concluidos - recusados,
+            "recusados": recusados,
+            "progresso": round(concluidos / total, 4) if total else 1.0,
+            "criada_em": _horario(criada_em),
+            "concluida_em": _horario(concluida_em),
+            "expira_em": _horario(expira_em),
+            "resultados": [{"indice": indice, **json.loads(resultado)} for indice, resultado in resultados],
+            # Próxima página (None se esta não veio cheia)
+            "desde": resultados[-1][0] + 1 if resultados and len(resultados) == limite else None,
+        }
+
+    def cancelar(self, tarefa: str) -> bool:
+        """Tira da fila os documentos ainda não validados. False se a tarefa não existe ou já terminou."""
+        agora = self._clock()
+        with self._transacao() as db:
+            cursor = db.execute(
+                f"UPDATE tarefas SET status = '{CANCELADA}', concluida_em = ?, expira_em = ?"
+                f" WHERE id = ? AND status IN ('{PENDENTE}', '{EM_ANDAMENTO}')", (agora, agora + self.ttl, tarefa))
+            if cursor.rowcount == 0:
+                return False
+            db.execute(f"DELETE FROM itens WHERE tarefa = ? AND status = '{_AGUARDANDO}'", (tarefa,))
+            self._stats["canceladas"] += 1
+        return True
+
+    # --- Workers ---
+
+    def reservar(self) -> Optional[ItemDaFila]:
+        """Próximo documento disponível, reservado por `reserva` segundos; None se a fila está vazia."""
+        agora = self._clock()
+        with self._transacao() as db:
+            linha = db.execute(
+                "SELECT i.tarefa, i.indice, i.documento, i.tentativas, t.todos_os_erros"
+                " FROM itens i JOIN tarefas t ON t.id = i.tarefa"
+                f" WHERE i.status = '{_AGUARDANDO}' AND i.disponivel_em <= ?"
+                " ORDER BY i.disponivel_em LIMIT 1", (agora,)).fetchone()
+            if linha is None:
+                return None
+            tarefa, indice, documento, tentativas, todos_os_erros = linha
+            db.execute("UPDATE itens SET disponivel_em = ?, tentativas = tentativas + 1 WHERE tarefa = ? AND indice = ?",
+                       (agora + self.reserva, tarefa, indice))
+            db.execute(f"UPDATE tarefas SET status = '{EM_ANDAMENTO}' WHERE id = ? AND status = '{PENDENTE}'", (tarefa,))
+        return ItemDaFila(tarefa, indice, json.loads(documento), tentativas + 1, bool(todos_os_erros))
+
+    def concluir(self, item: ItemDaFila, resultado: Dict[str, Any]) -> bool:
+        """
+        Guarda o resultado do documento. False se ele já tinha sido concluído
+        (por outro worker, depois de vencida a reserva) ou a tarefa foi cancelada.
+        """
+        agora = self._clock()
+        recusado = int(resultado["status"] != "sucesso")
+        with self._transacao() as db:
+            cursor = db.execute(
+                f"UPDATE itens SET status = '{_CONCLUIDO}', resultado = ?, documento = NULL"
+                f" WHERE tarefa = ? AND indice = ? AND status = '{_AGUARDANDO}'",
+                (json.dumps(resultado, ensure_ascii=False), item.tarefa, item.indice))
+            if cursor.rowcount == 0:
+                return False
+            # Os lados direitos do SET veem os valores antigos da linha
+            db.execute(
+                "UPDATE tarefas SET concluidos = concluidos + 1, recusados = recusados + ?,"
+                f" status = CASE WHEN concluidos + 1 >= total THEN '{CONCLUIDA}' ELSE status END,"
+                " concluida_em = CASE WHEN concluidos + 1 >= total THEN ? ELSE concluida_em END,"
+                " expira_em = CASE WHEN concluidos + 1 >= total THEN ? ELSE expira_em END"
+                " WHERE id = ?", (recusado, agora, agora + self.ttl, item.tarefa))
+        return True
+
+    def devolver(self, item: ItemDaFila, espera: Optional[float] = None, contar_tentativa: bool = True):
+        """
+        Devolve o documento à fila. Por padrão, como uma tentativa que falhou:
+        volta depois de `espera` (que dobra a cada tentativa). Com
+        `contar_tentativa=False` (worker encerrado no meio), volta na hora.
+        """
+        if espera is None:
+            espera = self.espera * 2 ** (item.tentativas - 1) if contar_tentativa else 0.0
+        with self._transacao() as db:
+            db.execute(
+                "UPDATE itens SET disponivel_em = ?, tentativas = tentativas - ?"
+                f" WHERE tarefa = ? AND indice = ? AND status = '{_AGUARDANDO}'",
+                (self._clock() + espera, 0 if contar_tentativa else 1, item.tarefa, item.indice))
+
+    def purgar_expiradas(self) -> int:
+        """Apaga as tarefas vencidas. Retorna quantas foram removidas."""
+        with self._transacao() as db:
+            removidas = self._apagar(db, "expira_em <= ?", (self._clock(),))
+            self._stats["expiradas"] += removidas
+        return removidas
+
+    def stats(self) -> Dict[str, Any]:
+        agora = self._clock()
+        with self._lock:
+            tarefas = dict(self._db.execute("SELECT status, COUNT(*) FROM tarefas GROUP BY status").fetchall())
+            aguardando, reservados = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(disponivel_em > ?), 0) FROM itens"
+                f" WHERE status = '{_AGUARDANDO}'", (agora,)).fetchone()
+            (guardados,) = self._db.execute("SELECT COUNT(*) FROM itens").fetchone()
+            stats = dict(self._stats)
+        return {
+            **stats,
+            "tarefas": {status: tarefas.get(status, 0) for status in (PENDENTE, EM_ANDAMENTO, CONCLUIDA, CANCELADA)},
+            "documentos_na_fila": aguardando,
+            "documentos_em_validacao": reservados,
+            "documentos_guardados": guardados,
+            "max_itens": self.max_itens,
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+async def na_fila(operacao: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Executa uma operação da fila fora do event loop: as transações esperam o
+    arquivo (outros processos, workers) por até 10 s. Erros do sqlite3
+    ("database is locked"...) viram FilaIndisponivel.
+    """
+    import sqlite3
+
+    try:
+        return await asyncio.to_thread(operacao, *args, **kwargs)
+    except sqlite3.OperationalError as e:
+        raise FilaIndisponivel(f"Fila de tarefas indisponível no momento ({e}). Tente novamente em instantes.") from e
+
+
+class ProcessadorDeTarefas:
+    """
+    Workers (tarefas asyncio do event loop da API) que esvaziam a fila: cada
+    um reserva um documento, valida e guarda o resultado. Quando a fila fica
+    vazia, esperam um aviso (`avisar`, chamado ao criar uma tarefa) ou
+    `intervalo` segundos (tarefas criadas por outro processo).
+    """
+
+    def __init__(
+        self,
+        fila: FilaDeTarefas,
+        workers: int = DEFAULT_WORKERS,
+        cliente: Callable[[], Optional["httpx.AsyncClient"]] = get_async_client,
+        intervalo: float = 1.0,
+        intervalo_purga: float = 60.0,
+    ):
+        self.fila = fila
+        self.workers = workers
+        self.cliente = cliente
+        self.intervalo = intervalo
+        self.intervalo_purga = intervalo_purga
+        self._tarefas: List[asyncio.Task] = []
+        self._aviso: Optional[asyncio.Event] = None
+        self._ultima_purga = 0.0
+        self._stats = {"aprovados": 0, "recusados": 0, "retentativas": 0, "falhas": 0, "erros_fila": 0}
+
+    @property
+    def ativo(self) -> bool:
+        return bool(self._tarefas)
+
+    def iniciar(self):
+        """Inicia os workers no event loop atual (se já não estiverem rodando) e os acorda."""
+        if not self._tarefas:
+            self._aviso = asyncio.Event()
+            self._tarefas = [asyncio.ensure_future(self._trabalhar()) for _ in range(self.workers)]
+        self.avisar()
+
+    def avisar(self):
+        if self._aviso is not None:
+            self._aviso.set()
+
+    async def parar(self):
+        """Cancela os workers; os documentos em validação voltam para a fila."""
+        tarefas, self._tarefas = self._tarefas, []
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+
+    async def _trabalhar(self):
+        # As operações da fila são transações sqlite3 que podem esperar o
+        # arquivo (outros processos): rodam fora do event loop. Um erro do
+        # armazenamento ("database is locked"...) não derruba o worker.
+        while True:
+            self._aviso.clear()
+            try:
+                item = await self._reservar()
+                if item is not None:
+                    await self._processar(item)
+                    continue
+                await asyncio.to_thread(self._purgar)
+            except Exception:
+                self._stats["erros_fila"] += 1
+                logger.exception("Erro na fila de tarefas; o worker tenta de novo")
+            try:
+                await asyncio.wait_for(self._aviso.wait(), self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _reservar(self) -> Optional[ItemDaFila]:
+        # Cancelado (parar()) com a reserva já feita na thread: o documento volta na hora
+        reserva = asyncio.ensure_future(asyncio.to_thread(self.fila.reservar))
+        try:
+            return await asyncio.shield(reserva)
+        except asyncio.CancelledError:
+            item = await reserva
+            if item is not None:
+                await asyncio.to_thread(self.fila.devolver, item, contar_tentativa=False)
+            raise
+
+    async def _processar(self, item: ItemDaFila):
+        try:
+            doc, erros, definitivo = await validar_documento(item.documento, self.cliente(), item.todos_os_erros)
+            resultado = {"status": "erro", "erros": erros} if erros else resumo_documento(doc)
+        except asyncio.CancelledError:
+            await asyncio.to_thread(self.fila.devolver, item, contar_tentativa=False)
+            raise
+        except Exception as e:
+            self._stats["falhas"] += 1
+            resultado = {"status": "erro", "erros": [{"type": "erro_interno", "loc": [], "msg": str(e)}]}
+            definitivo = False
+        if not definitivo and item.tentativas < self.fila.max_tentativas:
+            self._stats["retentativas"] += 1
+            await asyncio.to_thread(self.fila.devolver, item)
+            return
+        if await asyncio.to_thread(self.fila.concluir, item, resultado):
+            self._stats["recusados" if resultado["status"] != "sucesso" else "aprovados"] += 1
+
+    def _purgar(self):
+        agora = time.monotonic()
+        if agora - self._ultima_purga >= self.intervalo_purga:
+            self._ultima_purga = agora
+            self.fila.purgar_expiradas()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": len(self._tarefas), **self._stats}
+
+
+_UNSET = object()
+_fila_padrao = _UNSET
+_processador_padrao = _UNSET
+
+
+def _caminho_da_fila() -> Optional[str]:
+    """
+    Arquivo da fila (TAREFAS_PATH; padrão: no diretório privado de
+    utils.state_dir, pois guarda os documentos enviados; vazio = somente
+    memória) ou None se TAREFAS_ENABLED=0.
+    """
+    if os.environ.get("TAREFAS_ENABLED", "1") == "0":
+        return None
+    caminho = os.environ.get("TAREFAS_PATH")
+    return state_path("validacao_tarefas.sqlite3") if caminho is None else caminho
+
+
+def get_fila_tarefas() -> Optional[FilaDeTarefas]:
+    """
+    Fila padrão, criada na primeira chamada. Configuração por variáveis de
+    ambiente: TAREFAS_ENABLED=0 desliga; TAREFAS_PATH, TAREFAS_TTL (s),
+    TAREFAS_MAX_ITENS, TAREFAS_MAX_DOCUMENTOS.
+    """
+    global _fila_padrao
+    if _fila_padrao is _UNSET:
+        caminho = _caminho_da_fila()
+        _fila_padrao = None if caminho is None else FilaDeTarefas(
+            caminho or ":memory:",
+            ttl=float(os.environ.get("TAREFAS_TTL", DEFAULT_TTL)),
+            max_itens=int(os.environ.get("TAREFAS_MAX_ITENS", DEFAULT_MAX_ITENS)),
+            max_documentos=int(os.environ.get("TAREFAS_MAX_DOCUMENTOS", DEFAULT_MAX_DOCUMENTOS)),
+        )
+    return _fila_padrao
+
+
+def set_fila_tarefas(fila: Optional[FilaDeTarefas]):
+    """Substitui a fila padrão (None desliga as tarefas; ex.: nos testes)."""
+    global _fila_padrao
+    _fila_padrao = fila
+
+
+def get_processador_tarefas() -> Optional[ProcessadorDeTarefas]:
+    """Processador da fila padrão, com TAREFAS_WORKERS workers (padrão 4). None se a fila está desligada."""
+    global _processador_padrao
+    if _processador_padrao is _UNSET:
+        fila = get_fila_tarefas()
+        _processador_padrao = None if fila is None else ProcessadorDeTarefas(
+            fila, workers=int(os.environ.get("TAREFAS_WORKERS", DEFAULT_WORKERS)))
+    return _processador_padrao
+
+
+def set_processador_tarefas(processador: Optional[ProcessadorDeTarefas]):
+    """Substitui o processador padrão (ex.: nos testes, com outro cliente HTTP)."""
+    global _processador_padrao
+    _processador_padrao = processador
+
+
+def retomar_tarefas():
+    """
+    Na subida da API: se já existe uma fila (o arquivo de uma execução
+    anterior), volta a processá-la. Senão, a fila (e o sqlite3) só é aberta
+    na primeira tarefa criada.
+    """
+    if _fila_padrao is _UNSET:
+        caminho = _caminho_da_fila()
+        if not caminho or not os.path.exists(caminho):
+            return
+    processador = get_processador_tarefas()
+    if processador is not None:
+        processador.iniciar()
+
+
+async def parar_tarefas():
+    """No desligamento: para os workers, se estiverem rodando."""
+    if isinstance(_processador_padrao, ProcessadorDeTarefas):
+        await _processador_padrao.parar()
+
+
+def _coletar_tarefas() -> List[tuple]:
+    # Só a fila já aberta: a coleta não abre o arquivo
+    if not isinstance(_fila_padrao, FilaDeTarefas):
+        return []
+    s = _fila_padrao.stats()
+    familias = [
+        ("validation_jobs", "gauge", "Tarefas de validação guardadas, por situação",
+         [({"status": status}, n) for status, n in s["tarefas"].items()]),
+        ("validation_job_documents", "gauge", "Documentos das tarefas de validação, por situação", [
+            ({"state": "queued"}, s["documentos_na_fila"] - s["documentos_em_validacao"]),
+            ({"state": "in_progress"}, s["documentos_em_validacao"]),
+            ({"state": "stored"}, s["documentos_guardados"]),
+        ]),
+        ("validation_jobs_evicted_total", "counter", "Tarefas concluídas removidas antes de expirar, por falta de espaço",
+         [({}, s["despejadas"])]),
+    ]
+    if isinstance(_processador_padrao, ProcessadorDeTarefas):
+        p = _processador_padrao.stats()
+        familias.append(
+            ("validation_job_documents_processed_total", "counter", "Documentos validados pelos workers das tarefas",
+             [({"outcome": rotulo}, p[chave]) for chave, rotulo in (
+                 ("aprovados", "approved"), ("recusados", "rejected"), ("retentativas", "retried"), ("falhas", "failed"))]))
+        familias.append(
+            ("validation_job_queue_errors_total", "counter", "Erros do armazenamento da fila nos workers das tarefas",
+             [({}, p["erros_fila"])]))
+    return familias
+
+
+registry.add_collector(_coletar_tarefas)
@@ -0,0 +1,265 @@
+"""
+Verificações de um documento já aprovado pelo schema que dependem de algo
+além dele (hoje, a existência do CNPJ da Unidade Concedente na Receita
+Federal), registradas em um RegistroDeVerificadores.
+
+Os verificadores aplicáveis ao documento (campo preenchido) rodam em
+paralelo, sob um prazo único por requisição (VERIFICACAO_PRAZO, em
+segundos; 0 desliga): a resposta leva o tempo do verificador mais lento, e
+não a soma deles. Cada verificador pode ficar com só uma fração do prazo.
+O que não termina a tempo é cancelado e vira um erro transitório (a
+resposta não é guardada no cache). A duração de cada um vai para a métrica
+document_verifier_duration_seconds.
+"""
+import asyncio
+import os
+from operator import attrgetter
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from utils import check_cpf, cpf_error_message, format_cnpj
+from utils.document_validator import (
+    cnpj_needs_lookup,
+    lookup_cnpj,
+    CNPJ_FOUND,
+    CNPJ_NOT_FOUND,
+    CNPJ_SERVICE_ERROR,
+    CNPJ_BAD_REQUEST,
+    CNPJ_CONNECTION_ERROR,
+    CNPJ_UNAVAILABLE,
+    CNPJ_RATE_LIMITED,
+    CNPJ_INACTIVE,
+)
+from utils.tracing import span
+from .metricas import DURACAO_VERIFICADOR, SONDA_VERIFICADORES, rejeitar
+from .regras import erro_pydantic
+
+if TYPE_CHECKING:
+    import httpx
+
+DEFAULT_PRAZO = 10.0
+
+OK = "ok"
+RECUSADO = "recusado"
+TEMPO_ESGOTADO = "tempo_esgotado"
+
+# Resultados da consulta de CNPJ que uma nova tentativa não mudaria; os demais
+# (conexão, indisponibilidade, 5xx) são transitórios
+_CONSULTAS_DEFINITIVAS = {CNPJ_FOUND, CNPJ_NOT_FOUND, CNPJ_SERVICE_ERROR, CNPJ_BAD_REQUEST, CNPJ_INACTIVE}
+
+# verificar(valor do campo, cliente HTTP) -> (mensagem de erro ou None, definitivo)
+FuncaoDeVerificacao = Callable[[Any, Optional["httpx.AsyncClient"]], Awaitable[Tuple[Optional[str], bool]]]
+
+
+class Verificador(NamedTuple):
+    nome: str
+    rotulo: str                 # para mensagens ("CNPJ Unidade Concedente")
+    campo: Tuple[str, ...]      # campo verificado (e loc dos erros)
+    verificar: FuncaoDeVerificacao
+    codigo: str                 # código da recusa no modo todos_os_erros
+    fracao: float = 1.0         # fração do prazo da requisição
+    # precisa_rede(valor do campo): False se a verificação não consultaria
+    # nada fora do processo (ver api/admissao.py); None: sempre consulta
+    precisa_rede: Optional[Callable[[Any], bool]] = None
+
+
+class Verificacao(NamedTuple):
+    nome: str
+    resultado: str              # OK, RECUSADO ou TEMPO_ESGOTADO
+    duracao: float              # segundos
+    erro: Optional[Dict[str, Any]] = None   # no formato dos erros do Pydantic
+    codigo: Optional[str] = None
+    definitivo: bool = True
+
+
+class ResultadoVerificacoes(NamedTuple):
+    verificacoes: List[Verificacao]
+
+    @property
+    def erros(self) -> List[Dict[str, Any]]:
+        return [v.erro for v in self.verificacoes if v.erro is not None]
+
+    @property
+    def definitivo(self) -> bool:
+        return all(v.definitivo for v in self.verificacoes)
+
+
+class RegistroDeVerificadores:
+    """
+    Verificadores de documento, executados em paralelo e sob um prazo único.
+
+    Um verificador roda se o campo dele estiver preenchido no documento
+    (modelo do Pydantic ou Struct do caminho rápido).
+    """
+
+    def __init__(self, verificadores: Iterable[Verificador] = (), prazo: Optional[float] = DEFAULT_PRAZO):
+        self.prazo = prazo
+        self._verificadores: Dict[str, Tuple[Verificador, Callable[[Any], Any]]] = {}
+        for verificador in verificadores:
+            self.registrar(verificador)
+
+    def registrar(self, verificador: Verificador):
+        """Adiciona (ou substitui, pelo nome) um verificador."""
+        self._verificadores[verificador.nome] = (verificador, attrgetter(".".join(verificador.campo)))
+
+    def remover(self, nome: str):
+        self._verificadores.pop(nome, None)
+
+    def __iter__(self):
+        return (verificador for verificador, _ in self._verificadores.values())
+
+    def __len__(self):
+        return len(self._verificadores)
+
+    def precisa_de_rede(self, doc: Any) -> bool:
+        """True se algum verificador aplicável a `doc` consultaria a rede."""
+        for verificador, ler in self._verificadores.values():
+            valor = ler(doc)
+            if valor and (verificador.precisa_rede is None or verificador.precisa_rede(valor)):
+                return True
+        return False
+
+    async def verificar(self, doc: Any, client: Optional["httpx.AsyncClient"] = None) -> ResultadoVerificacoes:
+        """Executa os verificadores aplicáveis a `doc`, na ordem de registro dos resultados."""
+        pendentes = []
+        for verificador, ler in self._verificadores.values():
+            valor = ler(doc)
+            if valor:
+                pendentes.append(self._executar(verificador, valor, client))
+        if not pendentes:
+            return ResultadoVerificacoes([])
+        if len(pendentes) == 1:
+            return ResultadoVerificacoes([await pendentes[0]])
+
+        tarefas = [asyncio.ensure_future(p) for p in pendentes]
+        try:
+            return ResultadoVerificacoes(list(await asyncio.gather(*tarefas)))
+        except BaseException:
+            # Um verificador falhou (ou a requisição foi cancelada): os outros
+            # não têm mais para quem responder
+            for tarefa in tarefas:
+                tarefa.cancel()
+            raise
+
+    async def verificar_valor(self, nome: str, valor: Any, client: Optional["httpx.AsyncClient"] = None) -> Verificacao:
+        """Executa só o verificador `nome` sobre o valor do campo dele (ex.: validação ao vivo)."""
+        verificador, _ = self._verificadores[nome]
+        return await self._executar(verificador, valor, client)
+
+    async def _executar(self, verificador: Verificador, valor: Any, client) -> Verificacao:
+        limite = self.prazo * verificador.fracao if self.prazo else None
+        inicio = perf_counter()
+        with span(f"verificador.{verificador.nome}") as trecho:
+            try:
+                mensagem, definitivo = await asyncio.wait_for(verificador.verificar(valor, client), limite)
+                resultado = RECUSADO if mensagem else OK
+            except asyncio.TimeoutError:
+                rejeitar(f"{verificador.nome}.{TEMPO_ESGOTADO}")
+                mensagem = (f"{verificador.rotulo}: verificação não concluída em {limite:g}s. "
+                            "Tente novamente em instantes.")
+                definitivo, resultado = False, TEMPO_ESGOTADO
+            if trecho is not None:
+                trecho.set_attribute("resultado", resultado)
+        duracao = perf_counter() - inicio
+        if SONDA_VERIFICADORES.enabled:
+            DURACAO_VERIFICADOR.labels(verificador.nome, resultado).observe(duracao)
+        if not mensagem:
+            return Verificacao(verificador.nome, resultado, duracao)
+        erro = jsonable_encoder(erro_pydantic(verificador.campo, mensagem, valor))
+        return Verificacao(verificador.nome, resultado, duracao, erro, verificador.codigo, definitivo)
+
+
+# --- Verificadores ---
+
+async def verificar_cnpj_concedente(cnpj: Optional[str], client: Optional["httpx.AsyncClient"] = None) -> Optional[str]:
+    """
+    Confere a existência do CNPJ da Unidade Concedente na Receita Federal
+    (índice local, se configurado, ou BrasilAPI).
+    Retorna a mensagem de erro, ou None se o CNPJ foi aceito (ou não informado).
+    """
+    mensagem, _ = await consultar_cnpj_concedente(cnpj, client)
+    return mensagem
+
+
+async def consultar_cnpj_concedente(cnpj: Optional[str], client: Optional["httpx.AsyncClient"]) -> Tuple[Optional[str], bool]:
+    """(mensagem de erro ou None, True se o resultado é definitivo)."""
+    if not cnpj:
+        return None, True
+
+    resultado = await lookup_cnpj(format_cnpj(cnpj), client)
+    return _mensagem_cnpj(cnpj, resultado), resultado.status in _CONSULTAS_DEFINITIVAS
+
+
+def cnpj_precisa_rede(cnpj: str) -> bool:
+    """False se o CNPJ é respondido pelo índice local ou pelo cache em memória."""
+    return cnpj_needs_lookup(format_cnpj(cnpj))
+
+
+def _mensagem_cnpj(cnpj: str, resultado) -> Optional[str]:
+    if resultado.status == CNPJ_FOUND:
+        return None
+    rejeitar(f"cnpj_receita.{resultado.status}")
+    if resultado.status == CNPJ_INACTIVE:
+        return f"CNPJ com situação cadastral {resultado.situacao} na Receita Federal: {cnpj}"
+    if resultado.status == CNPJ_SERVICE_ERROR:
+        return f"CNPJ não encontrado na base da Receita Federal: {cnpj}"
+    if resultado.status == CNPJ_NOT_FOUND:
+        return f"CNPJ não existe na Receita Federal: {cnpj}"
+    if resultado.status == CNPJ_BAD_REQUEST:
+        return "CNPJ inválido ou mal formatado na consulta externa."
+    if resultado.status == CNPJ_CONNECTION_ERROR:
+        return "Erro de conexão: Não foi possível validar o CNPJ na Receita Federal."
+    if resultado.status == CNPJ_UNAVAILABLE:
+        return "Consulta de CNPJ temporariamente indisponível (falhas recentes na BrasilAPI). Tente novamente em instantes."
+    if resultado.status == CNPJ_RATE_LIMITED:
+        return "Consulta de CNPJ temporariamente indisponível (limite de consultas à BrasilAPI atingido). Tente novamente em instantes."
+    # Em caso de erro 500 da API externa, barramos por segurança
+    return f"Erro ao consultar BrasilAPI (Status {resultado.status_code}). Tente novamente."
+
+
+async def verificar_cpf(cpf: str, client: Optional["httpx.AsyncClient"] = None) -> Tuple[Optional[str], bool]:
+    """Dígitos verificadores do CPF (lib utils); sem consulta externa."""
+    valido, codigo = check_cpf(cpf)
+    return (None if valido else cpf_error_message(cpf, codigo)), True
+
+
+def _sem_rede(valor: Any) -> bool:
+    return False
+
+
+VERIFICADOR_CNPJ_CONCEDENTE = Verificador(
+    "cnpj_concedente", "CNPJ Unidade Concedente", ("unidade_concedente", "cnpj"),
+    consultar_cnpj_concedente, "cnpj.receita_federal", precisa_rede=cnpj_precisa_rede)
+
+# Os CPFs já são conferidos pelo schema: estes servem a quem verifica um
+# documento fora do POST /validacao/ (validate_document_service)
+VERIFICADORES_CPF = (
+    Verificador("cpf_supervisor", "CPF Supervisor", ("supervisor", "cpf"), verificar_cpf, "cpf.invalid",
+                precisa_rede=_sem_rede),
+    Verificador("cpf_estagiario", "CPF Estagiário", ("estagiario", "cpf"), verificar_cpf, "cpf.invalid",
+                precisa_rede=_sem_rede),
+)
+
+
+_UNSET = object()
+_registro_padrao = _UNSET
+
+
+def get_registro_verificadores() -> Optional[RegistroDeVerificadores]:
+    """
+    Registro usado pela validação de documentos, criado na primeira chamada:
+    o verificador de CNPJ, com o prazo de VERIFICACAO_PRAZO (segundos).
+    """
+    global _registro_padrao
+    if _registro_padrao is _UNSET:
+        prazo = float(os.environ.get("VERIFICACAO_PRAZO", DEFAULT_PRAZO))
+        _registro_padrao = RegistroDeVerificadores([VERIFICADOR_CNPJ_CONCEDENTE], prazo=prazo or None)
+    return _registro_padrao
+
+
+def set_registro_verificadores(registro: Optional[RegistroDeVerificadores]):
+    """Substitui o registro padrão (None desliga as verificações; ex.: nos testes)."""
+    global _registro_padrao
+    _registro_padrao = registro
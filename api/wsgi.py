@@ -0,0 +1,78 @@
+"""
+A API como aplicação WSGI, para servidores que só falam WSGI (Phusion
+Passenger, na hospedagem compartilhada: ver passenger_wsgi.py).
+
+O a2wsgi converte as chamadas WSGI em ASGI. Aqui ele ganha o que falta a ele
+para servir a API de verdade:
+- um event loop só, em uma thread própria, que vive enquanto o processo
+  viver: o cliente HTTP compartilhado (utils.http_client), com o pool de
+  conexões, e os agrupamentos de consultas são reaproveitados de uma
+  requisição para a outra;
+- o lifespan da aplicação (compilação das regras na subida, fechamento do
+  cliente HTTP na saída), que o a2wsgi não executa;
+- o tamanho do pool de threads das rotas e dependências síncronas
+  (WSGI_THREADS; padrão do anyio, 40).
+
+As threads do servidor WSGI (PassengerThreadCount) só esperam a resposta;
+o trabalho todo acontece no event loop.
+"""
+import asyncio
+import atexit
+import os
+import threading
+from typing import Optional
+
+from a2wsgi import ASGIMiddleware
+
+# Tempo máximo para a subida (lifespan) e para o encerramento
+TEMPO_LIMITE = 30.0
+
+
+class PonteWSGI:
+    """Aplicação WSGI que repassa as requisições a uma aplicação ASGI (FastAPI)."""
+
+    def __init__(self, app, threads: Optional[int] = None, wait_time: Optional[float] = None):
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="api-event-loop", daemon=True)
+        self._thread.start()
+        self._fechada = False
+        self._lifespan = app.router.lifespan_context(app)
+        self._executar(self._subir(threads))
+        self._wsgi = ASGIMiddleware(app, wait_time=wait_time, loop=self.loop)
+        atexit.register(self.fechar)
+
+    def __call__(self, environ, start_response):
+        return self._wsgi(environ, start_response)
+
+    def _executar(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(TEMPO_LIMITE)
+
+    async def _subir(self, threads: Optional[int]):
+        if threads:
+            # O limitador do anyio é do event loop: precisa ser ajustado nele
+            from anyio import to_thread
+            to_thread.current_default_thread_limiter().total_tokens = threads
+        await self._lifespan.__aenter__()
+
+    def fechar(self):
+        """Encerra o lifespan e o event loop (chamado também na saída do processo)."""
+        if self._fechada:
+            return
+        self._fechada = True
+        try:
+            self._executar(self._lifespan.__aexit__(None, None, None))
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(TEMPO_LIMITE)
+            self.loop.close()
+            atexit.unregister(self.fechar)
+
+
+def criar_aplicacao_wsgi(app=None, threads: Optional[int] = None) -> PonteWSGI:
+    """A API (api.main:app, por padrão) como aplicação WSGI; `threads` vem de WSGI_THREADS se omitido."""
+    if app is None:
+        from .main import app
+    if threads is None:
+        threads = int(os.environ.get("WSGI_THREADS", 0)) or None
+    return PonteWSGI(app, threads)
@@ -0,0 +1,90 @@
+"""
+Mede a decodificação + validação local de um documento (sem a etapa
+externa) pelo caminho de referência (json.loads + Pydantic) e pelo caminho
+rápido (api/rapido.py, msgspec), com o corpo em JSON e em MessagePack, e a
+forma canônica usada como chave do cache de respostas.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_caminho_rapido
+    python -m benchmarks.bench_caminho_rapido --saida rapido.json
+"""
+import argparse
+import copy
+import json
+import timeit
+
+from pydantic import ValidationError
+
+from api.idempotencia import forma_canonica
+from api.rapido import JSON, MSGPACK, CaminhoRapido
+from api.regras import COLETAR_REGRAS, CONJUNTO_DE_REGRAS, regras_vigentes
+from api.schemas import ValidacaoDocumentoSchema
+
+from .resultados import gravar
+
+EXEMPLO = ValidacaoDocumentoSchema.model_config["json_schema_extra"]["examples"][0]
+
+
+def _us(funcao, repeticoes):
+    return round(min(timeit.repeat(funcao, number=repeticoes, repeat=7)) / repeticoes * 1e6, 2)
+
+
+def medir(repeticoes):
+    caminho, regras = CaminhoRapido(), regras_vigentes()
+    invalido = copy.deepcopy(EXEMPLO)
+    invalido["dados_estagio"]["horas_semanais"] = 40
+    contexto = {CONJUNTO_DE_REGRAS: regras, COLETAR_REGRAS: True}
+
+    def referencia(corpo):
+        def validar():
+            try:
+                ValidacaoDocumentoSchema.model_validate(json.loads(corpo), context=contexto)
+            except ValidationError:
+                pass
+        return validar
+
+    def rapido(corpo, formato):
+        def validar():
+            doc = caminho.decodificar(corpo, formato)
+            return doc is not None and caminho.aprovado(doc, regras)
+        return validar
+
+    resultados = []
+    for caso, doc in (("valido", EXEMPLO), ("invalido", invalido)):
+        corpo_json = json.dumps(doc).encode()
+        corpo_msgpack = caminho.codificar(doc, MSGPACK)
+        resultado = {
+            "caso": caso,
+            "referencia_us": _us(referencia(corpo_json), repeticoes),
+            "rapido_json_us": _us(rapido(corpo_json, JSON), repeticoes),
+            "rapido_msgpack_us": _us(rapido(corpo_msgpack, MSGPACK), repeticoes),
+        }
+        resultados.append(resultado)
+
+    struct = caminho.decodificar(json.dumps(EXEMPLO).encode())
+    canonica = {
+        "referencia_us": _us(lambda: forma_canonica(EXEMPLO), repeticoes),
+        "rapido_us": _us(lambda: caminho.forma_canonica(struct), repeticoes),
+    }
+    return resultados, canonica
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=5_000)
+    parser.add_argument("--saida", help="Grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    documento, canonica = medir(args.repeticoes)
+    for r in documento:
+        # Um documento inválido passa pelos dois caminhos: o rápido recusa e o Pydantic gera os erros
+        print(f"documento {r['caso']:>8}: referência {r['referencia_us']:>6} us | "
+              f"rápido JSON {r['rapido_json_us']:>6} us | rápido MessagePack {r['rapido_msgpack_us']:>6} us")
+    print(f"forma canônica: referência {canonica['referencia_us']} us | rápido {canonica['rapido_us']} us")
+
+    if args.saida:
+        gravar(args.saida, "caminho_rapido", {"documento": documento, "forma_canonica": canonica}, vars(args))
+
+
+if __name__ == "__main__":
+    main()
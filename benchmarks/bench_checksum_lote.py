@@ -0,0 +1,102 @@
+"""
+Compara a validação escalar (is_valid_cpf / is_valid_cnpj) com a vetorizada
+(is_valid_cpf_batch / is_valid_cnpj_batch) em 10 mil, 100 mil e 1 milhão de
+valores, conferindo que os resultados são idênticos.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_checksum_lote
+    python -m benchmarks.bench_checksum_lote --tamanhos 10000 100000 --saida resultados.json
+"""
+import argparse
+import random
+import time
+
+from utils import is_valid_cpf, is_valid_cnpj, is_valid_cpf_batch, is_valid_cnpj_batch
+from utils.cpf import CPF_WEIGHTS_1, CPF_WEIGHTS_2
+from utils.cnpj import CNPJ_WEIGHTS_1, CNPJ_WEIGHTS_2
+
+from .resultados import gravar
+
+
+def _dv(digitos, pesos):
+    resto = sum(d * p for d, p in zip(digitos, pesos)) % 11
+    return 0 if resto < 2 else 11 - resto
+
+
+def gerar(tamanho, comprimento, pesos_1, pesos_2, formatar, semente=42):
+    """Gera uma mistura de valores válidos, DVs errados, tamanhos errados e repetidos."""
+    rnd = random.Random(semente)
+    valores = []
+    for _ in range(tamanho):
+        base = [rnd.randrange(10) for _ in range(comprimento - 2)]
+        base.append(_dv(base, pesos_1))
+        base.append(_dv(base, pesos_2))
+        sorteio = rnd.random()
+        if sorteio < 0.15:
+            base[-1] = (base[-1] + 1) % 10
+        elif sorteio < 0.20:
+            base = base[:-1]
+        elif sorteio < 0.22:
+            base = [base[0]] * comprimento
+        texto = "".join(map(str, base))
+        valores.append(formatar(texto) if rnd.random() < 0.5 else texto)
+    return valores
+
+
+def _formatar_cpf(t):
+    return f"{t[:3]}.{t[3:6]}.{t[6:9]}-{t[9:]}"
+
+
+def _formatar_cnpj(t):
+    return f"{t[:2]}.{t[2:5]}.{t[5:8]}/{t[8:12]}-{t[12:]}"
+
+
+def medir(nome, escalar, lote, valores):
+    inicio = time.perf_counter()
+    esperado = [escalar(v) for v in valores]
+    tempo_escalar = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    mascara, _ = lote(valores)
+    tempo_lote = time.perf_counter() - inicio
+
+    assert mascara.tolist() == esperado, f"{nome}: resultados divergentes"
+    return {
+        "validador": nome,
+        "quantidade": len(valores),
+        "escalar_s": round(tempo_escalar, 4),
+        "lote_s": round(tempo_lote, 4),
+        "aceleracao": round(tempo_escalar / tempo_lote, 1) if tempo_lote else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--saida", help="Grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    # Aquecimento: importa o NumPy fora da medição
+    is_valid_cpf_batch(["000"])
+
+    resultados = []
+    for tamanho in args.tamanhos:
+        cpfs = gerar(tamanho, 11, CPF_WEIGHTS_1, CPF_WEIGHTS_2, _formatar_cpf)
+        cnpjs = gerar(tamanho, 14, CNPJ_WEIGHTS_1, CNPJ_WEIGHTS_2, _formatar_cnpj)
+        for resultado in (
+            medir("cpf", is_valid_cpf, is_valid_cpf_batch, cpfs),
+            medir("cnpj", is_valid_cnpj, is_valid_cnpj_batch, cnpjs),
+        ):
+            resultados.append(resultado)
+            print(
+                f"{resultado['validador']:>5} {resultado['quantidade']:>9,}: "
+                f"escalar {resultado['escalar_s']:8.3f}s | lote {resultado['lote_s']:8.3f}s | "
+                f"{resultado['aceleracao']}x"
+            )
+
+    if args.saida:
+        gravar(args.saida, "checksum_lote", resultados, vars(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Mede a inicialização a frio da API (o que um usuário sente em um cold start
+serverless), cada execução em um processo Python novo:
+
+- processo: do início do interpretador até a primeira resposta de /validacao/;
+- importação de api.main;
+- lifespan (subida);
+- primeira resposta de GET /, de POST /validacao/ (documento sem CNPJ, sem
+  rede) e de GET /openapi.json, pré-gerado (api/openapi.json) ou gerado na hora.
+
+As requisições são feitas direto na aplicação ASGI, sem servidor e sem httpx
+(que distorceria a medição da importação).
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_inicializacao
+    python -m benchmarks.bench_inicializacao --execucoes 20 --saida inicializacao.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from .resultados import gravar
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executado em cada processo novo; imprime as medições (ms) em JSON
+_SCRIPT = r'''
+import time
+_inicio = time.perf_counter()
+import asyncio, copy, json, sys
+
+t = time.perf_counter()
+import api.main
+from api.schemas import ValidacaoDocumentoSchema
+importacao = time.perf_counter() - t
+
+if not {openapi_pre_gerado}:
+    api.main.CAMINHO_OPENAPI = "/nao/existe/openapi.json"
+
+documento = copy.deepcopy(ValidacaoDocumentoSchema.model_config["json_schema_extra"]["examples"][0])
+documento["unidade_concedente"].update(cnpj=None, cpf="877.549.876-60")
+
+
+async def chamar(app, metodo, caminho, corpo=b""):
+    mensagens = [{{"type": "http.request", "body": corpo, "more_body": False}}]
+    status = []
+
+    async def receive():
+        return mensagens.pop(0) if mensagens else {{"type": "http.disconnect"}}
+
+    async def send(mensagem):
+        if mensagem["type"] == "http.response.start":
+            status.append(mensagem["status"])
+
+    scope = {{
+        "type": "http", "asgi": {{"version": "3.0"}}, "http_version": "1.1", "method": metodo,
+        "scheme": "http", "path": caminho, "raw_path": caminho.encode(), "root_path": "",
+        "query_string": b"", "headers": [(b"content-type", b"application/json")],
+        "server": ("bench", 80), "client": ("bench", 1), "state": {{}},
+    }}
+    t = time.perf_counter()
+    await app(scope, receive, send)
+    assert status == [200], (caminho, status)
+    return time.perf_counter() - t
+
+
+async def main():
+    app = api.main.app
+    t = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        lifespan = time.perf_counter() - t
+        raiz = await chamar(app, "GET", "/")
+        validacao = await chamar(app, "POST", "/validacao/", json.dumps(documento).encode())
+        processo = time.perf_counter() - _inicio
+        openapi = await chamar(app, "GET", "/openapi.json")
+        segunda_validacao = await chamar(app, "POST", "/validacao/", json.dumps({{**documento, "x": 1}}).encode())
+    return {{
+        "importacao": importacao, "lifespan": lifespan, "primeira_raiz": raiz,
+        "primeira_validacao": validacao, "segunda_validacao": segunda_validacao,
+        "primeiro_openapi": openapi, "ate_primeira_validacao": processo,
+        "httpx_carregado": "httpx" in sys.modules,
+    }}
+
+print(json.dumps(asyncio.run(main())))
+'''
+
+
+def executar(openapi_pre_gerado: bool) -> dict:
+    """Uma inicialização a frio, em um processo novo. Tempos em ms."""
+    inicio = time.perf_counter()
+    saida = subprocess.run(
+        [sys.executable, "-c", _SCRIPT.format(openapi_pre_gerado=openapi_pre_gerado)],
+        cwd=RAIZ, capture_output=True, text=True, check=True,
+    ).stdout
+    total = time.perf_counter() - inicio
+    medicoes = json.loads(saida)
+    httpx_carregado = medicoes.pop("httpx_carregado")
+    resultado = {nome: segundos * 1000 for nome, segundos in medicoes.items()}
+    resultado["processo"] = total * 1000
+    resultado["httpx_carregado"] = httpx_carregado
+    return resultado
+
+
+def resumir(execucoes: list) -> dict:
+    resumo = {}
+    for nome in execucoes[0]:
+        valores = [e[nome] for e in execucoes]
+        if isinstance(valores[0], bool):
+            resumo[nome] = any(valores)
+            continue
+        resumo[nome] = {"min": round(min(valores), 2), "mediana": round(statistics.median(valores), 2)}
+    return resumo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--execucoes", type=int, default=10)
+    parser.add_argument("--saida", help="Grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    resultados = {}
+    for variante, pre_gerado in (("openapi_pre_gerado", True), ("openapi_gerado", False)):
+        resultados[variante] = resumo = resumir([executar(pre_gerado) for _ in range(args.execucoes)])
+        print(f"{variante}:")
+        for nome, valor in resumo.items():
+            if isinstance(valor, bool):
+                print(f"  {nome:>24}: {valor}")
+            else:
+                print(f"  {nome:>24}: {valor['min']:>8.2f} ms (mediana {valor['mediana']:.2f} ms)")
+
+    if args.saida:
+        gravar(args.saida, "inicializacao", resultados, vars(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Mede o custo das regras de negócio compiladas (api/regras.py) contra os
+model validators escritos à mão que elas substituíram, reproduzidos abaixo
+em subclasses dos schemas, e o tempo de compilação de um arquivo de regras.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_regras
+    python -m benchmarks.bench_regras --saida regras.json
+"""
+import argparse
+import copy
+import timeit
+from datetime import date, datetime
+
+from pydantic import ValidationError, model_validator
+
+from api.metricas import medir_validador
+from api.regras import CAMINHO_PADRAO, CONJUNTO_DE_REGRAS, ConjuntoDeRegras, regras_vigentes
+from api.schemas import (
+    DadosEstagioSchema, EstagiarioSchema, SupervisorSchema, UnidadeConcedenteSchema, ValidacaoDocumentoSchema,
+)
+
+from .resultados import gravar
+
+EXEMPLO = ValidacaoDocumentoSchema.model_config["json_schema_extra"]["examples"][0]
+
+
+# --- Validadores originais, mantidos apenas como referência de desempenho ---
+# (mesmo nome do validador atual, para substituí-lo na subclasse)
+
+class _UnidadeConcedenteLegado(UnidadeConcedenteSchema):
+    @model_validator(mode='after')
+    @medir_validador
+    def verificar_documento_obrigatorio(self):
+        if not self.cnpj and not self.cpf:
+            raise ValueError('É obrigatório informar o CNPJ ou o CPF da Unidade Concedente.')
+        return self
+
+
+class _DadosEstagioLegado(DadosEstagioSchema):
+    @model_validator(mode='after')
+    @medir_validador
+    def validar_regras_negocio(self):
+        if self.data_termino <= self.data_inicio:
+            raise ValueError('A data de término deve ser posterior à data de início.')
+        return self
+
+    @model_validator(mode='after')
+    @medir_validador
+    def validar_regras_negocio_horarios(self):
+        dummy_date = date(2000, 1, 1)
+        dt_inicio = datetime.combine(dummy_date, self.horario_inicio)
+        dt_termino = datetime.combine(dummy_date, self.horario_termino)
+        if dt_termino <= dt_inicio:
+            raise ValueError('O horário de término deve ser posterior ao horário de início.')
+        horas_diarias = (dt_termino - dt_inicio).total_seconds() / 3600
+        if horas_diarias > 6:
+            raise ValueError(f'A carga horária diária ({horas_diarias:.1f}h) excede o limite permitido de 6 horas.')
+        if self.horas_semanais > 30:
+            raise ValueError(f'A carga horária semanal ({self.horas_semanais}h) excede o limite permitido de 30 horas.')
+        return self
+
+
+class _DocumentoLegado(ValidacaoDocumentoSchema):
+    unidade_concedente: _UnidadeConcedenteLegado
+    supervisor: SupervisorSchema
+    estagiario: EstagiarioSchema
+    dados_estagio: _DadosEstagioLegado
+
+    @model_validator(mode='after')
+    @medir_validador
+    def validar_regras_documento(self):
+        inicio = self.dados_estagio.data_inicio
+        termino = self.dados_estagio.data_termino
+        if abs((termino - inicio).days) > 730 and not self.estagiario.portador_de_deficiencia:
+            raise ValueError('A duração do estágio não pode exceder 2 anos, exceto para estagiários PCD.')
+        return self
+
+    @model_validator(mode='after')
+    @medir_validador
+    def validar_idade_minima(self):
+        nascimento = self.estagiario.data_nascimento
+        inicio = self.dados_estagio.data_inicio
+        idade = inicio.year - nascimento.year - ((inicio.month, inicio.day) < (nascimento.month, nascimento.day))
+        if idade < 18:
+            raise ValueError(f'O estagiário deve ter no mínimo 18 anos na data de início do estágio. Idade calculada: {idade} anos.')
+        return self
+
+
+def _por_documento_us(schema, doc, repeticoes, **kwargs):
+    def validar():
+        try:
+            schema.model_validate(doc, **kwargs)
+        except ValidationError:
+            pass
+    return min(timeit.repeat(validar, number=repeticoes, repeat=7)) / repeticoes * 1e6
+
+
+def medir_documento(repeticoes):
+    casos = {
+        "valido": EXEMPLO,
+        "horas_semanais": copy.deepcopy(EXEMPLO),
+        "idade": copy.deepcopy(EXEMPLO),
+    }
+    casos["horas_semanais"]["dados_estagio"]["horas_semanais"] = 40
+    casos["idade"]["estagiario"]["data_nascimento"] = "2010-01-01"
+
+    contexto = {CONJUNTO_DE_REGRAS: regras_vigentes()}
+    resultados = []
+    for caso, doc in casos.items():
+        antes = _por_documento_us(_DocumentoLegado, doc, repeticoes)
+        depois = _por_documento_us(ValidacaoDocumentoSchema, doc, repeticoes, context=contexto)
+        resultados.append({
+            "caso": caso, "legado_us": round(antes, 2), "compilado_us": round(depois, 2),
+            "aceleracao": round(antes / depois, 2),
+        })
+    return resultados
+
+
+def medir_compilacao(repeticoes):
+    segundos = min(timeit.repeat(lambda: ConjuntoDeRegras.do_arquivo(CAMINHO_PADRAO), number=repeticoes, repeat=5))
+    return {"compilacao_us": round(segundos / repeticoes * 1e6, 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=5_000)
+    parser.add_argument("--saida", help="Grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    documento = medir_documento(args.repeticoes)
+    for r in documento:
+        print(f"documento {r['caso']:>14}: {r['legado_us']:>6} us -> {r['compilado_us']:>6} us ({r['aceleracao']}x)")
+    compilacao = medir_compilacao(max(args.repeticoes // 10, 10))
+    print(f"compilação de {CAMINHO_PADRAO}: {compilacao['compilacao_us']} us")
+
+    if args.saida:
+        gravar(args.saida, "regras", {"documento": documento, **compilacao}, vars(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compara a vazão do POST /validacao/ nos modos de servir a API
+(tools/servir.py), com a mesma carga (benchmarks/carga.py) e a mesma
+BrasilAPI simulada:
+
+- uvicorn com 1 worker;
+- uvicorn com um worker por CPU (o padrão de produção);
+- gunicorn com workers do uvicorn, um por CPU (se o gunicorn estiver instalado);
+- wsgi: passenger_wsgi.py (ponte WSGI) em um servidor WSGI com threads,
+  como na hospedagem compartilhada. Um processo só, como um processo do
+  Passenger; o servidor da biblioteca padrão não mantém conexões abertas
+  (sem keep-alive), o que também pesa na comparação.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_servidores
+    python -m benchmarks.bench_servidores --duracao 20 --concorrencia 32 --saida servidores.json
+"""
+import argparse
+import asyncio
+import importlib.util
+
+from tools.fake_brasilapi import FakeBrasilAPI
+from tools.servir import cpus_disponiveis
+
+from .carga import documentos, gerar_carga, subir_api
+from .resultados import gravar
+
+
+def modos(cpus: int):
+    yield "uvicorn_1_worker", "uvicorn", 1
+    if cpus > 1:
+        yield f"uvicorn_{cpus}_workers", "uvicorn", cpus
+    if importlib.util.find_spec("gunicorn") is not None:
+        yield f"gunicorn_{cpus}_workers", "gunicorn", cpus
+    yield "wsgi", "wsgi", 1
+
+
+def medir(servidor: str, workers: int, args) -> dict:
+    fake = FakeBrasilAPI(latencia=args.latencia_brasilapi, semente=1).start()
+    processo = None
+    try:
+        processo, url = subir_api(fake.url_cnpj, workers, False, servidor)
+        return asyncio.run(gerar_carga(
+            url, documentos(args.cnpjs_distintos), args.concorrencia, args.duracao, args.aquecimento))
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait(10)
+        fake.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concorrencia", type=int, default=16)
+    parser.add_argument("--duracao", type=float, default=10.0, help="Segundos de medição por modo")
+    parser.add_argument("--aquecimento", type=float, default=2.0)
+    parser.add_argument("--cnpjs-distintos", type=int, default=1000)
+    parser.add_argument("--latencia-brasilapi", type=float, default=0.05)
+    parser.add_argument("--saida", help="Grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    resultados = {}
+    for nome, servidor, workers in modos(cpus_disponiveis()):
+        resultados[nome] = r = medir(servidor, workers, args)
+        lat = r["latencia_ms"]
+        print(f"{nome:>22}: {r['rps']:>8} req/s | p50 {lat['p50']} ms | p99 {lat['p99']} ms | erros {r['erros']}")
+
+    if args.saida:
+        gravar(args.saida, "servidores", resultados, vars(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Mede o custo de cada validador de campo e de um documento completo, comparando
+o caminho rápido atual (check_*, sem exceções) com a implementação original
+(re.sub + ValidationError convertida em ValueError), reproduzida abaixo.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_validadores
+    python -m benchmarks.bench_validadores --saida resultados.json
+"""
+import argparse
+import copy
+import re
+import timeit
+
+from pydantic import ValidationError as PydanticValidationError
+
+from api import schemas
+from api.schemas import ValidacaoDocumentoSchema
+from utils import (
+    ValidationError,
+    check_cep, check_cpf, check_cnpj, check_email, check_phone_number, check_uf,
+)
+from utils.uf import UFS
+
+from .resultados import gravar
+
+EXEMPLO = ValidacaoDocumentoSchema.model_config["json_schema_extra"]["examples"][0]
+
+
+# --- Implementação original, mantida apenas como referência de desempenho ---
+
+def _legado_cpf(cpf):
+    cpf = re.sub(r'[^0-9]', '', cpf)
+    if len(cpf) != 11 or len(set(cpf)) == 1:
+        raise ValidationError("O número do CPF é inválido.")
+    sum_ = sum(int(cpf[i]) * (10 - i) for i in range(9))
+    if int(cpf[9]) != (0 if (sum_ % 11) < 2 else 11 - (sum_ % 11)):
+        raise ValidationError("O número do CPF é inválido.")
+    sum_ = sum(int(cpf[i]) * (11 - i) for i in range(10))
+    if int(cpf[10]) != (0 if (sum_ % 11) < 2 else 11 - (sum_ % 11)):
+        raise ValidationError("O número do CPF é inválido.")
+
+
+def _legado_cnpj(cnpj):
+    cnpj = re.sub(r'[^0-9]', '', cnpj)
+    if len(cnpj) != 14 or len(set(cnpj)) == 1:
+        raise ValidationError("O número do CNPJ é inválido.")
+    weights = [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
+    sum_ = sum(int(cnpj[i]) * weights[i] for i in range(12))
+    if int(cnpj[12]) != (0 if (sum_ % 11) < 2 else 11 - (sum_ % 11)):
+        raise ValidationError("O número do CNPJ é inválido.")
+    weights = [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
+    sum_ = sum(int(cnpj[i]) * weights[i] for i in range(13))
+    if int(cnpj[13]) != (0 if (sum_ % 11) < 2 else 11 - (sum_ % 11)):
+        raise ValidationError("O número do CNPJ é inválido.")
+
+
+def _legado_cep(cep):
+    cep = re.sub(r'[^0-9]', '', cep)
+    if not cep.isdigit():
+        raise ValidationError("CEP inválido: deve conter apenas números.")
+    if len(cep) != 8:
+        raise ValidationError(f"CEP inválido: deve conter 8 dígitos, mas contém {len(cep)}.")
+
+
+def _legado_email(email):
+    pattern = re.compile(
+        r"^[a-zA-Z0-9_+-]+(?:\.[a-zA-Z0-9_+-]+)*@"
+        r"(?:[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?\.)+"
+        r"[a-zA-Z]{2,63}$"
+    )
+    if not email or re.fullmatch(pattern, email) is None:
+        raise ValidationError("O formato do e-mail é inválido.")
+
+
+def _legado_telefone(phone_number):
+    phone_number = re.sub(r'[^0-9]', '', phone_number.replace('+55', ''))
+    invalido = (
+        not phone_number.isdigit()
+        or phone_number.startswith('0')
+        or (len(phone_number) > 1 and phone_number[1] == '0')
+        or len(phone_number) not in (10, 11)
+        or (len(phone_number) == 11 and (phone_number[2] != '9' or phone_number[3] == '0'))
+        or (len(phone_number) == 10 and phone_number[2] in ['0', '1', '9'])
+    )
+    if invalido:
+        raise ValidationError("O número de telefone é inválido.")
+
+
+def _legado_uf(uf):
+    if uf.upper() not in UFS:
+        raise ValidationError("UF inválida.")
+
+
+def _legado_via_pydantic(func):
+    """Como o validar_com_utils original: ValidationError -> ValueError."""
+    def validar(valor):
+        try:
+            func(valor)
+        except ValidationError as e:
+            raise ValueError(str(e))
+    return validar
+
+
+def _atual_via_pydantic(check):
+    def validar(valor):
+        valido, codigo = check(valor)
+        if not valido:
+            raise ValueError(codigo)
+    return validar
+
+
+CAMPOS = [
+    # (campo, valor válido, valor inválido, legado, atual)
+    ("cpf", "877.549.876-60", "877.549.876-61", _legado_cpf, check_cpf),
+    ("cnpj", "10.882.594/0009-12", "10.882.594/0009-13", _legado_cnpj, check_cnpj),
+    ("cep", "01310-100", "01310-10", _legado_cep, check_cep),
+    ("email", "ana.supervisor@empresa.com", "ana.supervisor@", _legado_email, check_email),
+    ("telefone", "11 987689371", "11 087689371", _legado_telefone, check_phone_number),
+    ("uf", "SP", "XX", _legado_uf, check_uf),
+]
+
+
+def _por_chamada_ns(func, valor, repeticoes):
+    def chamar():
+        try:
+            func(valor)
+        except ValueError:
+            pass
+    return min(timeit.repeat(chamar, number=repeticoes, repeat=5)) / repeticoes * 1e9
+
+
+def medir_campos(repeticoes):
+    resultados = []
+    for campo, valido, invalido, legado, atual in CAMPOS:
+        for caso, valor in (("valido", valido), ("invalido", invalido)):
+            antes = _por_chamada_ns(_legado_via_pydantic(legado), valor, repeticoes)
+            depois = _por_chamada_ns(_atual_via_pydantic(atual), valor, repeticoes)
+            resultados.append({
+                "campo": campo, "caso": caso,
+                "legado_ns": round(antes), "atual_ns": round(depois),
+                "aceleracao": round(antes / depois, 2),
+            })
+    return resultados
+
+
+def _validar_documento(doc):
+    try:
+        ValidacaoDocumentoSchema.model_validate(doc)
+    except PydanticValidationError:
+        pass
+
+
+def medir_documento(repeticoes):
+    invalido = copy.deepcopy(EXEMPLO)
+    invalido["supervisor"]["cpf"] = "877.549.876-61"
+    invalido["estagiario"]["email"] = "invalido@"
+
+    legado = {
+        'cep': (_legado_cep, None), 'cpf': (_legado_cpf, None), 'cnpj': (_legado_cnpj, None),
+        'email': (_legado_email, None), 'telefone': (_legado_telefone, None), 'uf': (_legado_uf, None),
+    }
+
+    def validar_legado(tipo, valor, nome_campo):
+        if not valor:
+            return valor
+        try:
+            legado[tipo][0](valor)
+        except ValidationError as e:
+            raise ValueError(str(e))
+        return valor
+
+    resultados = []
+    original = schemas.validar_com_utils
+    for caso, doc in (("valido", EXEMPLO), ("invalido", invalido)):
+        atual = min(timeit.repeat(lambda: _validar_documento(doc), number=repeticoes, repeat=5)) / repeticoes
+        # Os validadores chamam schemas.validar_com_utils pelo nome global do módulo
+        schemas.validar_com_utils = validar_legado
+        try:
+            antes = min(timeit.repeat(lambda: _validar_documento(doc), number=repeticoes, repeat=5)) / repeticoes
+        finally:
+            schemas.validar_com_utils = original
+        resultados.append({
+            "caso": caso, "legado_us": round(antes * 1e6, 2), "atual_us": round(atual * 1e6, 2),
+            "aceleracao": round(antes / atual, 2),
+        })
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=20_000)
+    parser.add_argument("--saida", help="Grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    campos = medir_campos(args.repeticoes)
+    for r in campos:
+        print(f"{r['campo']:>9} {r['caso']:>8}: {r['legado_ns']:>6} ns -> {r['atual_ns']:>6} ns ({r['aceleracao']}x)")
+    documento = medir_documento(max(args.repeticoes // 10, 100))
+    for r in documento:
+        print(f"documento {r['caso']:>8}: {r['legado_us']:>6} us -> {r['atual_us']:>6} us ({r['aceleracao']}x)")
+
+    if args.saida:
+        gravar(args.saida, "validadores", {"campos": campos, "documento": documento}, vars(args))
+
+
+if __name__ == "__main__":
+    main()
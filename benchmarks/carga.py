@@ -0,0 +1,255 @@
+"""
+Teste de carga de ponta a ponta do POST /validacao/: mantém `--concorrencia`
+requisições em andamento durante `--duracao` segundos e informa vazão
+(requisições/s) e latências p50/p95/p99.
+
+Sem --url, sobe sozinho tudo o que precisa, sem rede externa:
+- a BrasilAPI simulada (tools/fake_brasilapi.py), com --latencia-brasilapi
+  e --taxa-erro-brasilapi;
+- a API em um subprocesso (tools/servir.py: uvicorn, gunicorn ou a ponte
+  WSGI), apontando para ela.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.carga --concorrencia 32 --duracao 20
+    python -m benchmarks.carga --cnpjs-distintos 5000 --sem-cache --saida carga.json
+    python -m benchmarks.carga --servidor wsgi   # ponte WSGI (passenger_wsgi.py)
+    python -m benchmarks.carga --url http://127.0.0.1:8000   # servidor já rodando
+    python -m benchmarks.carga --workers 4 --cnpjs-distintos 5000 --limite-brasilapi 20 --limite-cnpj 18
+
+--cnpjs-distintos sorteia CNPJs válidos por requisição, para que o cache e o
+agrupamento de consultas não absorvam toda a carga.
+
+--limite-brasilapi faz a BrasilAPI simulada responder 429 acima de N
+consultas/s; --limite-cnpj liga o limitador de taxa da API (CNPJ_RATE_LIMIT,
+comum a todos os workers), desligado por padrão aqui. O resultado traz
+quantas consultas a BrasilAPI simulada recusou.
+
+--fracao-local mistura as duas classes de trabalho do controle de admissão
+(api/admissao.py): essa fração das requisições repete o CNPJ do exemplo, que
+depois da primeira consulta sai do cache sem rede (validação local); as
+demais usam os CNPJs sorteados, cada um consultado na BrasilAPI (validação
+externa). O resultado traz latências e status por classe; os limites dos
+compartimentos vêm das variáveis ADMISSAO_* do ambiente:
+    ADMISSAO_EXTERNA_CONCORRENCIA=8 python -m benchmarks.carga \
+        --cnpjs-distintos 100000 --fracao-local 0.5 --latencia-brasilapi 0.5 --concorrencia 64
+"""
+import argparse
+import asyncio
+import copy
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from api.schemas import ValidacaoDocumentoSchema
+from utils.cnpj import CNPJ_WEIGHTS_1, CNPJ_WEIGHTS_2
+from tools.fake_brasilapi import FakeBrasilAPI
+
+from .resultados import gravar
+
+EXEMPLO = ValidacaoDocumentoSchema.model_config["json_schema_extra"]["examples"][0]
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentil(ordenados: List[float], p: float) -> Optional[float]:
+    """Percentil pelo método do posto mais próximo (lista já ordenada)."""
+    if not ordenados:
+        return None
+    posicao = max(int(round(p * len(ordenados) + 0.5)) - 1, 0)
+    return ordenados[min(posicao, len(ordenados) - 1)]
+
+
+def _dv(digitos, pesos):
+    resto = sum(d * p for d, p in zip(digitos, pesos)) % 11
+    return 0 if resto < 2 else 11 - resto
+
+
+def cnpj_valido(rnd: random.Random) -> str:
+    digitos = [rnd.randrange(10) for _ in range(8)] + [0, 0, 0, 1]
+    digitos.append(_dv(digitos, CNPJ_WEIGHTS_1))
+    digitos.append(_dv(digitos, CNPJ_WEIGHTS_2))
+    t = "".join(map(str, digitos))
+    return f"{t[:2]}.{t[2:5]}.{t[5:8]}/{t[8:12]}-{t[12:]}"
+
+
+def documentos(distintos: int, semente: int = 42) -> List[Dict[str, Any]]:
+    """Documentos de exemplo, com `distintos` CNPJs diferentes (0 = só o do exemplo)."""
+    if distintos <= 0:
+        return [EXEMPLO]
+    rnd = random.Random(semente)
+    docs = []
+    for _ in range(distintos):
+        doc = copy.deepcopy(EXEMPLO)
+        doc["unidade_concedente"]["cnpj"] = cnpj_valido(rnd)
+        docs.append(doc)
+    return docs
+
+
+def misturar(docs: List[Dict[str, Any]], fracao_local: float, semente: int = 42) -> List[tuple]:
+    """
+    (classe, documento): uma fração `fracao_local` com o CNPJ do exemplo
+    ("local", respondido pelo cache) e o resto com os de `docs` ("externa").
+    """
+    rnd = random.Random(semente)
+    return [("local", EXEMPLO) if rnd.random() < fracao_local else ("externa", doc) for doc in docs]
+
+
+def resumir(latencias: List[float], status: Counter, duracao: float) -> Dict[str, Any]:
+    latencias.sort()
+    total = len(latencias)
+    ms = lambda s: round(s * 1000, 2) if s is not None else None
+    return {
+        "requisicoes": total,
+        "rps": round(total / duracao, 1),
+        "status": dict(status),
+        "erros": total - status.get("200", 0),
+        "latencia_ms": {
+            "media": ms(sum(latencias) / total) if total else None,
+            "p50": ms(percentil(latencias, 0.50)),
+            "p95": ms(percentil(latencias, 0.95)),
+            "p99": ms(percentil(latencias, 0.99)),
+            "max": ms(latencias[-1]) if total else None,
+        },
+    }
+
+
+async def gerar_carga(url: str, docs, concorrencia: int, duracao: float, aquecimento: float,
+                      classes: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Carga com os documentos `docs`; com `classes` (uma por documento), o resultado traz também cada classe."""
+    latencias: List[float] = []
+    status: Counter = Counter()
+    por_classe: Dict[str, tuple] = {c: ([], Counter()) for c in set(classes or ())}
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=30.0) as client:
+        inicio_medicao = time.perf_counter() + aquecimento
+        fim = inicio_medicao + duracao
+
+        async def trabalhador(n: int):
+            i = n
+            while True:
+                agora = time.perf_counter()
+                if agora >= fim:
+                    return
+                indice = i % len(docs)
+                doc = docs[indice]
+                i += concorrencia
+                try:
+                    resposta = await client.post("/validacao/", json=doc)
+                    codigo = str(resposta.status_code)
+                except httpx.HTTPError as e:
+                    codigo = type(e).__name__
+                if agora >= inicio_medicao:
+                    latencia = time.perf_counter() - agora
+                    latencias.append(latencia)
+                    status[codigo] += 1
+                    if classes:
+                        da_classe, status_da_classe = por_classe[classes[indice]]
+                        da_classe.append(latencia)
+                        status_da_classe[codigo] += 1
+
+        await asyncio.gather(*(trabalhador(n) for n in range(concorrencia)))
+
+    resultado = resumir(latencias, status, duracao)
+    if classes:
+        resultado["classes"] = {c: resumir(l, st, duracao) for c, (l, st) in sorted(por_classe.items())}
+    return resultado
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def subir_api(url_brasilapi: str, workers: int, sem_cache: bool, servidor: str = "uvicorn", limite_cnpj: float = 0.0):
+    """Sobe a API em um subprocesso (tools/servir.py) e espera ela responder."""
+    porta = _porta_livre()
+    env = dict(os.environ, BRASIL_API_CNPJ_URL=url_brasilapi, CNPJ_RATE_LIMIT=f"{limite_cnpj:g}")
+    if sem_cache:
+        env["CNPJ_CACHE_ENABLED"] = "0"
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "tools.servir", "--servidor", servidor, "--host", "127.0.0.1",
+         "--porta", str(porta), "--workers", str(workers)],
+        cwd=RAIZ, env=env,
+    )
+    url = f"http://127.0.0.1:{porta}"
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError("A API terminou durante a inicialização.")
+        try:
+            if httpx.get(url + "/", timeout=1.0).status_code == 200:
+                return processo, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    processo.terminate()
+    raise RuntimeError("A API não respondeu em 30 s.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="API já em execução (sem ela, a API e a BrasilAPI simulada são iniciadas aqui)")
+    parser.add_argument("--concorrencia", type=int, default=16)
+    parser.add_argument("--duracao", type=float, default=10.0, help="Segundos de medição")
+    parser.add_argument("--aquecimento", type=float, default=2.0, help="Segundos iniciais descartados")
+    parser.add_argument("--cnpjs-distintos", type=int, default=0)
+    parser.add_argument("--servidor", choices=("uvicorn", "gunicorn", "wsgi"), default="uvicorn",
+                        help="Servidor da API iniciada aqui (tools/servir.py)")
+    parser.add_argument("--workers", type=int, default=1, help="Workers da API iniciada aqui (0 = um por CPU)")
+    parser.add_argument("--sem-cache", action="store_true", help="Desliga o cache de CNPJ da API iniciada aqui")
+    parser.add_argument("--latencia-brasilapi", type=float, default=0.05)
+    parser.add_argument("--taxa-erro-brasilapi", type=float, default=0.0)
+    parser.add_argument("--limite-brasilapi", type=float, default=0.0,
+                        help="Consultas/s acima das quais a BrasilAPI simulada responde 429 (0 = sem limite)")
+    parser.add_argument("--limite-cnpj", type=float, default=0.0,
+                        help="Limite de consultas/s da API iniciada aqui, somando os workers (0 = desligado)")
+    parser.add_argument("--fracao-local", type=float, default=None,
+                        help="Fração das requisições com o CNPJ do exemplo (em cache); as demais, com CNPJs sorteados")
+    parser.add_argument("--saida", help="Grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    docs, classes = documentos(args.cnpjs_distintos), None
+    if args.fracao_local is not None:
+        classes, docs = map(list, zip(*misturar(docs, args.fracao_local)))
+    fake = processo = None
+    url = args.url
+    try:
+        if url is None:
+            fake = FakeBrasilAPI(latencia=args.latencia_brasilapi, taxa_erro=args.taxa_erro_brasilapi, semente=1,
+                                 limite=args.limite_brasilapi).start()
+            processo, url = subir_api(fake.url_cnpj, args.workers, args.sem_cache, args.servidor, args.limite_cnpj)
+        resultado = asyncio.run(gerar_carga(url, docs, args.concorrencia, args.duracao, args.aquecimento, classes))
+        if fake is not None:
+            resultado["consultas_brasilapi"] = fake.requisicoes
+            resultado["recusadas_brasilapi"] = fake.recusadas
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait(10)
+        if fake is not None:
+            fake.stop()
+
+    lat = resultado["latencia_ms"]
+    print(
+        f"{resultado['requisicoes']} requisições em {args.duracao:g}s: {resultado['rps']} req/s | "
+        f"p50 {lat['p50']} ms | p95 {lat['p95']} ms | p99 {lat['p99']} ms | max {lat['max']} ms | "
+        f"status {resultado['status']}"
+    )
+    for classe, r in resultado.get("classes", {}).items():
+        lat = r["latencia_ms"]
+        print(f"  {classe}: {r['requisicoes']} requisições | p50 {lat['p50']} ms | p99 {lat['p99']} ms | "
+              f"status {r['status']}")
+    if args.saida:
+        gravar(args.saida, "carga_validacao", resultado, vars(args))
+
+
+if __name__ == "__main__":
+    main()
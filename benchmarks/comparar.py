@@ -0,0 +1,68 @@
+"""
+Compara dois arquivos de resultados (--saida de qualquer benchmark), métrica
+a métrica, mostrando a variação percentual.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.comparar antes.json depois.json
+"""
+import argparse
+import json
+from typing import Any, Dict
+
+
+def achatar(valor: Any, prefixo: str = "") -> Dict[str, float]:
+    """
+    Métricas numéricas com o caminho como chave ("latencia_ms.p95"). Itens de
+    listas são identificados pelos seus campos de texto (ex.: "cpf/valido").
+    """
+    metricas: Dict[str, float] = {}
+    if isinstance(valor, bool):
+        return metricas
+    if isinstance(valor, (int, float)):
+        metricas[prefixo] = valor
+    elif isinstance(valor, dict):
+        for chave, item in valor.items():
+            metricas.update(achatar(item, f"{prefixo}.{chave}" if prefixo else str(chave)))
+    elif isinstance(valor, list):
+        for i, item in enumerate(valor):
+            rotulo = str(i)
+            if isinstance(item, dict):
+                textos = [str(v) for v in item.values() if isinstance(v, str)]
+                numeros = [f"{k}={v}" for k, v in item.items() if k in ("quantidade", "tamanho")]
+                rotulo = "/".join(textos + numeros) or rotulo
+            metricas.update(achatar(item, f"{prefixo}[{rotulo}]"))
+    return metricas
+
+
+def comparar(antes: Dict[str, Any], depois: Dict[str, Any]):
+    a, d = achatar(antes.get("resultados")), achatar(depois.get("resultados"))
+    linhas = []
+    for chave in sorted(a.keys() | d.keys()):
+        va, vd = a.get(chave), d.get(chave)
+        variacao = None
+        if va not in (None, 0) and vd is not None:
+            variacao = (vd - va) / abs(va) * 100
+        linhas.append((chave, va, vd, variacao))
+    return linhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("antes")
+    parser.add_argument("depois")
+    args = parser.parse_args(argv)
+
+    with open(args.antes, encoding="utf-8") as f:
+        antes = json.load(f)
+    with open(args.depois, encoding="utf-8") as f:
+        depois = json.load(f)
+
+    versoes = [(r.get("metadados") or {}).get("versao") for r in (antes, depois)]
+    print(f"{antes.get('benchmark')}: {versoes[0]} -> {versoes[1]}")
+    for chave, va, vd, variacao in comparar(antes, depois):
+        texto = f"{variacao:+.1f}%" if variacao is not None else "-"
+        print(f"{chave:<50} {va!s:>12} {vd!s:>12} {texto:>9}")
+
+
+if __name__ == "__main__":
+    main()
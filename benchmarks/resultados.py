@@ -0,0 +1,46 @@
+"""
+Gravação dos resultados dos benchmarks em JSON, com os metadados necessários
+para comparar execuções entre versões (ver benchmarks/comparar.py).
+"""
+import datetime
+import json
+import os
+import platform
+import subprocess
+from typing import Any, Dict, Optional
+
+
+def versao_git() -> Optional[str]:
+    """Commit atual (com sufixo -dirty se houver alterações), ou None fora de um repositório."""
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=raiz, capture_output=True, text=True, timeout=5, check=True,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def metadados() -> Dict[str, Any]:
+    return {
+        "versao": versao_git(),
+        "data": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def gravar(caminho: str, benchmark: str, resultados: Any, parametros: Optional[Dict[str, Any]] = None):
+    """Grava {"benchmark", "metadados", "parametros", "resultados"} em `caminho`."""
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(
+            {
+                "benchmark": benchmark,
+                "metadados": metadados(),
+                "parametros": parametros or {},
+                "resultados": resultados,
+            },
+            arquivo, indent=2, ensure_ascii=False,
+        )
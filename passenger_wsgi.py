@@ -1,13 +1,19 @@
+"""
+Entrada do Phusion Passenger (hospedagem compartilhada): serve a API
+(api.main:app) pela ponte WSGI de api/wsgi.py.
+
+Configuração por variáveis de ambiente (SetEnv no .htaccess ou no painel):
+- WSGI_THREADS: threads para rotas e dependências síncronas (padrão 40);
+- as mesmas da API (CNPJ_*, REGRAS_NEGOCIO_*, RESPOSTAS_CACHE_*...).
+As threads do próprio Passenger (PassengerThreadCount) só aguardam as
+respostas do event loop: poucas bastam.
+"""
 import os
 import sys
 
 
 sys.path.insert(0, os.path.dirname(__file__))
 
+from api.wsgi import criar_aplicacao_wsgi  # noqa: E402
 
-def application(environ, start_response):
-    start_response('200 OK', [('Content-Type', 'text/plain')])
-    message = 'It works!\n'
-    version = 'Python %s\n' % sys.version.split()[0]
-    response = '\n'.join([message, version])
-    return [response.encode()]
\ No newline at end of file
+application = criar_aplicacao_wsgi()
@@ -0,0 +1,21 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# Os testes consultam provedores simulados (httpx.MockTransport): o limite de
+# taxa dos provedores reais (utils.rate_limit) só atrasaria as consultas. Os
+# testes do limitador criam os seus.
+os.environ.setdefault("CNPJ_RATE_LIMIT", "0")
+
+# Os arquivos de estado (cache de CNPJ, tabela compartilhada, estado do
+# limitador e fila de tarefas) sobreviveriam aos testes, com os resultados
+# simulados, para a próxima execução ou um servidor local: cada sessão de
+# testes usa um diretório próprio, apagado no fim.
+_DIRETORIO = tempfile.mkdtemp(prefix="validacao_testes_")
+atexit.register(shutil.rmtree, _DIRETORIO, ignore_errors=True)
+os.environ.setdefault("VALIDACAO_STATE_DIR", _DIRETORIO)
+os.environ.setdefault("CNPJ_CACHE_PATH", os.path.join(_DIRETORIO, "cnpj_cache.sqlite3"))
+os.environ.setdefault("CNPJ_CACHE_SHARED_PATH", os.path.join(_DIRETORIO, "cnpj_cache.shm"))
+os.environ.setdefault("CNPJ_RATE_LIMIT_DIR", _DIRETORIO)
+os.environ.setdefault("TAREFAS_PATH", os.path.join(_DIRETORIO, "validacao_tarefas.sqlite3"))
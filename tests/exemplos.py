@@ -0,0 +1,20 @@
+# Documento de exemplo do schema (o mesmo da documentação da API) e uma
+# fábrica de variações dele, compartilhados pelos testes.
+
+import copy
+
+from api.schemas import ValidacaoDocumentoSchema
+
+EXEMPLO = ValidacaoDocumentoSchema.model_config["json_schema_extra"]["examples"][0]
+
+
+def documento(**alteracoes):
+    """Cópia do EXEMPLO com as alterações; campos aninhados separados por "__" (ex.: supervisor__cpf)."""
+    doc = copy.deepcopy(EXEMPLO)
+    for caminho, valor in alteracoes.items():
+        no = doc
+        *partes, campo = caminho.split("__")
+        for parte in partes:
+            no = no[parte]
+        no[campo] = valor
+    return doc
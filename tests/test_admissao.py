@@ -0,0 +1,164 @@
+# Testes do controle de admissão (utils/bulkhead.py e api/admissao.py): fila
+# limitada com espera máxima, 503 com Retry-After e o isolamento entre a
+# validação local e a que consulta a rede.
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from api.admissao import ControleDeAdmissao, get_controle_admissao, set_controle_admissao
+from api.idempotencia import set_cache_respostas
+from api.main import app
+from api.verificadores import (
+    VERIFICADOR_CNPJ_CONCEDENTE,
+    RegistroDeVerificadores,
+    Verificador,
+    get_registro_verificadores,
+    set_registro_verificadores,
+)
+from tests.exemplos import EXEMPLO, documento
+from utils.bulkhead import QUEUE_FULL, QUEUE_TIMEOUT, Bulkhead, BulkheadFull
+from utils.cnpj_cache import CNPJCache, set_cnpj_cache
+from utils.cnpj_result import CNPJ_FOUND, CNPJLookupResult
+from utils.metrics import registry
+
+CNPJ_LOCAL = "11.222.333/0001-81"
+
+
+def test_fila_atendida_na_ordem_de_chegada():
+    async def cenario():
+        bulkhead = Bulkhead("teste", 1, max_queue=2, queue_timeout=1.0)
+        ordem = []
+
+        async def trabalho(nome):
+            await bulkhead.acquire()
+            ordem.append(nome)
+            await asyncio.sleep(0.01)
+            bulkhead.release()
+
+        await asyncio.gather(*(trabalho(nome) for nome in "abc"))
+        return ordem, bulkhead.stats()
+
+    ordem, stats = asyncio.run(cenario())
+    assert ordem == ["a", "b", "c"]
+    assert stats["admitted"] == 3 and stats["queued"] == 2
+    assert stats["active"] == 0 and stats["waiting"] == 0
+
+
+def test_fila_cheia_e_espera_esgotada():
+    async def cenario():
+        bulkhead = Bulkhead("teste", 1, max_queue=1, queue_timeout=0.02)
+        await bulkhead.acquire()
+        esperando = asyncio.ensure_future(bulkhead.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(BulkheadFull) as cheia:
+            await bulkhead.acquire()
+        with pytest.raises(BulkheadFull) as esgotada:
+            await esperando
+        bulkhead.release()
+        return cheia.value.reason, esgotada.value.reason, bulkhead.stats()
+
+    cheia, esgotada, stats = asyncio.run(cenario())
+    assert (cheia, esgotada) == (QUEUE_FULL, QUEUE_TIMEOUT)
+    assert stats[QUEUE_FULL] == stats[QUEUE_TIMEOUT] == 1
+    assert stats["active"] == 0
+
+
+def test_cancelado_na_fila_nao_perde_a_vaga():
+    async def cenario():
+        bulkhead = Bulkhead("teste", 1, max_queue=2, queue_timeout=1.0)
+        await bulkhead.acquire()
+        cancelado = asyncio.ensure_future(bulkhead.acquire())
+        seguinte = asyncio.ensure_future(bulkhead.acquire())
+        await asyncio.sleep(0)
+        cancelado.cancel()
+        await asyncio.sleep(0)
+        bulkhead.release()
+        await asyncio.wait_for(seguinte, 0.5)
+        return bulkhead.stats()
+
+    stats = asyncio.run(cenario())
+    assert stats["active"] == 1 and stats["waiting"] == 0
+
+
+def test_vaga_entregue_junto_com_o_prazo_nao_se_perde(monkeypatch):
+    async def cenario():
+        bulkhead = Bulkhead("teste", 1, max_queue=1, queue_timeout=1.0)
+        await bulkhead.acquire()
+
+        async def prazo_vencido_apos_a_entrega(waiter, timeout):
+            bulkhead.release()      # o dono da vaga a entrega (set_result no waiter)...
+            raise asyncio.TimeoutError  # ...e o prazo vence no mesmo instante
+
+        monkeypatch.setattr(asyncio, "wait_for", prazo_vencido_apos_a_entrega)
+        with pytest.raises(BulkheadFull):
+            await bulkhead.acquire()
+        monkeypatch.undo()
+        return bulkhead.stats()
+
+    stats = asyncio.run(cenario())
+    assert stats["active"] == 0 and stats["waiting"] == 0
+
+@pytest.fixture
+def admissao():
+    """Um lugar no compartimento externo, sem fila; consulta lenta (0,3 s) para CNPJs fora de CNPJ_LOCAL."""
+    async def consulta_lenta(cnpj, client):
+        if cnpj != CNPJ_LOCAL:
+            await asyncio.sleep(0.3)
+        return None, True
+
+    consulta = Verificador("consulta", "Consulta", ("unidade_concedente", "cnpj"), consulta_lenta,
+                           "consulta.recusado", precisa_rede=lambda cnpj: cnpj != CNPJ_LOCAL)
+    padrao_registro, padrao_controle = get_registro_verificadores(), get_controle_admissao()
+    set_registro_verificadores(RegistroDeVerificadores([consulta]))
+    set_cache_respostas(None)
+    controle = ControleDeAdmissao(Bulkhead("local", 8, 8, 0.5), Bulkhead("externa", 1, 0, 0.5), retry_after=3)
+    set_controle_admissao(controle)
+    yield controle
+    set_registro_verificadores(padrao_registro)
+    set_controle_admissao(padrao_controle)
+
+
+def test_sobrecarga_externa_nao_atrasa_a_validacao_local(admissao):
+    async def cenario():
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://teste") as cliente:
+            async def enviar(cnpj, atraso=0.0):
+                await asyncio.sleep(atraso)
+                inicio = time.perf_counter()
+                resposta = await cliente.post("/validacao/", json=documento(unidade_concedente__cnpj=cnpj))
+                return resposta, time.perf_counter() - inicio
+
+            return await asyncio.gather(
+                enviar(EXEMPLO["unidade_concedente"]["cnpj"]),
+                enviar(EXEMPLO["unidade_concedente"]["cnpj"], 0.05),
+                enviar(CNPJ_LOCAL, 0.05),
+            )
+
+    (primeira, _), (recusada, _), (local, duracao_local) = asyncio.run(cenario())
+    assert primeira.status_code == 200
+    assert recusada.status_code == 503
+    assert recusada.headers["retry-after"] == "3"
+    assert local.status_code == 200 and duracao_local < 0.2
+
+    stats = admissao.stats()
+    assert stats["externa"][QUEUE_FULL] == 1 and stats["externa"]["admitted"] == 1
+    assert stats["local"]["admitted"] == 3 and stats["local"]["active"] == 0
+    metricas = registry.render()
+    assert 'bulkhead_rejected_total{bulkhead="externa",reason="queue_full"} 1' in metricas
+    assert 'bulkhead_max_concurrent{bulkhead="externa"} 1' in metricas
+
+
+def test_cnpj_em_cache_nao_precisa_de_rede():
+    cache = CNPJCache()
+    set_cnpj_cache(cache)
+    try:
+        cnpj = EXEMPLO["unidade_concedente"]["cnpj"]
+        assert VERIFICADOR_CNPJ_CONCEDENTE.precisa_rede(cnpj)
+        cache.set("10882594000912", CNPJLookupResult(CNPJ_FOUND, 200, "EMPRESA"))
+        assert not VERIFICADOR_CNPJ_CONCEDENTE.precisa_rede(cnpj)
+        assert cache.stats()["memory_hits"] == 0
+    finally:
+        set_cnpj_cache(None)
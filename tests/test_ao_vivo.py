@@ -0,0 +1,148 @@
+# Testes da validação ao vivo (api/ao_vivo.py): trechos validados campo a
+# campo, memorização por sessão (inclusive da consulta de CNPJ) e a rota
+# HTTP avulsa por trecho.
+
+import copy
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from api.ao_vivo import SessaoAoVivo
+from api.main import app, get_http_client
+from tests.exemplos import EXEMPLO, documento
+from utils.cnpj_cache import set_cnpj_cache
+from utils.metrics import registry
+
+
+@pytest.fixture
+def consultas():
+    """Consultas feitas à BrasilAPI simulada (sem cache de CNPJ)."""
+    feitas = []
+
+    def responder(request):
+        feitas.append(request.url.path.rsplit("/", 1)[-1])
+        return httpx.Response(200, json={"razao_social": "EMPRESA"})
+
+    fake = httpx.AsyncClient(transport=httpx.MockTransport(responder))
+    app.dependency_overrides[get_http_client] = lambda: fake
+    set_cnpj_cache(None)
+    yield feitas
+    app.dependency_overrides.clear()
+
+
+def receber_ate(ws, tipo):
+    mensagens = []
+    while True:
+        mensagem = ws.receive_json()
+        mensagens.append(mensagem)
+        if mensagem["tipo"] == tipo:
+            return mensagens
+
+
+def test_campo_invalido_marca_so_o_trecho_dele(consultas):
+    with TestClient(app).websocket_connect("/validacao/ao-vivo") as ws:
+        ws.send_json({"campos": {"estagiario.endereco.cep": "07190-100", "estagiario.endereco.estado": "RJ"}})
+        endereco, estagiario, documento = (ws.receive_json() for _ in range(3))
+        ws.send_json({"campos": {"supervisor.cpf": "111"}})
+        supervisor = ws.receive_json()
+        ws.send_json({"campos": {"supervisor.idade": 30}})
+        erro = ws.receive_json()
+
+    assert endereco["trecho"] == "estagiario.endereco"
+    assert not endereco["completo"] and not endereco["valido"]
+    [erro_cep] = endereco["erros"]
+    assert erro_cep["loc"] == ["estagiario", "endereco", "estado"] and "RJ" in erro_cep["msg"]
+    # Os trechos de fora só estão incompletos: o erro é do trecho interno
+    assert (estagiario["trecho"], estagiario["erros"]) == ("estagiario", [])
+    assert (documento["trecho"], documento["erros"]) == ("documento", [])
+    assert supervisor["trecho"] == "supervisor"
+    assert supervisor["erros"][0]["loc"] == ["supervisor", "cpf"]
+    assert erro == {"tipo": "erro", "mensagem": "Campo desconhecido: supervisor.idade"}
+    assert consultas == []
+
+
+def test_mensagem_binaria_responde_erro_e_sessao_segue(consultas):
+    with TestClient(app).websocket_connect("/validacao/ao-vivo") as ws:
+        ws.send_bytes(b"\x00\x01")
+        erro = ws.receive_json()
+        ws.send_json({"campos": {"supervisor.cpf": "111"}})
+        supervisor = ws.receive_json()
+    assert erro == {"tipo": "erro", "mensagem": "As mensagens devem ser texto (JSON)."}
+    assert supervisor["trecho"] == "supervisor"
+
+
+def test_documento_completo_consulta_o_cnpj_uma_vez_por_sessao(consultas):
+    outro_cnpj = "11.222.333/0001-81"
+    with TestClient(app).websocket_connect("/validacao/ao-vivo") as ws:
+        ws.send_json({"documento": documento()})
+        mensagens = receber_ate(ws, "verificacao")
+        ws.send_json({"campos": {"unidade_concedente.cnpj": outro_cnpj}})
+        outra = receber_ate(ws, "verificacao")[-1]
+        ws.send_json({"campos": {"unidade_concedente.cnpj": EXEMPLO["unidade_concedente"]["cnpj"]}})
+        de_volta = receber_ate(ws, "verificacao")[-1]
+        ws.send_json({"campos": {"estagiario.nome": "Gabriel Souza"}})
+        ws.send_json({"campos": {"estagiario.endereco.estado": "RJ"}})
+        depois = receber_ate(ws, "trecho")
+
+    trechos = {m["trecho"]: m for m in mensagens if m["tipo"] == "trecho"}
+    assert trechos["documento"]["valido"] and trechos["documento"]["completo"]
+    assert len(trechos) == 9
+    assert mensagens[-1] == {"tipo": "verificacao", "nome": "cnpj_concedente",
+                             "campo": "unidade_concedente.cnpj", "resultado": "ok", "erro": None}
+    assert outra["resultado"] == de_volta["resultado"] == "ok"
+    assert consultas == ["10882594000912", "11222333000181"]
+    # Trocar o nome não muda o resultado de nenhum trecho: nada é enviado
+    assert depois[0]["trecho"] == "estagiario.endereco" and not depois[0]["valido"]
+
+
+def test_trechos_sem_mudanca_vem_da_memoria():
+    sessao = SessaoAoVivo()
+    campos = {"estagiario.endereco.cep": "07190-100", "estagiario.endereco.estado": "SP"}
+    sessao.atualizar(campos)
+    validado = sessao.resultados["estagiario.endereco"]
+    sessao.atualizar({"estagiario.endereco.estado": "RJ"})
+    sessao.atualizar({"estagiario.endereco.estado": "SP"})
+    assert sessao.resultados["estagiario.endereco"] is validado
+    sessao.atualizar({"supervisor.nome": "Ana"})
+    assert sessao.resultados["estagiario.endereco"] is validado
+
+
+def test_rota_http_por_trecho(consultas):
+    cliente = TestClient(app)
+    endereco = cliente.post("/validacao/trecho/estagiario.endereco", json={"cep": "01310-100", "estado": "RJ"})
+    concedente = cliente.post("/validacao/trecho/unidade_concedente",
+                              json=copy.deepcopy(EXEMPLO["unidade_concedente"]))
+    desconhecido = cliente.post("/validacao/trecho/estagiario.carro", json={})
+    campo_a_mais = cliente.post("/validacao/trecho/supervisor", json={"idade": 30})
+
+    assert endereco.status_code == 200
+    corpo = endereco.json()
+    assert (corpo["completo"], corpo["valido"]) == (False, False)
+    assert corpo["erros"][0]["loc"] == ["estagiario", "endereco", "estado"]
+    corpo = concedente.json()
+    assert corpo["valido"] and corpo["erros"] == []
+    assert [v["resultado"] for v in corpo["verificacoes"]] == ["ok"]
+    assert consultas == ["10882594000912"]
+    assert desconhecido.status_code == 404
+    assert campo_a_mais.status_code == 422
+
+
+def test_sessao_nao_conta_recusas(consultas):
+    linha = 'validation_rejections_total{rule="cpf.invalid_length"}'
+
+    def contagem():
+        for l in registry.render().splitlines():
+            if l.startswith(linha + " "):
+                return float(l.rsplit(" ", 1)[1])
+        return 0.0
+
+    antes = contagem()
+    cliente = TestClient(app)
+    with cliente.websocket_connect("/validacao/ao-vivo") as ws:
+        for digitado in ("8", "87", "877", "877.5", "877.54"):
+            ws.send_json({"campos": {"supervisor.cpf": digitado}})
+            while ws.receive_json()["trecho"] != "supervisor":
+                pass
+    cliente.post("/validacao/trecho/supervisor", json={"cpf": "877"})
+    assert contagem() == antes
@@ -0,0 +1,421 @@
+# Testes dos endpoints da API.
+# A BrasilAPI é substituída por um httpx.MockTransport: nenhum teste acessa a rede.
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from api.idempotencia import CacheDeRespostas, set_cache_respostas
+from api.lote import ler_registros, ErroLote
+from api.main import CAMINHO_OPENAPI, app, get_http_client
+from api.regras import CAMINHO_PADRAO, CONJUNTO_DE_REGRAS, ConjuntoDeRegras, ErroNasRegras, FonteDeRegras, set_regras
+from api.schemas import ValidacaoDocumentoSchema
+from tests.exemplos import documento
+from utils.cnpj_cache import CNPJCache, set_cnpj_cache
+from utils.cnpj_resolver import set_cnpj_resolver
+
+
+def brasilapi_fake(status_code=200, json=None):
+    chamadas = []
+
+    def handler(request):
+        chamadas.append(request.url.path)
+        return httpx.Response(status_code, json=json if json is not None else {"razao_social": "EMPRESA"})
+
+    return handler, chamadas
+
+
+@pytest.fixture(autouse=True)
+def cache_isolado():
+    # Cada teste começa com um cache vazio, somente em memória
+    cache = CNPJCache()
+    set_cnpj_cache(cache)
+    set_cache_respostas(CacheDeRespostas())
+    yield cache
+    set_cnpj_cache(None)
+    set_cache_respostas(None)
+
+
+@pytest.fixture
+def cliente_api():
+    def _cliente(handler):
+        fake = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        app.dependency_overrides[get_http_client] = lambda: fake
+        return TestClient(app)
+
+    yield _cliente
+    app.dependency_overrides.clear()
+
+
+def test_validacao_sucesso(cliente_api):
+    handler, chamadas = brasilapi_fake()
+    with cliente_api(handler) as client:
+        resposta = client.post("/validacao/", json=documento())
+    assert resposta.status_code == 200
+    assert resposta.json()["status"] == "sucesso"
+    assert chamadas == ["/api/cnpj/v1/10882594000912"]
+
+
+def test_validacao_cnpj_inexistente(cliente_api):
+    handler, _ = brasilapi_fake(status_code=404, json={})
+    with cliente_api(handler) as client:
+        resposta = client.post("/validacao/", json=documento())
+    assert resposta.status_code == 422
+    erro = resposta.json()["detail"][0]
+    assert erro["loc"] == ["body", "unidade_concedente", "cnpj"]
+    assert "não existe na Receita Federal" in erro["msg"]
+
+
+def test_validacao_local_falha_nao_consulta_cnpj(cliente_api):
+    # Erros do schema são detectados antes da etapa externa
+    handler, chamadas = brasilapi_fake()
+    with cliente_api(handler) as client:
+        resposta = client.post("/validacao/", json=documento(dados_estagio__horas_semanais=40))
+    assert resposta.status_code == 422
+    assert chamadas == []
+
+
+def test_validacao_todos_os_erros(cliente_api):
+    # Um erro de campo não impede a avaliação das regras que não dependem dele
+    doc = documento(
+        supervisor__cpf="123",
+        dados_estagio__horario_termino="18:00",
+        dados_estagio__horas_semanais=40,
+        estagiario__data_nascimento="2015-01-01",
+    )
+    handler, chamadas = brasilapi_fake()
+    with cliente_api(handler) as client:
+        padrao = client.post("/validacao/", json=doc)
+        completo = client.post("/validacao/?todos_os_erros=true", json=doc)
+    assert len(padrao.json()["detail"]) == 2
+    erros = {(erro["codigo"], tuple(erro["loc"])) for erro in completo.json()["detail"]}
+    assert erros == {
+        ("cpf.invalid_length", ("body", "supervisor", "cpf")),
+        ("horario.limite_diario", ("body", "dados_estagio", "horario_termino")),
+        ("horario.limite_semanal", ("body", "dados_estagio", "horas_semanais")),
+        ("idade.minima", ("body", "estagiario", "data_nascimento")),
+    }
+    assert chamadas == []
+
+
+def test_validacao_cep_de_outra_uf(cliente_api):
+    doc = documento(unidade_concedente__endereco__estado="AM", estagiario__endereco__estado="sp")
+    handler, chamadas = brasilapi_fake()
+    with cliente_api(handler) as client:
+        resposta = client.post("/validacao/", json=doc)
+        completo = client.post("/validacao/?todos_os_erros=true", json=doc)
+    assert resposta.status_code == 422
+    (erro,) = resposta.json()["detail"]
+    assert erro["loc"] == ["body", "unidade_concedente", "endereco", "estado"]
+    assert erro["msg"] == "Value error, O CEP 01310-100 pertence a São Paulo (SP), não a AM."
+    assert [e["codigo"] for e in completo.json()["detail"]] == ["cep.uf_mismatch"]
+    assert chamadas == []
+
+
+def test_validacao_todos_os_erros_campo_invalido_pula_regra(cliente_api):
+    handler, _ = brasilapi_fake()
+    with cliente_api(handler) as client:
+        resposta = client.post(
+            "/validacao/?todos_os_erros=true",
+            json=documento(dados_estagio__data_inicio="ontem", estagiario__data_nascimento="2015-01-01"),
+        )
+    codigos = [erro["codigo"] for erro in resposta.json()["detail"]]
+    # As regras de datas, duração e idade dependem de data_inicio, que é inválida
+    assert codigos == ["date_from_datetime_parsing"]
+
+
+def test_validacao_reaproveita_cache_cnpj(cliente_api):
+    handler, chamadas = brasilapi_fake()
+    with cliente_api(handler) as client:
+        assert client.post("/validacao/", json=documento()).status_code == 200
+        # Outro documento da mesma concedente: não há resposta guardada, mas o CNPJ está no cache
+        assert client.post("/validacao/", json=documento(estagiario__nome="Outra Pessoa")).status_code == 200
+        stats = client.get("/cache/cnpj").json()
+        assert client.delete("/cache/cnpj/10.882.594/0009-12").json()["removido"] is True
+    assert len(chamadas) == 1
+    assert stats["memory_hits"] == 1
+
+
+def test_validacao_reenvio_usa_resposta_guardada(cliente_api):
+    handler, chamadas = brasilapi_fake()
+    with cliente_api(handler) as client:
+        primeira = client.post("/validacao/", json=documento())
+        # Mesmo conteúdo, com outra ordem de chaves e outros espaços
+        reordenado = json.dumps(dict(reversed(list(documento().items()))), indent=2)
+        segunda = client.post("/validacao/", content=reordenado, headers={"Content-Type": "application/json"})
+        outro_modo = client.post("/validacao/?todos_os_erros=true", json=documento())
+    assert (primeira.headers["X-Cache"], segunda.headers["X-Cache"]) == ("MISS", "HIT")
+    assert segunda.content == primeira.content
+    assert segunda.headers["ETag"] == primeira.headers["ETag"]
+    assert outro_modo.headers["X-Cache"] == "MISS"
+    assert len(chamadas) == 1
+
+
+def test_validacao_resposta_guardada_preserva_422(cliente_api):
+    handler, _ = brasilapi_fake(status_code=404, json={})
+    with cliente_api(handler) as client:
+        primeira = client.post("/validacao/", json=documento())
+        segunda = client.post("/validacao/", json=documento())
+    assert primeira.status_code == segunda.status_code == 422
+    assert segunda.headers["X-Cache"] == "HIT"
+    assert segunda.json() == primeira.json()
+    assert primeira.json()["detail"][0]["loc"] == ["body", "unidade_concedente", "cnpj"]
+
+
+def test_validacao_falha_transitoria_nao_e_guardada(cliente_api):
+    handler, _ = brasilapi_fake(status_code=503, json={})
+    try:
+        with cliente_api(handler) as client:
+            primeira = client.post("/validacao/", json=documento())
+            segunda = client.post("/validacao/", json=documento())
+    finally:
+        # Descarta os disjuntores abertos pelas falhas
+        set_cnpj_resolver(None)
+    assert primeira.status_code == 422
+    assert segunda.headers["X-Cache"] == "MISS"
+
+
+def test_validacao_idempotency_key(cliente_api):
+    handler, chamadas = brasilapi_fake()
+    with cliente_api(handler) as client:
+        chave = {"Idempotency-Key": "pedido-123"}
+        primeira = client.post("/validacao/", json=documento(), headers=chave)
+        repetida = client.post("/validacao/", json=documento(), headers=chave)
+        outro_doc = client.post("/validacao/", json=documento(estagiario__nome="Outra Pessoa"), headers=chave)
+    assert "Idempotent-Replayed" not in primeira.headers
+    assert repetida.headers["Idempotent-Replayed"] == "true"
+    assert repetida.content == primeira.content
+    assert outro_doc.status_code == 422
+    assert "Idempotency-Key" in outro_doc.json()["detail"]
+    assert len(chamadas) == 1
+
+
+def test_validacao_if_none_match(cliente_api):
+    handler, _ = brasilapi_fake()
+    with cliente_api(handler) as client:
+        etag = client.post("/validacao/", json=documento()).headers["ETag"]
+        resposta = client.post("/validacao/", json=documento(), headers={"If-None-Match": f'W/{etag}'})
+        diferente = client.post("/validacao/", json=documento(), headers={"If-None-Match": '"outra"'})
+    assert resposta.status_code == 304
+    assert resposta.content == b""
+    assert resposta.headers["ETag"] == etag
+    assert diferente.status_code == 200
+
+
+def test_validacao_json_invalido(cliente_api):
+    handler, _ = brasilapi_fake()
+    with cliente_api(handler) as client:
+        resposta = client.post("/validacao/", content=b'{"a":', headers={"Content-Type": "application/json"})
+        vazio = client.post("/validacao/")
+    assert resposta.status_code == 422
+    assert resposta.json()["detail"][0]["type"] == "json_invalid"
+    assert vazio.json()["detail"][0]["type"] == "missing"
+
+
+# --- Regras de negócio configuráveis ---
+
+def gravar_regras(caminho, **limites):
+    with open(CAMINHO_PADRAO, encoding="utf-8") as f:
+        config = json.load(f)
+    for item in config["regras"]:
+        item.update(limites.get(item["tipo"], {}))
+    caminho.write_text(json.dumps(config), encoding="utf-8")
+
+
+@pytest.fixture
+def regras_em_arquivo(tmp_path):
+    caminho = tmp_path / "regras.json"
+    gravar_regras(caminho)
+    fonte = FonteDeRegras(str(caminho), check_interval=0)
+    set_regras(fonte)
+    yield caminho, fonte
+    set_regras(None)
+
+
+def test_regras_limites_do_arquivo(cliente_api, regras_em_arquivo):
+    caminho, fonte = regras_em_arquivo
+    handler, _ = brasilapi_fake()
+    with cliente_api(handler) as client:
+        assert client.post("/validacao/", json=documento()).status_code == 200
+
+        # Outro convênio: até 20 h semanais e estágios de até 1 ano
+        gravar_regras(caminho, limite_horas_semanais={"limite": 20}, duracao_maxima={"dias": 365})
+        resposta = client.post("/validacao/?todos_os_erros=true", json=documento(dados_estagio__data_termino="2026-06-30"))
+        regras = client.get("/regras").json()
+    mensagens = {erro["codigo"]: erro["msg"] for erro in resposta.json()["detail"]}
+    assert "limite permitido de 20 horas" in mensagens["horario.limite_semanal"]
+    assert "não pode exceder 1 ano, exceto para estagiários PCD" in mensagens["duracao.limite"]
+    assert regras["recargas"] == 1
+
+
+def test_validacao_regras_novas_invalidam_respostas(cliente_api, regras_em_arquivo):
+    caminho, _ = regras_em_arquivo
+    handler, _ = brasilapi_fake()
+    with cliente_api(handler) as client:
+        assert client.post("/validacao/", json=documento()).status_code == 200
+        gravar_regras(caminho, limite_horas_semanais={"limite": 20})
+        resposta = client.post("/validacao/", json=documento())
+    assert resposta.status_code == 422
+    assert resposta.headers["X-Cache"] == "MISS"
+
+
+def test_regras_arquivo_invalido_mantem_conjunto_anterior(regras_em_arquivo):
+    caminho, fonte = regras_em_arquivo
+    anterior = fonte.vigente()
+    caminho.write_text('{"regras": [{"tipo": "limite_horas_semanais", "limite": 20, "depende_de": ["x"]}]}')
+    assert fonte.vigente() is anterior
+    assert "regra inexistente: x" in fonte.stats()["erro"]
+
+
+def test_regras_desligadas_e_dependencias():
+    config = {"regras": [
+        {"tipo": "horario_termino_apos_inicio", "ativa": False},
+        {"tipo": "limite_horas_diarias", "limite": 8},
+        {"tipo": "idade_minima", "anos": 16},
+    ]}
+    conjunto = ConjuntoDeRegras(config)
+    # A dependência de uma regra desligada é ignorada
+    assert [r.depende_de for r in conjunto.regras] == [(), ()]
+    doc = ValidacaoDocumentoSchema.model_validate(
+        documento(estagiario__data_nascimento="2008-06-01"), context={CONJUNTO_DE_REGRAS: conjunto})
+    assert doc.estagiario.nome
+
+    with pytest.raises(ErroNasRegras, match="circular"):
+        ConjuntoDeRegras({"regras": [
+            {"tipo": "horario_termino_apos_inicio", "depende_de": ["horario.limite_diario"]},
+            {"tipo": "limite_horas_diarias", "limite": 6},
+        ]})
+    with pytest.raises(ErroNasRegras, match="Parâmetros inválidos"):
+        ConjuntoDeRegras({"regras": [{"tipo": "idade_minima", "idade": 18}]})
+    with pytest.raises(ErroNasRegras, match="esperado int"):
+        ConjuntoDeRegras({"regras": [{"tipo": "idade_minima", "anos": "18"}]})
+
+
+# --- Métricas ---
+
+def amostra(texto, linha):
+    for l in texto.splitlines():
+        if l.startswith(linha + " "):
+            return float(l.rsplit(" ", 1)[1])
+    return None
+
+
+def test_metricas_prometheus(cliente_api):
+    handler, _ = brasilapi_fake()
+    with cliente_api(handler) as client:
+        antes = client.get("/metrics").text
+        client.post("/validacao/", json=documento())
+        client.post("/validacao/", json=documento(supervisor__cpf="123", dados_estagio__horas_semanais=40))
+        resposta = client.get("/metrics")
+    texto = resposta.text
+    assert resposta.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    def delta(linha):
+        return amostra(texto, linha) - (amostra(antes, linha) or 0)
+
+    assert delta('validation_rejections_total{rule="cpf.invalid_length"}') == 1
+    assert delta('validation_rejections_total{rule="horario.limite_semanal"}') == 1
+    assert delta('validation_stage_duration_seconds_count{stage="schema"}') == 2
+    assert delta('validation_stage_duration_seconds_count{stage="externa"}') == 1
+    assert delta('validator_duration_seconds_count{validator="validar_regras_documento"}') == 1
+    assert delta('http_request_duration_seconds_count{method="POST",route="/validacao/",status="422"}') == 1
+    assert delta('cnpj_provider_request_duration_seconds_count{provider="brasilapi",status="200"}') == 1
+    assert amostra(texto, 'cnpj_cache_lookups_total{result="miss"}') == 1
+
+
+def test_sonda_desligada_nao_mede(cliente_api):
+    from utils.metrics import registry
+
+    handler, _ = brasilapi_fake()
+    sonda = registry.probe("validators")
+    sonda.enabled = False
+    try:
+        with cliente_api(handler) as client:
+            antes = client.get("/metrics").text
+            client.post("/validacao/", json=documento())
+            depois = client.get("/metrics").text
+    finally:
+        sonda.enabled = True
+    linha = 'validator_duration_seconds_count{validator="cpf"}'
+    assert amostra(depois, linha) == amostra(antes, linha)
+
+
+# --- Lote (NDJSON) ---
+
+def test_lote_ndjson(cliente_api):
+    handler, chamadas = brasilapi_fake()
+    corpo = "\n".join([
+        json.dumps(documento()),
+        "{quebrado",
+        json.dumps(documento(dados_estagio__horas_semanais=40)),
+        json.dumps(documento()),
+    ])
+    with cliente_api(handler) as client:
+        resposta = client.post("/validacao/lote", content=corpo, headers={"Content-Type": "application/x-ndjson"})
+    assert resposta.status_code == 200
+    linhas = sorted((json.loads(l) for l in resposta.text.splitlines()), key=lambda l: l["indice"])
+    assert [l["status"] for l in linhas] == ["sucesso", "erro", "erro", "sucesso"]
+    assert linhas[1]["erros"][0]["type"] == "json_invalid"
+    assert len(chamadas) == 1  # mesmo CNPJ: cache + agrupamento
+
+
+def test_lote_array_json(cliente_api):
+    handler, _ = brasilapi_fake()
+    with cliente_api(handler) as client:
+        resposta = client.post("/validacao/lote?concorrencia=2", json=[documento() for _ in range(5)])
+    indices = sorted(json.loads(l)["indice"] for l in resposta.text.splitlines())
+    assert indices == [0, 1, 2, 3, 4]
+
+
+def test_ler_registros_incremental():
+    async def pedacos(texto, tamanho):
+        dados = texto.encode()
+        for i in range(0, len(dados), tamanho):
+            yield dados[i:i + tamanho]
+
+    async def ler(texto, tamanho):
+        return [r async for r in ler_registros(pedacos(texto, tamanho))]
+
+    texto = json.dumps([{"a": "ção"}, 12345, {"b": [1, 2]}])
+    for tamanho in (1, 3, 7, 1000):
+        assert asyncio.run(ler(texto, tamanho)) == [(0, {"a": "ção"}), (1, 12345), (2, {"b": [1, 2]})]
+
+    with pytest.raises(ErroLote):
+        asyncio.run(ler('[{"a": 1}, {"b"', 4))
+
+
+# --- Inicialização (cold start) ---
+
+def test_openapi_pre_gerado_em_dia():
+    from tools.gerar_openapi import conteudo
+
+    with open(CAMINHO_OPENAPI, encoding="utf-8") as f:
+        assert f.read() == conteudo(), "api/openapi.json desatualizado: rode python -m tools.gerar_openapi"
+
+
+def test_openapi_servido_do_arquivo():
+    client = TestClient(app)
+    assert client.get("/openapi.json").json() == json.loads(open(CAMINHO_OPENAPI, encoding="utf-8").read())
+
+
+def test_importacao_nao_carrega_modulos_sob_demanda():
+    from tools.orcamento_importacao import carregados_antes_da_hora
+
+    assert carregados_antes_da_hora() == []
+
+
+def test_cliente_http_compartilhado_entre_requisicoes():
+    from utils.http_client import close_async_client, shared_async_client
+
+    async def duas_invocacoes():
+        primeiro = shared_async_client()
+        segundo = shared_async_client()
+        await close_async_client()
+        return primeiro, segundo
+
+    primeiro, segundo = asyncio.run(duas_invocacoes())
+    assert primeiro is segundo
+    assert primeiro.is_closed
@@ -0,0 +1,568 @@
+# Testes da camada de consulta de CNPJ (cache, agrupamento, resiliência).
+
+import asyncio
+import multiprocessing
+import time
+
+import httpx
+import pytest
+
+from utils.cnpj_cache import CNPJCache, set_cnpj_cache
+from utils.cnpj_shared_cache import PROBE, SharedCNPJCache
+from utils.document_validator import lookup_cnpj
+from utils.singleflight import SingleFlight
+from utils.cnpj_providers import BrasilAPIProvider, CNPJProvider, MinhaReceitaProvider
+from utils.cnpj_resolver import CNPJResolver
+from utils.rate_limit import SharedTokenBucket, fcntl
+from utils.cnpj_result import (
+    CNPJLookupResult,
+    CNPJ_FOUND,
+    CNPJ_NOT_FOUND,
+    CNPJ_CONNECTION_ERROR,
+    CNPJ_PROVIDER_ERROR,
+    CNPJ_UNAVAILABLE,
+    CNPJ_RATE_LIMITED,
+)
+from utils.resilience import CircuitBreaker, RetryBudget
+from tools.fake_brasilapi import FakeBrasilAPI
+
+CNPJ = "10882594000912"
+ENCONTRADO = CNPJLookupResult(CNPJ_FOUND, 200, "EMPRESA")
+INEXISTENTE = CNPJLookupResult(CNPJ_NOT_FOUND, 404)
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+# --- Cache ---
+
+def test_cache_ttl_positivo_e_negativo():
+    relogio = Relogio()
+    cache = CNPJCache(ttl=100, negative_ttl=10, clock=relogio)
+    cache.set(CNPJ, ENCONTRADO)
+    cache.set("11111111000111", INEXISTENTE)
+    assert cache.get(CNPJ) == ENCONTRADO
+    assert cache.get("11111111000111") == INEXISTENTE
+
+    relogio.agora += 50
+    assert cache.get(CNPJ) == ENCONTRADO
+    assert cache.get("11111111000111") is None
+
+
+def test_cache_nao_guarda_erros_transitorios():
+    cache = CNPJCache()
+    assert cache.set(CNPJ, CNPJLookupResult(CNPJ_CONNECTION_ERROR)) is False
+    assert cache.get(CNPJ) is None
+
+
+def test_cache_lru_limitado():
+    cache = CNPJCache(max_entries=2)
+    cache.set("1", ENCONTRADO)
+    cache.set("2", ENCONTRADO)
+    cache.get("1")
+    cache.set("3", ENCONTRADO)
+    assert cache.get("2") is None
+    assert cache.get("1") == ENCONTRADO
+
+
+def test_cache_sqlite_sobrevive_reinicio(tmp_path):
+    caminho = str(tmp_path / "cache.sqlite3")
+    cache = CNPJCache(path=caminho)
+    cache.set(CNPJ, ENCONTRADO)
+    cache.close()
+
+    cache = CNPJCache(path=caminho)
+    assert cache.get(CNPJ) == ENCONTRADO
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.invalidate(CNPJ) is True
+    assert cache.get(CNPJ) is None
+    cache.close()
+
+
+
+def test_cache_sqlite_travado_vira_gravacao_pulada(tmp_path, monkeypatch):
+    import sqlite3
+    from utils import cnpj_cache
+
+    monkeypatch.setattr(cnpj_cache, "DISK_TIMEOUT", 0.05)
+    caminho = str(tmp_path / "cache.sqlite3")
+    cache = CNPJCache(path=caminho)
+    outro_worker = sqlite3.connect(caminho, isolation_level=None)
+    outro_worker.execute("BEGIN IMMEDIATE")
+    try:
+        assert asyncio.run(cache.set_async(CNPJ, ENCONTRADO))
+        assert asyncio.run(cache.get_async(CNPJ)) == ENCONTRADO     # da memória
+    finally:
+        outro_worker.execute("ROLLBACK")
+        outro_worker.close()
+    assert cache.stats()["disk_errors"] == 1
+    cache.close()
+
+
+def test_diretorio_de_estado_privado(tmp_path, monkeypatch):
+    import os
+    from utils.state_dir import state_dir, state_path
+
+    diretorio = tmp_path / "estado"
+    monkeypatch.setenv("VALIDACAO_STATE_DIR", str(diretorio))
+    assert state_path("cnpj_cache.sqlite3") == str(diretorio / "cnpj_cache.sqlite3")
+    assert diretorio.stat().st_mode & 0o777 == 0o700
+    diretorio.chmod(0o755)
+    state_dir()
+    assert diretorio.stat().st_mode & 0o777 == 0o700
+
+    link = tmp_path / "link"
+    os.symlink(diretorio, link)
+    monkeypatch.setenv("VALIDACAO_STATE_DIR", str(link))
+    with pytest.raises(PermissionError):
+        state_dir()
+
+# --- Tabela compartilhada entre workers (utils/cnpj_shared_cache.py) ---
+
+requer_fcntl = pytest.mark.skipif(fcntl is None, reason="sem fcntl, não há tabela compartilhada")
+
+
+@requer_fcntl
+def test_cache_compartilhado_entre_instancias(tmp_path):
+    relogio = Relogio()
+    caminho = str(tmp_path / "cnpj.shm")
+    worker_a = CNPJCache(ttl=100, negative_ttl=10, clock=relogio, shared=SharedCNPJCache(caminho, slots=64, clock=relogio))
+    worker_b = CNPJCache(ttl=100, clock=relogio, shared=SharedCNPJCache(caminho, slots=1024, clock=relogio))
+    longa = CNPJLookupResult(CNPJ_FOUND, 200, "AÇÚCAR " * 20)
+    worker_a.set(CNPJ, longa)
+    worker_a.set("11111111000111", INEXISTENTE)
+    # O segundo processo usa o tamanho do arquivo que já existia
+    assert worker_b.stats()["shared"]["slots"] == 64
+    assert worker_b.get("11111111000111") == INEXISTENTE
+    lida = worker_b.get(CNPJ)
+    assert worker_b.stats()["shared_hits"] == 2
+    assert longa.razao_social.startswith(lida.razao_social) and len(lida.razao_social.encode()) <= 88
+    assert worker_b.invalidate(CNPJ) is True
+    assert worker_a.get(CNPJ) == longa   # ainda no nível em memória do worker A
+    relogio.agora += 10
+    assert SharedCNPJCache(caminho, clock=relogio).get("11111111000111") is None
+
+
+@requer_fcntl
+def test_tabela_compartilhada_no_diretorio_privado_recusa_arquivo_alheio(tmp_path, monkeypatch):
+    import os
+    from utils.cnpj_cache import _cache_from_env
+
+    monkeypatch.delenv("CNPJ_CACHE_SHARED_PATH", raising=False)
+    monkeypatch.setenv("CNPJ_CACHE_PATH", "")
+    monkeypatch.setenv("VALIDACAO_STATE_DIR", str(tmp_path / "estado"))
+    cache = _cache_from_env()
+    assert (tmp_path / "estado" / "cnpj_cache.shm").exists()
+    cache.close()
+
+    if os.geteuid() == 0:
+        alheio = tmp_path / "alheio.shm"
+        alheio.write_bytes(b"")
+        os.chown(alheio, 4321, 4321)
+        with pytest.raises(PermissionError):
+            SharedCNPJCache(str(alheio))
+
+
+@requer_fcntl
+def test_cache_compartilhado_despeja_a_que_vence_primeiro(tmp_path):
+    relogio = Relogio()
+    tabela = SharedCNPJCache(str(tmp_path / "cnpj.shm"), slots=PROBE, clock=relogio)
+    cnpjs = [f"{i:014d}" for i in range(PROBE + 1)]
+    for i, cnpj in enumerate(cnpjs[:-1]):
+        assert tabela.set(cnpj, ENCONTRADO, relogio.agora + 100 + i)
+    tabela.set(cnpjs[-1], ENCONTRADO, relogio.agora + 500)
+    assert tabela.get(cnpjs[0]) is None
+    assert all(tabela.get(cnpj) is not None for cnpj in cnpjs[1:])
+    assert tabela.stats()["evictions"] == 1
+    assert tabela.entries() == PROBE
+
+
+@requer_fcntl
+def test_cache_compartilhado_sobrevive_escrita_interrompida(tmp_path):
+    relogio = Relogio()
+    tabela = SharedCNPJCache(str(tmp_path / "cnpj.shm"), slots=64, clock=relogio)
+    tabela.set(CNPJ, ENCONTRADO, relogio.agora + 100)
+    # Um worker morreu no meio de uma escrita: seq ímpar e conteúdo pela metade
+    posicao = tabela._window(CNPJ.encode())[0]
+    tabela._mm[posicao] += 1
+    tabela._mm[posicao + 40:posicao + 44] = b"XXXX"
+    assert tabela.get(CNPJ) is None
+    assert tabela.stats()["torn_reads"] >= 1
+    # A próxima escrita reaproveita a posição
+    tabela.set(CNPJ, INEXISTENTE, relogio.agora + 100)
+    assert tabela.get(CNPJ)[0] == INEXISTENTE
+    assert tabela.stats()["repairs"] == 1
+
+
+def _gravar_muitos(caminho, inicio, n):
+    tabela = SharedCNPJCache(caminho, slots=4096)
+    for i in range(inicio, inicio + n):
+        tabela.set(f"{i:014d}", CNPJLookupResult(CNPJ_FOUND, 200, f"EMPRESA {i}"), time.time() + 100)
+
+
+@requer_fcntl
+def test_cache_compartilhado_entre_processos(tmp_path):
+    caminho = str(tmp_path / "cnpj.shm")
+    tabela = SharedCNPJCache(caminho, slots=4096)
+    contexto = multiprocessing.get_context("fork")
+    processos = [contexto.Process(target=_gravar_muitos, args=(caminho, i * 200, 200)) for i in range(4)]
+    for processo in processos:
+        processo.start()
+    # Leituras simultâneas às escritas: nunca uma entrada misturada
+    while any(processo.is_alive() for processo in processos):
+        for i in range(0, 800, 7):
+            lida = tabela.get(f"{i:014d}")
+            assert lida is None or lida[0].razao_social == f"EMPRESA {i}"
+    for processo in processos:
+        processo.join(30)
+    assert all(tabela.get(f"{i:014d}")[0].razao_social == f"EMPRESA {i}" for i in range(800))
+
+
+# --- Agrupamento de consultas simultâneas (single-flight) ---
+
+def test_singleflight_agrupa_chamadas_simultaneas():
+    async def cenario():
+        sf = SingleFlight()
+        execucoes = []
+
+        async def consulta():
+            execucoes.append(1)
+            await asyncio.sleep(0.01)
+            return ENCONTRADO
+
+        resultados = await asyncio.gather(*(sf.do(CNPJ, consulta) for _ in range(5)))
+        return sf, execucoes, resultados
+
+    sf, execucoes, resultados = asyncio.run(cenario())
+    assert len(execucoes) == 1
+    assert all(r == (ENCONTRADO, 4) for r in resultados)
+    assert sf.stats()["coalesced"] == 4
+    assert sf.in_flight() == 0
+
+
+def test_singleflight_compartilha_excecao():
+    async def cenario():
+        sf = SingleFlight()
+
+        async def falha():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("fora do ar")
+
+        return await asyncio.gather(*(sf.do(CNPJ, falha) for _ in range(3)), return_exceptions=True)
+
+    resultados = asyncio.run(cenario())
+    assert all(isinstance(r, RuntimeError) for r in resultados)
+
+
+def test_lookup_cnpj_uma_requisicao_para_consultas_simultaneas():
+    chamadas = []
+
+    async def handler(request):
+        chamadas.append(request.url.path)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"razao_social": "EMPRESA"})
+
+    async def cenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await asyncio.gather(*(lookup_cnpj(CNPJ, client) for _ in range(10)))
+
+    set_cnpj_cache(None)
+    try:
+        resultados = asyncio.run(cenario())
+    finally:
+        set_cnpj_cache(None)
+    assert len(chamadas) == 1
+    assert all(r.found for r in resultados)
+
+
+# --- Resiliência: disjuntor, retentativas, hedge e fallback ---
+# Os provedores apontam para servidores locais (tools/fake_brasilapi.py).
+
+def consultar(resolver, cnpj=CNPJ):
+    async def cenario():
+        async with httpx.AsyncClient(timeout=5.0) as client:
+            inicio = time.perf_counter()
+            resultado = await resolver.lookup(cnpj, client)
+            return resultado, time.perf_counter() - inicio
+    return asyncio.run(cenario())
+
+
+def test_fallback_para_provedor_alternativo():
+    with FakeBrasilAPI(taxa_erro=1.0) as fora_do_ar, FakeBrasilAPI() as alternativo:
+        resolver = CNPJResolver(
+            [BrasilAPIProvider(fora_do_ar.url_cnpj), MinhaReceitaProvider(alternativo.url + "/")],
+            hedge=False, backoff_base=0.001,
+        )
+        resultado, _ = consultar(resolver)
+    assert resultado.found
+    assert fora_do_ar.requisicoes == 1 and alternativo.requisicoes == 1
+    assert resolver.stats()["fallbacks"] == 1
+
+
+def test_provedor_sem_parse_falha_ao_ser_criado():
+    class SemParse(CNPJProvider):
+        name = "sem_parse"
+
+    with pytest.raises(TypeError):
+        SemParse("http://localhost/")
+
+
+def test_disjuntor_abre_e_falha_rapido():
+    with FakeBrasilAPI(taxa_erro=1.0, status_erro=503) as fora_do_ar:
+        resolver = CNPJResolver(
+            [BrasilAPIProvider(fora_do_ar.url_cnpj)],
+            max_retries=0, hedge=False, failure_threshold=2, recovery_timeout=60,
+        )
+        assert consultar(resolver)[0].status == CNPJ_PROVIDER_ERROR
+        assert consultar(resolver)[0].status == CNPJ_PROVIDER_ERROR
+        resultado, _ = consultar(resolver)
+    assert resultado.status == CNPJ_UNAVAILABLE
+    assert fora_do_ar.requisicoes == 2
+    assert resolver.stats()["providers"]["brasilapi"]["state"] == "open"
+
+
+def test_disjuntor_meio_aberto_fecha_apos_sucesso():
+    relogio = Relogio()
+    disjuntor = CircuitBreaker(failure_threshold=1, recovery_timeout=10, clock=relogio)
+    assert disjuntor.allow()
+    disjuntor.record_failure()
+    assert not disjuntor.allow()
+    relogio.agora += 10
+    assert disjuntor.allow()        # chamada de teste
+    assert not disjuntor.allow()    # só uma por vez
+    disjuntor.record_success()
+    assert disjuntor.state == "closed"
+
+
+def test_orcamento_de_retentativas():
+    relogio = Relogio()
+    orcamento = RetryBudget(ratio=0.5, min_per_second=0, ttl=10, clock=relogio)
+    for _ in range(4):
+        orcamento.deposit()
+    assert [orcamento.try_withdraw() for _ in range(3)] == [True, True, False]
+    relogio.agora += 11
+    orcamento.deposit()
+    orcamento.deposit()
+    assert orcamento.try_withdraw()
+
+
+def test_hedge_quando_provedor_principal_demora():
+    with FakeBrasilAPI(latencia=1.0) as lento, FakeBrasilAPI() as rapido:
+        resolver = CNPJResolver(
+            [BrasilAPIProvider(lento.url_cnpj), MinhaReceitaProvider(rapido.url + "/")],
+            hedge_default_delay=0.05,
+        )
+        resultado, duracao = consultar(resolver)
+    assert resultado.found
+    assert duracao < 0.8
+    assert resolver.stats()["hedge_wins"] == 1
+
+
+# --- Limite de taxa (utils/rate_limit.py) ---
+
+def test_limitador_fila_justa_e_descarte():
+    relogio = Relogio()
+    balde = SharedTokenBucket(rate=10, burst=2, max_wait=0.25, clock=relogio)
+    # Cada reserva fica com o próximo horário livre, na ordem de chegada
+    assert [balde.reserve() for _ in range(4)] == [0, 0, pytest.approx(0.1), pytest.approx(0.2)]
+    assert balde.reserve() is None   # esperaria 0,3 s
+    balde.cancel()                   # quem esperava 0,2 s desistiu
+    assert balde.reserve() == pytest.approx(0.2)
+    relogio.agora += 1
+    assert balde.reserve() == 0
+    assert balde.stats()["dropped"] == 1
+
+
+def test_limitador_429_reduz_taxa_e_recupera():
+    relogio = Relogio()
+    balde = SharedTokenBucket(rate=10, burst=10, max_wait=5, increase=0.25, clock=relogio)
+    balde.record_throttled(retry_after=1.0)
+    balde.record_throttled(retry_after=1.0)   # mesma rajada: reduz uma vez só
+    assert balde.stats()["effective_rate"] == 5
+    # Ninguém chama antes do Retry-After
+    assert balde.reserve() == pytest.approx(1.2)
+    for _ in range(3):
+        balde.record_success()
+    assert balde.stats()["effective_rate"] == 10
+
+
+def _reservar_muitas(caminho, n):
+    balde = SharedTokenBucket(rate=0.001, burst=1000, path=caminho)
+    for _ in range(n):
+        balde.reserve()
+
+
+@pytest.mark.skipif(fcntl is None, reason="sem fcntl, o balde vale só para o processo")
+def test_limitador_compartilhado_entre_processos(tmp_path):
+    caminho = str(tmp_path / "balde.bin")
+    contexto = multiprocessing.get_context("fork")
+    processos = [contexto.Process(target=_reservar_muitas, args=(caminho, 100)) for _ in range(4)]
+    for processo in processos:
+        processo.start()
+    for processo in processos:
+        processo.join(30)
+    # Nenhuma reserva perdida entre os processos
+    tokens, _ = SharedTokenBucket(rate=0.001, burst=1000, path=caminho).snapshot()
+    assert tokens == pytest.approx(600, abs=1)
+
+
+
+@pytest.mark.skipif(fcntl is None, reason="sem fcntl, o balde vale só para o processo")
+def test_limitador_no_diretorio_privado_recusa_arquivo_alheio(tmp_path, monkeypatch):
+    import os
+    from utils.cnpj_resolver import limiters_from_env
+
+    monkeypatch.delenv("CNPJ_RATE_LIMIT_DIR", raising=False)
+    monkeypatch.setenv("CNPJ_RATE_LIMIT", "5")
+    monkeypatch.setenv("VALIDACAO_STATE_DIR", str(tmp_path / "estado"))
+    balde = limiters_from_env([BrasilAPIProvider()])["brasilapi"]
+    assert balde.path == str(tmp_path / "estado" / "cnpj_rate_brasilapi.bin")
+
+    if os.geteuid() == 0:
+        alheio = tmp_path / "alheio.bin"
+        alheio.write_bytes(b"")
+        os.chown(alheio, 4321, 4321)
+        with pytest.raises(PermissionError):
+            SharedTokenBucket(rate=5, burst=10, path=str(alheio)).snapshot()
+
+def test_resolver_respeita_429_e_descarta_sem_abrir_disjuntor():
+    with FakeBrasilAPI(taxa_erro=1.0, status_erro=429) as limitado:
+        limitado.retry_after = 5
+        balde = SharedTokenBucket(rate=100, burst=1, max_wait=1)
+        resolver = CNPJResolver(
+            [BrasilAPIProvider(limitado.url_cnpj)], max_retries=0, hedge=False,
+            limiters={"brasilapi": balde},
+        )
+        primeiro, _ = consultar(resolver)
+        segundo, duracao = consultar(resolver)
+    assert primeiro.status == CNPJ_PROVIDER_ERROR and primeiro.retry_after == 5
+    # A consulta seguinte teria de esperar o Retry-After: descartada
+    assert segundo.status == CNPJ_RATE_LIMITED
+    assert duracao < 0.5
+    assert limitado.requisicoes == 1
+    estatisticas = resolver.stats()["providers"]["brasilapi"]
+    assert estatisticas["consecutive_failures"] == 1
+    assert estatisticas["rate_limit"]["throttled"] == 1
+    assert estatisticas["rate_limit"]["effective_rate"] == 50
+
+
+# --- Índice local da Receita Federal ---
+
+ESTABELECIMENTOS = (
+    '"11222333";"0001";"81";"1";"";"02";"20050101";"00"\n'
+    '"11444777";"0001";"61";"1";"";"08";"20190101";"01"\n'
+    '"11444777";"0002";"42";"2";"";"02";"20190101";"00"\n'
+)
+EMPRESAS = (
+    '"11222333";"ACME COMÉRCIO LTDA";"2062";"49";"1000,00";"01";""\n'
+    '"11444777";"FOO SERVIÇOS S.A.";"2054";"10";"5000,00";"05";""\n'
+)
+
+
+def gerar_indice(tmp_path, estabelecimentos=ESTABELECIMENTOS, nome="cnpj.idx"):
+    import zipfile
+    from tools.importar_receita import importar
+
+    pacote = tmp_path / "Estabelecimentos0.zip"
+    with zipfile.ZipFile(pacote, "w") as zf:
+        zf.writestr("K3241.K03200Y0.D40914.ESTABELE", estabelecimentos.encode("latin-1"))
+    empresas = tmp_path / "EMPRESAS.csv"
+    empresas.write_bytes(EMPRESAS.encode("latin-1"))
+    saida = str(tmp_path / nome)
+    importar([str(pacote)], [str(empresas)], saida)
+    return saida
+
+
+def test_indice_existencia_e_situacao(tmp_path):
+    from utils.cnpj_registry import CNPJRegistry
+
+    registro = CNPJRegistry(gerar_indice(tmp_path))
+    ativo = registro.lookup("11222333000181")
+    assert ativo.ativa and ativo.razao_social == "ACME COMÉRCIO LTDA"
+    baixado = registro.lookup("11444777000161")
+    assert not baixado.ativa and baixado.descricao_situacao == "BAIXADA"
+    assert registro.lookup("11444777000242").ativa
+    assert registro.lookup("11444777000300") is None
+    assert registro.lookup("00000000000000") is None
+    assert registro.lookup("99999999999999") is None
+
+
+def test_indice_troca_atomica(tmp_path):
+    from utils.cnpj_registry import CNPJRegistry
+
+    caminho = gerar_indice(tmp_path)
+    registro = CNPJRegistry(caminho, check_interval=0)
+    assert registro.lookup("11222333000181").ativa
+
+    # Nova importação sobre o mesmo caminho: o CNPJ passou a SUSPENSA
+    gerar_indice(tmp_path, ESTABELECIMENTOS.replace('"81";"1";"";"02"', '"81";"1";"";"03"'))
+    assert registro.lookup("11222333000181").descricao_situacao == "SUSPENSA"
+    assert registro.reloads == 1
+
+
+def test_indice_novo_invalido_mantem_o_atual(tmp_path):
+    import os
+    from utils.cnpj_registry import CNPJRegistry
+
+    caminho = gerar_indice(tmp_path)
+    registro = CNPJRegistry(caminho, check_interval=0)
+    with open(caminho, "rb") as f:
+        inteiro = f.read()
+    for conteudo in (b"", b"XXXXXXXX" + inteiro[8:], inteiro[:len(inteiro) // 2]):
+        temporario = tmp_path / "novo.idx"
+        temporario.write_bytes(conteudo)
+        os.replace(temporario, caminho)
+        assert registro.lookup("11222333000181").ativa
+    assert registro.reloads == 0
+
+
+def test_lookup_cnpj_usa_indice_sem_rede(tmp_path):
+    from utils.cnpj_registry import CNPJRegistry, set_cnpj_registry
+    from utils.cnpj_result import CNPJ_INACTIVE
+    from api.services import verificar_cnpj_concedente
+
+    def sem_rede(request):
+        raise AssertionError("o índice local deveria ter respondido")
+
+    async def cenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(sem_rede)) as client:
+            return (
+                await lookup_cnpj("11222333000181", client),
+                await lookup_cnpj("11444777000161", client),
+                await lookup_cnpj("11444777000300", client),
+                await verificar_cnpj_concedente("11.444.777/0001-61", client),
+            )
+
+    set_cnpj_registry(CNPJRegistry(gerar_indice(tmp_path)))
+    try:
+        ativo, baixado, ausente, mensagem = asyncio.run(cenario())
+    finally:
+        set_cnpj_registry(None)
+    assert ativo.found and ativo.razao_social == "ACME COMÉRCIO LTDA"
+    assert baixado.status == CNPJ_INACTIVE
+    assert ausente.status == CNPJ_NOT_FOUND
+    assert mensagem == "CNPJ com situação cadastral BAIXADA na Receita Federal: 11.444.777/0001-61"
+
+
+def test_indice_nao_autoritativo_consulta_provedor(tmp_path):
+    from utils.cnpj_registry import CNPJRegistry, set_cnpj_registry
+
+    async def handler(request):
+        return httpx.Response(200, json={"razao_social": "EMPRESA NOVA"})
+
+    async def cenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await lookup_cnpj("11444777000300", client)
+
+    set_cnpj_registry(CNPJRegistry(gerar_indice(tmp_path), authoritative=False))
+    set_cnpj_cache(None)
+    try:
+        resultado = asyncio.run(cenario())
+    finally:
+        set_cnpj_registry(None)
+    assert resultado.found and resultado.razao_social == "EMPRESA NOVA"
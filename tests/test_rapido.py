@@ -0,0 +1,176 @@
+# Testes do caminho rápido (api/rapido.py): para qualquer documento, a
+# resposta tem que ser a mesma com e sem ele.
+
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+msgspec = pytest.importorskip("msgspec")
+
+from api.idempotencia import CacheDeRespostas, set_cache_respostas
+from api.main import app, get_http_client
+from api.rapido import VERIFICACOES, CaminhoRapido, formato_aceito, formato_do_conteudo, set_caminho_rapido
+from api.regras import regras_vigentes
+from api.schemas import ValidacaoDocumentoSchema
+from tests.exemplos import documento
+from utils.cnpj_cache import CNPJCache, set_cnpj_cache
+from utils.metrics import registry
+
+
+# Alterações do exemplo (caminho com "__", valor): válidas, inválidas e as
+# que o Pydantic aceita convertendo e o msgspec recusa
+ALTERACOES = [
+    {},
+    {"unidade_concedente__cnpj": None, "unidade_concedente__cpf": "877.549.876-60"},
+    {"unidade_concedente__cnpj": "11.111.111/1111-11"},
+    {"unidade_concedente__cnpj": None},
+    {"unidade_concedente__telefone": "123"},
+    {"unidade_concedente__telefone": ""},
+    {"unidade_concedente__endereco__cep": "0131"},
+    {"unidade_concedente__endereco__estado": "XX"},
+    {"unidade_concedente__endereco__estado": "AM"},
+    {"unidade_concedente__endereco__estado": "sp"},
+    {"estagiario__endereco__cep": "69900-000"},
+    {"estagiario__endereco__cep": "00500-000"},
+    {"unidade_concedente__razao_social": "x" * 500},
+    {"supervisor__cpf": "111.111.111-11"},
+    {"supervisor__email": "sem-arroba"},
+    {"estagiario__cpf": "123"},
+    {"estagiario__celular": None},
+    {"estagiario__data_nascimento": "2020-01-01"},
+    {"estagiario__data_nascimento": "15/05/2002"},
+    {"estagiario__estagio_obrigatorio": "true"},
+    {"estagiario__estagio_obrigatorio": 1},
+    {"dados_estagio__horas_semanais": "30"},
+    {"dados_estagio__horas_semanais": 30.0},
+    {"dados_estagio__horas_semanais": 45},
+    {"dados_estagio__horario_inicio": "09:00:00"},
+    {"dados_estagio__horario_inicio": "9h"},
+    {"dados_estagio__horario_termino": "08:00"},
+    {"dados_estagio__data_termino": "2024-01-31"},
+    {"dados_estagio__valor_bolsa_auxilio": 1500},
+    {"dados_estagio__valor_bolsa_auxilio": "1500"},
+    {"dados_estagio__valor_seguro": -1},
+    {"supervisor": None},
+    {"estagiario__endereco": "Rua X"},
+]
+
+
+@pytest.fixture
+def cliente():
+    def handler(request):
+        return httpx.Response(200, json={"razao_social": "EMPRESA"})
+
+    fake = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app.dependency_overrides[get_http_client] = lambda: fake
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    set_caminho_rapido(CaminhoRapido())
+    set_cnpj_cache(None)
+    set_cache_respostas(None)
+
+
+def responder(cliente, rapido, corpo, **kwargs):
+    set_caminho_rapido(CaminhoRapido() if rapido else None)
+    set_cnpj_cache(CNPJCache())
+    set_cache_respostas(CacheDeRespostas())
+    resposta = cliente.post("/validacao/", content=corpo, **kwargs)
+    return resposta.status_code, resposta.content
+
+
+@pytest.mark.parametrize("alteracoes", ALTERACOES)
+def test_mesma_resposta_com_e_sem_caminho_rapido(cliente, alteracoes):
+    corpo = json.dumps(documento(**alteracoes)).encode()
+    assert responder(cliente, True, corpo) == responder(cliente, False, corpo)
+
+
+@pytest.mark.parametrize("corpo", [b"", b"{", b"[]", b"null", b'{"supervisor": {}}'])
+def test_corpos_invalidos_iguais(cliente, corpo):
+    assert responder(cliente, True, corpo) == responder(cliente, False, corpo)
+
+
+def test_aprovado_somente_se_pydantic_aprova():
+    caminho, regras = CaminhoRapido(), regras_vigentes()
+    for alteracoes in ALTERACOES:
+        dados = documento(**alteracoes)
+        doc = caminho.converter(dados)
+        if doc is None or not caminho.aprovado(doc, regras):
+            continue
+        modelo = ValidacaoDocumentoSchema.model_validate(dados)
+        assert msgspec.to_builtins(doc) == modelo.model_dump(mode="json"), alteracoes
+
+
+def test_recusa_contada_uma_vez(cliente):
+    # O caminho rápido recusa sem contar; quem conta é o Pydantic, que valida de novo
+    set_caminho_rapido(CaminhoRapido())
+    set_cache_respostas(None)
+    linha = 'validation_rejections_total{rule="horario.limite_semanal"}'
+
+    def contagem():
+        for l in registry.render().splitlines():
+            if l.startswith(linha + " "):
+                return float(l.rsplit(" ", 1)[1])
+        return 0.0
+
+    antes = contagem()
+    resposta = cliente.post("/validacao/", json=documento(dados_estagio__horas_semanais=45))
+    assert resposta.status_code == 422
+    assert contagem() - antes == 1
+
+
+def test_verificacoes_cobrem_os_validadores_dos_schemas():
+    for modelo, campos in VERIFICACOES.items():
+        declarados = set()
+        for decorador in modelo.__pydantic_decorators__.field_validators.values():
+            declarados.update(decorador.info.fields)
+        assert declarados == set(campos), modelo.__name__
+
+
+def test_msgpack_ida_e_volta(cliente):
+    dados = documento(unidade_concedente__cnpj=None, unidade_concedente__cpf="877.549.876-60")
+    esperado = cliente.post("/validacao/", json=dados).json()
+
+    resposta = cliente.post(
+        "/validacao/", content=msgspec.msgpack.encode(dados),
+        headers={"content-type": "application/msgpack", "accept": "application/msgpack"},
+    )
+    assert resposta.status_code == 200
+    assert resposta.headers["content-type"] == "application/msgpack"
+    assert msgspec.msgpack.decode(resposta.content) == esperado
+
+    invalido = cliente.post(
+        "/validacao/", content=msgspec.msgpack.encode({**dados, "supervisor": None}),
+        headers={"content-type": "application/msgpack"},
+    )
+    assert invalido.status_code == 422
+    assert invalido.json()["detail"][0]["loc"] == ["body", "supervisor"]
+
+    quebrado = cliente.post("/validacao/", content=b"\xc1", headers={"content-type": "application/msgpack"})
+    assert quebrado.status_code == 422
+    assert quebrado.json()["detail"][0]["type"] == "msgpack_invalid"
+
+
+def test_msgpack_sem_msgspec(cliente):
+    set_caminho_rapido(None)
+    resposta = cliente.post("/validacao/", content=b"\x80", headers={"content-type": "application/msgpack"})
+    assert resposta.status_code == 415
+
+
+def test_cache_independe_da_forma_do_corpo(cliente):
+    set_cache_respostas(CacheDeRespostas())
+    dados = documento(unidade_concedente__cnpj=None, unidade_concedente__cpf="877.549.876-60")
+    assert cliente.post("/validacao/", content=json.dumps(dados)).headers["x-cache"] == "MISS"
+    reordenado = json.dumps(dict(reversed(list(dados.items()))), indent=2)
+    assert cliente.post("/validacao/", content=reordenado).headers["x-cache"] == "HIT"
+    # A mesma validação, pedida em MessagePack, é outra resposta
+    assert cliente.post("/validacao/", json=dados, headers={"accept": "application/msgpack"}).headers["x-cache"] == "MISS"
+
+
+def test_negociacao_de_formato():
+    assert formato_do_conteudo(None) == "json"
+    assert formato_do_conteudo("text/plain") == "json"
+    assert formato_do_conteudo("application/x-msgpack; charset=binary") == "msgpack"
+    assert formato_aceito("text/html, application/msgpack;q=0.9") == "msgpack"
+    assert formato_aceito("*/*") == "json"
@@ -0,0 +1,125 @@
+# Testes do rastreamento das requisições (utils/tracing.py e
+# api/rastreamento.py): spans, Server-Timing, exportação OTLP/JSON e o log
+# de requisições lentas sem dados pessoais.
+
+import json
+import logging
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from api.idempotencia import set_cache_respostas
+from api.main import app, get_http_client
+from api.rastreamento import Rastreador, get_rastreador, mascarar_texto, set_rastreador
+from tests.exemplos import EXEMPLO
+from utils import tracing
+from utils.cnpj_cache import set_cnpj_cache
+from utils.tracing import BackgroundExporter, FileExporter, end_trace, span, start_trace
+
+CNPJ_DO_EXEMPLO = EXEMPLO["unidade_concedente"]["cnpj"]
+
+
+@pytest.fixture
+def cliente():
+    fake = httpx.AsyncClient(transport=httpx.MockTransport(
+        lambda request: httpx.Response(200, json={"razao_social": "EMPRESA"})))
+    app.dependency_overrides[get_http_client] = lambda: fake
+    set_cnpj_cache(None)
+    set_cache_respostas(None)
+    padrao = get_rastreador()
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    set_rastreador(padrao)
+
+
+def nomes(no):
+    yield no["name"]
+    for filho in no.get("children", ()):
+        yield from nomes(filho)
+
+
+def test_span_fora_de_rastro_nao_cria_nada():
+    with span("solto") as trecho:
+        assert trecho is None
+    raiz, token = start_trace("raiz")
+    with span("a", {"x": 1}):
+        with span("b") as b:
+            pass
+    end_trace(raiz, token)
+    assert [filho.name for filho in raiz.children] == ["a"]
+    assert raiz.children[0].children == [b] and b.end is not None
+    assert tracing.current_span() is None
+
+
+def test_rastro_limitado(monkeypatch):
+    monkeypatch.setattr(tracing, "MAX_SPANS", 3)
+    raiz, token = start_trace("raiz")
+    for _ in range(5):
+        with span("filho"):
+            pass
+    end_trace(raiz, token)
+    assert len(raiz.children) == 2
+    assert tracing.to_dict(raiz)["dropped_spans"] == 3
+
+
+def test_server_timing_e_trace_id(cliente):
+    set_rastreador(Rastreador(limiar_lento=None))
+    resposta = cliente.post("/validacao/", json=EXEMPLO)
+    assert resposta.status_code == 200
+    etapas = dict(parte.split(";dur=") for parte in resposta.headers["server-timing"].split(", "))
+    assert {"parse", "externa", "resposta", "total"} <= set(etapas)
+    assert float(etapas["total"]) >= float(etapas["externa"])
+    assert len(resposta.headers["x-trace-id"]) == 32
+    assert get_rastreador().stats()["rastros"] == 1
+
+
+def test_log_de_requisicao_lenta_sem_dados_pessoais(cliente, caplog):
+    set_rastreador(Rastreador(limiar_lento=1e-9))
+    with caplog.at_level(logging.WARNING, logger="api.rastreamento"):
+        resposta = cliente.post("/validacao/", json=EXEMPLO, params={"todos_os_erros": "true"})
+    assert resposta.status_code == 200
+    [registro] = caplog.records
+    arvore = json.loads(registro.getMessage().split(": ", 1)[1])
+    assert arvore["name"] == "POST /validacao/"
+    assert arvore["trace_id"] == resposta.headers["x-trace-id"]
+    encontrados = set(nomes(arvore))
+    assert {"schema", "validador.cpf", "validador.verificar_documento_obrigatorio",
+            "verificador.cnpj_concedente", "cnpj.brasilapi"} <= encontrados
+    digitos = "".join(c for c in CNPJ_DO_EXEMPLO if c.isdigit())
+    assert digitos not in registro.getMessage() and CNPJ_DO_EXEMPLO not in registro.getMessage()
+    assert "10.***.***/0009-**" in registro.getMessage()
+
+
+def test_amostra_do_log_lento(cliente, caplog):
+    set_rastreador(Rastreador(limiar_lento=1e-9, amostra_lenta=0.5, aleatorio=lambda: 0.7))
+    with caplog.at_level(logging.WARNING, logger="api.rastreamento"):
+        cliente.get("/")
+    assert caplog.records == []
+    assert get_rastreador().stats()["lentos"] == 1
+
+
+def test_exportacao_otlp_em_arquivo(cliente, tmp_path):
+    arquivo = tmp_path / "rastros.jsonl"
+    exportador = BackgroundExporter([FileExporter(str(arquivo))], "teste", interval=0.01)
+    set_rastreador(Rastreador(exportador, limiar_lento=None))
+    cliente.post("/validacao/", json=EXEMPLO)
+    exportador.close()
+
+    [linha] = arquivo.read_text(encoding="utf-8").splitlines()
+    spans = json.loads(linha)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    por_nome = {s["name"]: s for s in spans}
+    raiz = por_nome["POST /validacao/"]
+    assert raiz["kind"] == tracing.KIND_SERVER and "parentSpanId" not in raiz
+    consulta = por_nome["cnpj.brasilapi"]
+    assert consulta["kind"] == tracing.KIND_CLIENT
+    assert {"key": "cnpj", "value": {"stringValue": "10.***.***/0009-**"}} in consulta["attributes"]
+    ids = {s["spanId"] for s in spans}
+    assert all(s["traceId"] == raiz["traceId"] for s in spans)
+    assert all(s.get("parentSpanId", raiz["spanId"]) in ids for s in spans)
+    assert int(raiz["startTimeUnixNano"]) <= int(consulta["startTimeUnixNano"]) <= int(raiz["endTimeUnixNano"])
+
+
+def test_mascarar_texto():
+    texto = "CNPJ 10.882.594/0009-12, CPF 87754987660, e-mail fulano.silva@exemplo.com"
+    assert mascarar_texto(texto) == "CNPJ 10.***.***/0009-**, CPF 877.***.***-60, e-mail fula********@exemplo.com"
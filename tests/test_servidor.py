@@ -0,0 +1,64 @@
+# Testes da ponte WSGI (api/wsgi.py, usada pelo passenger_wsgi.py) e do
+# lançador de produção (tools/servir.py).
+
+import io
+import json
+import sys
+
+from api.main import app
+from api.wsgi import PonteWSGI
+from tools.servir import comando, workers_padrao
+from tests.exemplos import documento
+from utils.http_client import get_async_client
+
+
+def chamar(aplicacao, metodo, caminho, corpo=b""):
+    environ = {
+        "REQUEST_METHOD": metodo, "PATH_INFO": caminho, "QUERY_STRING": "", "SERVER_NAME": "teste",
+        "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1", "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(corpo), "wsgi.errors": sys.stderr,
+        "CONTENT_TYPE": "application/json", "CONTENT_LENGTH": str(len(corpo)),
+    }
+    status = []
+    resposta = b"".join(aplicacao(environ, lambda s, cabecalhos, *exc: status.append(s)))
+    return status[0], resposta
+
+
+def test_ponte_wsgi_serve_a_api_com_um_event_loop_so():
+    ponte = PonteWSGI(app, threads=4)
+    try:
+        loop = ponte.loop
+        assert chamar(ponte, "GET", "/")[0] == "200 OK"
+
+        doc = documento()
+        doc["unidade_concedente"].update(cnpj=None, cpf="877.549.876-60")
+        status, corpo = chamar(ponte, "POST", "/validacao/", json.dumps(doc).encode())
+        assert status == "200 OK"
+        assert json.loads(corpo)["status"] == "sucesso"
+
+        status, _ = chamar(ponte, "POST", "/validacao/", b"{")
+        assert status == "422 Unprocessable Entity"
+        # O mesmo loop atende todas as requisições
+        assert ponte.loop is loop and loop.is_running()
+    finally:
+        ponte.fechar()
+    assert ponte.loop.is_closed()
+    # O lifespan rodou até o fim: cliente HTTP compartilhado fechado
+    assert get_async_client() is None
+    ponte.fechar()   # idempotente (também registrado no atexit)
+
+
+def test_workers_pelos_cpus(monkeypatch):
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    assert workers_padrao(cpus=8) == 8
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    assert workers_padrao(cpus=8) == 3
+
+
+def test_comando_dos_servidores():
+    uvicorn = comando("uvicorn", "0.0.0.0", 8000, 4)
+    assert uvicorn[1:4] == ["-m", "uvicorn", "api.main:app"]
+    assert uvicorn[uvicorn.index("--workers") + 1] == "4"
+    gunicorn = comando("gunicorn", "0.0.0.0", 8000, 2)
+    assert "uvicorn.workers.UvicornWorker" in gunicorn
+    assert gunicorn[gunicorn.index("--bind") + 1] == "0.0.0.0:8000"
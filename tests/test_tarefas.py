@@ -0,0 +1,265 @@
+# Testes das tarefas de validação assíncrona (api/tarefas.py): fila
+# persistente, reservas, retentativas, limites e expiração, e a API.
+
+import asyncio
+import json
+import sqlite3
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from api.idempotencia import set_cache_respostas
+from api.lote import RegistroInvalido
+from api.main import app
+from api.tarefas import (
+    CANCELADA,
+    CONCLUIDA,
+    EM_ANDAMENTO,
+    PENDENTE,
+    FilaCheia,
+    FilaDeTarefas,
+    ProcessadorDeTarefas,
+    _caminho_da_fila,
+    set_fila_tarefas,
+    set_processador_tarefas,
+)
+from api.verificadores import (
+    RegistroDeVerificadores,
+    Verificador,
+    get_registro_verificadores,
+    set_registro_verificadores,
+)
+from tests.exemplos import EXEMPLO, documento
+from utils.cnpj_cache import CNPJCache, set_cnpj_cache
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1_000_000.0
+
+    def __call__(self):
+        return self.agora
+
+
+def test_fila_progresso_e_resultados_parciais():
+    fila = FilaDeTarefas(clock=Relogio())
+    tarefa = fila.criar([{"a": 1}, RegistroInvalido("JSON inválido: x"), {"a": 3}])
+    situacao = fila.situacao(tarefa)
+    assert (situacao["status"], situacao["total"], situacao["concluidos"]) == (PENDENTE, 3, 1)
+    assert situacao["resultados"] == [
+        {"indice": 1, "status": "erro", "erros": [{"type": "json_invalid", "loc": [], "msg": "JSON inválido: x"}]}]
+
+    item = fila.reservar()
+    assert (item.indice, item.documento, item.tentativas) == (0, {"a": 1}, 1)
+    assert fila.situacao(tarefa)["status"] == EM_ANDAMENTO
+    assert fila.concluir(item, {"status": "sucesso"})
+    assert not fila.concluir(item, {"status": "sucesso"})   # já concluído
+
+    item = fila.reservar()
+    assert item.indice == 2
+    assert fila.reservar() is None
+    fila.concluir(item, {"status": "erro", "erros": []})
+    situacao = fila.situacao(tarefa, desde=1, limite=1)
+    assert (situacao["status"], situacao["aprovados"], situacao["recusados"], situacao["progresso"]) == (CONCLUIDA, 1, 2, 1.0)
+    assert [r["indice"] for r in situacao["resultados"]] == [1]
+    assert situacao["desde"] == 2
+    assert fila.situacao("nao-existe") is None
+
+
+def test_fila_sobrevive_reinicio_e_reserva_vence(tmp_path):
+    relogio = Relogio()
+    caminho = str(tmp_path / "tarefas.sqlite3")
+    fila = FilaDeTarefas(caminho, reserva=60, clock=relogio)
+    tarefa = fila.criar([{"a": 1}, {"a": 2}], todos_os_erros=True)
+    reservado = fila.reservar()
+    fila.close()   # o processo "morreu" com o documento 0 reservado
+
+    fila = FilaDeTarefas(caminho, reserva=60, clock=relogio)
+    assert fila.reservar().indice == 1
+    assert fila.reservar() is None
+    relogio.agora += 61
+    item = fila.reservar()
+    assert (item.indice, item.tentativas, item.todos_os_erros) == (reservado.indice, 2, True)
+    assert fila.situacao(tarefa)["total"] == 2
+
+
+def test_devolver_espera_e_conta_tentativas():
+    relogio = Relogio()
+    fila = FilaDeTarefas(espera=5, clock=relogio)
+    fila.criar([{"a": 1}])
+    item = fila.reservar()
+    fila.devolver(item)
+    assert fila.reservar() is None
+    relogio.agora += 5
+    item = fila.reservar()
+    assert item.tentativas == 2
+    fila.devolver(item, contar_tentativa=False)   # worker encerrado: volta na hora, sem gastar tentativa
+    assert fila.reservar().tentativas == 2
+
+
+def test_limite_de_espaco_despeja_concluidas_e_recusa_excesso():
+    relogio = Relogio()
+    fila = FilaDeTarefas(max_itens=4, clock=relogio)
+    antiga = fila.criar([RegistroInvalido("x"), RegistroInvalido("y")])
+    ativa = fila.criar([{"a": 1}, {"a": 2}])
+    relogio.agora += 1
+    nova = fila.criar([{"a": 3}])
+    # Só a tarefa concluída pode sair para abrir espaço
+    assert fila.situacao(antiga) is None
+    assert fila.situacao(ativa) is not None and fila.situacao(nova) is not None
+    with pytest.raises(FilaCheia):
+        fila.criar([{"a": 4}, {"a": 5}])
+    assert fila.stats()["despejadas"] == 1
+
+
+def test_expiracao_e_cancelamento():
+    relogio = Relogio()
+    fila = FilaDeTarefas(ttl=100, clock=relogio)
+    concluida = fila.criar([RegistroInvalido("x")])
+    cancelada = fila.criar([{"a": 1}, {"a": 2}])
+    item = fila.reservar()
+    assert fila.cancelar(cancelada)
+    assert not fila.cancelar(cancelada)
+    assert not fila.concluir(item, {"status": "sucesso"})   # documento em validação na hora do cancelamento
+    assert fila.reservar() is None
+    assert fila.situacao(cancelada)["status"] == CANCELADA
+
+    relogio.agora += 100
+    assert fila.situacao(concluida) is None
+    assert fila.purgar_expiradas() == 2
+    assert fila.stats()["documentos_guardados"] == 0
+
+
+def test_fila_padrao_no_diretorio_privado(tmp_path, monkeypatch):
+    monkeypatch.delenv("TAREFAS_PATH", raising=False)
+    monkeypatch.setenv("VALIDACAO_STATE_DIR", str(tmp_path / "estado"))
+    assert _caminho_da_fila() == str(tmp_path / "estado" / "validacao_tarefas.sqlite3")
+    assert (tmp_path / "estado").stat().st_mode & 0o777 == 0o700
+    monkeypatch.setenv("TAREFAS_PATH", "")
+    assert _caminho_da_fila() == ""
+
+class FilaTravada(FilaDeTarefas):
+    """Fila cuja primeira reserva falha como um arquivo travado por outro processo."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.travada = True
+
+    def reservar(self):
+        if self.travada:
+            self.travada = False
+            raise sqlite3.OperationalError("database is locked")
+        return super().reservar()
+
+
+def test_worker_sobrevive_erro_do_armazenamento():
+    async def cenario():
+        fila = FilaTravada()
+        tarefa = fila.criar([{"a": 1}])
+        processador = ProcessadorDeTarefas(fila, workers=1, cliente=lambda: None, intervalo=0.01)
+        processador.iniciar()
+        for _ in range(200):
+            if fila.situacao(tarefa)["status"] == CONCLUIDA:
+                break
+            await asyncio.sleep(0.01)
+        ativo = all(not t.done() for t in processador._tarefas)
+        await processador.parar()
+        return fila.situacao(tarefa)["status"], ativo, processador.stats()
+
+    status, ativo, stats = asyncio.run(cenario())
+    assert status == CONCLUIDA and ativo
+    assert stats["erros_fila"] == 1 and stats["recusados"] == 1
+
+
+@pytest.fixture
+def api_de_tarefas():
+    fila = FilaDeTarefas(espera=0.01)
+    fake = httpx.AsyncClient(transport=httpx.MockTransport(
+        lambda request: httpx.Response(200, json={"razao_social": "EMPRESA"})))
+    set_fila_tarefas(fila)
+    set_processador_tarefas(ProcessadorDeTarefas(fila, workers=2, cliente=lambda: fake, intervalo=0.05))
+    set_cnpj_cache(CNPJCache())
+    set_cache_respostas(None)
+    yield fila
+    set_fila_tarefas(None)
+    set_processador_tarefas(None)
+    set_cnpj_cache(None)
+
+
+def esperar_conclusao(client, local, segundos=5):
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        situacao = client.get(local).json()
+        if situacao["status"] in (CONCLUIDA, CANCELADA):
+            return situacao
+        time.sleep(0.02)
+    raise AssertionError(f"tarefa não terminou: {situacao}")
+
+
+def test_api_cria_e_acompanha_tarefa(api_de_tarefas):
+    invalido = documento()
+    invalido["supervisor"]["cpf"] = "111.111.111-11"
+    corpo = "\n".join([json.dumps(EXEMPLO), "{quebrado", json.dumps(invalido)])
+    with TestClient(app) as client:
+        resposta = client.post("/validacao/tarefas", content=corpo, headers={"Content-Type": "application/x-ndjson"})
+        assert resposta.status_code == 202
+        local = resposta.headers["location"]
+        assert resposta.json()["total"] == 3
+        situacao = esperar_conclusao(client, local)
+        assert client.get("/validacao/tarefas/nao-existe").status_code == 404
+        assert client.delete(local).status_code == 409
+    assert (situacao["aprovados"], situacao["recusados"]) == (1, 2)
+    assert [r["status"] for r in situacao["resultados"]] == ["sucesso", "erro", "erro"]
+    assert situacao["resultados"][1]["erros"][0]["type"] == "json_invalid"
+    assert situacao["resultados"][2]["erros"][0]["loc"] == ["supervisor", "cpf"]
+
+
+def test_api_retenta_falhas_transitorias(api_de_tarefas):
+    tentativas = []
+
+    async def instavel(cnpj, client):
+        tentativas.append(cnpj)
+        if len(tentativas) == 1:
+            return "Consulta de CNPJ temporariamente indisponível.", False
+        return None, True
+
+    padrao = get_registro_verificadores()
+    set_registro_verificadores(RegistroDeVerificadores([Verificador(
+        "cnpj_concedente", "CNPJ", ("unidade_concedente", "cnpj"), instavel, "cnpj.receita_federal")]))
+    try:
+        with TestClient(app) as client:
+            local = client.post("/validacao/tarefas", json=[EXEMPLO]).headers["location"]
+            situacao = esperar_conclusao(client, local)
+    finally:
+        set_registro_verificadores(padrao)
+    assert len(tentativas) == 2
+    assert [r["status"] for r in situacao["resultados"]] == ["sucesso"]
+
+
+def test_api_limites(api_de_tarefas):
+    api_de_tarefas.max_documentos = 2
+    with TestClient(app) as client:
+        assert client.post("/validacao/tarefas", json=[EXEMPLO] * 3).status_code == 413
+        assert client.post("/validacao/tarefas", json=[]).status_code == 422
+        assert client.post("/validacao/tarefas", content="[{").status_code == 422
+        api_de_tarefas.max_itens = 1
+        cheia = client.post("/validacao/tarefas", json=[EXEMPLO] * 2)
+    assert cheia.status_code == 503
+    assert cheia.headers["retry-after"] == "60"
+
+
+def test_api_fila_travada_responde_503(api_de_tarefas, monkeypatch):
+    def travada(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    with TestClient(app) as client:
+        local = client.post("/validacao/tarefas", json=[EXEMPLO]).headers["location"]
+        monkeypatch.setattr(api_de_tarefas, "situacao", travada)
+        monkeypatch.setattr(api_de_tarefas, "criar", travada)
+        consulta = client.get(local)
+        criacao = client.post("/validacao/tarefas", json=[EXEMPLO])
+    for resposta in (consulta, criacao):
+        assert resposta.status_code == 503
+        assert resposta.headers["retry-after"] == "5"
@@ -8,15 +8,22 @@ from utils import (
     # CEP
     format_cep, is_valid_cep, validate_cep,
     # CPF
-    format_cpf, is_valid_cpf, validate_cpf, mask_cpf,
+    format_cpf, is_valid_cpf, validate_cpf, mask_cpf, is_valid_cpf_batch,
     # CNPJ
-    format_cnpj, is_valid_cnpj, validate_cnpj, mask_cnpj,
+    format_cnpj, is_valid_cnpj, validate_cnpj, mask_cnpj, is_valid_cnpj_batch,
     # Email
     is_valid_email, validate_email, mask_email,
     # Phone
     format_phone_number, is_valid_phone_number, validate_phone_number,
     # UF
-    is_valid_uf, validate_uf
+    is_valid_uf, validate_uf,
+    # Validações rápidas
+    check_cep, check_cpf, check_cnpj, check_email, check_phone_number, check_uf,
+    cep_error_message, cpf_error_message,
+    # Consistência entre campos (CEP/DDD x UF)
+    cep_uf, check_cep_uf, check_cep_uf_batch, cep_uf_error_message,
+    phone_number_uf, check_phone_number_uf, check_phone_number_uf_batch,
+    uf_for_ddd, UFRanges,
 )
 
 # --- Testes para CEP ---
@@ -68,6 +75,24 @@ def test_mask_cpf():
     assert mask_cpf(VALID_CPF_NUMBERS) == "121.***.***-95"
     assert mask_cpf(VALID_CPF_FORMATTED) == "121.***.***-95"
 
+CPFS_LOTE = [
+    VALID_CPF_NUMBERS, VALID_CPF_FORMATTED, INVALID_CPF_ALL_SAME, INVALID_CPF_WRONG_DIGIT,
+    "123", "", "121.363.095-95\n", "121 363 095 95 x", "１２１３６３０９５９５", "877.549.876-60",
+]
+
+def test_is_valid_cpf_batch_igual_ao_escalar():
+    mascara, motivos = is_valid_cpf_batch(CPFS_LOTE)
+    assert mascara.tolist() == [is_valid_cpf(c) for c in CPFS_LOTE]
+    assert motivos[2] == "repeated_digits"
+    assert motivos[3] == "invalid_check_digit"
+    assert motivos[4] == "invalid_length"
+    assert motivos[0] == ""
+
+def test_is_valid_cpf_batch_valores_nao_texto():
+    mascara, motivos = is_valid_cpf_batch([None, VALID_CPF_NUMBERS])
+    assert mascara.tolist() == [False, True]
+    assert motivos[0] == "invalid_length"
+
 
 # --- Testes para CNPJ ---
 
@@ -97,6 +122,15 @@ def test_mask_cnpj():
     assert mask_cnpj(VALID_CNPJ_NUMBERS) == "80.***.***/0001-**"
     assert mask_cnpj(VALID_CNPJ_FORMATTED) == "80.***.***/0001-**"
 
+def test_is_valid_cnpj_batch_igual_ao_escalar():
+    cnpjs = [
+        VALID_CNPJ_NUMBERS, VALID_CNPJ_FORMATTED, INVALID_CNPJ_ALL_SAME,
+        INVALID_CNPJ_WRONG_DIGIT, "123", "10.882.594/0009-12",
+    ]
+    mascara, motivos = is_valid_cnpj_batch(cnpjs)
+    assert mascara.tolist() == [is_valid_cnpj(c) for c in cnpjs]
+    assert list(motivos) == ["", "", "repeated_digits", "invalid_check_digit", "invalid_length", ""]
+
 
 # --- Testes para Email ---
 
@@ -161,4 +195,112 @@ def test_is_valid_uf():
 def test_validate_uf():
     validate_uf("MG") # Deve passar
     with pytest.raises(ValidationError, match="UF inválida"):
-        validate_uf("ZZ")
\ No newline at end of file
+        validate_uf("ZZ")
+
+# --- Testes para CEP/DDD x UF ---
+
+@pytest.mark.parametrize("cep, uf", [
+    ("01001-000", "SP"), ("19999-999", "SP"), ("20040-020", "RJ"), ("29000-000", "ES"),
+    ("30130-000", "MG"), ("40020-000", "BA"), ("68900-000", "AP"), ("69000-000", "AM"),
+    ("69300-000", "RR"), ("69400-000", "AM"), ("69900-000", "AC"), ("70040-000", "DF"),
+    ("72800-000", "GO"), ("73000-000", "DF"), ("74000-000", "GO"), ("76800-000", "RO"),
+    ("77000-000", "TO"), ("78000-000", "MT"), ("80010-000", "PR"), ("88010-000", "SC"),
+    ("90010-000", "RS"), ("99999-999", "RS"),
+])
+def test_cep_uf(cep, uf):
+    assert cep_uf(cep) == uf
+
+def test_cep_fora_das_faixas_nao_tem_uf():
+    assert cep_uf("00500-000") is None
+    assert cep_uf("1234") is None
+    assert check_cep_uf("00500-000", "SP") == (True, "")
+
+def test_check_cep_uf():
+    assert check_cep_uf("01310-100", "SP") == (True, "")
+    assert check_cep_uf("01310-100", "sp") == (True, "")
+    assert check_cep_uf("01310-100", "AM") == (False, "uf_mismatch")
+    # Sem como decidir: cada campo é validado por conta própria
+    assert check_cep_uf("0131", "AM") == (True, "")
+    assert check_cep_uf("01310-100", "XX") == (True, "")
+    assert check_cep_uf("", "AM") == (True, "")
+    assert cep_uf_error_message("01310-100", "am", "uf_mismatch") == "O CEP 01310-100 pertence a São Paulo (SP), não a AM."
+
+def test_ddd_uf():
+    assert uf_for_ddd(11) == "SP"
+    assert uf_for_ddd(38) == "MG"
+    assert uf_for_ddd(36) is None
+    assert uf_for_ddd(20) is None
+    assert phone_number_uf("+55 (21) 98765-4321") == "RJ"
+    assert phone_number_uf("123") is None
+    assert check_phone_number_uf("21 98765-4321", "rj") == (True, "")
+    assert check_phone_number_uf("21 98765-4321", "SP") == (False, "uf_mismatch")
+
+def test_cep_e_ddd_uf_batch_igual_ao_escalar():
+    ceps = ["01310-100", "01310-100", "69900000", "123", None, "00500-000", "90010-000"]
+    ufs = ["SP", "AM", "ac", "AM", "SP", "SP", None]
+    ok, motivos = check_cep_uf_batch(ceps, ufs)
+    esperado = [check_cep_uf(c, u) if isinstance(c, str) and isinstance(u, str) else (True, "") for c, u in zip(ceps, ufs)]
+    assert ok.tolist() == [e[0] for e in esperado]
+    assert motivos.tolist() == [e[1] for e in esperado]
+
+    telefones = ["11987654321", "21987654321", "2012345678", None]
+    ok, _ = check_phone_number_uf_batch(telefones, ["SP", "SP", "SP", "RJ"])
+    assert ok.tolist() == [True, False, True, True]
+
+def test_uf_ranges():
+    tabela = UFRanges([("SP", 10, 19), ("RJ", 30, 39), ("SP", 20, 29)])
+    assert len(tabela) == 2   # faixas vizinhas da mesma UF são unidas
+    assert [tabela.lookup(v) for v in (9, 10, 25, 29, 30, 39, 40)] == [None, "SP", "SP", "SP", "RJ", "RJ", None]
+    assert tabela.lookup_batch([9, 10, 25, 30, 40]).tolist() == [None, "SP", "SP", "RJ", None]
+    with pytest.raises(ValueError, match="sobrepostas"):
+        UFRanges([("SP", 10, 20), ("RJ", 20, 30)])
+
+# --- Testes para as validações rápidas (check_*) ---
+
+@pytest.mark.parametrize("check, valor, esperado", [
+    (check_cpf, VALID_CPF_FORMATTED, (True, "")),
+    (check_cpf, INVALID_CPF_ALL_SAME, (False, "repeated_digits")),
+    (check_cpf, INVALID_CPF_WRONG_DIGIT, (False, "invalid_check_digit")),
+    (check_cpf, "123", (False, "invalid_length")),
+    (check_cnpj, VALID_CNPJ_FORMATTED, (True, "")),
+    (check_cnpj, INVALID_CNPJ_WRONG_DIGIT, (False, "invalid_check_digit")),
+    (check_cep, "01001-000", (True, "")),
+    (check_cep, "abc", (False, "empty")),
+    (check_cep, "1234567", (False, "invalid_length")),
+    (check_email, "email@example.com", (True, "")),
+    (check_email, "", (False, "empty")),
+    (check_email, "email.example.com", (False, "invalid_format")),
+    (check_phone_number, "+55 (11) 98765-4321", (True, "")),
+    (check_phone_number, "0123456789", (False, "invalid_ddd")),
+    (check_phone_number, "1112345678", (False, "invalid_prefix")),
+    (check_phone_number, "12345", (False, "invalid_length")),
+    (check_uf, "sp", (True, "")),
+    (check_uf, "XX", (False, "unknown_uf")),
+])
+def test_check(check, valor, esperado):
+    assert check(valor) == esperado
+
+def test_mensagens_de_erro():
+    assert cep_error_message("1234567", "invalid_length") == "CEP inválido: deve conter 8 dígitos, mas contém 7."
+    assert cpf_error_message("123", "invalid_length") == "O número do CPF é inválido."
+
+# --- Métricas (formato texto do Prometheus) ---
+
+def test_metricas_histograma_e_contador():
+    from utils.metrics import MetricsRegistry
+
+    registro = MetricsRegistry(disabled_probes=["lenta"])
+    latencia = registro.histogram("latencia_seconds", "Latência", ("etapa",), buckets=(0.1, 1.0))
+    latencia.labels("schema").observe(0.05)
+    latencia.labels("schema").observe(0.5)
+    latencia.labels("schema").observe(5)
+    registro.counter("erros", "Erros", ("regra",)).labels('a"b').inc()
+
+    texto = registro.render()
+    assert 'latencia_seconds_bucket{etapa="schema",le="0.1"} 1' in texto
+    assert 'latencia_seconds_bucket{etapa="schema",le="1"} 2' in texto
+    assert 'latencia_seconds_bucket{etapa="schema",le="+Inf"} 3' in texto
+    assert 'latencia_seconds_count{etapa="schema"} 3' in texto
+    assert 'erros_total{regra="a\\"b"} 1' in texto
+    assert registro.probe("lenta").enabled is False
+    assert registro.probe("outra").enabled is True
@@ -0,0 +1,50 @@
+# Testes da validação em massa via linha de comando (tools/validar_arquivo.py).
+
+import csv
+import json
+
+from tools.validar_arquivo import executar
+from tests.exemplos import EXEMPLO, documento
+
+
+def achatar(doc, prefixo=""):
+    linha = {}
+    for chave, valor in doc.items():
+        if isinstance(valor, dict):
+            linha.update(achatar(valor, f"{prefixo}{chave}."))
+        else:
+            linha[f"{prefixo}{chave}"] = "" if valor is None else valor
+    return linha
+
+
+def test_jsonl_com_pool_de_processos(tmp_path):
+    invalido = documento()
+    invalido["supervisor"]["cpf"] = "111.111.111-11"
+    entrada = tmp_path / "contratos.jsonl"
+    entrada.write_text("\n".join([json.dumps(EXEMPLO)] * 5 + ["{quebrado", json.dumps(invalido)]))
+    saida = tmp_path / "relatorio.json"
+
+    resumo = executar(str(entrada), str(saida), workers=2, bloco=2)
+
+    relatorio = json.loads(saida.read_text())
+    assert relatorio["resumo"] == resumo
+    assert resumo["total"] == 7 and resumo["validos"] == 5 and resumo["invalidos"] == 2
+    assert sorted(r["indice"] for r in relatorio["registros"]) == list(range(7))
+    assert resumo["erros_por_campo"]["supervisor.cpf"] == 1
+
+
+def test_csv(tmp_path):
+    linha = achatar(EXEMPLO)
+    entrada = tmp_path / "contratos.csv"
+    with open(entrada, "w", newline="", encoding="utf-8") as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=list(linha), delimiter=";")
+        escritor.writeheader()
+        escritor.writerow(linha)
+        escritor.writerow({**linha, "dados_estagio.horas_semanais": "45"})
+    saida = tmp_path / "relatorio.json"
+
+    resumo = executar(str(entrada), str(saida), workers=1)
+
+    assert resumo["validos"] == 1 and resumo["invalidos"] == 1
+    registros = json.loads(saida.read_text())["registros"]
+    assert registros[1]["erros"][0]["loc"] == "dados_estagio"
@@ -0,0 +1,152 @@
+# Testes do registro de verificadores (api/verificadores.py): execução em
+# paralelo, prazo único por requisição e cancelamento dos atrasados.
+
+import asyncio
+import time
+
+import httpx
+from fastapi.testclient import TestClient
+
+from api.idempotencia import CacheDeRespostas, set_cache_respostas
+from api.main import app, get_http_client
+from api.schemas import ValidacaoDocumentoSchema
+from api.services import validate_document_service
+from tests.exemplos import EXEMPLO, documento
+from utils.cnpj_cache import CNPJCache, set_cnpj_cache
+from api.verificadores import (
+    OK,
+    RECUSADO,
+    TEMPO_ESGOTADO,
+    RegistroDeVerificadores,
+    Verificador,
+    get_registro_verificadores,
+    set_registro_verificadores,
+)
+
+DOC = ValidacaoDocumentoSchema.model_validate(EXEMPLO)
+
+
+def lento(segundos, mensagem=None, cancelados=None):
+    async def verificar(valor, client):
+        try:
+            await asyncio.sleep(segundos)
+        except asyncio.CancelledError:
+            if cancelados is not None:
+                cancelados.append(valor)
+            raise
+        return mensagem, True
+    return verificar
+
+
+def verificador(nome, campo, funcao, fracao=1.0):
+    return Verificador(nome, nome.upper(), campo, funcao, f"{nome}.recusado", fracao)
+
+
+def test_verificadores_em_paralelo():
+    registro = RegistroDeVerificadores([
+        verificador("a", ("supervisor", "cpf"), lento(0.2)),
+        verificador("b", ("estagiario", "cpf"), lento(0.2, "recusado")),
+        verificador("c", ("unidade_concedente", "cnpj"), lento(0.2)),
+    ])
+    inicio = time.perf_counter()
+    resultado = asyncio.run(registro.verificar(DOC))
+    # O tempo do mais lento, não a soma
+    assert time.perf_counter() - inicio < 0.4
+    assert [v.resultado for v in resultado.verificacoes] == [OK, RECUSADO, OK]
+    assert all(v.duracao >= 0.19 for v in resultado.verificacoes)
+    assert resultado.erros == [{
+        "type": "value_error", "loc": ["estagiario", "cpf"], "msg": "Value error, recusado",
+        "input": DOC.estagiario.cpf, "ctx": {"error": "recusado"},
+    }]
+    assert resultado.definitivo
+
+
+def test_prazo_cancela_os_atrasados():
+    cancelados = []
+    registro = RegistroDeVerificadores([
+        verificador("rapido", ("supervisor", "cpf"), lento(0.01)),
+        verificador("lento", ("estagiario", "cpf"), lento(5, cancelados=cancelados)),
+        verificador("metade", ("unidade_concedente", "cnpj"), lento(0.15, cancelados=cancelados), fracao=0.5),
+    ], prazo=0.2)
+    inicio = time.perf_counter()
+    resultado = asyncio.run(registro.verificar(DOC))
+    assert time.perf_counter() - inicio < 1
+    assert [v.resultado for v in resultado.verificacoes] == [OK, TEMPO_ESGOTADO, TEMPO_ESGOTADO]
+    assert sorted(cancelados) == sorted([DOC.estagiario.cpf, DOC.unidade_concedente.cnpj])
+    assert not resultado.definitivo
+    assert "não concluída em 0.1s" in resultado.erros[1]["msg"]
+
+
+def test_falha_de_um_verificador_cancela_os_outros():
+    cancelados = []
+
+    async def quebrado(valor, client):
+        raise RuntimeError("falhou")
+
+    registro = RegistroDeVerificadores([
+        verificador("lento", ("supervisor", "cpf"), lento(5, cancelados=cancelados)),
+        verificador("quebrado", ("estagiario", "cpf"), quebrado),
+    ])
+
+    async def cenario():
+        try:
+            await registro.verificar(DOC)
+        except RuntimeError:
+            await asyncio.sleep(0)
+            return True
+
+    assert asyncio.run(cenario())
+    assert cancelados == [DOC.supervisor.cpf]
+
+
+def test_campo_vazio_nao_verifica():
+    chamados = []
+
+    async def verificar(valor, client):
+        chamados.append(valor)
+        return None, True
+
+    registro = RegistroDeVerificadores([verificador("cpf", ("unidade_concedente", "cpf"), verificar)])
+    assert asyncio.run(registro.verificar(DOC)).verificacoes == []
+    assert chamados == []
+
+
+def test_validate_document_service_usa_o_registro():
+    padrao = get_registro_verificadores()
+    set_registro_verificadores(RegistroDeVerificadores([verificador("cnpj", ("unidade_concedente", "cnpj"), lento(0))]))
+    try:
+        valido = asyncio.run(validate_document_service(DOC))
+        doc = DOC.model_copy(update={"supervisor": DOC.supervisor.model_copy(update={"cpf": "111.111.111-11"})})
+        invalido = asyncio.run(validate_document_service(doc))
+    finally:
+        set_registro_verificadores(padrao)
+    assert valido["validacao"]
+    assert valido["obs"].count("válido") == 3
+    assert not invalido["validacao"]
+    assert "CPF Supervisor: " in invalido["obs"]
+
+
+def test_prazo_esgotado_na_api_nao_fica_no_cache():
+    async def sem_resposta(request):
+        await asyncio.sleep(5)
+
+    fake = httpx.AsyncClient(transport=httpx.MockTransport(sem_resposta))
+    app.dependency_overrides[get_http_client] = lambda: fake
+    set_cache_respostas(CacheDeRespostas())
+    set_cnpj_cache(CNPJCache())
+    padrao = get_registro_verificadores()
+    set_registro_verificadores(RegistroDeVerificadores(padrao, prazo=0.05))
+    try:
+        cliente = TestClient(app)
+        resposta = cliente.post("/validacao/", json=documento())
+        reenvio = cliente.post("/validacao/", json=documento())
+    finally:
+        app.dependency_overrides.clear()
+        set_cache_respostas(None)
+        set_cnpj_cache(None)
+        set_registro_verificadores(padrao)
+    assert resposta.status_code == 422
+    erro = resposta.json()["detail"][0]
+    assert erro["loc"] == ["body", "unidade_concedente", "cnpj"]
+    assert "não concluída" in erro["msg"]
+    assert reenvio.headers["x-cache"] == "MISS"
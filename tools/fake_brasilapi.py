@@ -0,0 +1,197 @@
+"""
+Servidor local que imita a BrasilAPI (GET /api/cnpj/v1/{cnpj}), com latência
+e taxa de erros configuráveis, para testes e benchmarks reprodutíveis sem rede.
+
+Uso (na raiz do projeto):
+    python -m tools.fake_brasilapi --porta 8001 --latencia 0.08 --taxa-erro 0.05
+    python -m tools.fake_brasilapi --limite 20   # 429 acima de 20 consultas/s
+
+e, na API:
+    BRASIL_API_CNPJ_URL=http://127.0.0.1:8001/api/cnpj/v1/ uvicorn api.main:app
+
+Qualquer caminho terminado em 14 dígitos é aceito, então o mesmo servidor
+pode fazer o papel dos provedores alternativos (CNPJ_PROVIDER_<NOME>_URL).
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional
+
+_CNPJ_NO_CAMINHO = re.compile(r"(\d{14})/?$")
+
+
+class FakeBrasilAPI:
+    """
+    Configuração (pode ser alterada com o servidor rodando):
+    - latencia: atraso fixo de cada resposta, em segundos;
+    - taxa_lenta / latencia_lenta: fração das respostas com atraso maior
+      (cauda de latência, para exercitar o hedge);
+    - taxa_erro / status_erro: fração das respostas que falham e o status usado;
+    - limite: consultas por segundo (janela deslizante de 1 s) acima das
+      quais a resposta é 429, com Retry-After de `retry_after` segundos
+      (0 = sem limite); as recusadas são contadas em `recusadas`;
+    - inexistentes: CNPJs respondidos com 404; os demais são "encontrados".
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        porta: int = 0,
+        latencia: float = 0.0,
+        taxa_erro: float = 0.0,
+        status_erro: int = 500,
+        taxa_lenta: float = 0.0,
+        latencia_lenta: float = 1.0,
+        inexistentes: Iterable[str] = (),
+        semente: Optional[int] = None,
+        limite: float = 0.0,
+        retry_after: float = 1.0,
+    ):
+        self.latencia = latencia
+        self.taxa_erro = taxa_erro
+        self.status_erro = status_erro
+        self.taxa_lenta = taxa_lenta
+        self.latencia_lenta = latencia_lenta
+        self.inexistentes = set(inexistentes)
+        self.limite = limite
+        self.retry_after = retry_after
+        self.requisicoes = 0
+        self.recusadas = 0
+        self._recentes: deque = deque()
+        self._random = random.Random(semente)
+        self._lock = threading.Lock()
+        self._servidor = ThreadingHTTPServer((host, porta), self._criar_handler())
+        self._servidor.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, porta = self._servidor.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    @property
+    def url_cnpj(self) -> str:
+        return f"{self.url}/api/cnpj/v1/"
+
+    def _sortear(self):
+        with self._lock:
+            self.requisicoes += 1
+            atraso = self.latencia_lenta if self._random.random() < self.taxa_lenta else self.latencia
+            falha = self._random.random() < self.taxa_erro
+        return atraso, falha
+
+    def _acima_do_limite(self) -> bool:
+        if not self.limite:
+            return False
+        agora = time.monotonic()
+        with self._lock:
+            while self._recentes and self._recentes[0] <= agora - 1.0:
+                self._recentes.popleft()
+            if len(self._recentes) >= self.limite:
+                self.recusadas += 1
+                return True
+            self._recentes.append(agora)
+        return False
+
+    def _cabecalhos(self, status: int) -> Dict[str, str]:
+        return {"Retry-After": f"{self.retry_after:g}"} if status == 429 else {}
+
+    def _responder(self, caminho: str):
+        if self._acima_do_limite():
+            with self._lock:
+                self.requisicoes += 1
+            return 429, {"message": "Too many requests", "type": "rate_limit"}
+        atraso, falha = self._sortear()
+        if atraso:
+            time.sleep(atraso)
+        if falha:
+            return self.status_erro, {"message": "Erro simulado", "type": "simulated_error"}
+        encontrado = _CNPJ_NO_CAMINHO.search(caminho.split("?")[0])
+        if not encontrado:
+            return 400, {"message": "CNPJ inválido", "type": "bad_request"}
+        cnpj = encontrado.group(1)
+        if cnpj in self.inexistentes:
+            return 404, {"message": f"CNPJ {cnpj} não encontrado.", "type": "not_found"}
+        return 200, {
+            "cnpj": cnpj,
+            "razao_social": f"EMPRESA FICTICIA {cnpj[:8]} LTDA",
+            "descricao_situacao_cadastral": "ATIVA",
+        }
+
+    def _criar_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, corpo = fake._responder(self.path)
+                dados = json.dumps(corpo).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(dados)))
+                    for nome, valor in fake._cabecalhos(status).items():
+                        self.send_header(nome, valor)
+                    self.end_headers()
+                    self.wfile.write(dados)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Cliente desistiu (timeout, hedge cancelado): comportamento esperado
+                    self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "FakeBrasilAPI":
+        self._thread = threading.Thread(target=self._servidor.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8001)
+    parser.add_argument("--latencia", type=float, default=0.0, help="Atraso de cada resposta (s)")
+    parser.add_argument("--taxa-lenta", type=float, default=0.0, help="Fração de respostas lentas")
+    parser.add_argument("--latencia-lenta", type=float, default=1.0, help="Atraso das respostas lentas (s)")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de respostas com erro")
+    parser.add_argument("--status-erro", type=int, default=500, help="Status HTTP das respostas com erro")
+    parser.add_argument("--limite", type=float, default=0.0, help="Consultas/s acima das quais responde 429 (0 = sem limite)")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After das respostas 429 (s)")
+    parser.add_argument("--semente", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    fake = FakeBrasilAPI(
+        args.host, args.porta, args.latencia, args.taxa_erro, args.status_erro,
+        args.taxa_lenta, args.latencia_lenta, semente=args.semente,
+        limite=args.limite, retry_after=args.retry_after,
+    )
+    print(f"BrasilAPI simulada em {fake.url_cnpj}")
+    try:
+        fake._servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake._servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
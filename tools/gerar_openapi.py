@@ -0,0 +1,50 @@
+"""
+Gera o OpenAPI da API em api/openapi.json, no build (ou antes do deploy):
+em produção, GET /openapi.json e /docs servem o arquivo pronto em vez de
+gerar o schema na primeira requisição.
+
+Uso (na raiz do projeto):
+    python -m tools.gerar_openapi
+    python -m tools.gerar_openapi --verificar   # falha se o arquivo estiver desatualizado
+
+Rode sempre que mudar uma rota ou um schema; tests/test_api.py confere se o
+arquivo do repositório está em dia.
+"""
+import argparse
+import json
+import sys
+
+from api.main import CAMINHO_OPENAPI, gerar_openapi
+
+
+def conteudo() -> str:
+    return json.dumps(gerar_openapi(), ensure_ascii=False, indent=1, sort_keys=True) + "\n"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--saida", default=CAMINHO_OPENAPI)
+    parser.add_argument("--verificar", action="store_true", help="Não grava; sai com 1 se o arquivo estiver desatualizado")
+    args = parser.parse_args(argv)
+
+    novo = conteudo()
+    if args.verificar:
+        try:
+            with open(args.saida, encoding="utf-8") as f:
+                atual = f.read()
+        except FileNotFoundError:
+            atual = None
+        if atual != novo:
+            print(f"{args.saida} desatualizado: rode python -m tools.gerar_openapi", file=sys.stderr)
+            return 1
+        print(f"{args.saida} em dia")
+        return 0
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        f.write(novo)
+    print(f"{args.saida}: {len(novo)} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Gera o índice local de CNPJs (utils.cnpj_registry) a partir dos dados abertos
+do CNPJ publicados pela Receita Federal (arquivos Estabelecimentos*.zip e
+Empresas*.zip, CSV separado por ";" em latin-1, sem cabeçalho).
+
+Uso (na raiz do projeto):
+    python -m tools.importar_receita \\
+        --estabelecimentos dados/Estabelecimentos*.zip \\
+        --empresas dados/Empresas*.zip \\
+        -o /var/lib/valida-doc/cnpj.idx
+
+e, na API:
+    CNPJ_REGISTRY_PATH=/var/lib/valida-doc/cnpj.idx uvicorn api.main:app
+
+- Aceita os .zip baixados ou os CSVs já extraídos.
+- O índice é gravado em um arquivo temporário e renomeado sobre o destino:
+  a API em execução passa a usar o novo arquivo sem reinício e sem janela
+  de arquivo incompleto.
+- --sem-razao-social gera um índice só com existência e situação cadastral
+  (menor e mais rápido de importar).
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from array import array
+from typing import Iterable, Iterator, List
+
+from utils.cnpj_registry import MAX_NAME_BYTES, write_registry
+
+# Colunas usadas de cada arquivo (layout dos dados abertos do CNPJ)
+ESTAB_BASICO, ESTAB_ORDEM, ESTAB_DV, ESTAB_SITUACAO = 0, 1, 2, 5
+EMPRESA_BASICO, EMPRESA_RAZAO_SOCIAL = 0, 1
+
+
+def ler_linhas(caminhos: Iterable[str]) -> Iterator[List[str]]:
+    """Linhas de todos os arquivos (CSV ou .zip com CSVs dentro)."""
+    for caminho in caminhos:
+        if zipfile.is_zipfile(caminho):
+            with zipfile.ZipFile(caminho) as pacote:
+                for membro in pacote.namelist():
+                    with pacote.open(membro) as bruto:
+                        texto = io.TextIOWrapper(bruto, encoding="latin-1", newline="")
+                        yield from csv.reader(texto, delimiter=";", quotechar='"')
+        else:
+            with open(caminho, encoding="latin-1", newline="") as texto:
+                yield from csv.reader(texto, delimiter=";", quotechar='"')
+
+
+def _ordenar(valores: array) -> array:
+    """Ordena um array("Q") (com NumPy, se disponível)."""
+    try:
+        import numpy as np
+    except ImportError:
+        return array("Q", sorted(valores))
+    return array("Q", np.sort(np.frombuffer(valores, dtype=np.uint64)).tobytes())
+
+
+def _ordem(valores: array):
+    """Índices que ordenam um array("I"), de forma estável (com NumPy, se disponível)."""
+    try:
+        import numpy as np
+    except ImportError:
+        return sorted(range(len(valores)), key=valores.__getitem__)
+    return np.argsort(np.frombuffer(valores, dtype=np.uint32), kind="stable")
+
+
+def chaves_estabelecimentos(caminhos: Iterable[str]) -> array:
+    """Chaves (CNPJ * 16 + situação) de todos os estabelecimentos, ordenadas e sem repetição."""
+    chaves = array("Q")
+    for linha in ler_linhas(caminhos):
+        try:
+            cnpj = int(linha[ESTAB_BASICO] + linha[ESTAB_ORDEM] + linha[ESTAB_DV])
+            situacao = int(linha[ESTAB_SITUACAO])
+        except (IndexError, ValueError):
+            continue
+        chaves.append(cnpj << 4 | (situacao & 0xF))
+    chaves = _ordenar(chaves)
+
+    unicas = array("Q")
+    anterior = -1
+    for chave in chaves:
+        cnpj = chave >> 4
+        if cnpj == anterior:
+            unicas[-1] = chave  # CNPJ repetido: vale a última ocorrência
+        else:
+            unicas.append(chave)
+            anterior = cnpj
+    return unicas
+
+
+def _nome(razao_social: str) -> bytes:
+    dados = razao_social.strip().encode("utf-8")
+    if len(dados) > MAX_NAME_BYTES:
+        dados = dados[:MAX_NAME_BYTES].decode("utf-8", "ignore").encode("utf-8")
+    return dados
+
+
+def importar(estabelecimentos: List[str], empresas: List[str], saida: str) -> dict:
+    inicio = time.perf_counter()
+    chaves = chaves_estabelecimentos(estabelecimentos)
+
+    # As razões sociais vão para um arquivo temporário na ordem de leitura;
+    # em memória ficam só o CNPJ básico e a posição de cada nome.
+    basicos, inicios, tamanhos = array("I"), array("Q"), array("H")
+    with tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(saida))) as nomes:
+        posicao = 0
+        for linha in ler_linhas(empresas):
+            try:
+                basico = int(linha[EMPRESA_BASICO])
+                nome = _nome(linha[EMPRESA_RAZAO_SOCIAL])
+            except (IndexError, ValueError):
+                continue
+            basicos.append(basico)
+            inicios.append(posicao)
+            tamanhos.append(len(nome))
+            nomes.write(nome)
+            posicao += len(nome)
+        nomes.flush()
+
+        # Ordena por CNPJ básico; em caso de repetição, vale a última linha
+        ordem = _ordem(basicos)
+        selecionados = [
+            int(i) for n, i in enumerate(ordem)
+            if n + 1 == len(ordem) or basicos[ordem[n + 1]] != basicos[i]
+        ]
+        companhias = array("I", (basicos[i] for i in selecionados))
+
+        def razoes_sociais():
+            for i in selecionados:
+                nomes.seek(inicios[i])
+                yield nomes.read(tamanhos[i])
+
+        write_registry(saida, chaves, companhias, razoes_sociais())
+
+    return {
+        "estabelecimentos": len(chaves),
+        "empresas": len(companhias),
+        "arquivo": saida,
+        "tamanho_bytes": os.path.getsize(saida),
+        "tempo_s": round(time.perf_counter() - inicio, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--estabelecimentos", nargs="+", required=True, help="Arquivos Estabelecimentos*.zip/.csv")
+    parser.add_argument("--empresas", nargs="*", default=[], help="Arquivos Empresas*.zip/.csv")
+    parser.add_argument("--sem-razao-social", action="store_true", help="Não inclui as razões sociais no índice")
+    parser.add_argument("-o", "--saida", required=True, help="Caminho do índice gerado")
+    args = parser.parse_args(argv)
+
+    empresas = [] if args.sem_razao_social else args.empresas
+    resumo = importar(args.estabelecimentos, empresas, args.saida)
+    print(
+        f"{resumo['estabelecimentos']} estabelecimentos e {resumo['empresas']} empresas "
+        f"gravados em {resumo['arquivo']} ({resumo['tamanho_bytes']} bytes, {resumo['tempo_s']} s)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
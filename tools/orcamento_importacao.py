@@ -0,0 +1,112 @@
+"""
+Mede o tempo de importação da API (python -X importtime, em processos novos)
+e confere o orçamento de inicialização:
+
+- módulos sob demanda (MODULOS_SOB_DEMANDA) não podem ser carregados na
+  subida: só quando a primeira requisição precisar deles;
+- o tempo total de importação de api.main não pode passar de --orcamento-ms
+  (opcional: o valor depende da máquina; use o da máquina de deploy).
+
+Uso (na raiz do projeto):
+    python -m tools.orcamento_importacao
+    python -m tools.orcamento_importacao --orcamento-ms 400 --top 15
+
+Sai com 1 se o orçamento foi estourado.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple, Sequence
+
+MODULO_PADRAO = "api.main"
+EXECUCOES_PADRAO = 7
+
+# Cliente HTTP (httpx, h2), cache em disco (sqlite3), cálculos em lote
+# (numpy) e caminho rápido da validação (msgspec): carregados na primeira
+# vez que são usados.
+MODULOS_SOB_DEMANDA = ("httpx", "h2", "sqlite3", "numpy", "msgspec")
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Importacao(NamedTuple):
+    total_us: int
+    # Tempo acumulado (próprio + dependências) de cada módulo, em microssegundos
+    por_modulo: Dict[str, int]
+
+
+def _executar(codigo: str, *opcoes: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *opcoes, "-c", codigo],
+        cwd=RAIZ, capture_output=True, text=True, check=True,
+    )
+
+
+def medir_importacao(modulo: str = MODULO_PADRAO) -> Importacao:
+    """Importa `modulo` em um processo novo e lê a saída de -X importtime."""
+    saida = _executar(f"import {modulo}", "-X", "importtime").stderr
+    por_modulo = {}
+    for linha in saida.splitlines():
+        if not linha.startswith("import time:") or "|" not in linha:
+            continue
+        _, acumulado, nome = linha.split("|")
+        try:
+            por_modulo[nome.strip()] = int(acumulado)
+        except ValueError:   # cabeçalho
+            continue
+    return Importacao(por_modulo.get(modulo, 0), por_modulo)
+
+
+def modulos_carregados(modulo: str = MODULO_PADRAO) -> List[str]:
+    """Módulos em sys.modules depois de importar `modulo` em um processo novo."""
+    saida = _executar(f"import json, sys, {modulo}; print(json.dumps(sorted(sys.modules)))").stdout
+    return json.loads(saida)
+
+
+def carregados_antes_da_hora(modulo: str = MODULO_PADRAO, sob_demanda: Sequence[str] = MODULOS_SOB_DEMANDA) -> List[str]:
+    """Módulos sob demanda (ou submódulos deles) carregados já na importação de `modulo`."""
+    carregados = modulos_carregados(modulo)
+    return [
+        nome for nome in sob_demanda
+        if any(m == nome or m.startswith(nome + ".") for m in carregados)
+    ]
+
+
+def _primeiro_nivel(por_modulo: Dict[str, int], top: int) -> List[tuple]:
+    # Pacotes de primeiro nível (o tempo dos submódulos já está acumulado neles)
+    raizes = {nome: us for nome, us in por_modulo.items() if "." not in nome}
+    return sorted(raizes.items(), key=lambda item: -item[1])[:top]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modulo", default=MODULO_PADRAO)
+    parser.add_argument("--execucoes", type=int, default=EXECUCOES_PADRAO)
+    parser.add_argument("--orcamento-ms", type=float, help="Tempo máximo de importação (menor das execuções)")
+    parser.add_argument("--top", type=int, default=10, help="Quantos pacotes mostrar, do mais lento ao mais rápido")
+    args = parser.parse_args(argv)
+
+    # A menor das execuções é a menos afetada por ruído (disco, outros processos)
+    medicoes = [medir_importacao(args.modulo) for _ in range(args.execucoes)]
+    melhor = min(medicoes, key=lambda m: m.total_us)
+    total_ms = melhor.total_us / 1000
+
+    print(f"import {args.modulo}: {total_ms:.1f} ms (menor de {args.execucoes} execuções)")
+    for nome, us in _primeiro_nivel(melhor.por_modulo, args.top):
+        print(f"  {us / 1000:>8.1f} ms  {nome}")
+
+    estourado = False
+    antes_da_hora = carregados_antes_da_hora(args.modulo)
+    if antes_da_hora:
+        estourado = True
+        print(f"carregados na subida, mas deveriam ser sob demanda: {', '.join(antes_da_hora)}", file=sys.stderr)
+    if args.orcamento_ms is not None and total_ms > args.orcamento_ms:
+        estourado = True
+        print(f"orçamento estourado: {total_ms:.1f} ms > {args.orcamento_ms:.1f} ms", file=sys.stderr)
+    return 1 if estourado else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Sobe a API em produção (ou para testes de carga), com o número de workers
+calculado pelos CPUs disponíveis para o processo.
+
+Servidores:
+- uvicorn (padrão): `uvicorn api.main:app --workers N`;
+- gunicorn: gerenciador de processos do gunicorn com workers do uvicorn
+  (`pip install gunicorn`), que reinicia workers que travam ou morrem;
+- wsgi: passenger_wsgi.py (a ponte WSGI de api/wsgi.py) em um servidor
+  WSGI com threads da biblioteca padrão. Serve para reproduzir localmente o
+  modo da hospedagem compartilhada (Passenger); não para produção.
+
+Workers: um por CPU disponível (a API é assíncrona: cada worker atende
+muitas requisições ao mesmo tempo no seu event loop; mais workers que CPUs
+só disputam processador). WEB_CONCURRENCY ou --workers mudam o número.
+Cada worker tem os próprios caches em memória (CNPJ, respostas); as
+consultas de CNPJ também ficam em uma tabela mapeada em memória comum a todos
+os workers da máquina (utils/cnpj_shared_cache.py).
+
+Uso (na raiz do projeto):
+    python -m tools.servir --host 0.0.0.0 --porta 8000
+    python -m tools.servir --servidor gunicorn --workers 4
+    python -m tools.servir --servidor wsgi --threads 16
+"""
+import argparse
+import os
+import sys
+from typing import List, Optional
+
+SERVIDORES = ("uvicorn", "gunicorn", "wsgi")
+APP = "api.main:app"
+
+
+def cpus_disponiveis() -> int:
+    """CPUs que o processo pode usar (respeita a afinidade, ex.: em contêineres)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:   # macOS, Windows
+        return os.cpu_count() or 1
+
+
+def workers_padrao(cpus: Optional[int] = None) -> int:
+    """WEB_CONCURRENCY, se definido; senão, um worker por CPU disponível."""
+    if os.environ.get("WEB_CONCURRENCY"):
+        return max(int(os.environ["WEB_CONCURRENCY"]), 1)
+    return max(cpus or cpus_disponiveis(), 1)
+
+
+def comando(servidor: str, host: str, porta: int, workers: int) -> List[str]:
+    """Linha de comando do uvicorn ou do gunicorn."""
+    if servidor == "uvicorn":
+        return [sys.executable, "-m", "uvicorn", APP, "--host", host, "--port", str(porta),
+                "--workers", str(workers), "--no-access-log"]
+    if servidor == "gunicorn":
+        return [sys.executable, "-m", "gunicorn", APP, "--worker-class", "uvicorn.workers.UvicornWorker",
+                "--workers", str(workers), "--bind", f"{host}:{porta}", "--graceful-timeout", "30"]
+    raise ValueError(f"servidor sem linha de comando: {servidor}")
+
+
+def servir_wsgi(host: str, porta: int, threads: int):
+    """passenger_wsgi.application em um servidor WSGI com uma thread por conexão."""
+    from socketserver import ThreadingMixIn
+    from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+    from passenger_wsgi import application
+
+    class Servidor(ThreadingMixIn, WSGIServer):
+        daemon_threads = True
+        request_queue_size = max(threads, 5)
+
+    class SemLog(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    with make_server(host, porta, application, server_class=Servidor, handler_class=SemLog) as servidor:
+        try:
+            servidor.serve_forever()
+        finally:
+            application.fechar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servidor", choices=SERVIDORES, default="uvicorn")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8000)
+    parser.add_argument("--workers", type=int, help="Padrão: WEB_CONCURRENCY ou um por CPU disponível")
+    parser.add_argument("--threads", type=int, help="Modo wsgi: threads de rotas síncronas (WSGI_THREADS)")
+    args = parser.parse_args(argv)
+
+    if args.servidor == "wsgi":
+        # Um processo só, como um processo do Passenger
+        if args.threads:
+            os.environ["WSGI_THREADS"] = str(args.threads)
+        servir_wsgi(args.host, args.porta, args.threads or 40)
+        return
+
+    workers = args.workers or workers_padrao()
+    argv_servidor = comando(args.servidor, args.host, args.porta, workers)
+    print(f"{args.servidor}: {workers} worker(s) em http://{args.host}:{args.porta}", file=sys.stderr)
+    os.execv(sys.executable, argv_servidor)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Validação em massa, offline, de documentos de estágio exportados em JSONL ou CSV.
+
+Uso (na raiz do projeto):
+    python -m tools.validar_arquivo contratos.jsonl -o relatorio.json
+    python -m tools.validar_arquivo contratos.csv -o relatorio.json --workers 8 --consultar-cnpj
+
+- Cada documento passa pelas mesmas regras do ValidacaoDocumentoSchema
+  (formatos via utils + regras de negócio).
+- O arquivo é lido em blocos (--bloco registros por vez) e os blocos são
+  distribuídos entre processos (--workers, padrão: número de CPUs).
+- No CSV, as colunas usam o caminho do campo com pontos, ex.:
+  "unidade_concedente.endereco.cep". Células vazias viram null.
+- --consultar-cnpj confere na Receita os CNPJs dos documentos válidos,
+  uma única consulta por CNPJ distinto, depois da etapa local.
+
+O relatório é um JSON com "resumo" (totais e vazão) e "registros"
+(um item por documento, com "indice", "status" e "erros").
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+BLOCO_PADRAO = 500
+CONCORRENCIA_CNPJ = 8
+
+
+# --- Leitura ---
+
+def ler_jsonl(caminho: str) -> Iterator[Tuple[int, Any]]:
+    with open(caminho, encoding="utf-8-sig") as arquivo:
+        indice = 0
+        for linha in arquivo:
+            linha = linha.strip()
+            if not linha:
+                continue
+            try:
+                yield indice, json.loads(linha)
+            except ValueError as e:
+                yield indice, {"__erro_json__": str(e)}
+            indice += 1
+
+
+def _aninhar(linha: Dict[str, str]) -> Dict[str, Any]:
+    """Converte {"a.b": "x"} em {"a": {"b": "x"}}; células vazias viram None."""
+    documento: Dict[str, Any] = {}
+    for coluna, valor in linha.items():
+        if coluna is None:
+            continue
+        no = documento
+        *caminho, campo = coluna.strip().split(".")
+        for parte in caminho:
+            no = no.setdefault(parte, {})
+        no[campo] = valor if valor not in ("", None) else None
+    return documento
+
+
+def ler_csv(caminho: str) -> Iterator[Tuple[int, Any]]:
+    with open(caminho, encoding="utf-8-sig", newline="") as arquivo:
+        amostra = arquivo.read(4096)
+        arquivo.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+        except csv.Error:
+            dialeto = csv.excel
+        for indice, linha in enumerate(csv.DictReader(arquivo, dialect=dialeto)):
+            yield indice, _aninhar(linha)
+
+
+def ler_registros(caminho: str, formato: Optional[str] = None) -> Iterator[Tuple[int, Any]]:
+    formato = formato or ("csv" if caminho.lower().endswith(".csv") else "jsonl")
+    return ler_csv(caminho) if formato == "csv" else ler_jsonl(caminho)
+
+
+def em_blocos(registros: Iterator[Tuple[int, Any]], tamanho: int) -> Iterator[List[Tuple[int, Any]]]:
+    registros = iter(registros)
+    while True:
+        bloco = list(islice(registros, tamanho))
+        if not bloco:
+            return
+        yield bloco
+
+
+# --- Validação (executada nos processos do pool) ---
+
+def validar_bloco(bloco: List[Tuple[int, Any]]) -> List[Dict[str, Any]]:
+    """Valida um bloco de documentos. Roda em um processo separado."""
+    from pydantic import ValidationError
+    from api.schemas import ValidacaoDocumentoSchema
+    from utils import format_cnpj
+
+    resultados = []
+    for indice, dados in bloco:
+        if isinstance(dados, dict) and "__erro_json__" in dados:
+            resultados.append({
+                "indice": indice,
+                "status": "erro",
+                "erros": [{"loc": "", "type": "json_invalid", "msg": f"JSON inválido: {dados['__erro_json__']}"}],
+            })
+            continue
+        try:
+            doc = ValidacaoDocumentoSchema.model_validate(dados)
+        except ValidationError as e:
+            resultados.append({
+                "indice": indice,
+                "status": "erro",
+                "erros": [
+                    {"loc": ".".join(str(p) for p in erro["loc"]), "type": erro["type"], "msg": erro["msg"]}
+                    for erro in e.errors(include_url=False, include_input=False, include_context=False)
+                ],
+            })
+            continue
+        resultado = {"indice": indice, "status": "sucesso", "erros": []}
+        if doc.unidade_concedente.cnpj:
+            resultado["cnpj"] = format_cnpj(doc.unidade_concedente.cnpj)
+        resultados.append(resultado)
+    return resultados
+
+
+def validar_em_paralelo(blocos: Iterator[List[Tuple[int, Any]]], workers: int) -> Iterator[Dict[str, Any]]:
+    """
+    Distribui os blocos no pool mantendo no máximo 2 blocos por processo em
+    andamento, para que a memória não cresça com o tamanho do arquivo.
+    """
+    if workers <= 1:
+        for bloco in blocos:
+            yield from validar_bloco(bloco)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pendentes = set()
+        for bloco in blocos:
+            pendentes.add(pool.submit(validar_bloco, bloco))
+            if len(pendentes) >= workers * 2:
+                prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    yield from futuro.result()
+        for futuro in pendentes:
+            yield from futuro.result()
+
+
+# --- Consulta externa de CNPJ (opcional, deduplicada) ---
+
+async def consultar_cnpjs(cnpjs, concorrencia: int = CONCORRENCIA_CNPJ) -> Dict[str, Optional[str]]:
+    """Consulta cada CNPJ distinto uma única vez. Retorna {cnpj: erro ou None}."""
+    from api.services import verificar_cnpj_concedente
+    from utils.http_client import create_async_client
+
+    vagas = asyncio.Semaphore(concorrencia)
+
+    async with create_async_client() as client:
+        async def consultar(cnpj):
+            async with vagas:
+                return cnpj, await verificar_cnpj_concedente(cnpj, client)
+
+        return dict(await asyncio.gather(*(consultar(c) for c in cnpjs)))
+
+
+# --- Relatório ---
+
+def executar(
+    entrada: str,
+    saida: str,
+    formato: Optional[str] = None,
+    workers: Optional[int] = None,
+    bloco: int = BLOCO_PADRAO,
+    consultar_cnpj: bool = False,
+) -> Dict[str, Any]:
+    workers = workers or os.cpu_count() or 1
+    inicio = time.perf_counter()
+    totais = Counter()
+    erros_por_campo = Counter()
+    cnpjs = set()
+
+    # Os registros vão primeiro para um arquivo temporário (um por linha), para
+    # que o resultado da consulta de CNPJ possa ser aplicado sem guardar o
+    # relatório inteiro em memória.
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as temporario:
+        for resultado in validar_em_paralelo(em_blocos(ler_registros(entrada, formato), bloco), workers):
+            totais[resultado["status"]] += 1
+            for erro in resultado["erros"]:
+                erros_por_campo[erro["loc"] or "(documento)"] += 1
+            if consultar_cnpj and "cnpj" in resultado:
+                cnpjs.add(resultado["cnpj"])
+            temporario.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+        tempo_local = time.perf_counter() - inicio
+
+        erros_cnpj: Dict[str, Optional[str]] = {}
+        tempo_cnpj = 0.0
+        if cnpjs:
+            inicio_cnpj = time.perf_counter()
+            erros_cnpj = asyncio.run(consultar_cnpjs(sorted(cnpjs)))
+            tempo_cnpj = time.perf_counter() - inicio_cnpj
+
+        total = totais["sucesso"] + totais["erro"]
+        invalidos_cnpj = 0
+        temporario.seek(0)
+        with open(saida, "w", encoding="utf-8") as relatorio:
+            relatorio.write('{"registros": [\n')
+            for n, linha in enumerate(temporario):
+                resultado = json.loads(linha)
+                erro = erros_cnpj.get(resultado.pop("cnpj", None))
+                if erro:
+                    invalidos_cnpj += 1
+                    resultado["status"] = "erro"
+                    resultado["erros"].append({"loc": "unidade_concedente.cnpj", "type": "cnpj_receita", "msg": erro})
+                    erros_por_campo["unidade_concedente.cnpj"] += 1
+                relatorio.write((",\n" if n else "") + json.dumps(resultado, ensure_ascii=False))
+
+            resumo = {
+                "arquivo": entrada,
+                "total": total,
+                "validos": totais["sucesso"] - invalidos_cnpj,
+                "invalidos": totais["erro"] + invalidos_cnpj,
+                "erros_por_campo": dict(erros_por_campo.most_common()),
+                "workers": workers,
+                "tamanho_bloco": bloco,
+                "tempo_validacao_local_s": round(tempo_local, 3),
+                "documentos_por_segundo": round(total / tempo_local, 1) if tempo_local else None,
+                "cnpjs_consultados": len(cnpjs),
+                "tempo_consulta_cnpj_s": round(tempo_cnpj, 3),
+                "tempo_total_s": round(time.perf_counter() - inicio, 3),
+            }
+            relatorio.write('\n], "resumo": ' + json.dumps(resumo, ensure_ascii=False) + "}\n")
+    return resumo
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Valida em massa documentos de estágio (JSONL ou CSV).")
+    parser.add_argument("entrada", help="Arquivo .jsonl ou .csv")
+    parser.add_argument("-o", "--saida", default="relatorio_validacao.json", help="Arquivo do relatório (JSON)")
+    parser.add_argument("--formato", choices=["jsonl", "csv"], help="Força o formato da entrada")
+    parser.add_argument("--workers", type=int, default=None, help="Processos de validação (padrão: nº de CPUs)")
+    parser.add_argument("--bloco", type=int, default=BLOCO_PADRAO, help="Registros por bloco enviado a cada processo")
+    parser.add_argument("--consultar-cnpj", action="store_true", help="Confere os CNPJs na Receita (BrasilAPI)")
+    args = parser.parse_args(argv)
+
+    resumo = executar(args.entrada, args.saida, args.formato, args.workers, args.bloco, args.consultar_cnpj)
+    json.dump(resumo, sys.stderr, ensure_ascii=False, indent=2)
+    sys.stderr.write("\n")
+    return 0 if resumo["invalidos"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
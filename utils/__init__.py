@@ -3,32 +3,56 @@ from .exceptions import ValidationError
 from .cep import (
     format_cep,
     is_valid_cep,
-    validate_cep
+    validate_cep,
+    check_cep,
+    cep_error_message,
+    cep_uf,
+    check_cep_uf,
+    cep_uf_error_message,
+    check_cep_uf_batch,
 )
 from .cpf import (
     format_cpf,
     is_valid_cpf,
     validate_cpf,
-    mask_cpf
+    mask_cpf,
+    is_valid_cpf_batch,
+    check_cpf,
+    cpf_error_message
 )
 from .cnpj import (
     format_cnpj,
     is_valid_cnpj,
     validate_cnpj,
-    mask_cnpj
+    mask_cnpj,
+    is_valid_cnpj_batch,
+    check_cnpj,
+    cnpj_error_message
 )
 from .email import (
     is_valid_email,
     validate_email,
-    mask_email
+    mask_email,
+    check_email,
+    email_error_message
 )
 from .phone_number import (
     format_phone_number,
     is_valid_phone_number,
-    validate_phone_number
+    validate_phone_number,
+    check_phone_number,
+    phone_number_error_message,
+    phone_number_uf,
+    check_phone_number_uf,
+    phone_number_uf_error_message,
+    check_phone_number_uf_batch,
 )
 from .uf import (
     is_valid_uf,
     validate_uf,
+    check_uf,
+    uf_error_message,
+    uf_for_ddd,
+    UFRanges,
     UFS
 )
\ No newline at end of file
@@ -0,0 +1,89 @@
+# Apoio às validações em lote (NumPy): converte uma sequência de strings em
+# uma matriz de dígitos uint8 e calcula dígitos verificadores por produto
+# matricial. O NumPy só é importado quando uma função de lote é usada.
+
+from ._digits import (
+    only_digits,
+    OK as REASON_OK,
+    INVALID_LENGTH as REASON_LENGTH,
+    REPEATED_DIGITS as REASON_REPEATED,
+    INVALID_CHECK_DIGIT as REASON_CHECK_DIGIT,
+)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as e:  # pragma: no cover
+        raise ImportError("As validações em lote dependem do NumPy: pip install numpy") from e
+    return numpy
+
+
+def digit_matrix(values, length: int):
+    """
+    Retorna (matriz n_ok x length de dígitos, índices das linhas com o tamanho
+    certo, n). Valores com outro tamanho ficam de fora da matriz.
+
+    Os valores são concatenados (separados por "\\n") e os dígitos de todos
+    eles são extraídos de uma só vez sobre o buffer de bytes.
+    """
+    np = _numpy()
+    if not isinstance(values, list):
+        values = list(values)
+    n = len(values)
+    try:
+        joined = "\n".join(values)
+    except TypeError:
+        # Valores que não são str (ex.: None) contam como vazios
+        joined = "\n".join(v if isinstance(v, str) else "" for v in values)
+
+    raw = np.frombuffer(joined.encode("ascii", "ignore"), dtype=np.uint8)
+    separators = raw == 10
+    if int(separators.sum()) != max(n - 1, 0):
+        # Algum valor contém quebra de linha: volta ao caminho valor a valor
+        return _digit_matrix_per_value(np, values, length)
+
+    # Segmento i = bytes entre o separador i-1 e o separador i
+    bounds = np.concatenate(([0], np.flatnonzero(separators), [len(raw)]))
+    is_digit = (raw >= 48) & (raw <= 57)
+    digits_before = np.concatenate(([0], np.cumsum(is_digit, dtype=np.int32)))
+    lengths = digits_before[bounds[1:]] - digits_before[bounds[:-1]]
+    selected = np.flatnonzero(lengths == length)
+    keep = is_digit & np.repeat(lengths == length, np.diff(bounds))
+    matrix = (raw[keep] - 48).reshape(-1, length)
+    return matrix, selected, n
+
+
+def _digit_matrix_per_value(np, values, length: int):
+    cleaned = [only_digits(v) for v in values]
+    n = len(cleaned)
+    lengths = np.fromiter(map(len, cleaned), dtype=np.int64, count=n)
+    selected = np.flatnonzero(lengths == length)
+    buf = b"".join([cleaned[i] for i in selected.tolist()])
+    matrix = np.frombuffer(buf, dtype=np.uint8).reshape(-1, length) - 48
+    return matrix, selected, n
+
+
+def check_digit(matrix, weights):
+    """Dígito verificador módulo 11 (0 se resto < 2, senão 11 - resto) de cada linha."""
+    np = _numpy()
+    remainder = (matrix[:, :len(weights)].astype(np.int32) @ np.asarray(weights, dtype=np.int32)) % 11
+    return np.where(remainder < 2, 0, 11 - remainder)
+
+
+def validate_matrix(values, length: int, weights_1, weights_2):
+    """Validação completa (tamanho, dígitos repetidos, dois DVs) de um lote."""
+    np = _numpy()
+    matrix, selected, n = digit_matrix(values, length)
+
+    # Códigos: 0 = válido, 1 = tamanho, 2 = repetidos, 3 = dígito verificador
+    codes = np.ones(n, dtype=np.uint8)
+    if len(selected):
+        repeated = (matrix == matrix[:, :1]).all(axis=1)
+        dv_ok = (check_digit(matrix, weights_1) == matrix[:, len(weights_1)]) & (
+            check_digit(matrix, weights_2) == matrix[:, len(weights_2)]
+        )
+        codes[selected] = np.where(repeated, 2, np.where(dv_ok, 0, 3))
+
+    reasons = np.array([REASON_OK, REASON_LENGTH, REASON_REPEATED, REASON_CHECK_DIGIT], dtype=object)[codes]
+    return codes == 0, reasons
@@ -0,0 +1,43 @@
+# Tabelas pré-computadas usadas pelas validações rápidas (check_*) e em lote.
+
+# Todos os bytes que não são dígitos ASCII: removê-los com bytes.translate
+# equivale ao re.sub(r'[^0-9]', '', ...) das versões originais.
+NON_DIGIT_BYTES = bytes(b for b in range(256) if not 0x30 <= b <= 0x39)
+
+# Códigos de reprovação (o "code" de (ok, code)); "" indica valor válido
+OK = ""
+INVALID_LENGTH = "invalid_length"
+REPEATED_DIGITS = "repeated_digits"
+INVALID_CHECK_DIGIT = "invalid_check_digit"
+
+# Dígito verificador módulo 11 indexado pela soma ponderada
+_MOD11 = tuple(0 if s % 11 < 2 else 11 - s % 11 for s in range(11))
+
+
+def only_digits(value) -> bytes:
+    """Dígitos ASCII do valor, como bytes (b'' para valores que não são str)."""
+    if not isinstance(value, str):
+        return b""
+    return value.encode("ascii", "ignore").translate(None, NON_DIGIT_BYTES)
+
+
+def digits_str(value: str) -> str:
+    return value.encode("ascii", "ignore").translate(None, NON_DIGIT_BYTES).decode("ascii")
+
+
+def weighted_tables(weights):
+    """
+    Para cada posição, tabela byte -> peso * dígito (já descontado o '0' ASCII),
+    reduzindo a soma ponderada a consultas em tabela.
+    """
+    return tuple(
+        tuple((b - 48) * w if 48 <= b <= 57 else 0 for b in range(256))
+        for w in weights
+    )
+
+
+def mod11_check_digit(digits: bytes, tables) -> int:
+    total = 0
+    for table, b in zip(tables, digits):
+        total += table[b]
+    return _MOD11[total % 11]
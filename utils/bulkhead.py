@@ -0,0 +1,111 @@
+"""
+Compartimento (bulkhead): limita quantas execuções de um tipo de trabalho
+acontecem ao mesmo tempo no processo, com uma fila limitada e um tempo
+máximo de espera nela.
+
+Quem não cabe é recusado na hora (fila cheia) ou depois de `queue_timeout`
+segundos na fila (BulkheadFull), em vez de esperar indefinidamente: a
+latência fica limitada e quem chamou pode responder "tente mais tarde".
+A fila é atendida na ordem de chegada: a vaga de quem termina passa direto
+para o primeiro da fila.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict
+
+QUEUE_FULL = "queue_full"
+QUEUE_TIMEOUT = "queue_timeout"
+
+
+class BulkheadFull(Exception):
+    """Execução recusada pelo compartimento `bulkhead`, por `reason` (QUEUE_FULL ou QUEUE_TIMEOUT)."""
+
+    def __init__(self, bulkhead: "Bulkhead", reason: str):
+        super().__init__(f"{bulkhead.name}: {reason}")
+        self.bulkhead = bulkhead
+        self.reason = reason
+
+
+class Bulkhead:
+    """
+    Até `max_concurrent` execuções simultâneas e até `max_queue` esperando
+    a vez, cada uma por no máximo `queue_timeout` segundos. Uso:
+
+        wait = await bulkhead.acquire()
+        try:
+            ...
+        finally:
+            bulkhead.release()
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int = 0, queue_timeout: float = 1.0):
+        if max_concurrent < 1 or max_queue < 0:
+            raise ValueError("max_concurrent deve ser ao menos 1 e max_queue, não negativo")
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._stats = {"admitted": 0, "queued": 0, QUEUE_FULL: 0, QUEUE_TIMEOUT: 0}
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> float:
+        """Ocupa uma vaga. Retorna a espera na fila (s) ou levanta BulkheadFull."""
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self._stats["admitted"] += 1
+            return 0.0
+        if len(self._waiters) >= self.max_queue:
+            self._stats[QUEUE_FULL] += 1
+            raise BulkheadFull(self, QUEUE_FULL)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._stats["queued"] += 1
+        start = time.perf_counter()
+        try:
+            # A vaga é entregue por release() (set_result): active já a conta
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Recebeu a vaga no mesmo instante em que o prazo venceu (wait_for
+                # do Python 3.12+ pode levantar TimeoutError mesmo assim)
+                self.release()
+            self._stats[QUEUE_TIMEOUT] += 1
+            raise BulkheadFull(self, QUEUE_TIMEOUT) from None
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Recebeu a vaga no mesmo instante em que foi cancelado
+                self.release()
+            raise
+        finally:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+        self._stats["admitted"] += 1
+        return time.perf_counter() - start
+
+    def release(self):
+        """Libera a vaga: passa para o primeiro da fila, se houver."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            **self._stats,
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "max_wait": self.queue_timeout,
+        }
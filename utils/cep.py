@@ -1,16 +1,99 @@
-import re
+from typing import Optional, Tuple
+
 from .exceptions import ValidationError
+from ._digits import only_digits, digits_str, OK, INVALID_LENGTH
+from .uf import UFS, UFRanges
+
+EMPTY = "empty"
+UF_MISMATCH = "uf_mismatch"
+
+MESSAGES = {
+    EMPTY: "CEP inválido: deve conter apenas números.",
+    INVALID_LENGTH: "CEP inválido: deve conter 8 dígitos, mas contém {length}.",
+    UF_MISMATCH: "O CEP {cep} pertence a {estado} ({uf_cep}), não a {uf}.",
+}
+
+# Faixas de CEP de cada UF (Correios), pelos 5 primeiros dígitos
+CEP_RANGES = UFRanges((
+    ("SP", 1000, 19999), ("RJ", 20000, 28999), ("ES", 29000, 29999), ("MG", 30000, 39999),
+    ("BA", 40000, 48999), ("SE", 49000, 49999), ("PE", 50000, 56999), ("AL", 57000, 57999),
+    ("PB", 58000, 58999), ("RN", 59000, 59999), ("CE", 60000, 63999), ("PI", 64000, 64999),
+    ("MA", 65000, 65999), ("PA", 66000, 68899), ("AP", 68900, 68999), ("AM", 69000, 69299),
+    ("RR", 69300, 69399), ("AM", 69400, 69899), ("AC", 69900, 69999), ("DF", 70000, 72799),
+    ("GO", 72800, 72999), ("DF", 73000, 73699), ("GO", 73700, 76799), ("RO", 76800, 76999),
+    ("TO", 77000, 77999), ("MT", 78000, 78899), ("MS", 79000, 79999), ("PR", 80000, 87999),
+    ("SC", 88000, 89999), ("RS", 90000, 99999),
+))
+_PREFIX_WEIGHTS = (10000, 1000, 100, 10, 1)
 
 def format_cep(cep: str) -> str:
-    return re.sub(r'[^0-9]', '', cep)
+    return digits_str(cep)
+
+def check_cep(cep: str) -> Tuple[bool, str]:
+    """
+    Valida o CEP sem levantar exceções.
+    Retorna (True, "") ou (False, código do motivo).
+    """
+    length = len(only_digits(cep))
+    if length == 8:
+        return True, OK
+    return False, EMPTY if length == 0 else INVALID_LENGTH
+
+def cep_error_message(cep: str, code: str) -> str:
+    return MESSAGES[code].format(length=len(only_digits(cep)))
 
 def is_valid_cep(cep: str) -> bool:
-    cep = format_cep(cep)
-    return cep.isdigit() and len(cep) == 8
+    return check_cep(cep)[0]
 
 def validate_cep(cep: str):
-    cep = format_cep(cep)
-    if not cep.isdigit():
-        raise ValidationError("CEP inválido: deve conter apenas números.")
-    if len(cep) != 8:
-        raise ValidationError(f"CEP inválido: deve conter 8 dígitos, mas contém {len(cep)}.")
\ No newline at end of file
+    valid, code = check_cep(cep)
+    if not valid:
+        raise ValidationError(cep_error_message(cep, code))
+
+def cep_uf(cep: str) -> Optional[str]:
+    """UF do CEP pela faixa dos Correios, ou None (CEP inválido ou fora das faixas)."""
+    digits = only_digits(cep)
+    if len(digits) != 8:
+        return None
+    return CEP_RANGES.lookup(int(digits[:5]))
+
+def check_cep_uf(cep: str, uf: str) -> Tuple[bool, str]:
+    """
+    Confere se o CEP pertence à UF, sem levantar exceções.
+    Retorna (True, "") ou (False, "uf_mismatch"). Sem como decidir (CEP ou UF
+    inválidos ou vazios, CEP fora das faixas conhecidas), aceita: a validação
+    de cada campo cuida deles.
+    """
+    if not cep or not uf:
+        return True, OK
+    uf_cep = cep_uf(cep)
+    if uf_cep is None or uf_cep == uf:
+        return True, OK
+    uf = uf.upper()
+    if uf_cep == uf or uf not in UFS:
+        return True, OK
+    return False, UF_MISMATCH
+
+def cep_uf_error_message(cep: str, uf: str, code: str) -> str:
+    uf_cep = cep_uf(cep)
+    return MESSAGES[code].format(cep=cep, uf=uf.upper(), uf_cep=uf_cep, estado=UFS.get(uf_cep))
+
+def check_cep_uf_batch(ceps, ufs):
+    """
+    Versão vetorizada (NumPy) de check_cep_uf para grandes volumes.
+    Retorna (máscara booleana, motivo de cada reprovação), ambos arrays do
+    tamanho da entrada. Motivos: "" ou "uf_mismatch".
+    """
+    from . import _batch
+    np = _batch._numpy()
+    matrix, selected, n = _batch.digit_matrix(ceps, 8)
+    ok = np.ones(n, dtype=bool)
+    if len(selected):
+        prefixes = matrix[:, :5].astype(np.int64) @ np.array(_PREFIX_WEIGHTS, dtype=np.int64)
+        expected = CEP_RANGES.lookup_batch(prefixes)
+        informed = np.array([
+            u.upper() if isinstance(u, str) and u.upper() in UFS else None for u in ufs
+        ], dtype=object)[selected]
+        ok[selected] = (expected == None) | (informed == None) | (expected == informed)  # noqa: E711
+    reasons = np.where(ok, OK, UF_MISMATCH).astype(object)
+    return ok, reasons
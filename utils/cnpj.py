@@ -1,35 +1,71 @@
-import re
+from typing import Tuple
+
 from .exceptions import ValidationError
+from . import _batch
+from ._digits import (
+    only_digits,
+    digits_str,
+    weighted_tables,
+    mod11_check_digit,
+    OK,
+    INVALID_LENGTH,
+    REPEATED_DIGITS,
+    INVALID_CHECK_DIGIT,
+)
+
+CNPJ_WEIGHTS_1 = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+CNPJ_WEIGHTS_2 = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+_TABLES_1 = weighted_tables(CNPJ_WEIGHTS_1)
+_TABLES_2 = weighted_tables(CNPJ_WEIGHTS_2)
+
+MESSAGES = {
+    INVALID_LENGTH: "O número do CNPJ é inválido.",
+    REPEATED_DIGITS: "O número do CNPJ é inválido.",
+    INVALID_CHECK_DIGIT: "O número do CNPJ é inválido.",
+}
 
 def format_cnpj(cnpj: str) -> str:
-    return re.sub(r'[^0-9]', '', cnpj)
+    return digits_str(cnpj)
 
-def is_valid_cnpj(cnpj: str) -> bool:
-    cnpj = format_cnpj(cnpj)
+def check_cnpj(cnpj: str) -> Tuple[bool, str]:
+    """
+    Valida o CNPJ sem levantar exceções.
+    Retorna (True, "") ou (False, código do motivo).
+    """
+    digits = only_digits(cnpj)
 
-    if len(cnpj) != 14 or len(set(cnpj)) == 1:
-        return False
-    
-    weights = [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
-    sum_ = sum(int(cnpj[i]) * weights[i] for i in range(12))
-    digit1 = 0 if (sum_ % 11) < 2 else 11 - (sum_ % 11)
-    if int(cnpj[12]) != digit1:
-        return False
-        
-    weights = [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
-    sum_ = sum(int(cnpj[i]) * weights[i] for i in range(13))
-    digit2 = 0 if (sum_ % 11) < 2 else 11 - (sum_ % 11)
-    if int(cnpj[13]) != digit2:
-        return False
-        
-    return True
+    if len(digits) != 14:
+        return False, INVALID_LENGTH
+    if digits.count(digits[0]) == 14:
+        return False, REPEATED_DIGITS
+    if digits[12] - 48 != mod11_check_digit(digits, _TABLES_1):
+        return False, INVALID_CHECK_DIGIT
+    if digits[13] - 48 != mod11_check_digit(digits, _TABLES_2):
+        return False, INVALID_CHECK_DIGIT
+    return True, OK
+
+def cnpj_error_message(cnpj: str, code: str) -> str:
+    return MESSAGES[code]
+
+def is_valid_cnpj(cnpj: str) -> bool:
+    return check_cnpj(cnpj)[0]
 
 def validate_cnpj(cnpj: str):
-    if not is_valid_cnpj(cnpj):
-        raise ValidationError("O número do CNPJ é inválido.")
+    valid, code = check_cnpj(cnpj)
+    if not valid:
+        raise ValidationError(cnpj_error_message(cnpj, code))
+
+def is_valid_cnpj_batch(cnpjs):
+    """
+    Versão vetorizada (NumPy) de is_valid_cnpj para grandes volumes.
+    Retorna (máscara booleana, motivo de cada reprovação), ambos arrays do
+    tamanho da entrada. Motivos: "" (válido), "invalid_length",
+    "repeated_digits" ou "invalid_check_digit".
+    """
+    return _batch.validate_matrix(cnpjs, 14, CNPJ_WEIGHTS_1, CNPJ_WEIGHTS_2)
 
 def mask_cnpj(cnpj: str) -> str:
     cnpj = format_cnpj(cnpj)
     if len(cnpj) != 14:
         return cnpj # Retorna o original se não for um CNPJ formatável
-    return f"{cnpj[:2]}.***.***/{cnpj[8:12]}-**"
\ No newline at end of file
+    return f"{cnpj[:2]}.***.***/{cnpj[8:12]}-**"
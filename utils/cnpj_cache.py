@@ -0,0 +1,329 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+
+from . import cnpj_shared_cache
+from .state_dir import state_path
+from .cnpj_result import (
+    CNPJLookupResult,
+    CNPJ_FOUND,
+    CNPJ_NOT_FOUND,
+    CNPJ_SERVICE_ERROR,
+    CNPJ_BAD_REQUEST,
+)
+
+if TYPE_CHECKING:
+    import sqlite3
+
+    from .cnpj_shared_cache import SharedCNPJCache
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_TTL = 7 * 24 * 3600          # CNPJ encontrado: 7 dias
+DEFAULT_NEGATIVE_TTL = 24 * 3600     # CNPJ inexistente: 1 dia
+DISK_TIMEOUT = 1.0                   # espera máxima pela trava do SQLite (outro worker escrevendo)
+
+# Apenas respostas definitivas do provedor são guardadas. Erros transitórios
+# (conexão, 5xx) nunca entram no cache.
+_NEGATIVE_STATUSES = {CNPJ_NOT_FOUND, CNPJ_SERVICE_ERROR, CNPJ_BAD_REQUEST}
+
+
+class CNPJCache:
+    """
+    Cache de consultas de CNPJ em até três níveis:
+    - memória: LRU limitado a `max_entries` itens;
+    - memória compartilhada (opcional): tabela de tamanho fixo mapeada em
+      memória, lida sem trava por todos os workers da máquina
+      (utils.cnpj_shared_cache);
+    - disco: SQLite (opcional), que sobrevive a reinícios e é compartilhado
+      entre processos.
+    Resultados positivos e negativos têm TTLs independentes.
+
+    No event loop, use get_async/set_async: o nível em disco roda em uma
+    thread. Um erro do SQLite (arquivo travado por outro processo) conta
+    como falta no cache ou gravação pulada, nunca como erro da consulta.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: float = DEFAULT_TTL,
+        negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+        clock: Callable[[], float] = time.time,
+        shared: Optional["SharedCNPJCache"] = None,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._clock = clock
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()  # a conexão; o nível em memória não espera por ela
+        self._db = self._open_db(path) if path else None
+        self._shared = shared
+        self._stats = {
+            "memory_hits": 0,
+            "shared_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "invalidations": 0,
+            "disk_errors": 0,
+        }
+
+    @staticmethod
+    def _open_db(path: str) -> "sqlite3.Connection":
+        import sqlite3  # só o nível em disco precisa dele
+
+        db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=DISK_TIMEOUT)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS cnpj_cache ("
+            " cnpj TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " status_code INTEGER,"
+            " razao_social TEXT,"
+            " expires_at REAL NOT NULL)"
+        )
+        return db
+
+    def ttl_for(self, result: CNPJLookupResult) -> Optional[float]:
+        """TTL aplicável ao resultado, ou None se ele não deve ser guardado."""
+        if result.status == CNPJ_FOUND:
+            return self.ttl
+        if result.status in _NEGATIVE_STATUSES:
+            return self.negative_ttl
+        return None
+
+    def get(self, cnpj: str) -> Optional[CNPJLookupResult]:
+        now = self._clock()
+        result = self._get_memory(cnpj, now)
+        if result is None and self._db is not None:
+            result = self._get_disk(cnpj, now)
+        if result is None:
+            self._count("misses")
+        return result
+
+    async def get_async(self, cnpj: str) -> Optional[CNPJLookupResult]:
+        """Como get, com a leitura do disco fora do event loop."""
+        now = self._clock()
+        result = self._get_memory(cnpj, now)
+        if result is None and self._db is not None:
+            result = await asyncio.to_thread(self._get_disk, cnpj, now)
+        if result is None:
+            self._count("misses")
+        return result
+
+    def _get_memory(self, cnpj: str, now: float) -> Optional[CNPJLookupResult]:
+        with self._lock:
+            entry = self._memory.get(cnpj)
+            if entry is not None:
+                result, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(cnpj)
+                    self._stats["memory_hits"] += 1
+                    return result
+                del self._memory[cnpj]
+
+        # Leitura sem trava: outro worker pode estar escrevendo na tabela
+        if self._shared is not None:
+            entry = self._shared.get(cnpj)
+            if entry is not None:
+                with self._lock:
+                    self._remember(cnpj, *entry)
+                    self._stats["shared_hits"] += 1
+                return entry[0]
+        return None
+
+    def _get_disk(self, cnpj: str, now: float) -> Optional[CNPJLookupResult]:
+        rows = self._execute(
+            "SELECT status, status_code, razao_social, expires_at FROM cnpj_cache WHERE cnpj = ?", (cnpj,))
+        if not rows or rows[0][3] <= now:
+            return None
+        row = rows[0]
+        result = CNPJLookupResult(row[0], row[1], row[2])
+        with self._lock:
+            self._remember(cnpj, result, row[3])
+            self._stats["disk_hits"] += 1
+        if self._shared is not None:
+            self._shared.set(cnpj, result, row[3])
+        return result
+
+    def _execute(self, sql: str, params: tuple = ()) -> Optional[list]:
+        """Executa no disco e retorna as linhas; None se o SQLite falhou (ex.: "database is locked")."""
+        import sqlite3  # já carregado por _open_db
+
+        try:
+            with self._db_lock:
+                if self._db is None:
+                    return None
+                return self._db.execute(sql, params).fetchall()
+        except sqlite3.OperationalError:
+            self._count("disk_errors")
+            return None
+
+    def _count(self, stat: str):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def peek(self, cnpj: str) -> bool:
+        """
+        True se o CNPJ está (não vencido) na memória do processo ou na tabela
+        compartilhada. Não consulta o disco nem conta nas estatísticas.
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._memory.get(cnpj)
+            if entry is not None and entry[1] > now:
+                return True
+        return self._shared is not None and self._shared.get(cnpj) is not None
+
+    def set(self, cnpj: str, result: CNPJLookupResult) -> bool:
+        """Guarda o resultado se ele for cacheável. Retorna True se guardou."""
+        expires_at = self._set_memory(cnpj, result)
+        if expires_at is None:
+            return False
+        if self._db is not None:
+            self._set_disk(cnpj, result, expires_at)
+        return True
+
+    async def set_async(self, cnpj: str, result: CNPJLookupResult) -> bool:
+        """Como set, com a gravação no disco fora do event loop."""
+        expires_at = self._set_memory(cnpj, result)
+        if expires_at is None:
+            return False
+        if self._db is not None:
+            await asyncio.to_thread(self._set_disk, cnpj, result, expires_at)
+        return True
+
+    def _set_memory(self, cnpj: str, result: CNPJLookupResult) -> Optional[float]:
+        ttl = self.ttl_for(result)
+        if ttl is None or ttl <= 0:
+            return None
+        expires_at = self._clock() + ttl
+        with self._lock:
+            self._remember(cnpj, result, expires_at)
+            self._stats["stores"] += 1
+        if self._shared is not None:
+            self._shared.set(cnpj, result, expires_at)
+        return expires_at
+
+    def _set_disk(self, cnpj: str, result: CNPJLookupResult, expires_at: float):
+        self._execute(
+            "INSERT OR REPLACE INTO cnpj_cache (cnpj, status, status_code, razao_social, expires_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (cnpj, result.status, result.status_code, result.razao_social, expires_at),
+        )
+
+    def _remember(self, cnpj: str, result: CNPJLookupResult, expires_at: float):
+        self._memory[cnpj] = (result, expires_at)
+        self._memory.move_to_end(cnpj)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def invalidate(self, cnpj: str) -> bool:
+        """Remove o CNPJ de todos os níveis. Retorna True se havia algo guardado."""
+        with self._lock:
+            removed = self._memory.pop(cnpj, None) is not None
+            if self._shared is not None:
+                removed = self._shared.invalidate(cnpj) or removed
+        if self._db is not None:
+            with self._db_lock:
+                cursor = self._db.execute("DELETE FROM cnpj_cache WHERE cnpj = ?", (cnpj,))
+            removed = removed or cursor.rowcount > 0
+        if removed:
+            self._count("invalidations")
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._shared is not None:
+                self._shared.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM cnpj_cache")
+
+    def purge_expired(self) -> int:
+        """Apaga do disco as entradas vencidas. Retorna quantas foram removidas."""
+        if self._db is None:
+            return 0
+        with self._db_lock:
+            cursor = self._db.execute("DELETE FROM cnpj_cache WHERE expires_at <= ?", (self._clock(),))
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        stats["shared"] = self._shared.stats() if self._shared is not None else None
+        hits = stats["memory_hits"] + stats["shared_hits"] + stats["disk_hits"]
+        total = hits + stats["misses"]
+        stats["hit_rate"] = hits / total if total else 0.0
+        return stats
+
+    def close(self):
+        if self._shared is not None:
+            self._shared.close()
+            self._shared = None
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+                self._db = None
+
+
+_UNSET = object()
+_default_cache = _UNSET
+
+
+def _cache_from_env() -> Optional[CNPJCache]:
+    """
+    Configuração por variáveis de ambiente:
+    - CNPJ_CACHE_ENABLED=0 desliga o cache;
+    - CNPJ_CACHE_PATH: arquivo SQLite (padrão: no diretório privado de
+      utils.state_dir; vazio = somente memória);
+    - CNPJ_CACHE_SHARED_PATH: arquivo da tabela compartilhada entre os
+      workers (padrão: no diretório privado de utils.state_dir; vazio = sem
+      ela); CNPJ_CACHE_SHARED_SLOTS: posições da tabela;
+    - CNPJ_CACHE_MAX_ENTRIES, CNPJ_CACHE_TTL, CNPJ_CACHE_NEGATIVE_TTL (segundos).
+    """
+    if os.environ.get("CNPJ_CACHE_ENABLED", "1") == "0":
+        return None
+    path = os.environ.get("CNPJ_CACHE_PATH")
+    if path is None:
+        path = state_path("cnpj_cache.sqlite3")
+    shared_path = os.environ.get("CNPJ_CACHE_SHARED_PATH")
+    if shared_path is None and cnpj_shared_cache.fcntl is not None:
+        shared_path = state_path("cnpj_cache.shm")
+    shared = None
+    if shared_path and cnpj_shared_cache.fcntl is not None:
+        shared = cnpj_shared_cache.SharedCNPJCache(
+            shared_path,
+            slots=int(os.environ.get("CNPJ_CACHE_SHARED_SLOTS", cnpj_shared_cache.DEFAULT_SLOTS)),
+        )
+    return CNPJCache(
+        path=path or None,
+        shared=shared,
+        max_entries=int(os.environ.get("CNPJ_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+        ttl=float(os.environ.get("CNPJ_CACHE_TTL", DEFAULT_TTL)),
+        negative_ttl=float(os.environ.get("CNPJ_CACHE_NEGATIVE_TTL", DEFAULT_NEGATIVE_TTL)),
+    )
+
+
+def get_cnpj_cache() -> Optional[CNPJCache]:
+    """Retorna o cache padrão, criando-o na primeira chamada."""
+    global _default_cache
+    if _default_cache is _UNSET:
+        _default_cache = _cache_from_env()
+    return _default_cache
+
+
+def set_cnpj_cache(cache: Optional[CNPJCache]):
+    """Substitui o cache padrão (None desliga o cache; ex.: nos testes)."""
+    global _default_cache
+    _default_cache = cache
@@ -0,0 +1,205 @@
+import asyncio
+import dataclasses
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Type
+
+from .cnpj_result import (
+    CNPJLookupResult,
+    CNPJ_FOUND,
+    CNPJ_NOT_FOUND,
+    CNPJ_SERVICE_ERROR,
+    CNPJ_BAD_REQUEST,
+    CNPJ_PROVIDER_ERROR,
+    CNPJ_CONNECTION_ERROR,
+)
+from .metrics import registry
+from .tracing import span
+
+if TYPE_CHECKING:
+    import httpx
+
+# Duração e resultado (status HTTP, "connection_error" ou "cancelled") de
+# cada chamada aos provedores, inclusive retentativas e hedges.
+OUTBOUND_PROBE = registry.probe("outbound")
+PROVIDER_REQUEST_SECONDS = registry.histogram(
+    "cnpj_provider_request_duration_seconds",
+    "Duração das consultas de CNPJ aos provedores externos",
+    ("provider", "status"),
+)
+
+# Constante para a URL da API de CNPJ
+BRASIL_API_CNPJ_URL = "https://brasilapi.com.br/api/cnpj/v1/"
+
+
+class CNPJProvider(ABC):
+    """
+    Adaptador de um serviço de consulta de CNPJ. Cada provedor só precisa
+    traduzir a resposta HTTP do serviço para um CNPJLookupResult.
+    """
+    name = "provider"
+    default_url = ""
+    # Limite de taxa padrão do serviço: (chamadas por segundo, rajada), ou None
+    rate_limit: Optional[Tuple[float, int]] = None
+
+    def __init__(self, base_url: Optional[str] = None):
+        self.base_url = base_url or self.default_url
+
+    def url(self, cnpj: str) -> str:
+        return f"{self.base_url}{cnpj}"
+
+    async def lookup(self, client: "httpx.AsyncClient", cnpj: str) -> CNPJLookupResult:
+        import httpx  # já carregado por quem criou o cliente
+
+        start = time.perf_counter()
+        with span(f"cnpj.{self.name}", {"cnpj": cnpj}) as current:
+            try:
+                response = await client.get(self.url(cnpj))
+            except httpx.RequestError as e:
+                self._observe("connection_error", start)
+                if current is not None:
+                    current.error = type(e).__name__
+                return CNPJLookupResult(CNPJ_CONNECTION_ERROR)
+            except asyncio.CancelledError:
+                self._observe("cancelled", start)
+                raise
+            if current is not None:
+                current.set_attribute("http.status_code", response.status_code)
+        self._observe(response.status_code, start)
+        result = self.parse(response)
+        if response.status_code == 429:
+            result = dataclasses.replace(result, retry_after=_retry_after(response))
+        return result
+
+    def _observe(self, status, start: float):
+        if OUTBOUND_PROBE.enabled:
+            PROVIDER_REQUEST_SECONDS.labels(self.name, status).observe(time.perf_counter() - start)
+
+    @abstractmethod
+    def parse(self, response: "httpx.Response") -> CNPJLookupResult:
+        """Traduz a resposta do serviço (qualquer status HTTP) para um CNPJLookupResult."""
+
+    @staticmethod
+    def _json(response: "httpx.Response") -> Optional[dict]:
+        try:
+            data = response.json()
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.base_url}>"
+
+
+def _retry_after(response: "httpx.Response") -> Optional[float]:
+    """Retry-After em segundos (a forma com data HTTP é ignorada)."""
+    try:
+        return max(float(response.headers["retry-after"]), 0.0)
+    except (KeyError, ValueError):
+        return None
+
+
+class BrasilAPIProvider(CNPJProvider):
+    name = "brasilapi"
+    default_url = BRASIL_API_CNPJ_URL
+    # Sem limite publicado: um valor conservador para todos os workers juntos
+    rate_limit = (5.0, 10)
+
+    def parse(self, response: "httpx.Response") -> CNPJLookupResult:
+        if response.status_code == 200:
+            data = self._json(response)
+            if data is None:
+                return CNPJLookupResult(CNPJ_PROVIDER_ERROR, 200)
+            if 'type' in data and data['type'] == 'service_error':
+                return CNPJLookupResult(CNPJ_SERVICE_ERROR, 200)
+            return CNPJLookupResult(CNPJ_FOUND, 200, data.get('razao_social'))
+
+        if response.status_code == 404:
+            return CNPJLookupResult(CNPJ_NOT_FOUND, 404)
+
+        if response.status_code == 400:
+            return CNPJLookupResult(CNPJ_BAD_REQUEST, 400)
+
+        return CNPJLookupResult(CNPJ_PROVIDER_ERROR, response.status_code)
+
+
+class MinhaReceitaProvider(CNPJProvider):
+    """https://minhareceita.org — espelho aberto dos dados da Receita Federal."""
+    name = "minhareceita"
+    default_url = "https://minhareceita.org/"
+
+    def parse(self, response: "httpx.Response") -> CNPJLookupResult:
+        if response.status_code == 200:
+            data = self._json(response)
+            if data is None:
+                return CNPJLookupResult(CNPJ_PROVIDER_ERROR, 200)
+            return CNPJLookupResult(CNPJ_FOUND, 200, data.get('razao_social'))
+        if response.status_code == 404:
+            return CNPJLookupResult(CNPJ_NOT_FOUND, 404)
+        if response.status_code == 400:
+            return CNPJLookupResult(CNPJ_BAD_REQUEST, 400)
+        return CNPJLookupResult(CNPJ_PROVIDER_ERROR, response.status_code)
+
+
+class CNPJwsProvider(CNPJProvider):
+    """https://publica.cnpj.ws — API pública (limite baixo de requisições)."""
+    name = "cnpjws"
+    default_url = "https://publica.cnpj.ws/cnpj/"
+    rate_limit = (3 / 60, 3)   # 3 consultas por minuto
+
+    def parse(self, response: "httpx.Response") -> CNPJLookupResult:
+        if response.status_code == 200:
+            data = self._json(response)
+            if data is None:
+                return CNPJLookupResult(CNPJ_PROVIDER_ERROR, 200)
+            return CNPJLookupResult(CNPJ_FOUND, 200, data.get('razao_social'))
+        if response.status_code == 404:
+            return CNPJLookupResult(CNPJ_NOT_FOUND, 404)
+        if response.status_code == 400:
+            return CNPJLookupResult(CNPJ_BAD_REQUEST, 400)
+        return CNPJLookupResult(CNPJ_PROVIDER_ERROR, response.status_code)
+
+
+class ReceitaWSProvider(CNPJProvider):
+    """https://receitaws.com.br — responde 200 com {"status": "ERROR"} para CNPJ inexistente."""
+    name = "receitaws"
+    default_url = "https://receitaws.com.br/v1/cnpj/"
+    rate_limit = (3 / 60, 3)   # plano gratuito: 3 consultas por minuto
+
+    def parse(self, response: "httpx.Response") -> CNPJLookupResult:
+        if response.status_code == 200:
+            data = self._json(response)
+            if data is None:
+                return CNPJLookupResult(CNPJ_PROVIDER_ERROR, 200)
+            if data.get('status') == 'ERROR':
+                return CNPJLookupResult(CNPJ_SERVICE_ERROR, 200)
+            return CNPJLookupResult(CNPJ_FOUND, 200, data.get('nome'))
+        if response.status_code == 404:
+            return CNPJLookupResult(CNPJ_NOT_FOUND, 404)
+        return CNPJLookupResult(CNPJ_PROVIDER_ERROR, response.status_code)
+
+
+PROVIDERS: Dict[str, Type[CNPJProvider]] = {
+    cls.name: cls
+    for cls in (BrasilAPIProvider, MinhaReceitaProvider, CNPJwsProvider, ReceitaWSProvider)
+}
+
+
+def providers_from_env() -> List[CNPJProvider]:
+    """
+    Lista de provedores, em ordem de preferência, conforme o ambiente:
+    - CNPJ_PROVIDERS: nomes separados por vírgula (padrão: "brasilapi");
+    - CNPJ_PROVIDER_<NOME>_URL: URL base alternativa (ex.: um servidor local
+      de testes). Para a BrasilAPI também vale BRASIL_API_CNPJ_URL.
+    """
+    names = [n.strip().lower() for n in os.environ.get("CNPJ_PROVIDERS", "brasilapi").split(",") if n.strip()]
+    providers = []
+    for name in names:
+        if name not in PROVIDERS:
+            raise ValueError(f"Provedor de CNPJ desconhecido: {name} (disponíveis: {', '.join(PROVIDERS)})")
+        url = os.environ.get(f"CNPJ_PROVIDER_{name.upper()}_URL")
+        if name == BrasilAPIProvider.name:
+            url = url or os.environ.get("BRASIL_API_CNPJ_URL")
+        providers.append(PROVIDERS[name](url))
+    return providers
@@ -0,0 +1,286 @@
+import logging
+import mmap
+from array import array
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, NamedTuple, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Formato do índice (little-endian), gerado por tools/importar_receita.py:
+#
+#   cabeçalho (64 bytes): magic, versão, nº de estabelecimentos, nº de
+#       empresas, tamanho do bloco de nomes, data de geração
+#   estabelecimentos: n x uint64, ordenados; chave = CNPJ (14 dígitos) * 16 + situação
+#   empresas:         m x uint32, ordenados; CNPJ básico (8 primeiros dígitos)
+#   deslocamentos:    (m + 1) x uint64; início da razão social de cada empresa
+#   nomes:            razões sociais em UTF-8, concatenadas
+#
+# Cada seção começa em um múltiplo de 8 bytes. O arquivo é aberto com mmap
+# somente leitura: todos os processos que o abrem compartilham as mesmas
+# páginas do cache do sistema operacional.
+
+MAGIC = b"CNPJIDX1"
+VERSION = 1
+_HEADER = struct.Struct("<8sIIQQQQ16x")  # 64 bytes
+MAX_NAME_BYTES = 150  # razões sociais mais longas são truncadas na importação
+
+# Situação cadastral (tabela da Receita Federal)
+SITUACOES = {
+    1: "NULA",
+    2: "ATIVA",
+    3: "SUSPENSA",
+    4: "INAPTA",
+    8: "BAIXADA",
+}
+SITUACAO_ATIVA = 2
+
+
+class RegistryEntry(NamedTuple):
+    cnpj: str
+    situacao: int
+    razao_social: Optional[str]
+
+    @property
+    def descricao_situacao(self) -> str:
+        return SITUACOES.get(self.situacao, str(self.situacao))
+
+    @property
+    def ativa(self) -> bool:
+        return self.situacao == SITUACAO_ATIVA
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class _Index:
+    """Um arquivo de índice mapeado em memória (imutável)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self.identity = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)  # ValueError se vazio
+        if len(self._mm) < _HEADER.size:
+            raise ValueError(f"Índice de CNPJ truncado: {path}")
+        magic, version, _, n_estab, n_emp, names_len, created = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Arquivo não é um índice de CNPJ válido: {path}")
+        fim = _align(_align(_align(_HEADER.size + n_estab * 8) + n_emp * 4) + (n_emp + 1) * 8) + names_len
+        if fim > len(self._mm):
+            raise ValueError(f"Índice de CNPJ truncado: {path}")
+        self.created = created
+        self.n_estab = n_estab
+        self.n_emp = n_emp
+
+        view = memoryview(self._mm)
+        offset = _HEADER.size
+        self.keys = self._column(view, offset, n_estab, "Q", 8)
+        offset = _align(offset + n_estab * 8)
+        self.companies = self._column(view, offset, n_emp, "I", 4)
+        offset = _align(offset + n_emp * 4)
+        self.name_offsets = self._column(view, offset, n_emp + 1, "Q", 8)
+        offset = _align(offset + (n_emp + 1) * 8)
+        self.names = view[offset:offset + names_len]
+
+    @staticmethod
+    def _column(view: memoryview, offset: int, count: int, fmt: str, size: int) -> Sequence[int]:
+        raw = view[offset:offset + count * size]
+        if sys.byteorder == "little":
+            # memoryview tipado: bisect roda direto sobre as páginas mapeadas
+            return raw.cast(fmt)
+        return _StructColumn(raw, "<" + fmt, size, count)
+
+    def lookup(self, cnpj: int) -> Optional[RegistryEntry]:
+        keys = self.keys
+        i = bisect_left(keys, cnpj << 4)
+        if i == len(keys) or keys[i] >> 4 != cnpj:
+            return None
+        situacao = keys[i] & 0xF
+        return RegistryEntry(f"{cnpj:014d}", situacao, self.razao_social(cnpj // 1_000_000))
+
+    def razao_social(self, basico: int) -> Optional[str]:
+        companies = self.companies
+        j = bisect_left(companies, basico)
+        if j == len(companies) or companies[j] != basico:
+            return None
+        start, end = self.name_offsets[j], self.name_offsets[j + 1]
+        return bytes(self.names[start:end]).decode("utf-8", "replace")
+
+
+class _StructColumn:
+    """Fallback para plataformas big-endian: coluna lida com struct."""
+
+    def __init__(self, raw: memoryview, fmt: str, size: int, count: int):
+        self._raw = raw
+        self._struct = struct.Struct(fmt)
+        self._size = size
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i: int) -> int:
+        if i < 0:
+            i += self._count
+        return self._struct.unpack_from(self._raw, i * self._size)[0]
+
+
+class CNPJRegistry:
+    """
+    Consulta local (sem rede) de existência e situação cadastral de CNPJs,
+    em O(log n) sobre o índice mapeado em memória.
+
+    Quando um novo índice é importado (os.replace sobre o mesmo caminho), a
+    troca é percebida em até `check_interval` segundos e as consultas
+    seguintes passam a usar o arquivo novo; consultas em andamento terminam
+    com o antigo.
+
+    Com `authoritative=True` (padrão) um CNPJ ausente do índice é tratado
+    como inexistente; com False, a ausência apenas encaminha a consulta aos
+    provedores externos (útil para CNPJs abertos depois da última importação).
+    """
+
+    def __init__(self, path: str, check_interval: float = 30.0, authoritative: bool = True):
+        self.path = path
+        self.check_interval = check_interval
+        self.authoritative = authoritative
+        self._lock = threading.Lock()
+        self._index = _Index(path)
+        self._rejected = None  # identidade do último arquivo novo recusado
+        self._checked_at = time.monotonic()
+        self.reloads = 0
+        self.lookups = 0
+        self.hits = 0
+
+    def reload_if_changed(self, force: bool = False) -> bool:
+        """Reabre o índice se o arquivo foi substituído. Retorna True se trocou."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                return False
+            identity = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+            if not force and identity in (self._index.identity, self._rejected):
+                return False
+            try:
+                index = _Index(self.path)
+            except (OSError, ValueError) as e:
+                # Arquivo novo inválido (vazio, truncado, de outro formato):
+                # segue com o índice atual até a próxima substituição
+                self._rejected = identity
+                logger.warning("Índice de CNPJ mantido; arquivo novo inválido: %s", e)
+                return False
+            self._index = index
+            self.reloads += 1
+            return True
+
+    def lookup(self, cnpj: str) -> Optional[RegistryEntry]:
+        """Consulta um CNPJ (14 dígitos). None se ele não consta no índice."""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self.reload_if_changed()
+        self.lookups += 1
+        entry = self._index.lookup(int(cnpj))
+        if entry is not None:
+            self.hits += 1
+        return entry
+
+    def stats(self) -> Dict[str, object]:
+        index = self._index
+        return {
+            "path": self.path,
+            "authoritative": self.authoritative,
+            "establishments": index.n_estab,
+            "companies": index.n_emp,
+            "created": index.created,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "reloads": self.reloads,
+        }
+
+
+def _pack(fmt: str, values) -> bytes:
+    column = array(fmt, values)
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column.tobytes()
+
+
+def write_registry(path: str, keys: Sequence[int], companies: Sequence[int], names: Iterable[bytes]):
+    """
+    Grava um índice de forma atômica: escreve em um arquivo temporário no
+    mesmo diretório e o renomeia sobre `path` (os.replace).
+
+    - keys: chaves dos estabelecimentos (CNPJ * 16 + situação), ordenadas;
+    - companies / names: CNPJs básicos ordenados e a razão social (UTF-8) de
+      cada um, na mesma ordem. `names` é percorrido uma única vez.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".cnpj-registry-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"\0" * _HEADER.size)
+            f.write(_pack("Q", keys))
+            f.write(b"\0" * (_align(f.tell()) - f.tell()))
+            f.write(_pack("I", companies))
+            f.write(b"\0" * (_align(f.tell()) - f.tell()))
+
+            # Os nomes vêm depois da tabela de deslocamentos, que só é
+            # conhecida ao final: reserva o espaço e volta para preenchê-lo.
+            offsets_at = f.tell()
+            names_at = _align(offsets_at + (len(companies) + 1) * 8)
+            f.seek(names_at)
+            offsets = array("Q", [0])
+            for name in names:
+                f.write(name)
+                offsets.append(offsets[-1] + len(name))
+            if len(offsets) != len(companies) + 1:
+                raise ValueError("A quantidade de razões sociais difere da de empresas.")
+            f.seek(offsets_at)
+            f.write(_pack("Q", offsets))
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, VERSION, 0, len(keys), len(companies), offsets[-1], int(time.time())))
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+_UNSET = object()
+_default_registry = _UNSET
+
+
+def get_cnpj_registry() -> Optional[CNPJRegistry]:
+    """
+    Índice local configurado em CNPJ_REGISTRY_PATH (None se não configurado
+    ou se o arquivo ainda não existe). CNPJ_REGISTRY_CHECK_INTERVAL define de
+    quanto em quanto tempo (s) a troca do arquivo é verificada e
+    CNPJ_REGISTRY_AUTHORITATIVE=0 faz CNPJs ausentes seguirem para a consulta externa.
+    """
+    global _default_registry
+    if _default_registry is _UNSET:
+        path = os.environ.get("CNPJ_REGISTRY_PATH")
+        if not path or not os.path.exists(path):
+            return None
+        interval = float(os.environ.get("CNPJ_REGISTRY_CHECK_INTERVAL", 30.0))
+        authoritative = os.environ.get("CNPJ_REGISTRY_AUTHORITATIVE", "1") != "0"
+        _default_registry = CNPJRegistry(path, interval, authoritative)
+    return _default_registry
+
+
+def set_cnpj_registry(registry: Optional[CNPJRegistry]):
+    """Substitui o índice padrão (None desliga a consulta local)."""
+    global _default_registry
+    _default_registry = registry
@@ -0,0 +1,311 @@
+import asyncio
+import os
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set
+
+from .cnpj_providers import OUTBOUND_PROBE, CNPJProvider, providers_from_env
+from .cnpj_result import (
+    CNPJLookupResult,
+    CNPJ_PROVIDER_ERROR,
+    CNPJ_CONNECTION_ERROR,
+    CNPJ_UNAVAILABLE,
+    CNPJ_RATE_LIMITED,
+)
+from .metrics import registry
+from .rate_limit import SharedTokenBucket
+from .resilience import CircuitBreaker, LatencyTracker, RetryBudget, jittered_backoff
+from .state_dir import state_dir
+from .tracing import span
+
+if TYPE_CHECKING:
+    import httpx
+
+# Falhas que justificam nova tentativa / outro provedor. As demais respostas
+# (encontrado, inexistente, inválido) são definitivas.
+TRANSIENT_STATUSES = frozenset({CNPJ_PROVIDER_ERROR, CNPJ_CONNECTION_ERROR, CNPJ_RATE_LIMITED})
+
+RATE_LIMIT_WAIT_SECONDS = registry.histogram(
+    "cnpj_rate_limit_wait_seconds",
+    "Espera na fila do limitador de taxa antes de cada consulta de CNPJ",
+    ("provider",),
+)
+RATE_LIMIT_DROPPED = registry.counter(
+    "cnpj_rate_limit_dropped",
+    "Consultas de CNPJ descartadas pelo limitador de taxa (espera além do orçamento)",
+    ("provider",),
+)
+
+
+def is_transient(result: CNPJLookupResult) -> bool:
+    return result.status in TRANSIENT_STATUSES
+
+
+class CNPJResolver:
+    """
+    Consulta de CNPJ resiliente sobre uma lista ordenada de provedores:
+    - disjuntor por provedor (falha rápida quando o provedor está doente);
+    - retentativas com backoff e jitter, limitadas por um orçamento global;
+    - hedge: se a resposta demorar mais que o percentil `hedge_percentile`
+      das latências recentes, dispara uma segunda consulta (no próximo
+      provedor saudável) e usa a primeira resposta definitiva;
+    - fallback: após uma falha transitória, a próxima tentativa vai para o
+      próximo provedor da lista;
+    - limite de taxa por provedor (`limiters`, utils.rate_limit), comum a
+      todos os processos da máquina: a chamada espera a vez dela, ou é
+      descartada (CNPJ_RATE_LIMITED) se a espera passar do orçamento. Um
+      hedge nunca espera: só sai se houver token na hora.
+    """
+
+    def __init__(
+        self,
+        providers: Iterable[CNPJProvider],
+        max_retries: int = 2,
+        hedge: bool = True,
+        hedge_percentile: float = 0.95,
+        hedge_default_delay: float = 1.0,
+        hedge_min_delay: float = 0.05,
+        budget: Optional[RetryBudget] = None,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        backoff_base: float = 0.1,
+        backoff_cap: float = 2.0,
+        limiters: Optional[Dict[str, SharedTokenBucket]] = None,
+    ):
+        self.providers: List[CNPJProvider] = list(providers)
+        if not self.providers:
+            raise ValueError("É necessário ao menos um provedor de CNPJ.")
+        self.max_retries = max_retries
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_default_delay = hedge_default_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.budget = budget or RetryBudget()
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breakers: Dict[str, CircuitBreaker] = {
+            p.name: CircuitBreaker(failure_threshold, recovery_timeout) for p in self.providers
+        }
+        self.latencies: Dict[str, LatencyTracker] = {p.name: LatencyTracker() for p in self.providers}
+        self.limiters: Dict[str, SharedTokenBucket] = dict(limiters or {})
+        self._stats = {"lookups": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "fallbacks": 0, "fast_failures": 0}
+
+    def _pick(self, exclude: Set[str] = frozenset()) -> Optional[CNPJProvider]:
+        """Primeiro provedor (em ordem de preferência) fora de `exclude` cujo disjuntor permite a chamada."""
+        for provider in self.providers:
+            if provider.name not in exclude and self.breakers[provider.name].allow():
+                return provider
+        return None
+
+    def hedge_delay(self, provider: CNPJProvider) -> float:
+        p = self.latencies[provider.name].percentile(self.hedge_percentile)
+        if p is None:
+            return self.hedge_default_delay
+        return max(p, self.hedge_min_delay)
+
+    async def _call(
+        self, provider: CNPJProvider, cnpj: str, client: "httpx.AsyncClient", max_wait: Optional[float] = None
+    ) -> CNPJLookupResult:
+        breaker = self.breakers[provider.name]
+        limiter = self.limiters.get(provider.name)
+        if limiter is not None:
+            try:
+                with span(f"rate_limit.{provider.name}") as current:
+                    wait = await limiter.acquire(max_wait)
+                    if current is not None:
+                        current.set_attribute("dropped", wait is None)
+            except asyncio.CancelledError:
+                breaker.record_cancel()
+                raise
+            if wait is None:
+                # Não chegou ao provedor: não conta como falha dele
+                breaker.record_cancel()
+                if OUTBOUND_PROBE.enabled:
+                    RATE_LIMIT_DROPPED.labels(provider.name).inc()
+                return CNPJLookupResult(CNPJ_RATE_LIMITED)
+            if OUTBOUND_PROBE.enabled:
+                RATE_LIMIT_WAIT_SECONDS.labels(provider.name).observe(wait)
+
+        start = time.perf_counter()
+        try:
+            result = await provider.lookup(client, cnpj)
+        except asyncio.CancelledError:
+            breaker.record_cancel()
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        if limiter is not None and result.status != CNPJ_CONNECTION_ERROR:
+            if result.status_code == 429:
+                limiter.record_throttled(result.retry_after)
+            else:
+                limiter.record_success()
+        if is_transient(result):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+            self.latencies[provider.name].record(time.perf_counter() - start)
+        return result
+
+    async def _attempt(self, provider: CNPJProvider, cnpj: str, client: "httpx.AsyncClient") -> CNPJLookupResult:
+        """Uma tentativa, com hedge se a resposta demorar além do percentil."""
+        primary = asyncio.ensure_future(self._call(provider, cnpj, client))
+        if not self.hedge:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay(provider))
+        if done:
+            return primary.result()
+
+        hedge_provider = self._pick(exclude={provider.name})
+        if hedge_provider is None:
+            if not self.breakers[provider.name].allow():
+                return await primary
+            hedge_provider = provider
+        if not self.budget.try_withdraw():
+            self.breakers[hedge_provider.name].record_cancel()
+            return await primary
+
+        self._stats["hedges"] += 1
+        hedge = asyncio.ensure_future(self._call(hedge_provider, cnpj, client, max_wait=0.0))
+        pending = {primary, hedge}
+        last = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        continue
+                    result = task.result()
+                    if not is_transient(result):
+                        if task is hedge:
+                            self._stats["hedge_wins"] += 1
+                        return result
+                    last = result
+        finally:
+            for task in pending:
+                task.cancel()
+        return last or CNPJLookupResult(CNPJ_CONNECTION_ERROR)
+
+    async def lookup(self, cnpj: str, client: "httpx.AsyncClient") -> CNPJLookupResult:
+        self._stats["lookups"] += 1
+        self.budget.deposit()
+        failed: Set[str] = set()
+        rate_limited: Set[str] = set()
+        last: Optional[CNPJLookupResult] = None
+
+        for attempt in range(self.max_retries + 1):
+            # Um provedor que descartou a chamada pelo limite de taxa não é
+            # tentado de novo: a fila dele não andou
+            provider = self._pick(exclude=failed) or self._pick(exclude=rate_limited)
+            if provider is None:
+                break
+            if failed and provider.name not in failed:
+                self._stats["fallbacks"] += 1
+
+            try:
+                result = await self._attempt(provider, cnpj, client)
+            except Exception:
+                result = CNPJLookupResult(CNPJ_PROVIDER_ERROR)
+            if not is_transient(result):
+                return result
+
+            last = result
+            failed.add(provider.name)
+            if result.status == CNPJ_RATE_LIMITED:
+                rate_limited.add(provider.name)
+            if attempt == self.max_retries or not self.budget.try_withdraw():
+                break
+            self._stats["retries"] += 1
+            await asyncio.sleep(jittered_backoff(attempt, self.backoff_base, self.backoff_cap))
+
+        if last is None:
+            # Todos os disjuntores abertos: falha imediata, sem tocar na rede
+            self._stats["fast_failures"] += 1
+            return CNPJLookupResult(CNPJ_UNAVAILABLE)
+        return last
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            **self._stats,
+            "retry_budget": self.budget.stats(),
+            "providers": {
+                p.name: {
+                    **self.breakers[p.name].stats(),
+                    "hedge_delay_s": round(self.hedge_delay(p), 4),
+                    "rate_limit": self.limiters[p.name].stats() if p.name in self.limiters else None,
+                }
+                for p in self.providers
+            },
+        }
+
+
+def limiters_from_env(providers: Iterable[CNPJProvider]) -> Dict[str, SharedTokenBucket]:
+    """
+    Limitadores de taxa dos provedores, conforme o ambiente:
+    - CNPJ_RATE_LIMIT: consultas por segundo a cada provedor, somando todos
+      os processos da máquina (padrão: o limite conhecido de cada provedor;
+      0 desliga); CNPJ_PROVIDER_<NOME>_RATE_LIMIT vale para um provedor só;
+    - CNPJ_RATE_BURST: rajada máxima (padrão: a do provedor, ou 2 s de taxa);
+    - CNPJ_RATE_MAX_WAIT: espera máxima por um token, em segundos (padrão 2);
+    - CNPJ_RATE_LIMIT_DIR: diretório dos arquivos de estado compartilhados
+      (padrão: o diretório privado de utils.state_dir; vazio = um limitador
+      por processo).
+    """
+    env = os.environ.get
+    directory = env("CNPJ_RATE_LIMIT_DIR")
+    limiters = {}
+    for provider in providers:
+        rate, burst = provider.rate_limit or (None, None)
+        configured = env(f"CNPJ_PROVIDER_{provider.name.upper()}_RATE_LIMIT", env("CNPJ_RATE_LIMIT"))
+        if configured is not None:
+            rate = float(configured)
+        if not rate:
+            continue
+        burst = int(env("CNPJ_RATE_BURST", 0)) or burst or max(int(rate * 2), 1)
+        if directory is None:
+            directory = state_dir()
+        limiters[provider.name] = SharedTokenBucket(
+            rate, burst,
+            path=os.path.join(directory, f"cnpj_rate_{provider.name}.bin") if directory else None,
+            max_wait=float(env("CNPJ_RATE_MAX_WAIT", 2.0)),
+        )
+    return limiters
+
+
+def _resolver_from_env() -> CNPJResolver:
+    """
+    Configuração por variáveis de ambiente (além de CNPJ_PROVIDERS e dos
+    limites de taxa, em limiters_from_env):
+    CNPJ_MAX_RETRIES, CNPJ_HEDGE (0/1), CNPJ_HEDGE_PERCENTILE,
+    CNPJ_BREAKER_THRESHOLD, CNPJ_BREAKER_RECOVERY (segundos),
+    CNPJ_RETRY_BUDGET_RATIO.
+    """
+    env = os.environ.get
+    providers = providers_from_env()
+    return CNPJResolver(
+        providers,
+        max_retries=int(env("CNPJ_MAX_RETRIES", 2)),
+        hedge=env("CNPJ_HEDGE", "1") != "0",
+        hedge_percentile=float(env("CNPJ_HEDGE_PERCENTILE", 0.95)),
+        failure_threshold=int(env("CNPJ_BREAKER_THRESHOLD", 5)),
+        recovery_timeout=float(env("CNPJ_BREAKER_RECOVERY", 30.0)),
+        budget=RetryBudget(ratio=float(env("CNPJ_RETRY_BUDGET_RATIO", 0.2))),
+        limiters=limiters_from_env(providers),
+    )
+
+
+_default_resolver: Optional[CNPJResolver] = None
+
+
+def get_cnpj_resolver() -> CNPJResolver:
+    """Retorna o resolvedor padrão, criando-o na primeira chamada."""
+    global _default_resolver
+    if _default_resolver is None:
+        _default_resolver = _resolver_from_env()
+    return _default_resolver
+
+
+def set_cnpj_resolver(resolver: Optional[CNPJResolver]):
+    """Substitui o resolvedor padrão (None volta à configuração do ambiente)."""
+    global _default_resolver
+    _default_resolver = resolver
@@ -0,0 +1,28 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Resultados possíveis de uma consulta de CNPJ
+CNPJ_FOUND = "found"
+CNPJ_NOT_FOUND = "not_found"          # 404 da Brasil API
+CNPJ_SERVICE_ERROR = "service_error"  # 200 com {"type": "service_error"}
+CNPJ_BAD_REQUEST = "bad_request"      # 400 da Brasil API
+CNPJ_PROVIDER_ERROR = "provider_error"
+CNPJ_CONNECTION_ERROR = "connection_error"
+CNPJ_UNAVAILABLE = "unavailable"      # todos os provedores com o disjuntor aberto
+CNPJ_RATE_LIMITED = "rate_limited"    # descartada pelo limitador de taxa (utils.rate_limit)
+CNPJ_INACTIVE = "inactive"            # consta no índice local, mas não está ATIVA
+
+
+@dataclass(frozen=True)
+class CNPJLookupResult:
+    """Resultado de uma consulta de CNPJ (externa ou no índice local)."""
+    status: str
+    status_code: Optional[int] = None
+    razao_social: Optional[str] = None
+    situacao: Optional[str] = None  # situação cadastral, quando a fonte informa
+    # Retry-After (s) de uma resposta 429 do provedor
+    retry_after: Optional[float] = field(default=None, compare=False)
+
+    @property
+    def found(self) -> bool:
+        return self.status == CNPJ_FOUND
@@ -0,0 +1,273 @@
+"""
+Nível compartilhado do cache de CNPJ: uma tabela hash de tamanho fixo em um
+arquivo mapeado em memória, que todos os workers da máquina leem e escrevem.
+Um CNPJ consultado por um worker já está no cache dos demais, e a tabela
+existe uma vez só na memória (as páginas são do cache do sistema operacional).
+
+Formato (little-endian):
+
+    cabeçalho (64 bytes): magic, versão, nº de posições
+    posições (128 bytes cada): seq, crc32, CNPJ (14 caracteres), status,
+        tamanho da razão social, status HTTP, expiração, razão social
+        (truncada em MAX_NAME_BYTES bytes de UTF-8)
+
+Endereçamento aberto: a chave vai para a posição crc32(cnpj) % n, ou para uma
+das PROBE - 1 seguintes. Com as PROBE posições ocupadas, a entrada que vence
+primeiro dá lugar à nova.
+
+Leitura sem trava (seqlock): cada posição tem um contador `seq`, ímpar
+enquanto alguém escreve nela. O leitor copia a posição e só aceita a cópia se
+`seq` era par e não mudou durante a cópia e se o crc32 confere; senão tenta de
+novo algumas vezes e, por fim, trata como ausente. As escritas são seriadas
+por uma trava de arquivo (fcntl.flock), liberada pelo sistema operacional se o
+processo morre. Um worker que morre no meio de uma escrita deixa `seq` ímpar:
+a posição fica ilegível (ausente) até a próxima escrita, que a reaproveita.
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos, sem nível compartilhado
+    fcntl = None
+
+from .cnpj_result import (
+    CNPJLookupResult,
+    CNPJ_FOUND,
+    CNPJ_NOT_FOUND,
+    CNPJ_SERVICE_ERROR,
+    CNPJ_BAD_REQUEST,
+)
+from .state_dir import check_owner
+
+MAGIC = b"CNPJSHM1"
+VERSION = 1
+_HEADER = struct.Struct("<8sII48x")  # 64 bytes
+_SEQ = struct.Struct("<I")
+_SLOT = struct.Struct("<II14sBBH6xd88s")  # 128 bytes
+_BODY_OFFSET = 8  # o crc32 cobre tudo depois de seq e crc
+MAX_NAME_BYTES = 88
+PROBE = 8
+READ_RETRIES = 4
+DEFAULT_SLOTS = 65_536  # 8 MiB
+
+# Status guardáveis (os mesmos do cache em memória); 0 marca posição vazia
+STATUSES = (None, CNPJ_FOUND, CNPJ_NOT_FOUND, CNPJ_SERVICE_ERROR, CNPJ_BAD_REQUEST)
+_STATUS_CODES = {status: i for i, status in enumerate(STATUSES) if status}
+
+
+def _truncate(name: Optional[str]) -> bytes:
+    """Razão social em UTF-8, cortada em MAX_NAME_BYTES sem partir caracteres."""
+    if not name:
+        return b""
+    data = name.encode("utf-8")[:MAX_NAME_BYTES]
+    return data.decode("utf-8", "ignore").encode("utf-8")
+
+
+class SharedCNPJCache:
+    """
+    Tabela de veredictos de CNPJ no arquivo `path`, compartilhada pelos
+    processos que o abrem. O primeiro processo define o número de posições;
+    os demais usam o do arquivo.
+    """
+
+    def __init__(self, path: str, slots: int = DEFAULT_SLOTS, clock: Callable[[], float] = time.time):
+        if fcntl is None:
+            raise RuntimeError("o nível compartilhado do cache de CNPJ precisa de fcntl")
+        if slots < PROBE:
+            raise ValueError(f"slots deve ser ao menos {PROBE}")
+        self.path = path
+        self.slots = slots
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._mm = None
+        self._stats = {"evictions": 0, "torn_reads": 0, "repairs": 0}
+        self._open()
+
+    # --- Arquivo ---
+
+    def _open(self):
+        """Abre (ou reabre, depois de um fork) o arquivo, criando a tabela se preciso."""
+        if self._fd is not None:
+            self._close_file()
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # Tabela criada antes por outro usuário: as entradas dele viriam como veredito
+            check_owner(os.fstat(fd), self.path)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size >= _HEADER.size:
+                    magic, version, slots = _HEADER.unpack(os.pread(fd, _HEADER.size, 0))[:3]
+                else:
+                    magic, version, slots = b"", 0, 0
+                if magic != MAGIC or version != VERSION or slots < PROBE:
+                    slots = self.slots
+                    size = _HEADER.size + slots * _SLOT.size
+                    # Só cresce: outro processo pode ter o arquivo antigo mapeado
+                    os.ftruncate(fd, max(size, os.fstat(fd).st_size))
+                    os.pwrite(fd, bytes(slots * _SLOT.size), _HEADER.size)
+                    # O magic vai por último: uma criação interrompida é refeita
+                    os.pwrite(fd, _HEADER.pack(MAGIC, VERSION, slots), 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            mm = mmap.mmap(fd, _HEADER.size + slots * _SLOT.size)
+        except BaseException:
+            os.close(fd)
+            raise
+        self.slots = slots
+        self._fd = fd
+        self._mm = mm
+        self._pid = os.getpid()
+
+    def _offset(self, index: int) -> int:
+        return _HEADER.size + (index % self.slots) * _SLOT.size
+
+    def _window(self, key: bytes):
+        start = zlib.crc32(key) % self.slots
+        return [self._offset(start + i) for i in range(PROBE)]
+
+    # --- Leitura (sem trava) ---
+
+    def _read(self, offset: int) -> Optional[tuple]:
+        """Cópia consistente da posição, ou None se ela está sendo (ou ficou pela metade) escrita."""
+        mm = self._mm
+        for _ in range(READ_RETRIES):
+            seq = _SEQ.unpack_from(mm, offset)[0]
+            if seq & 1:
+                continue
+            raw = mm[offset:offset + _SLOT.size]
+            if _SEQ.unpack_from(mm, offset)[0] != seq:
+                continue
+            fields = _SLOT.unpack(raw)
+            if fields[0] == seq and fields[1] == zlib.crc32(raw[_BODY_OFFSET:]):
+                return fields
+        return None
+
+    def get(self, cnpj: str) -> Optional[Tuple[CNPJLookupResult, float]]:
+        """(resultado, expiração) guardado para o CNPJ, se houver e não estiver vencido."""
+        key = cnpj.encode("ascii", "ignore")
+        if len(key) != 14 or self._mm is None:
+            return None
+        now = self._clock()
+        for offset in self._window(key):
+            fields = self._read(offset)
+            if fields is None:
+                self._stats["torn_reads"] += 1
+                continue
+            _, _, slot_key, status, name_len, status_code, expires_at, name = fields
+            if slot_key == key and status:
+                if expires_at <= now:
+                    return None
+                razao_social = name[:name_len].decode("utf-8") if name_len else None
+                return CNPJLookupResult(STATUSES[status], status_code or None, razao_social), expires_at
+        return None
+
+    # --- Escrita (sob trava) ---
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Trava de arquivo herdada em um fork não exclui o processo pai
+                self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _write(self, offset: int, key: bytes, status: int, status_code: int, expires_at: float, name: bytes):
+        mm = self._mm
+        seq = _SEQ.unpack_from(mm, offset)[0]
+        if seq & 1:
+            # Escritor anterior morreu no meio: a posição é reaproveitada
+            self._stats["repairs"] += 1
+        else:
+            seq = (seq + 1) & 0xFFFFFFFF
+            _SEQ.pack_into(mm, offset, seq)
+        body = _SLOT.pack(0, 0, key, status, len(name), status_code, expires_at, name)[_BODY_OFFSET:]
+        mm[offset + _BODY_OFFSET:offset + _SLOT.size] = body
+        _SEQ.pack_into(mm, offset + 4, zlib.crc32(body))
+        _SEQ.pack_into(mm, offset, (seq + 1) & 0xFFFFFFFF)
+
+    def set(self, cnpj: str, result: CNPJLookupResult, expires_at: float) -> bool:
+        """Guarda o resultado até `expires_at`. Retorna False se ele não cabe na tabela."""
+        key = cnpj.encode("ascii", "ignore")
+        status = _STATUS_CODES.get(result.status)
+        if len(key) != 14 or status is None:
+            return False
+        now = self._clock()
+        with self._locked():
+            window = self._window(key)
+            target, victim, victim_expiry = None, None, None
+            for offset in window:
+                fields = self._read(offset)
+                if fields is None or not fields[3] or fields[6] <= now:
+                    # Vazia, vencida ou escrita interrompida
+                    target = target if target is not None else offset
+                    continue
+                if fields[2] == key:
+                    target = offset
+                    break
+                if victim is None or fields[6] < victim_expiry:
+                    victim, victim_expiry = offset, fields[6]
+            if target is None:
+                target = victim
+                self._stats["evictions"] += 1
+            self._write(target, key, status, result.status_code or 0, expires_at,
+                        _truncate(result.razao_social))
+        return True
+
+    def invalidate(self, cnpj: str) -> bool:
+        """Esvazia a posição do CNPJ. Retorna True se havia uma entrada válida."""
+        key = cnpj.encode("ascii", "ignore")
+        if len(key) != 14:
+            return False
+        now = self._clock()
+        with self._locked():
+            for offset in self._window(key):
+                fields = self._read(offset)
+                if fields is not None and fields[2] == key and fields[3]:
+                    self._write(offset, b"", 0, 0, 0.0, b"")
+                    return fields[6] > now
+        return False
+
+    def clear(self):
+        with self._locked():
+            for i in range(self.slots):
+                offset = self._offset(i)
+                if _SEQ.unpack_from(self._mm, offset)[0]:
+                    self._write(offset, b"", 0, 0, 0.0, b"")
+
+    def entries(self) -> int:
+        """Entradas válidas (não vencidas) na tabela. Percorre a tabela inteira."""
+        now = self._clock()
+        count = 0
+        for i in range(self.slots):
+            fields = self._read(self._offset(i))
+            if fields is not None and fields[3] and fields[6] > now:
+                count += 1
+        return count
+
+    def stats(self) -> Dict[str, float]:
+        return {**self._stats, "slots": self.slots}
+
+    def _close_file(self):
+        self._mm.close()
+        os.close(self._fd)
+        self._mm = None
+        self._fd = None
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                self._close_file()
+            self._pid = None
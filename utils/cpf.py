@@ -1,33 +1,71 @@
-import re
+from typing import Tuple
+
 from .exceptions import ValidationError
+from . import _batch
+from ._digits import (
+    only_digits,
+    digits_str,
+    weighted_tables,
+    mod11_check_digit,
+    OK,
+    INVALID_LENGTH,
+    REPEATED_DIGITS,
+    INVALID_CHECK_DIGIT,
+)
+
+CPF_WEIGHTS_1 = tuple(range(10, 1, -1))
+CPF_WEIGHTS_2 = tuple(range(11, 1, -1))
+_TABLES_1 = weighted_tables(CPF_WEIGHTS_1)
+_TABLES_2 = weighted_tables(CPF_WEIGHTS_2)
+
+MESSAGES = {
+    INVALID_LENGTH: "O número do CPF é inválido.",
+    REPEATED_DIGITS: "O número do CPF é inválido.",
+    INVALID_CHECK_DIGIT: "O número do CPF é inválido.",
+}
 
 def format_cpf(cpf: str) -> str:
-    return re.sub(r'[^0-9]', '', cpf)
+    return digits_str(cpf)
+
+def check_cpf(cpf: str) -> Tuple[bool, str]:
+    """
+    Valida o CPF sem levantar exceções.
+    Retorna (True, "") ou (False, código do motivo).
+    """
+    digits = only_digits(cpf)
+
+    if len(digits) != 11:
+        return False, INVALID_LENGTH
+    if digits.count(digits[0]) == 11:
+        return False, REPEATED_DIGITS
+    if digits[9] - 48 != mod11_check_digit(digits, _TABLES_1):
+        return False, INVALID_CHECK_DIGIT
+    if digits[10] - 48 != mod11_check_digit(digits, _TABLES_2):
+        return False, INVALID_CHECK_DIGIT
+    return True, OK
+
+def cpf_error_message(cpf: str, code: str) -> str:
+    return MESSAGES[code]
 
 def is_valid_cpf(cpf: str) -> bool:
-    cpf = format_cpf(cpf)
-    
-    if len(cpf) != 11 or len(set(cpf)) == 1:
-        return False
-
-    sum_ = sum(int(cpf[i]) * (10 - i) for i in range(9))
-    digit1 = 0 if (sum_ % 11) < 2 else 11 - (sum_ % 11)
-    if int(cpf[9]) != digit1:
-        return False
-        
-    sum_ = sum(int(cpf[i]) * (11 - i) for i in range(10))
-    digit2 = 0 if (sum_ % 11) < 2 else 11 - (sum_ % 11)
-    if int(cpf[10]) != digit2:
-        return False
-        
-    return True
+    return check_cpf(cpf)[0]
 
 def validate_cpf(cpf: str):
-    if not is_valid_cpf(cpf):
-        raise ValidationError("O número do CPF é inválido.")
+    valid, code = check_cpf(cpf)
+    if not valid:
+        raise ValidationError(cpf_error_message(cpf, code))
+
+def is_valid_cpf_batch(cpfs):
+    """
+    Versão vetorizada (NumPy) de is_valid_cpf para grandes volumes.
+    Retorna (máscara booleana, motivo de cada reprovação), ambos arrays do
+    tamanho da entrada. Motivos: "" (válido), "invalid_length",
+    "repeated_digits" ou "invalid_check_digit".
+    """
+    return _batch.validate_matrix(cpfs, 11, CPF_WEIGHTS_1, CPF_WEIGHTS_2)
 
 def mask_cpf(cpf: str) -> str:
     cpf = format_cpf(cpf)
     if len(cpf) != 11:
         return cpf # Retorna o original se não for um CPF formatável
-    return f"{cpf[:3]}.***.***-{cpf[9:]}"
\ No newline at end of file
+    return f"{cpf[:3]}.***.***-{cpf[9:]}"
@@ -1,64 +1,91 @@
-import httpx
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Optional
 
-# Constante para a URL da API de CNPJ
-BRASIL_API_CNPJ_URL = "https://brasilapi.com.br/api/cnpj/v1/"
+from .http_client import shared_async_client
+from .cnpj_cache import get_cnpj_cache
+from .cnpj_registry import get_cnpj_registry
+from .cnpj_providers import BRASIL_API_CNPJ_URL
+from .cnpj_resolver import get_cnpj_resolver
+from .singleflight import SingleFlight
+from .tracing import current_span
+from .cnpj_result import (
+    CNPJLookupResult,
+    CNPJ_FOUND,
+    CNPJ_NOT_FOUND,
+    CNPJ_SERVICE_ERROR,
+    CNPJ_BAD_REQUEST,
+    CNPJ_PROVIDER_ERROR,
+    CNPJ_CONNECTION_ERROR,
+    CNPJ_UNAVAILABLE,
+    CNPJ_RATE_LIMITED,
+    CNPJ_INACTIVE,
+)
 
-async def validate_cnpj_api(cnpj: str) -> Dict[str, Any]:
-    """
-    Valida um CNPJ consultando a Brasil API.
-    Retorna um dicionário com 'validacao' (bool) e 'obs' (str).
-    """
-    cnpj_clean = "".join(filter(str.isdigit, cnpj))
-    
-    if len(cnpj_clean) != 14:
-        return {"validacao": False, "obs": "CNPJ deve conter 14 dígitos."}
+if TYPE_CHECKING:
+    import httpx
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{BRASIL_API_CNPJ_URL}{cnpj_clean}", timeout=10.0)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if 'type' in data and data['type'] == 'service_error':
-                    return {"validacao": False, "obs": f"CNPJ não encontrado na Receita Federal: {cnpj}"}
-                
-                # CNPJ encontrado e ativo
-                razao_social = data.get('razao_social', 'Razão Social não disponível')
-                return {"validacao": True, "obs": f"CNPJ Válido. Razão Social: {razao_social}"}
-            
-            elif response.status_code == 404:
-                return {"validacao": False, "obs": f"CNPJ não encontrado: {cnpj}"}
-            
-            elif response.status_code == 400:
-                return {"validacao": False, "obs": "CNPJ inválido ou mal formatado."}
-            
-            else:
-                return {"validacao": False, "obs": f"Erro na Brasil API ao consultar CNPJ: {response.status_code}"}
+# Consultas concorrentes ao mesmo CNPJ compartilham uma única requisição externa
+cnpj_singleflight = SingleFlight("lookup_cnpj")
 
-    except httpx.ConnectError:
-        return {"validacao": False, "obs": "Não foi possível conectar à Brasil API para validar CNPJ."}
-    except Exception as e:
-        return {"validacao": False, "obs": f"Erro interno ao validar CNPJ: {str(e)}"}
 
-def validate_cpf_format(cpf: str) -> Dict[str, Any]:
+async def lookup_cnpj(cnpj: str, client: Optional["httpx.AsyncClient"] = None) -> CNPJLookupResult:
     """
-    Valida o formato básico de um CPF (tamanho e dígitos repetidos).
-    Retorna um dicionário com 'validacao' (bool) e 'obs' (str).
+    Consulta o CNPJ (apenas dígitos). Se houver um índice local da Receita
+    Federal (utils.cnpj_registry), ele responde sem rede. Caso contrário
+    (ou se o CNPJ não consta de um índice não autoritativo), consulta a
+    Brasil API, passando antes pelo cache de consultas (utils.cnpj_cache). Consultas simultâneas ao mesmo
+    CNPJ são agrupadas em uma só (utils.singleflight) e a chamada externa
+    passa pela camada de resiliência (utils.cnpj_resolver): disjuntor,
+    retentativas, hedge e provedores alternativos.
+    Usa o cliente informado ou o cliente compartilhado (utils.http_client),
+    criado na primeira consulta: o httpx só é carregado quando a primeira
+    consulta externa acontece.
     """
-    cpf_clean = "".join(filter(str.isdigit, cpf))
-    
-    if len(cpf_clean) != 11:
-        return {"validacao": False, "obs": "CPF deve conter 11 dígitos."}
+    registry = get_cnpj_registry()
+    if registry is not None:
+        entry = registry.lookup(cnpj)
+        if entry is not None:
+            _trace_source("registry")
+            status = CNPJ_FOUND if entry.ativa else CNPJ_INACTIVE
+            return CNPJLookupResult(status, None, entry.razao_social, entry.descricao_situacao)
+        if registry.authoritative:
+            _trace_source("registry")
+            return CNPJLookupResult(CNPJ_NOT_FOUND)
+
+    cache = get_cnpj_cache()
+    if cache is not None:
+        cached = await cache.get_async(cnpj)
+        if cached is not None:
+            _trace_source("cache")
+            return cached
+
+    _trace_source("provider")
+    result, _ = await cnpj_singleflight.do(cnpj, lambda: _fetch_cnpj(cnpj, client, cache))
+    return result
+
 
-    
-    if cpf_clean == cpf_clean[0] * 11:
-        return {"validacao": False, "obs": "CPF inválido (todos os dígitos iguais)."}
-    
-    return {"validacao": True, "obs": "CPF Válido (formato)." }
+def _trace_source(source: str):
+    """De onde veio a resposta (índice, cache ou provedores), no span atual."""
+    span = current_span()
+    if span is not None:
+        span.set_attribute("cnpj.source", source)
 
-async def validate_cpf_business(cpf: str) -> Dict[str, Any]:
+
+def cnpj_needs_lookup(cnpj: str) -> bool:
     """
-    Função de validação de CPF de alto nível (atualmente apenas valida o formato).
+    False se lookup_cnpj responderia sem rede: pelo índice local ou pelo
+    cache em memória (do processo ou compartilhado). Não altera estatísticas.
     """
-    return validate_cpf_format(cpf)
+    registry = get_cnpj_registry()
+    if registry is not None and (registry.authoritative or registry.lookup(cnpj) is not None):
+        return False
+    cache = get_cnpj_cache()
+    return cache is None or not cache.peek(cnpj)
+
+
+async def _fetch_cnpj(cnpj: str, client: Optional["httpx.AsyncClient"], cache) -> CNPJLookupResult:
+    resolver = get_cnpj_resolver()
+    result = await resolver.lookup(cnpj, client or shared_async_client())
+
+    if cache is not None:
+        await cache.set_async(cnpj, result)
+    return result
@@ -1,18 +1,45 @@
 import re
+from typing import Tuple
+
 from .exceptions import ValidationError
+from ._digits import OK
+
+EMPTY = "empty"
+INVALID_FORMAT = "invalid_format"
+
+MESSAGES = {
+    EMPTY: "O formato do e-mail é inválido.",
+    INVALID_FORMAT: "O formato do e-mail é inválido.",
+}
+
+# Compilado uma única vez, na importação do módulo
+EMAIL_PATTERN = re.compile(
+    r"^[a-zA-Z0-9_+-]+(?:\.[a-zA-Z0-9_+-]+)*@"
+    r"(?:[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?\.)+"
+    r"[a-zA-Z]{2,63}$"
+)
+_fullmatch = EMAIL_PATTERN.fullmatch
+
+def check_email(email: str) -> Tuple[bool, str]:
+    """
+    Valida o e-mail sem levantar exceções.
+    Retorna (True, "") ou (False, código do motivo).
+    """
+    if not email: return False, EMPTY
+    if _fullmatch(email) is None:
+        return False, INVALID_FORMAT
+    return True, OK
+
+def email_error_message(email: str, code: str) -> str:
+    return MESSAGES[code]
 
 def is_valid_email(email: str) -> bool:
-    if not email: return False
-    pattern = re.compile(
-        r"^[a-zA-Z0-9_+-]+(?:\.[a-zA-Z0-9_+-]+)*@"
-        r"(?:[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?\.)+"
-        r"[a-zA-Z]{2,63}$"
-    )
-    return re.fullmatch(pattern, email) is not None
+    return check_email(email)[0]
 
 def validate_email(email: str):
-    if not is_valid_email(email):
-        raise ValidationError("O formato do e-mail é inválido.")
+    valid, code = check_email(email)
+    if not valid:
+        raise ValidationError(email_error_message(email, code))
 
 def mask_email(email: str) -> str:
     try:
@@ -22,4 +49,4 @@ def mask_email(email: str) -> str:
         masked_local = local_part[:4] + '*' * (len(local_part) - 4)
         return f"{masked_local}@{domain}"
     except ValueError:
-        return email
\ No newline at end of file
+        return email
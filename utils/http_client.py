@@ -0,0 +1,70 @@
+import asyncio
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import httpx
+
+# O httpx (e o certifi, carregado junto) custa ~70 ms de importação: só é
+# importado quando o primeiro cliente é criado, não na subida da API.
+
+# Timeout total de 10s (mesmo valor usado historicamente nas consultas),
+# mas falhando mais cedo quando nem a conexão é estabelecida.
+DEFAULT_TIMEOUT = {"timeout": 10.0, "connect": 5.0}
+DEFAULT_LIMITS = {
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 30.0,
+}
+
+_shared_client: Optional["httpx.AsyncClient"] = None
+# Loop em que o cliente criado sob demanda foi aberto (o pool de conexões
+# fica preso a ele)
+_shared_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def create_async_client(**kwargs) -> "httpx.AsyncClient":
+    """
+    Cria um cliente assíncrono com pool de conexões e HTTP/2 habilitado.
+    Parâmetros extras (ex.: transport) são repassados ao httpx.AsyncClient.
+    """
+    import httpx
+
+    kwargs.setdefault("timeout", httpx.Timeout(DEFAULT_TIMEOUT["timeout"], connect=DEFAULT_TIMEOUT["connect"]))
+    kwargs.setdefault("limits", httpx.Limits(**DEFAULT_LIMITS))
+    kwargs.setdefault("http2", True)
+    return httpx.AsyncClient(**kwargs)
+
+
+def get_async_client() -> Optional["httpx.AsyncClient"]:
+    """Retorna o cliente compartilhado da aplicação (ou None se ainda não há um)."""
+    return _shared_client
+
+
+def set_async_client(client: Optional["httpx.AsyncClient"]):
+    """Registra (ou remove, com None) o cliente compartilhado da aplicação."""
+    global _shared_client, _shared_loop
+    _shared_client = client
+    _shared_loop = None
+
+
+def shared_async_client() -> "httpx.AsyncClient":
+    """
+    Cliente compartilhado, criado na primeira chamada e reaproveitado pelas
+    chamadas seguintes (em um ambiente serverless, pelas invocações seguintes
+    da mesma instância). Deve ser chamado dentro do event loop; se o loop
+    mudou desde a criação, um novo cliente é criado para o loop atual.
+    """
+    global _shared_client, _shared_loop
+    loop = asyncio.get_running_loop()
+    if _shared_client is None or _shared_client.is_closed or (_shared_loop is not None and _shared_loop is not loop):
+        _shared_client = create_async_client()
+        _shared_loop = loop
+    return _shared_client
+
+
+async def close_async_client():
+    """Fecha e remove o cliente compartilhado, se houver."""
+    client = _shared_client
+    set_async_client(None)
+    if client is not None:
+        await client.aclose()
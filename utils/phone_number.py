@@ -1,31 +1,111 @@
-import re
+from typing import Optional, Tuple
+
 from .exceptions import ValidationError
+from ._digits import NON_DIGIT_BYTES, OK, INVALID_LENGTH
+from .uf import UFS, DDD_RANGES
+
+INVALID_DDD = "invalid_ddd"
+INVALID_PREFIX = "invalid_prefix"
+UF_MISMATCH = "uf_mismatch"
+
+MESSAGES = {
+    INVALID_LENGTH: "O número de telefone é inválido.",
+    INVALID_DDD: "O número de telefone é inválido.",
+    INVALID_PREFIX: "O número de telefone é inválido.",
+    UF_MISMATCH: "O DDD {ddd} do telefone é de {uf_ddd}, não de {uf}.",
+}
+
+_ZERO = 48
+_NINE = 57
+# Primeiro dígito do número (após o DDD) que um fixo não pode ter: 0, 1 e 9
+_LANDLINE_FORBIDDEN = frozenset(b"019")
+
+def _phone_digits(phone_number: str) -> bytes:
+    return phone_number.replace('+55', '').encode("ascii", "ignore").translate(None, NON_DIGIT_BYTES)
 
 def format_phone_number(phone_number: str) -> str:
-    clean_phone = phone_number.replace('+55', '')
-    return re.sub(r'[^0-9]', '', clean_phone)
+    return _phone_digits(phone_number).decode("ascii")
+
+def check_phone_number(phone_number: str) -> Tuple[bool, str]:
+    """
+    Valida o telefone (fixo ou celular, com DDD) sem levantar exceções.
+    Retorna (True, "") ou (False, código do motivo).
+    """
+    if not isinstance(phone_number, str):
+        return False, INVALID_LENGTH
+    digits = _phone_digits(phone_number)
+    length = len(digits)
+
+    if length == 0:
+        return False, INVALID_LENGTH
+    if digits[0] == _ZERO or (length > 1 and digits[1] == _ZERO):
+        return False, INVALID_DDD
 
-def is_valid_phone_number(phone_number: str) -> bool:
-    phone_number = format_phone_number(phone_number)
-    
-    if not phone_number.isdigit():
-        return False
-    
-    if phone_number.startswith('0') or (len(phone_number) > 1 and phone_number[1] == '0'):
-        return False
-
-    length = len(phone_number)
     if length == 11:
-        if phone_number[2] != '9' or phone_number[3] == '0':
-            return False
+        if digits[2] != _NINE or digits[3] == _ZERO:
+            return False, INVALID_PREFIX
     elif length == 10:
-        if phone_number[2] in ['0', '1', '9']:
-            return False
+        if digits[2] in _LANDLINE_FORBIDDEN:
+            return False, INVALID_PREFIX
     else:
-        return False
-        
-    return True
+        return False, INVALID_LENGTH
+
+    return True, OK
+
+def phone_number_error_message(phone_number: str, code: str) -> str:
+    return MESSAGES[code]
+
+def is_valid_phone_number(phone_number: str) -> bool:
+    return check_phone_number(phone_number)[0]
 
 def validate_phone_number(phone_number: str):
-    if not is_valid_phone_number(phone_number):
-        raise ValidationError("O número de telefone é inválido.")
\ No newline at end of file
+    valid, code = check_phone_number(phone_number)
+    if not valid:
+        raise ValidationError(phone_number_error_message(phone_number, code))
+
+def phone_number_uf(phone_number: str) -> Optional[str]:
+    """UF do DDD do telefone (10 ou 11 dígitos), ou None se o DDD não existe."""
+    if not isinstance(phone_number, str):
+        return None
+    digits = _phone_digits(phone_number)
+    if len(digits) not in (10, 11):
+        return None
+    return DDD_RANGES.lookup(int(digits[:2]))
+
+def check_phone_number_uf(phone_number: str, uf: str) -> Tuple[bool, str]:
+    """
+    Confere se o DDD do telefone é da UF, sem levantar exceções.
+    Retorna (True, "") ou (False, "uf_mismatch"); sem como decidir (telefone
+    ou UF inválidos ou vazios), aceita.
+    """
+    if not phone_number or not uf:
+        return True, OK
+    uf_ddd = phone_number_uf(phone_number)
+    if uf_ddd is None or uf_ddd == uf:
+        return True, OK
+    uf = uf.upper()
+    if uf_ddd == uf or uf not in UFS:
+        return True, OK
+    return False, UF_MISMATCH
+
+def phone_number_uf_error_message(phone_number: str, uf: str, code: str) -> str:
+    return MESSAGES[code].format(ddd=format_phone_number(phone_number)[:2], uf=uf.upper(),
+                                 uf_ddd=phone_number_uf(phone_number))
+
+def check_phone_number_uf_batch(phone_numbers, ufs):
+    """
+    Versão vetorizada (NumPy) de check_phone_number_uf para grandes volumes.
+    Retorna (máscara booleana, motivo de cada reprovação).
+    """
+    from ._batch import _numpy
+    np = _numpy()
+    n = len(phone_numbers)
+    ddds = np.zeros(n, dtype=np.int64)
+    for i, phone_number in enumerate(phone_numbers):
+        digits = _phone_digits(phone_number) if isinstance(phone_number, str) else b""
+        if len(digits) in (10, 11):
+            ddds[i] = int(digits[:2])
+    expected = DDD_RANGES.lookup_batch(ddds)
+    informed = np.array([u.upper() if isinstance(u, str) and u.upper() in UFS else None for u in ufs], dtype=object)
+    ok = (expected == None) | (informed == None) | (expected == informed)  # noqa: E711
+    return ok, np.where(ok, OK, UF_MISMATCH).astype(object)
@@ -0,0 +1,215 @@
+"""
+Limitador de taxa (token bucket) de chamadas a um serviço externo,
+compartilhado por todos os processos da máquina (ex.: os workers do uvicorn).
+
+O estado do balde (tokens, instante da última atualização e o fator de
+redução adaptativa) fica em um arquivo pequeno mapeado em memória, e cada
+operação é uma seção crítica curta sob trava de arquivo (fcntl.flock). Sem
+arquivo (path=None), ou sem fcntl (Windows), o balde vale só para o processo.
+
+Fila justa: quem pede um token reserva o próximo horário livre (os tokens
+podem ficar negativos) e dorme até ele. As reservas são atendidas na ordem em
+que foram feitas, em todos os processos, sem disputa nem espera ativa. Quem
+teria de esperar mais que `max_wait` não reserva nada: a chamada é
+descartada.
+
+Backoff adaptativo: uma resposta 429 reduz a taxa (multiplica por
+`decrease`) para todos os processos e cria uma dívida de Retry-After
+segundos; cada chamada aceita depois disso devolve um pouco da taxa
+(`increase`), até a taxa configurada (AIMD).
+"""
+import asyncio
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+from .state_dir import check_owner
+
+try:
+    import fcntl
+except ImportError:  # Windows: o balde fica restrito ao processo
+    fcntl = None
+
+# magic, tokens, atualizado_em, fator da taxa, último 429
+_STATE = struct.Struct("<4sdddd")
+_MAGIC = b"TBK1"
+_FILE_SIZE = 64
+
+
+class SharedTokenBucket:
+    """
+    Token bucket de `rate` chamadas por segundo com rajadas de até `burst`,
+    opcionalmente compartilhado entre processos pelo arquivo `path`.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        path: Optional[str] = None,
+        max_wait: float = 2.0,
+        decrease: float = 0.5,
+        increase: float = 0.05,
+        min_factor: float = 0.05,
+        default_retry_after: float = 1.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate deve ser positivo e burst, ao menos 1")
+        self.rate = rate
+        self.burst = burst
+        self.path = path
+        self.max_wait = max_wait
+        self.decrease = decrease
+        self.increase = increase
+        self.min_factor = min_factor
+        self.default_retry_after = default_retry_after
+        # Relógio de parede: o mesmo para todos os processos da máquina
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._buffer = None
+        self._stats = {"acquired": 0, "delayed": 0, "dropped": 0, "throttled": 0, "cancelled": 0}
+
+    # --- Estado compartilhado ---
+
+    def _open(self):
+        """Abre (ou reabre, depois de um fork) o arquivo de estado."""
+        if self.path is None or fcntl is None:
+            self._buffer = bytearray(_FILE_SIZE)
+        else:
+            if self._fd is not None:
+                self._close_file()
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                # Arquivo criado antes por outro usuário: ele controlaria o limite
+                check_owner(os.fstat(fd), self.path)
+            except PermissionError:
+                os.close(fd)
+                raise
+            if os.fstat(fd).st_size < _FILE_SIZE:
+                os.ftruncate(fd, _FILE_SIZE)
+            self._fd = fd
+            self._buffer = mmap.mmap(fd, _FILE_SIZE)
+        self._pid = os.getpid()
+
+    @contextmanager
+    def _state(self):
+        """Seção crítica: produz o estado atual e grava o que for devolvido em `box[0]`."""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Trava de arquivo herdada em um fork não exclui o processo pai
+                self._open()
+            if self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                magic, tokens, updated, factor, throttled_at = _STATE.unpack_from(self._buffer)
+                now = self._clock()
+                if magic != _MAGIC:
+                    tokens, updated, factor, throttled_at = float(self.burst), now, 1.0, 0.0
+                # Reposição desde a última atualização (relógio que voltou não repõe)
+                tokens = min(self.burst, tokens + max(now - updated, 0.0) * self.rate * factor)
+                box = [(tokens, factor, throttled_at)]
+                yield now, box
+                tokens, factor, throttled_at = box[0]
+                _STATE.pack_into(self._buffer, 0, _MAGIC, tokens, now, factor, throttled_at)
+            finally:
+                if self._fd is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    # --- Operações ---
+
+    def reserve(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """
+        Reserva um token. Retorna quantos segundos esperar antes da chamada
+        (0 se há token agora) ou None se a espera passaria de `max_wait`
+        (nada é reservado: a chamada deve ser descartada).
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        with self._state() as (now, box):
+            tokens, factor, throttled_at = box[0]
+            wait = max(1.0 - tokens, 0.0) / (self.rate * factor)
+            if wait > max_wait:
+                self._stats["dropped"] += 1
+                return None
+            box[0] = (tokens - 1.0, factor, throttled_at)
+        self._stats["acquired"] += 1
+        if wait > 0:
+            self._stats["delayed"] += 1
+        return wait
+
+    def cancel(self):
+        """Devolve um token reservado e não usado (quem esperava desistiu)."""
+        with self._state() as (now, box):
+            tokens, factor, throttled_at = box[0]
+            box[0] = (min(tokens + 1.0, self.burst), factor, throttled_at)
+        self._stats["cancelled"] += 1
+
+    async def acquire(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """Espera a vez da chamada. Retorna a espera (s), ou None se a chamada foi descartada."""
+        wait = self.reserve(max_wait)
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.cancel()
+                raise
+        return wait
+
+    def record_throttled(self, retry_after: Optional[float] = None):
+        """
+        O serviço respondeu 429: reduz a taxa e suspende as chamadas por
+        `retry_after` segundos (padrão: `default_retry_after`). Vários 429
+        da mesma rajada (chamadas que já estavam em andamento) reduzem a taxa
+        uma vez só.
+        """
+        pause = self.default_retry_after if retry_after is None else max(retry_after, 0.0)
+        with self._state() as (now, box):
+            tokens, factor, throttled_at = box[0]
+            if now - throttled_at >= pause:
+                factor = max(factor * self.decrease, self.min_factor)
+                throttled_at = now
+            # Dívida: ninguém chama antes de `pause` segundos (429 repetidos não somam)
+            box[0] = (min(tokens, -pause * self.rate * factor), factor, throttled_at)
+        self._stats["throttled"] += 1
+
+    def record_success(self):
+        """Chamada aceita pelo serviço: recupera parte da taxa, se ela foi reduzida."""
+        with self._state() as (now, box):
+            tokens, factor, throttled_at = box[0]
+            if factor < 1.0:
+                box[0] = (tokens, min(factor + self.increase, 1.0), throttled_at)
+
+    def snapshot(self) -> Tuple[float, float]:
+        """(tokens disponíveis agora, fator atual da taxa)."""
+        with self._state() as (now, box):
+            tokens, factor, _ = box[0]
+        return tokens, factor
+
+    def stats(self) -> Dict[str, float]:
+        tokens, factor = self.snapshot()
+        return {
+            **self._stats,
+            "rate": self.rate,
+            "burst": self.burst,
+            "effective_rate": round(self.rate * factor, 4),
+            "tokens": round(tokens, 3),
+            "shared": self._fd is not None,
+        }
+
+    def _close_file(self):
+        self._buffer.close()
+        os.close(self._fd)
+        self._fd = None
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                self._close_file()
+            self._buffer = None
+            self._pid = None
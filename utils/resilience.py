@@ -0,0 +1,157 @@
+import random
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Disjuntor por provedor: após `failure_threshold` falhas seguidas, abre e
+    recusa chamadas (falha rápida) por `recovery_timeout` segundos. Depois
+    disso deixa passar até `half_open_max_calls` chamadas de teste: sucesso
+    fecha o circuito, falha o abre de novo.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def allow(self) -> bool:
+        """Reserva uma chamada. Toda chamada permitida deve terminar em record_*."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._probes < self.half_open_max_calls:
+            self._probes += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        if self._state == HALF_OPEN:
+            self._state = CLOSED
+        self._failures = 0
+        self._probes = max(self._probes - 1, 0)
+
+    def record_failure(self):
+        self._failures += 1
+        if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != OPEN:
+                self.times_opened += 1
+            self._state = OPEN
+            self._opened_at = self._clock()
+        self._probes = max(self._probes - 1, 0)
+
+    def record_cancel(self):
+        """Chamada abandonada (ex.: perdeu a corrida do hedge): só libera a vaga."""
+        self._probes = max(self._probes - 1, 0)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+class RetryBudget:
+    """
+    Orçamento global de novas tentativas: em uma janela de `ttl` segundos,
+    permite no máximo `ratio` novas tentativas por requisição original, mais
+    `min_per_second` por segundo. Evita que retentativas multipliquem a carga
+    justamente quando o provedor está sobrecarregado.
+    """
+
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        min_per_second: float = 1.0,
+        ttl: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.ttl = ttl
+        self._clock = clock
+        self._requests: deque = deque()
+        self._retries: deque = deque()
+        self.exhausted = 0
+
+    def _trim(self, now: float):
+        limit = now - self.ttl
+        for events in (self._requests, self._retries):
+            while events and events[0] < limit:
+                events.popleft()
+
+    def deposit(self):
+        """Registra uma requisição original."""
+        now = self._clock()
+        self._trim(now)
+        self._requests.append(now)
+
+    def try_withdraw(self) -> bool:
+        """Reserva uma nova tentativa (ou hedge), se ainda houver orçamento."""
+        now = self._clock()
+        self._trim(now)
+        allowed = self.ratio * len(self._requests) + self.min_per_second * self.ttl
+        if len(self._retries) + 1 > allowed:
+            self.exhausted += 1
+            return False
+        self._retries.append(now)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        self._trim(self._clock())
+        return {
+            "requests_in_window": len(self._requests),
+            "retries_in_window": len(self._retries),
+            "exhausted": self.exhausted,
+        }
+
+
+class LatencyTracker:
+    """Latências recentes de um provedor, para calcular o atraso do hedge."""
+
+    def __init__(self, size: int = 256, min_samples: int = 20):
+        self._samples: deque = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(int(p * len(ordered)), len(ordered) - 1)]
+
+
+def jittered_backoff(attempt: int, base: float = 0.1, cap: float = 2.0, rng=random) -> float:
+    """Espera antes da tentativa `attempt` (0 = primeira retentativa), com jitter total."""
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
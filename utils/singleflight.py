@@ -0,0 +1,68 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    __slots__ = ("task", "callers")
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.callers = 1
+
+
+class SingleFlight:
+    """
+    Agrupa chamadas assíncronas concorrentes com a mesma chave: apenas a
+    primeira executa a função; as demais aguardam e recebem o mesmo resultado
+    (ou a mesma exceção).
+
+    A execução roda em uma task própria, então o cancelamento de um dos
+    chamadores (ex.: cliente desconectou) não afeta os demais.
+    """
+
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._stats = {"executions": 0, "coalesced": 0, "max_coalesced": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, int]:
+        """
+        Executa `fn()` (ou se junta à execução em andamento para `key`).
+        Retorna (resultado, quantidade de chamadas agrupadas à execução).
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            task = asyncio.ensure_future(fn())
+            flight = _Flight(task)
+            self._flights[key] = flight
+            self._stats["executions"] += 1
+            task.add_done_callback(lambda _, k=key, f=flight: self._finish(k, f))
+        else:
+            flight.callers += 1
+            self._stats["coalesced"] += 1
+
+        result = await asyncio.shield(flight.task)
+        return result, flight.callers - 1
+
+    def _finish(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        coalesced = flight.callers - 1
+        if coalesced > self._stats["max_coalesced"]:
+            self._stats["max_coalesced"] = coalesced
+        if coalesced:
+            logger.debug("%s: %d chamada(s) agrupada(s) em uma execução", self.name, coalesced)
+        if not flight.task.cancelled():
+            # Evita o aviso "exception was never retrieved" quando ninguém mais aguarda
+            flight.task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> Dict[str, int]:
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._flights)
+        return stats
@@ -0,0 +1,52 @@
+"""
+Diretório privado dos arquivos de estado locais: cache de CNPJ em disco,
+tabela compartilhada entre os workers, estado do limitador de taxa e fila
+de tarefas.
+
+Nenhum deles pode ficar em um caminho previsível do temporário do sistema:
+outro usuário da máquina criaria o arquivo antes e plantaria resultados
+(ou leria os documentos da fila). O padrão é um diretório do usuário,
+criado com permissão 0700 e conferido a cada uso.
+"""
+import os
+import stat
+import tempfile
+
+ENV_VAR = "VALIDACAO_STATE_DIR"
+
+
+def state_dir() -> str:
+    """
+    VALIDACAO_STATE_DIR ou, por padrão, $XDG_STATE_HOME/validacao
+    (~/.local/state/validacao). Criado com 0700 se não existe. Levanta
+    PermissionError se o diretório é de outro usuário ou um link simbólico.
+    """
+    path = os.environ.get(ENV_VAR) or _default_state_dir()
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if stat.S_ISLNK(st.st_mode):
+        raise PermissionError(f"Diretório de estado é um link simbólico: {path}")
+    check_owner(st, path)
+    if hasattr(os, "getuid") and st.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return path
+
+
+def state_path(name: str) -> str:
+    """Caminho de um arquivo de estado dentro de state_dir()."""
+    return os.path.join(state_dir(), name)
+
+
+def check_owner(st: os.stat_result, path: str):
+    """Levanta PermissionError se o arquivo (stat já feito) pertence a outro usuário."""
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        raise PermissionError(f"{path} pertence a outro usuário (uid {st.st_uid})")
+
+
+def _default_state_dir() -> str:
+    base = os.environ.get("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
+    if not os.path.isabs(base):
+        # Sem diretório do usuário (HOME indefinido): um por usuário no temporário
+        uid = os.getuid() if hasattr(os, "getuid") else os.getpid()
+        return os.path.join(tempfile.gettempdir(), f"validacao-{uid}")
+    return os.path.join(base, "validacao")
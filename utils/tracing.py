@@ -0,0 +1,342 @@
+"""
+Rastreamento leve: árvore de spans (trechos cronometrados) de uma execução,
+propagada por contextvars (vale através de awaits e das tasks criadas dentro
+do trecho).
+
+    raiz, token = start_trace("POST /validacao/")
+    with span("schema"):
+        with span("validador.cpf", {"campo": "cpf"}):
+            ...
+    end_trace(raiz, token)
+
+Fora de um rastro, `span(...)` não cria nada: o custo é uma leitura de
+contextvar. Um rastro guarda no máximo MAX_SPANS spans; os excedentes são só
+contados.
+
+Exportação no formato OTLP/JSON (o do OpenTelemetry): arquivo JSONL, uma
+requisição de exportação por linha (lido, por exemplo, pelo receiver
+otlpjsonfile do OpenTelemetry Collector), ou POST para um coletor OTLP/HTTP
+(`/v1/traces`). A exportação roda em uma thread, fora do caminho da
+requisição.
+"""
+import json
+import queue
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+MAX_SPANS = 512
+
+# Redação de atributos: (chave, valor) -> valor a exportar
+Redactor = Callable[[str, Any], Any]
+
+_current: ContextVar[Optional["Span"]] = ContextVar("tracing_current_span", default=None)
+
+
+class Trace:
+    """Dados comuns aos spans de um rastro."""
+    __slots__ = ("trace_id", "wall_start", "perf_start", "spans", "dropped")
+
+    def __init__(self):
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.wall_start = time.time_ns()
+        self.perf_start = time.perf_counter()
+        self.spans = 1
+        self.dropped = 0
+
+
+class Span:
+    __slots__ = ("name", "trace", "start", "end", "attributes", "children", "error")
+
+    def __init__(self, name: str, trace: Trace, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace = trace
+        self.attributes = attributes
+        self.children: List["Span"] = []
+        self.error: Optional[str] = None
+        self.end: Optional[float] = None
+        self.start = time.perf_counter()
+
+    def set_attribute(self, key: str, value: Any):
+        if self.attributes is None:
+            self.attributes = {}
+        self.attributes[key] = value
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    @property
+    def duration(self) -> float:
+        """Duração em segundos (até agora, se o span ainda não terminou)."""
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def start_trace(name: str, attributes: Optional[Dict[str, Any]] = None) -> Tuple[Span, object]:
+    """Abre um rastro com o span raiz `name`. Retorna (raiz, token para end_trace)."""
+    root = Span(name, Trace(), attributes)
+    return root, _current.set(root)
+
+
+def end_trace(root: Span, token):
+    root.finish()
+    _current.reset(token)
+
+
+class span:
+    """Span filho do span atual (se houver um rastro aberto): `with span("nome", {...}) as s: ...`."""
+    __slots__ = ("_span", "_token")
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        parent = _current.get()
+        if parent is None:
+            self._span = None
+            return
+        trace = parent.trace
+        if trace.spans >= MAX_SPANS:
+            trace.dropped += 1
+            self._span = None
+            return
+        trace.spans += 1
+        self._span = Span(name, trace, attributes)
+        parent.children.append(self._span)
+
+    def __enter__(self) -> Optional[Span]:
+        if self._span is not None:
+            self._token = _current.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._span is not None:
+            self._span.finish()
+            if exc_type is not None:
+                self._span.error = exc_type.__name__
+            _current.reset(self._token)
+        return False
+
+
+# --- Resumos e formatos ---
+
+def server_timing(root: Span) -> str:
+    """
+    Valor do cabeçalho Server-Timing: a soma das durações dos filhos diretos
+    da raiz, por nome, e o total (em ms).
+    """
+    totals: Dict[str, float] = {}
+    for child in root.children:
+        totals[child.name] = totals.get(child.name, 0.0) + child.duration
+    parts = [f"{_token(name)};dur={seconds * 1000:.2f}" for name, seconds in totals.items()]
+    parts.append(f"total;dur={root.duration * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def _token(name: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_.!#$%&'*+^`|~" else "_" for c in name)
+
+
+def _attributes(attributes: Optional[Dict[str, Any]], redact: Optional[Redactor]) -> Dict[str, Any]:
+    if not attributes:
+        return {}
+    if redact is None:
+        return dict(attributes)
+    return {key: redact(key, value) for key, value in attributes.items()}
+
+
+def to_dict(root: Span, redact: Optional[Redactor] = None) -> Dict[str, Any]:
+    """Árvore de spans com início (relativo à raiz) e duração em ms."""
+    origin = root.start
+
+    def node(s: Span) -> Dict[str, Any]:
+        result = {
+            "name": s.name,
+            "start_ms": round((s.start - origin) * 1000, 3),
+            "duration_ms": round(s.duration * 1000, 3),
+        }
+        attributes = _attributes(s.attributes, redact)
+        if attributes:
+            result["attributes"] = attributes
+        if s.error:
+            result["error"] = s.error
+        if s.end is None:
+            result["unfinished"] = True
+        if s.children:
+            result["children"] = [node(child) for child in s.children]
+        return result
+
+    tree = node(root)
+    tree["trace_id"] = root.trace.trace_id
+    if root.trace.dropped:
+        tree["dropped_spans"] = root.trace.dropped
+    return tree
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+# SpanKind do OTLP
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+
+
+def to_otlp_spans(root: Span, redact: Optional[Redactor] = None,
+                  client_prefixes: Tuple[str, ...] = ()) -> List[Dict[str, Any]]:
+    """Spans do rastro no formato OTLP/JSON. Spans cujo nome começa com `client_prefixes` são chamadas de saída."""
+    trace = root.trace
+    offset = trace.wall_start - int(trace.perf_start * 1e9)
+    end_of_root = root.end if root.end is not None else time.perf_counter()
+    spans = []
+
+    def emit(s: Span, parent_id: Optional[str]):
+        span_id = f"{random.getrandbits(64):016x}"
+        end = s.end if s.end is not None else end_of_root
+        item = {
+            "traceId": trace.trace_id,
+            "spanId": span_id,
+            "name": s.name,
+            "kind": KIND_SERVER if parent_id is None else (
+                KIND_CLIENT if client_prefixes and s.name.startswith(client_prefixes) else KIND_INTERNAL),
+            "startTimeUnixNano": str(offset + int(s.start * 1e9)),
+            "endTimeUnixNano": str(offset + int(end * 1e9)),
+            "attributes": _otlp_attributes(_attributes(s.attributes, redact)),
+        }
+        if parent_id is not None:
+            item["parentSpanId"] = parent_id
+        if s.error:
+            item["status"] = {"code": 2, "message": s.error}
+        spans.append(item)
+        for child in s.children:
+            emit(child, span_id)
+
+    emit(root, None)
+    return spans
+
+
+def otlp_request(spans: List[Dict[str, Any]], service_name: str, scope: str = "tracing") -> Dict[str, Any]:
+    """Corpo de uma ExportTraceServiceRequest (OTLP/JSON) com os spans informados."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": service_name})},
+            "scopeSpans": [{"scope": {"name": scope}, "spans": spans}],
+        }]
+    }
+
+
+# --- Exportadores ---
+
+class FileExporter:
+    """Acrescenta cada lote ao arquivo `path` como uma linha OTLP/JSON."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, payload: Dict[str, Any]):
+        line = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class OTLPHTTPExporter:
+    """POST do lote para um coletor OTLP/HTTP (ex.: http://localhost:4318/v1/traces)."""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0, headers: Optional[Dict[str, str]] = None):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+
+    def export(self, payload: Dict[str, Any]):
+        import urllib.request  # só quem exporta para um coletor precisa dele
+
+        request = urllib.request.Request(
+            self.endpoint, data=json.dumps(payload).encode("utf-8"), headers=self.headers, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class BackgroundExporter:
+    """
+    Fila de spans exportados por uma thread em lotes de até `batch_size`
+    rastros (ou a cada `interval` segundos). Com a fila cheia, o rastro é
+    descartado: a exportação nunca segura a requisição.
+    """
+
+    def __init__(self, exporters, service_name: str, scope: str = "tracing",
+                 max_queue: int = 1000, batch_size: int = 64, interval: float = 1.0):
+        self.exporters = list(exporters)
+        self.service_name = service_name
+        self.scope = scope
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue: "queue.Queue" = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats = {"exported": 0, "dropped": 0, "errors": 0}
+
+    def submit(self, spans: List[Dict[str, Any]]):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="tracing-export", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self._stats["dropped"] += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            stop = batch[0] is None
+            deadline = time.monotonic() + self.interval
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            traces = [spans for spans in batch if spans is not None]
+            if traces:
+                self._export(traces)
+            if stop:
+                return
+
+    def _export(self, traces: List[List[Dict[str, Any]]]):
+        payload = otlp_request([s for spans in traces for s in spans], self.service_name, self.scope)
+        for exporter in self.exporters:
+            try:
+                exporter.export(payload)
+            except Exception:
+                self._stats["errors"] += 1
+        self._stats["exported"] += len(traces)
+
+    def close(self, timeout: float = 5.0):
+        """Exporta o que estiver na fila e encerra a thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                return
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "queued": self._queue.qsize()}
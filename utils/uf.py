@@ -1,4 +1,15 @@
+from array import array
+from bisect import bisect_right
+from typing import Iterable, Optional, Tuple
+
 from .exceptions import ValidationError
+from ._digits import OK
+
+UNKNOWN_UF = "unknown_uf"
+
+MESSAGES = {
+    UNKNOWN_UF: "UF inválida.",
+}
 
 UFS = {
     "AC": "Acre", 
@@ -30,9 +41,100 @@ UFS = {
     "TO": "Tocantins",
 }
 
+# Todas as grafias de cada sigla (SP, sp, Sp, sP): evita o upper() por chamada
+_UF_VARIANTS = frozenset(
+    variant
+    for uf in UFS
+    for variant in (uf, uf.lower(), uf.capitalize(), uf[0].lower() + uf[1])
+)
+
+def check_uf(uf: str) -> Tuple[bool, str]:
+    """
+    Valida a UF sem levantar exceções.
+    Retorna (True, "") ou (False, código do motivo).
+    """
+    if uf in _UF_VARIANTS or uf.upper() in UFS:
+        return True, OK
+    return False, UNKNOWN_UF
+
+def uf_error_message(uf: str, code: str) -> str:
+    return MESSAGES[code]
+
 def is_valid_uf(uf: str) -> bool:
-    return uf.upper() in UFS
+    return check_uf(uf)[0]
 
 def validate_uf(uf: str):
-    if not is_valid_uf(uf):
-        raise ValidationError("UF inválida.")
\ No newline at end of file
+    valid, code = check_uf(uf)
+    if not valid:
+        raise ValidationError(uf_error_message(uf, code))
+
+
+class UFRanges:
+    """
+    Tabela de faixas numéricas [início, fim] -> UF (faixas de CEP, DDDs),
+    guardada em arrays ordenados e consultada por busca binária (bisect):
+    sem I/O e sem um dicionário com todos os valores possíveis. Faixas
+    vizinhas da mesma UF são unidas. Valores fora de todas as faixas não têm
+    UF (None).
+    """
+    __slots__ = ("starts", "ends", "ufs", "_arrays")
+
+    def __init__(self, ranges: Iterable[Tuple[str, int, int]]):
+        merged = []
+        for uf, start, end in sorted(ranges, key=lambda r: r[1]):
+            if uf not in UFS or start > end:
+                raise ValueError(f"Faixa inválida: {uf} {start}-{end}")
+            if merged and start <= merged[-1][2]:
+                raise ValueError(f"Faixas sobrepostas: {merged[-1][0]} até {merged[-1][2]} e {uf} a partir de {start}")
+            if merged and merged[-1][0] == uf and merged[-1][2] + 1 == start:
+                merged[-1][2] = end
+            else:
+                merged.append([uf, start, end])
+        self.starts = array("q", (start for _, start, _ in merged))
+        self.ends = array("q", (end for _, _, end in merged))
+        self.ufs = tuple(uf for uf, _, _ in merged)
+        self._arrays = None
+
+    def __len__(self):
+        return len(self.ufs)
+
+    def lookup(self, value: int) -> Optional[str]:
+        """UF da faixa que contém `value`, ou None."""
+        i = bisect_right(self.starts, value) - 1
+        if i >= 0 and value <= self.ends[i]:
+            return self.ufs[i]
+        return None
+
+    def lookup_batch(self, values):
+        """
+        Versão vetorizada (NumPy, searchsorted) de lookup: array de objetos
+        com a UF de cada valor, ou None.
+        """
+        from ._batch import _numpy
+        np = _numpy()
+        if self._arrays is None:
+            self._arrays = (
+                np.frombuffer(self.starts, dtype=np.int64), np.frombuffer(self.ends, dtype=np.int64),
+                np.array(self.ufs + (None,), dtype=object),
+            )
+        starts, ends, ufs = self._arrays
+        values = np.asarray(values, dtype=np.int64)
+        i = np.searchsorted(starts, values, side="right") - 1
+        found = (i >= 0) & (values <= ends[np.maximum(i, 0)])
+        return ufs[np.where(found, i, len(starts))]
+
+
+# DDDs de cada UF (Anatel)
+DDDS = {
+    "AC": (68,), "AL": (82,), "AP": (96,), "AM": (92, 97), "BA": (71, 73, 74, 75, 77),
+    "CE": (85, 88), "DF": (61,), "ES": (27, 28), "GO": (62, 64), "MA": (98, 99),
+    "MT": (65, 66), "MS": (67,), "MG": (31, 32, 33, 34, 35, 37, 38), "PA": (91, 93, 94),
+    "PB": (83,), "PR": (41, 42, 43, 44, 45, 46), "PE": (81, 87), "PI": (86, 89),
+    "RJ": (21, 22, 24), "RN": (84,), "RS": (51, 53, 54, 55), "RO": (69,), "RR": (95,),
+    "SC": (47, 48, 49), "SP": (11, 12, 13, 14, 15, 16, 17, 18, 19), "SE": (79,), "TO": (63,),
+}
+DDD_RANGES = UFRanges((uf, ddd, ddd) for uf, ddds in DDDS.items() for ddd in ddds)
+
+def uf_for_ddd(ddd: int) -> Optional[str]:
+    """UF do DDD (ex.: 11 -> "SP"), ou None se o DDD não existe."""
+    return DDD_RANGES.lookup(ddd)